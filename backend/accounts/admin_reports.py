@@ -3,7 +3,8 @@ from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import api_view, permission_classes, action
-from django.db.models import Count, Sum
+from django.db.models import Count, Sum, Q, Value
+from django.db.models.functions import Concat
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.http import HttpResponse
@@ -15,6 +16,26 @@ from payments.models import Transaction, Payment
 from users.models import Customer, Merchant
 from accounts.models import User
 from core.api_utils import api_success
+from core.exports import StreamingExport, ASYNC_EXPORT_ROW_THRESHOLD
+
+TRANSACTION_EXPORT_COLUMNS = [
+    ('ID', 'id'),
+    ('Amount', 'amount'),
+    ('Currency', 'currency'),
+    ('Status', 'status'),
+    ('Customer', 'customer_name'),
+    ('Created', 'created_at'),
+]
+
+PAYMENT_EXPORT_COLUMNS = [
+    ('ID', 'id'),
+    ('Amount', 'amount'),
+    ('Currency', 'currency'),
+    ('Status', 'status'),
+    ('Customer', 'customer_name'),
+    ('Payment Method', 'payment_method__method_type'),
+    ('Created', 'created_at'),
+]
 
 class AdminReportViewSet(viewsets.ModelViewSet):
     """Admin viewset for managing generated reports"""
@@ -49,26 +70,55 @@ def generate_admin_report(request):
     date_to = request.data.get('date_to')
 
     # Generate report data based on type
-    if report_type == 'transactions':
-        data = generate_transaction_report(date_from, date_to)
-    elif report_type == 'users':
-        data = generate_user_report(date_from, date_to)
-    elif report_type == 'revenue':
-        data = generate_revenue_report(date_from, date_to)
-    elif report_type == 'payments':
-        data = generate_payment_report(date_from, date_to)
-    else:
+    data = build_admin_report_data(report_type, date_from, date_to)
+    if data is None:
         return Response({"error": "Invalid report type"}, status=400)
 
+    if format_type not in ('pdf', 'excel', 'csv'):
+        return Response({"error": "Invalid format"}, status=400)
+
+    # Very large row exports are built on a worker and written to storage
+    row_count = data.get('summary', {}).get('total_count', 0)
+    wants_async = str(request.data.get('async', '')).lower() in ('1', 'true', 'yes')
+    if format_type != 'pdf' and (wants_async or row_count > ASYNC_EXPORT_ROW_THRESHOLD):
+        from .tasks import generate_admin_report_export
+        task = generate_admin_report_export.delay(report_type, format_type, date_from, date_to)
+        return Response({
+            'message': 'Report is being generated',
+            'task_id': task.id,
+            'row_count': row_count
+        }, status=status.HTTP_202_ACCEPTED)
+
     # Return report in requested format
     if format_type == 'pdf':
         return generate_pdf_response(data, report_type)
     elif format_type == 'excel':
         return generate_excel_response(data, report_type)
-    elif format_type == 'csv':
-        return generate_csv_response(data, report_type)
-    else:
-        return Response({"error": "Invalid format"}, status=400)
+    return generate_csv_response(data, report_type)
+
+def build_admin_report_data(report_type, date_from=None, date_to=None):
+    """Return report data for a report type, or None if the type is unknown"""
+    if report_type == 'transactions':
+        return generate_transaction_report(date_from, date_to)
+    elif report_type == 'users':
+        return generate_user_report(date_from, date_to)
+    elif report_type == 'revenue':
+        return generate_revenue_report(date_from, date_to)
+    elif report_type == 'payments':
+        return generate_payment_report(date_from, date_to)
+    return None
+
+def build_report_export(data):
+    """Return a StreamingExport over the report's row queryset, if it has one"""
+    summary = [
+        (key.replace('_', ' ').title(), value)
+        for key, value in data.get('summary', {}).items()
+    ]
+    if 'transactions' in data:
+        return StreamingExport(data['transactions'], TRANSACTION_EXPORT_COLUMNS, title='Transactions', summary=summary)
+    if 'payments' in data:
+        return StreamingExport(data['payments'], PAYMENT_EXPORT_COLUMNS, title='Payments', summary=summary)
+    return None
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
@@ -110,31 +160,34 @@ def get_admin_report_stats(request):
 
     return api_success(stats, request=request)
 
+def _customer_name():
+    return Concat('customer__user__first_name', Value(' '), 'customer__user__last_name')
+
 def generate_transaction_report(date_from=None, date_to=None):
     """Generate transaction report data"""
-    queryset = Transaction.objects.select_related('customer', 'merchant').all()
+    queryset = Transaction.objects.all()
 
     if date_from:
         queryset = queryset.filter(created_at__gte=date_from)
     if date_to:
         queryset = queryset.filter(created_at__lte=date_to)
 
+    summary = queryset.aggregate(
+        total_count=Count('id'),
+        total_amount=Sum('amount'),
+        completed_count=Count('id', filter=Q(status='completed')),
+        pending_count=Count('id', filter=Q(status='pending'))
+    )
+    summary['total_amount'] = summary['total_amount'] or 0
+
     return {
         'title': 'Transaction Report',
         'generated_at': datetime.now(),
         'date_from': date_from,
         'date_to': date_to,
-        'transactions': list(queryset.values(
-            'id', 'amount', 'currency', 'status', 'created_at',
-            'customer__user__first_name', 'customer__user__last_name',
-            'merchant__business_name'
-        )),
-        'summary': {
-            'total_count': queryset.count(),
-            'total_amount': queryset.aggregate(Sum('amount'))['amount__sum'] or 0,
-            'completed_count': queryset.filter(status='completed').count(),
-            'pending_count': queryset.filter(status='pending').count()
-        }
+        # Left lazy so exports can stream it from a cursor
+        'transactions': queryset.annotate(customer_name=_customer_name()).order_by('id'),
+        'summary': summary
     }
 
 def generate_user_report(date_from=None, date_to=None):
@@ -196,29 +249,29 @@ def generate_revenue_report(date_from=None, date_to=None):
 
 def generate_payment_report(date_from=None, date_to=None):
     """Generate payment report data"""
-    queryset = Payment.objects.select_related('customer', 'payment_method').all()
+    queryset = Payment.objects.all()
 
     if date_from:
         queryset = queryset.filter(created_at__gte=date_from)
     if date_to:
         queryset = queryset.filter(created_at__lte=date_to)
 
+    summary = queryset.aggregate(
+        total_count=Count('id'),
+        total_amount=Sum('amount'),
+        completed_count=Count('id', filter=Q(status='completed')),
+        failed_count=Count('id', filter=Q(status='failed'))
+    )
+    summary['total_amount'] = summary['total_amount'] or 0
+
     return {
         'title': 'Payment Report',
         'generated_at': datetime.now(),
         'date_from': date_from,
         'date_to': date_to,
-        'payments': list(queryset.values(
-            'id', 'amount', 'currency', 'status', 'created_at',
-            'customer__user__first_name', 'customer__user__last_name',
-            'payment_method__method_type'
-        )),
-        'summary': {
-            'total_count': queryset.count(),
-            'total_amount': queryset.aggregate(Sum('amount'))['amount__sum'] or 0,
-            'completed_count': queryset.filter(status='completed').count(),
-            'failed_count': queryset.filter(status='failed').count()
-        }
+        # Left lazy so exports can stream it from a cursor
+        'payments': queryset.annotate(customer_name=_customer_name()).order_by('id'),
+        'summary': summary
     }
 
 def generate_pdf_response(data, report_type):
@@ -253,6 +306,10 @@ def generate_pdf_response(data, report_type):
 
 def generate_excel_response(data, report_type):
     """Generate Excel response"""
+    export = build_report_export(data)
+    if export is not None:
+        return export.xlsx_response(f"{report_type}_report.xlsx")
+
     output = io.BytesIO()
     workbook = xlsxwriter.Workbook(output)
     worksheet = workbook.add_worksheet()
@@ -269,18 +326,6 @@ def generate_excel_response(data, report_type):
             worksheet.write(row, 1, value)
             row += 1
 
-    # Write data
-    if 'transactions' in data:
-        worksheet.write_row(row + 2, 0, ["Transactions"], header_format)
-        worksheet.write_row(row + 3, 0, ["ID", "Amount", "Currency", "Status", "Customer", "Created"])
-        for i, transaction in enumerate(data['transactions'][:1000]):  # Limit to 1000 rows
-            worksheet.write(row + 4 + i, 0, transaction['id'])
-            worksheet.write(row + 4 + i, 1, float(transaction['amount']))
-            worksheet.write(row + 4 + i, 2, transaction['currency'])
-            worksheet.write(row + 4 + i, 3, transaction['status'])
-            worksheet.write(row + 4 + i, 4, f"{transaction['customer__user__first_name']} {transaction['customer__user__last_name']}")
-            worksheet.write(row + 4 + i, 5, transaction['created_at'])
-
     workbook.close()
     output.seek(0)
 
@@ -291,6 +336,10 @@ def generate_excel_response(data, report_type):
 
 def generate_csv_response(data, report_type):
     """Generate CSV response"""
+    export = build_report_export(data)
+    if export is not None:
+        return export.csv_response(f"{report_type}_report.csv")
+
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="{report_type}_report.csv"'
 
@@ -303,20 +352,6 @@ def generate_csv_response(data, report_type):
             writer.writerow([key.replace('_', ' ').title(), value])
         writer.writerow([])
 
-    # Write data
-    if 'transactions' in data:
-        writer.writerow(['Transactions'])
-        writer.writerow(['ID', 'Amount', 'Currency', 'Status', 'Customer', 'Created'])
-        for transaction in data['transactions'][:1000]:  # Limit to 1000 rows
-            writer.writerow([
-                transaction['id'],
-                transaction['amount'],
-                transaction['currency'],
-                transaction['status'],
-                f"{transaction['customer__user__first_name']} {transaction['customer__user__last_name']}",
-                transaction['created_at']
-            ])
-
     return response
 
 def calculate_period_days(date_from, date_to):
@@ -3,8 +3,6 @@ from django.core.mail import send_mail
 from .models import PaymentLog
 from django.conf import settings
 from django.utils import timezone
-from .models import PasswordResetToken
-from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 import logging
 
 logger = logging.getLogger(__name__)
@@ -70,18 +68,14 @@ def cleanup_expired_tokens():
     """
     Clean up expired password reset tokens and JWT tokens
     """
+    from core.retention import purge_expired
+
     try:
         # Clean up expired password reset tokens
-        expired_reset_tokens = PasswordResetToken.objects.filter(
-            expires_at__lt=timezone.now()
-        )
-        reset_count = expired_reset_tokens.delete()[0]
+        reset_count = purge_expired('password_reset_tokens')['deleted']
 
         # Clean up expired JWT tokens from blacklist
-        expired_jwt_tokens = OutstandingToken.objects.filter(
-            expires_at__lt=timezone.now()
-        )
-        jwt_count = expired_jwt_tokens.delete()[0]
+        jwt_count = purge_expired('outstanding_jwt_tokens')['deleted']
 
         logger.info(f"Cleaned up {reset_count} expired password reset tokens and {jwt_count} expired JWT tokens")
 
@@ -93,3 +87,30 @@ def cleanup_expired_tokens():
     except Exception as e:
         logger.error(f"Token cleanup error: {str(e)}")
         raise e
+
+@shared_task
+def generate_admin_report_export(report_type, format_type, date_from=None, date_to=None):
+    """
+    Build a large admin report export on a worker and write it to file storage
+    """
+    from .admin_reports import build_admin_report_data, build_report_export
+
+    data = build_admin_report_data(report_type, date_from, date_to)
+    export = build_report_export(data) if data else None
+    if export is None:
+        logger.error(f"Report type {report_type} has no exportable rows")
+        return None
+
+    extension = 'csv' if format_type == 'csv' else 'xlsx'
+    path = f"exports/admin/{report_type}_report_{timezone.now().strftime('%Y%m%d%H%M%S')}.{extension}"
+
+    try:
+        stored_path, row_count = export.save(path, format_type)
+    except Exception as e:
+        logger.error(f"Admin report export failed: {str(e)}")
+        raise e
+
+    return {
+        'file_path': stored_path,
+        'row_count': row_count
+    }
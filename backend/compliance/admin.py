@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import RegulatorySubmission
+from .models import RegulatorySubmission, SanctionsScreeningRun, SanctionsScreeningHit
 
 @admin.register(RegulatorySubmission)
 class RegulatorySubmissionAdmin(admin.ModelAdmin):
@@ -7,3 +7,17 @@ class RegulatorySubmissionAdmin(admin.ModelAdmin):
     list_filter = ('success', 'submitted_at')
     search_fields = ('user__email',)
     readonly_fields = ('submitted_at', 'response')
+
+@admin.register(SanctionsScreeningRun)
+class SanctionsScreeningRunAdmin(admin.ModelAdmin):
+    list_display = ('list_version', 'status', 'entries_screened', 'names_screened', 'hit_count', 'started_at', 'completed_at')
+    list_filter = ('status',)
+    exclude = ('entry_fingerprints',)
+    readonly_fields = ('started_at', 'completed_at', 'checkpoint_user_id', 'elapsed_seconds', 'error')
+
+@admin.register(SanctionsScreeningHit)
+class SanctionsScreeningHitAdmin(admin.ModelAdmin):
+    list_display = ('screened_name', 'matched_name', 'source', 'match_confidence', 'reviewed', 'created_at')
+    list_filter = ('reviewed', 'source')
+    search_fields = ('user__email', 'screened_name', 'matched_name')
+    raw_id_fields = ('run', 'user')
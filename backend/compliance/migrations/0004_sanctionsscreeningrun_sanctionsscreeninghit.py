@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('compliance', '0003_suspiciousactivityreport_bogmonthlyreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SanctionsScreeningRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('list_version', models.CharField(db_index=True, max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('entry_fingerprints', models.JSONField(default=list)),
+                ('entries_screened', models.IntegerField(default=0)),
+                ('checkpoint_user_id', models.BigIntegerField(default=0)),
+                ('users_screened', models.IntegerField(default=0)),
+                ('names_screened', models.IntegerField(default=0)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('elapsed_seconds', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('previous_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='next_runs', to='compliance.sanctionsscreeningrun')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SanctionsScreeningHit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('screened_name', models.CharField(max_length=255)),
+                ('matched_name', models.CharField(max_length=255)),
+                ('source', models.CharField(max_length=50)),
+                ('sanctions_type', models.CharField(blank=True, max_length=50)),
+                ('match_confidence', models.FloatField()),
+                ('reviewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hits', to='compliance.sanctionsscreeningrun')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sanctions_hits', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-match_confidence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sanctionsscreeninghit',
+            constraint=models.UniqueConstraint(fields=('run', 'user', 'source', 'matched_name'), name='unique_sanctions_hit_per_run'),
+        ),
+    ]
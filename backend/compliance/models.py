@@ -201,3 +201,75 @@ class BOGMonthlyReport(models.Model):
     
     def __str__(self):
         return f"BoG Report {self.year}-{self.month:02d}"
+
+
+class SanctionsScreeningRun(models.Model):
+    """
+    One bulk re-screen of the customer and merchant base against a sanctions
+    list version. ``checkpoint_user_id`` is the last user whose screening has
+    been fully written, so a crashed run resumes right after it.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    list_version = models.CharField(max_length=64, db_index=True)
+    previous_run = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='next_runs'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    
+    # Fingerprints of every list entry, diffed against by the next run
+    entry_fingerprints = models.JSONField(default=list)
+    entries_screened = models.IntegerField(default=0)
+    
+    checkpoint_user_id = models.BigIntegerField(default=0)
+    users_screened = models.IntegerField(default=0)
+    names_screened = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    elapsed_seconds = models.FloatField(default=0)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Sanctions re-screen {self.list_version} ({self.status})"
+    
+    @property
+    def names_per_second(self):
+        return self.names_screened / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class SanctionsScreeningHit(models.Model):
+    """A customer or merchant name matched by a bulk sanctions re-screen"""
+    run = models.ForeignKey(SanctionsScreeningRun, on_delete=models.CASCADE, related_name='hits')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sanctions_hits')
+    screened_name = models.CharField(max_length=255)
+    matched_name = models.CharField(max_length=255)
+    source = models.CharField(max_length=50)
+    sanctions_type = models.CharField(max_length=50, blank=True)
+    match_confidence = models.FloatField()
+    reviewed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-match_confidence']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'user', 'source', 'matched_name'],
+                name='unique_sanctions_hit_per_run'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.screened_name} ~ {self.matched_name} ({self.match_confidence:.2f})"
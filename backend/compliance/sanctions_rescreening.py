@@ -0,0 +1,209 @@
+"""
+Bulk sanctions re-screening for SikaRemit
+Re-screens every customer and merchant name against the entries that are new
+or changed in a sanctions list update, with progress checkpointed per chunk.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from payments.services.sanctions_screening_service import (
+    MATCH_THRESHOLD, SanctionsScreeningIndex, diff_sanctions_lists, entry_fingerprint
+)
+from .models import SanctionsScreeningHit, SanctionsScreeningRun
+
+logger = logging.getLogger(__name__)
+
+# Users per chunk: the unit of work sent to a worker and of checkpointing
+RESCREEN_CHUNK_SIZE = getattr(settings, 'SANCTIONS_RESCREEN_CHUNK_SIZE', 2000)
+
+# Worker processes used to screen chunks in parallel
+RESCREEN_WORKERS = getattr(settings, 'SANCTIONS_RESCREEN_WORKERS', os.cpu_count() or 1)
+
+# Index over the list diff, built once per worker process
+_worker_index = None
+
+
+def _init_worker(sanctions_data: Dict[str, List[Dict[str, Any]]], list_version: str):
+    global _worker_index
+    _worker_index = SanctionsScreeningIndex(sanctions_data, list_version)
+
+
+def _screen_chunk(chunk: List[Tuple[int, str, str]]) -> Tuple[int, int, int, List[Dict[str, Any]]]:
+    """
+    Screen ``(user_id, full_name, business_name)`` rows against the worker index.
+
+    Returns ``(last_user_id, users, names, hits)``. Personal names are screened
+    against every entry and business names against entities only, matching
+    ``PEPSanctionsService.screen_individual`` / ``screen_entity``.
+    """
+    hits = []
+    names = 0
+    for user_id, full_name, business_name in chunk:
+        user_hits = {}
+        for name, entry_type in ((full_name, None), (business_name, 'entity')):
+            if not name:
+                continue
+            names += 1
+            for match in _worker_index.screen([name], MATCH_THRESHOLD, entry_type):
+                entry = match['entry']
+                key = (match['source'], entry['name'])
+                if key in user_hits and user_hits[key]['match_confidence'] >= match['score']:
+                    continue
+                user_hits[key] = {
+                    'user_id': user_id,
+                    'screened_name': name[:255],
+                    'matched_name': entry['name'][:255],
+                    'source': match['source'],
+                    'sanctions_type': entry.get('sanctions_type', ''),
+                    'match_confidence': match['score'],
+                }
+        hits.extend(user_hits.values())
+    return chunk[-1][0], len(chunk), names, hits
+
+
+class SanctionsRescreeningJob:
+    """
+    Re-screen the whole customer and merchant base for one list version.
+
+    Only entries that are new or changed since the last completed run are
+    indexed, so a routine list update screens millions of names against a few
+    hundred entries. Users are streamed in primary key order with
+    ``.iterator()``, screened in worker processes, and each chunk's hits are
+    bulk-inserted together with the run checkpoint in one transaction; a
+    crashed run picks up after the last committed chunk.
+    """
+
+    def __init__(self, sanctions_data: Dict[str, List[Dict[str, Any]]], list_version: str,
+                 workers: int = None, chunk_size: int = None):
+        self.sanctions_data = sanctions_data
+        self.list_version = list_version
+        self.workers = workers or RESCREEN_WORKERS
+        self.chunk_size = chunk_size or RESCREEN_CHUNK_SIZE
+
+    def run(self) -> SanctionsScreeningRun:
+        run = self._start_or_resume()
+        if run.status == 'completed':
+            logger.info(f"Sanctions list {self.list_version} already re-screened (run {run.id})")
+            return run
+
+        previous = run.previous_run
+        diff = diff_sanctions_lists(self.sanctions_data, previous.entry_fingerprints if previous else [])
+        run.entries_screened = sum(len(entries) for entries in diff.values())
+        run.save(update_fields=['entries_screened'])
+
+        if diff:
+            try:
+                self._screen_users(run, diff)
+            except Exception as e:
+                run.status = 'failed'
+                run.error = str(e)
+                run.save(update_fields=['status', 'error'])
+                logger.error(f"Sanctions re-screen run {run.id} failed at user {run.checkpoint_user_id}: {str(e)}")
+                raise
+
+        run.status = 'completed'
+        run.completed_at = timezone.now()
+        run.error = ''
+        run.save(update_fields=['status', 'completed_at', 'error'])
+        logger.info(
+            f"Sanctions re-screen run {run.id} completed: {run.names_screened} names against "
+            f"{run.entries_screened} new/changed entries, {run.hit_count} hits, "
+            f"{run.names_per_second:.0f} names/sec"
+        )
+        return run
+
+    def _start_or_resume(self) -> SanctionsScreeningRun:
+        runs = SanctionsScreeningRun.objects.filter(list_version=self.list_version)
+        run = runs.filter(status='completed').first() or runs.exclude(status='completed').first()
+        if run is not None:
+            if run.status == 'failed':
+                logger.info(f"Resuming sanctions re-screen run {run.id} after user {run.checkpoint_user_id}")
+                run.status = 'running'
+                run.save(update_fields=['status'])
+            return run
+
+        return SanctionsScreeningRun.objects.create(
+            list_version=self.list_version,
+            previous_run=SanctionsScreeningRun.objects.filter(status='completed').first(),
+            entry_fingerprints=[
+                entry_fingerprint(source, entry)
+                for source, entries in self.sanctions_data.items()
+                for entry in entries
+            ],
+        )
+
+    def _iter_chunks(self, after_user_id: int) -> Iterator[List[Tuple[int, str, str]]]:
+        rows = (
+            get_user_model().objects
+            .filter(pk__gt=after_user_id)
+            .order_by('pk')
+            .values_list('pk', 'first_name', 'last_name', 'merchant_profile__business_name')
+            .iterator(chunk_size=self.chunk_size)
+        )
+        chunk = []
+        for user_id, first_name, last_name, business_name in rows:
+            chunk.append((user_id, f"{first_name or ''} {last_name or ''}".strip(), business_name or ''))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _screen_users(self, run: SanctionsScreeningRun, diff: Dict[str, List[Dict[str, Any]]]):
+        chunks = self._iter_chunks(run.checkpoint_user_id)
+        self._session_started = time.perf_counter()
+        self._elapsed_before = run.elapsed_seconds
+
+        # Celery prefork children are daemonic and cannot start processes
+        if self.workers <= 1 or multiprocessing.current_process().daemon:
+            _init_worker(diff, self.list_version)
+            for chunk in chunks:
+                self._record_chunk(run, *_screen_chunk(chunk))
+            return
+
+        # Workers only screen, they never touch the database, so forking after
+        # the connection is open is safe. Results are consumed in submission
+        # order so the checkpoint always advances over a contiguous prefix.
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(diff, self.list_version)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_screen_chunk, chunk))
+                if len(pending) >= self.workers * 2:
+                    self._record_chunk(run, *pending.popleft().result())
+            while pending:
+                self._record_chunk(run, *pending.popleft().result())
+
+    def _record_chunk(self, run: SanctionsScreeningRun, last_user_id: int, users: int,
+                      names: int, hits: List[Dict[str, Any]]):
+        with transaction.atomic():
+            if hits:
+                SanctionsScreeningHit.objects.bulk_create(
+                    [SanctionsScreeningHit(run=run, **hit) for hit in hits],
+                    ignore_conflicts=True
+                )
+                # Hits already stored were skipped, so count what the run holds
+                run.hit_count = run.hits.count()
+            run.checkpoint_user_id = last_user_id
+            run.users_screened += users
+            run.names_screened += names
+            run.elapsed_seconds = self._elapsed_before + time.perf_counter() - self._session_started
+            run.save(update_fields=[
+                'checkpoint_user_id', 'users_screened', 'names_screened', 'hit_count', 'elapsed_seconds'
+            ])
+        logger.debug(
+            f"Sanctions re-screen run {run.id}: checkpoint user {last_user_id}, "
+            f"{run.names_per_second:.0f} names/sec"
+        )
@@ -0,0 +1,42 @@
+from celery import shared_task
+from django.core.cache import cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESCREEN_LOCK_KEY = 'compliance_sanctions_rescreen_lock'
+RESCREEN_LOCK_TIMEOUT = 60 * 60 * 12  # 12 hours
+
+
+@shared_task
+def rescreen_customer_base():
+    """
+    Re-screen all customers and merchants when the sanctions lists change.
+
+    Runs on a schedule; it is a no-op when the current list version has
+    already been screened, and resumes an unfinished run otherwise.
+    """
+    from payments.services.advanced_compliance_service import PEPSanctionsService
+    from .sanctions_rescreening import SanctionsRescreeningJob
+
+    if not cache.add(RESCREEN_LOCK_KEY, True, RESCREEN_LOCK_TIMEOUT):
+        logger.info("Sanctions re-screen already in progress, skipping")
+        return None
+
+    try:
+        service = PEPSanctionsService()
+        if not service.sanctions_data:
+            logger.warning("No sanctions data loaded, skipping re-screen")
+            return None
+
+        run = SanctionsRescreeningJob(service.sanctions_data, service.sanctions_index.version).run()
+        return {
+            'run_id': run.id,
+            'list_version': run.list_version,
+            'entries_screened': run.entries_screened,
+            'names_screened': run.names_screened,
+            'hit_count': run.hit_count,
+            'names_per_second': round(run.names_per_second, 1),
+        }
+    finally:
+        cache.delete(RESCREEN_LOCK_KEY)
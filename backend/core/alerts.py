@@ -1,26 +1,25 @@
-from prometheus_client import Gauge
+from django.core.cache import cache
 from django.core.mail import send_mail
 from datetime import datetime, timedelta
 import os
 import requests
 
+from .metrics import get_registry, sample_total
+
+# Alert when a counter grew by more than `value` since the previous check
 ALERT_THRESHOLDS = {
     'db_connection_errors': {
+        'metric': 'db_connection_errors_total',
+        'labels': {},
         'value': 3,
         'severity': 'CRITICAL'
     },
-    'statement_timeouts': {
-        'value': 5, 
+    'gateway_errors': {
+        'metric': 'payment_gateway_requests_total',
+        'labels': {'outcome': 'error'},
+        'value': 5,
         'severity': 'WARNING'
     },
-    'idle_transactions': {
-        'value': 1,
-        'severity': 'CRITICAL'
-    },
-    'lock_wait_time': {
-        'value': 2000,
-        'severity': 'WARNING'
-    }
 }
 
 NOTIFICATION_CHANNELS = [
@@ -33,25 +32,43 @@ ALERT_COOLDOWN = 300  # 5 minutes between repeat alerts
 SLACK_WEBHOOK = os.getenv('SLACK_WEBHOOK_URL')
 GRAFANA_WEBHOOK = os.getenv('GRAFANA_WEBHOOK_URL')
 
-last_alert_sent = None
+# check_alerts runs in its own process, so state between runs lives in the cache
+LAST_ALERT_KEY = 'alerts:last_sent'
+COUNTER_KEY = 'alerts:counter:{name}'
+STATE_TIMEOUT = 24 * 3600
 
 def check_alerts():
-    global last_alert_sent
-    
-    if last_alert_sent and datetime.now() - last_alert_sent < timedelta(seconds=ALERT_COOLDOWN):
-        return
-        
+    """
+    Compare how much each alert counter grew since the previous check with
+    its threshold. Counters are read from every process's metrics in
+    multiprocess mode (PROMETHEUS_MULTIPROC_DIR), otherwise from this one.
+    During the cooldown after an alert the counters' baselines are kept, so
+    growth in that time is reported by the first check after it.
+    """
+    registry = get_registry()
     alerts = []
-    
-    if DB_CONNECTION_ERRORS > ALERT_THRESHOLDS['db_connection_errors']['value']:
-        alerts.append((ALERT_THRESHOLDS['db_connection_errors']['severity'], f'Database connection errors: {DB_CONNECTION_ERRORS}'))
-        
-    if STATEMENT_TIMEOUTS > ALERT_THRESHOLDS['statement_timeouts']['value']:
-        alerts.append((ALERT_THRESHOLDS['statement_timeouts']['severity'], f'Statement timeouts: {STATEMENT_TIMEOUTS}'))
-    
+
+    last_alert_sent = cache.get(LAST_ALERT_KEY)
+    cooling_down = bool(last_alert_sent and datetime.now() - last_alert_sent < timedelta(seconds=ALERT_COOLDOWN))
+
+    for name, threshold in ALERT_THRESHOLDS.items():
+        previous = cache.get(COUNTER_KEY.format(name=name))
+        if cooling_down and previous is not None:
+            continue
+        total = sample_total(threshold['metric'], registry, **threshold['labels'])
+        cache.set(COUNTER_KEY.format(name=name), total, STATE_TIMEOUT)
+        if cooling_down:
+            continue
+        # A total below the previous one means the processes restarted
+        increase = total if previous is None or total < previous else total - previous
+        if increase > threshold['value']:
+            label = name.replace('_', ' ').capitalize()
+            alerts.append((threshold['severity'], f'{label}: {increase:.0f} since last check'))
+
     if alerts:
         send_alerts(alerts)
-        last_alert_sent = datetime.now()
+        cache.set(LAST_ALERT_KEY, datetime.now(), STATE_TIMEOUT)
+    return alerts
 
 def send_to_slack(message):
     if SLACK_WEBHOOK:
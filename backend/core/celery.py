@@ -1,10 +1,15 @@
 # core/celery.py
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
+# prometheus_client needs the multiprocess directory to exist before the first metric is created
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
 app = Celery('SikaRemit')
 
 # Using a string here means the worker doesn't have to serialize
@@ -14,6 +19,29 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+@worker_process_init.connect
+def warm_up_fraud_model(**kwargs):
+    """Load the fraud model once per worker process instead of on the first task"""
+    from payments.services.fraud_detection_ml_service import fraud_model_registry
+    fraud_model_registry.warm_up()
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    """
+    Serve the metrics of every pool process on CELERY_METRICS_PORT. Give the
+    worker its own empty PROMETHEUS_MULTIPROC_DIR, separate from gunicorn's.
+    """
+    port = os.environ.get('CELERY_METRICS_PORT')
+    if port:
+        from prometheus_client import start_http_server
+        from core.metrics import get_registry
+        start_http_server(int(port), registry=get_registry())
+
+@worker_process_shutdown.connect
+def drop_process_metrics(pid=None, **kwargs):
+    from core.metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -0,0 +1,307 @@
+"""
+Streaming export engine for SikaRemit reports
+Writes CSV, Excel and JSON exports row by row straight from a database cursor,
+so memory stays flat no matter how many rows a report covers.
+"""
+
+import csv
+import logging
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import xlsxwriter
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per cursor round-trip. On PostgreSQL ``.iterator()`` uses a
+# server-side cursor, so only one chunk is ever held in memory.
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# Reports larger than this are generated on a Celery worker instead of inline
+ASYNC_EXPORT_ROW_THRESHOLD = getattr(settings, 'ASYNC_EXPORT_ROW_THRESHOLD', 250000)
+
+# Hard row limit of a single XLSX worksheet (including the header row)
+XLSX_MAX_ROWS = 1048576
+
+# reportlab keeps every page in memory until the document is saved, so PDF
+# exports stop after this many rows; CSV, Excel and JSON are never truncated
+PDF_MAX_ROWS = getattr(settings, 'EXPORT_PDF_MAX_ROWS', 5000)
+
+CSV_CONTENT_TYPE = 'text/csv'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _EchoBuffer:
+    """File-like object whose write() hands the line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _excel_value(value):
+    """Coerce a database value into something xlsxwriter can write without a format"""
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _pdf_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return str(value)
+
+
+class StreamingExport:
+    """
+    Export a queryset to CSV or XLSX without materialising it.
+
+    ``columns`` is a list of ``(header, field)`` pairs, where ``field`` is any
+    lookup accepted by ``values_list`` (including annotations). ``summary`` is an
+    optional list of ``(label, value)`` pairs written above the data table.
+    ``progress_callback``, if given, is called with the number of rows written
+    so far after every ``chunk_size`` rows.
+    """
+
+    def __init__(self, queryset, columns: Sequence[Tuple[str, str]], title: str = None,
+                 summary: Optional[Iterable[Tuple[str, object]]] = None,
+                 chunk_size: int = None, progress_callback: Callable[[int], None] = None):
+        self.queryset = queryset
+        self.columns = list(columns)
+        self.title = title
+        self.summary = list(summary or [])
+        self.chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+        self.progress_callback = progress_callback
+
+    @property
+    def headers(self) -> List[str]:
+        return [header for header, _ in self.columns]
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Yield one tuple per row, fetched from the database in chunks"""
+        fields = [field for _, field in self.columns]
+        rows = self.queryset.values_list(*fields).iterator(chunk_size=self.chunk_size)
+        if self.progress_callback is None:
+            return rows
+        return self._report_progress(rows)
+
+    def _report_progress(self, rows: Iterator[tuple]) -> Iterator[tuple]:
+        count = 0
+        for row in rows:
+            yield row
+            count += 1
+            if count % self.chunk_size == 0:
+                self.progress_callback(count)
+
+    def _iter_preamble(self) -> Iterator[list]:
+        if self.summary:
+            yield ['Summary']
+            for label, value in self.summary:
+                yield [label, value]
+            yield []
+        if self.title:
+            yield [self.title]
+
+    def iter_csv_lines(self) -> Iterator[str]:
+        """Yield encoded CSV lines: summary block, header, then data rows"""
+        writer = csv.writer(_EchoBuffer())
+        for line in self._iter_preamble():
+            yield writer.writerow(line)
+        yield writer.writerow(self.headers)
+        for row in self.iter_rows():
+            yield writer.writerow(row)
+
+    def write_csv(self, fileobj) -> int:
+        """Write the CSV export to a text file object and return the data row count"""
+        writer = csv.writer(fileobj)
+        for line in self._iter_preamble():
+            writer.writerow(line)
+        writer.writerow(self.headers)
+        count = 0
+        for row in self.iter_rows():
+            writer.writerow(row)
+            count += 1
+        return count
+
+    def write_xlsx(self, fileobj) -> int:
+        """
+        Write the XLSX export to a binary file object and return the data row count.
+
+        The workbook runs in ``constant_memory`` mode, which flushes each row to
+        disk as soon as the next one starts, and rolls over to a new worksheet
+        when the XLSX per-sheet row limit is reached.
+        """
+        workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True, 'in_memory': False})
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#D7E4BC'})
+
+        def start_sheet(number):
+            worksheet = workbook.add_worksheet(f'Data {number}' if number > 1 else 'Data')
+            worksheet.write_row(0, 0, self.headers, header_format)
+            return worksheet
+
+        if self.summary:
+            summary_sheet = workbook.add_worksheet('Summary')
+            summary_sheet.write_row(0, 0, ['Summary'], header_format)
+            for row_index, (label, value) in enumerate(self.summary, start=1):
+                summary_sheet.write(row_index, 0, label)
+                summary_sheet.write(row_index, 1, _excel_value(value))
+
+        sheet_number = 1
+        worksheet = start_sheet(sheet_number)
+        row_index = 1
+        count = 0
+        for row in self.iter_rows():
+            if row_index >= XLSX_MAX_ROWS:
+                sheet_number += 1
+                worksheet = start_sheet(sheet_number)
+                row_index = 1
+            worksheet.write_row(row_index, 0, [_excel_value(value) for value in row])
+            row_index += 1
+            count += 1
+
+        workbook.close()
+        return count
+
+    def write_json(self, fileobj) -> int:
+        """
+        Write the export as a JSON document to a text file object and return
+        the data row count. Rows are objects keyed by column header, encoded
+        and written one at a time.
+        """
+        encoder = DjangoJSONEncoder()
+        fileobj.write('{"title": %s, "summary": %s, "columns": %s, "rows": [' % (
+            encoder.encode(self.title),
+            encoder.encode({label: value for label, value in self.summary}),
+            encoder.encode(self.headers),
+        ))
+        headers = self.headers
+        count = 0
+        for row in self.iter_rows():
+            fileobj.write(',\n' if count else '\n')
+            fileobj.write(encoder.encode(dict(zip(headers, row))))
+            count += 1
+        fileobj.write('\n]}\n')
+        return count
+
+    def write_pdf(self, fileobj, max_rows: int = None) -> int:
+        """
+        Write the export as a landscape PDF table to a binary file object and
+        return the data row count.
+
+        Stops after ``max_rows`` rows (``EXPORT_PDF_MAX_ROWS`` by default) with
+        a note pointing at the untruncated formats.
+        """
+        from reportlab.lib.pagesizes import landscape, letter
+        from reportlab.pdfgen import canvas
+
+        max_rows = PDF_MAX_ROWS if max_rows is None else max_rows
+        width, height = landscape(letter)
+        margin, line_height = 36, 14
+        column_width = (width - 2 * margin) / max(len(self.columns), 1)
+        max_chars = max(int(column_width / 5), 4)
+        pdf = canvas.Canvas(fileobj, pagesize=(width, height))
+
+        def write_line(y, values, font='Helvetica'):
+            pdf.setFont(font, 8)
+            for index, value in enumerate(values):
+                pdf.drawString(margin + index * column_width, y, _pdf_value(value)[:max_chars])
+
+        def new_page():
+            pdf.showPage()
+            write_line(height - margin, self.headers, 'Helvetica-Bold')
+            return height - margin - line_height
+
+        y = height - margin
+        if self.title:
+            pdf.setFont('Helvetica-Bold', 12)
+            pdf.drawString(margin, y, self.title)
+            y -= 2 * line_height
+        for label, value in self.summary:
+            pdf.setFont('Helvetica', 9)
+            pdf.drawString(margin, y, f"{label}: {_pdf_value(value)}")
+            y -= line_height
+        y -= line_height
+        write_line(y, self.headers, 'Helvetica-Bold')
+        y -= line_height
+
+        count = 0
+        truncated = False
+        rows = self.iter_rows()
+        for row in rows:
+            if count >= max_rows:
+                truncated = True
+                break
+            if y < margin:
+                y = new_page()
+            write_line(y, row)
+            y -= line_height
+            count += 1
+        # Release the server-side cursor instead of draining it
+        rows.close()
+
+        if truncated:
+            if y < margin:
+                y = new_page()
+            pdf.setFont('Helvetica-Oblique', 9)
+            pdf.drawString(margin, y, f"Truncated after {max_rows} rows; export as CSV, Excel or JSON for every row.")
+            logger.info(f"PDF export truncated after {max_rows} rows")
+
+        pdf.showPage()
+        pdf.save()
+        return count
+
+    def csv_response(self, filename: str) -> StreamingHttpResponse:
+        """Stream the CSV export to the client as it is generated"""
+        response = StreamingHttpResponse(self.iter_csv_lines(), content_type=CSV_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def xlsx_response(self, filename: str) -> FileResponse:
+        """
+        Build the XLSX export in a temporary file and stream it back.
+
+        XLSX is a zip container, so it cannot be emitted before the workbook is
+        closed; spooling to disk keeps memory flat instead.
+        """
+        tmp = tempfile.TemporaryFile()
+        self.write_xlsx(tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+    def save(self, path: str, format_type: str) -> Tuple[str, int]:
+        """
+        Write the export into default storage and return ``(stored_path, row_count)``.
+
+        Used by Celery workers for exports too large to build inside a request.
+        """
+        if format_type in ('csv', 'json'):
+            writer = self.write_csv if format_type == 'csv' else self.write_json
+            with tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8') as tmp:
+                count = writer(tmp)
+                tmp.seek(0)
+                stored_path = default_storage.save(path, File(tmp))
+        elif format_type in ('excel', 'xlsx', 'pdf'):
+            writer = self.write_pdf if format_type == 'pdf' else self.write_xlsx
+            with tempfile.TemporaryFile() as tmp:
+                count = writer(tmp)
+                tmp.seek(0)
+                stored_path = default_storage.save(path, File(tmp))
+        else:
+            raise ValueError(f"Unsupported export format: {format_type}")
+
+        logger.info(f"Export written to {stored_path} ({count} rows)")
+        return stored_path, count
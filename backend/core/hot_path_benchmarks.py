@@ -0,0 +1,520 @@
+"""
+Hot path benchmark suite for SikaRemit
+Times the payment hot paths against SQLite and locmem and gates regressions against a JSON baseline
+"""
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sikaremit-benchmarks',
+    }
+}
+
+
+class _Rollback(Exception):
+    """Raised to roll back the fixtures and writes of a benchmark run"""
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``samples``"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(operation: Callable[[int], Any], iterations: int, warmup: int = 5) -> Dict[str, float]:
+    """
+    Call ``operation(i)`` ``iterations`` times and return throughput,
+    latency percentiles (milliseconds) and database queries per call
+    """
+    for i in range(warmup):
+        operation(-1 - i)
+
+    samples = []
+    with CaptureQueriesContext(connection) as queries:
+        for i in range(iterations):
+            started = time.perf_counter()
+            operation(i)
+            samples.append(time.perf_counter() - started)
+
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations / total if total else 0.0,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'queries_per_op': len(queries.captured_queries) / iterations,
+    }
+
+
+class HotPathBenchmarkSuite:
+    """
+    Benchmarks of the payment hot paths.
+
+    Every operation runs against the same fixtures (customers with a
+    wallet, a USD/GHS rate, a domestic transfer fee, a fixed page of
+    transactions) inside one transaction that is rolled back at the end,
+    so nothing leaks into the database and ``on_commit`` side effects such
+    as notification delivery never fire. The cache is locmem so results do
+    not depend on Redis. ``compare`` checks a run against a saved baseline.
+    """
+
+    OPERATIONS = [
+        'wallet_transfer',
+        'fee_calculation',
+        'currency_conversion',
+        'fraud_analysis',
+        'rate_limit_check',
+        'ussd_request',
+        'transaction_list_api',
+    ]
+
+    # Tracked metrics and whether a higher value is better
+    METRICS = {
+        'ops_per_sec': True,
+        'p50_ms': False,
+        'p99_ms': False,
+        'queries_per_op': False,
+    }
+
+    DEFAULT_ITERATIONS = {
+        'wallet_transfer': 200,
+        'fee_calculation': 1000,
+        'currency_conversion': 2000,
+        'fraud_analysis': 500,
+        'rate_limit_check': 5000,
+        'ussd_request': 300,
+        'transaction_list_api': 100,
+    }
+
+    TRANSACTION_PAGE_SIZE = 50
+
+    def __init__(self, iterations: int = None, warmup: int = 5, operations: List[str] = None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.operations = operations or self.OPERATIONS
+        unknown = set(self.operations) - set(self.OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown benchmark operations: {', '.join(sorted(unknown))}")
+
+    def run(self) -> Dict[str, Any]:
+        """Run the selected operations and return the report"""
+        report = {
+            'timestamp': time.time(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': 'locmem',
+            },
+            'operations': {},
+        }
+
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            from django.core.cache import cache
+
+            cache.clear()
+            try:
+                with transaction.atomic():
+                    fixtures = self._create_fixtures()
+                    for name in self.operations:
+                        iterations = self.iterations or self.DEFAULT_ITERATIONS[name]
+                        logger.info(f"Benchmarking {name} ({iterations} iterations)...")
+                        operation = getattr(self, f'_{name}')(fixtures)
+                        report['operations'][name] = measure(operation, iterations, self.warmup)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            finally:
+                cache.clear()
+
+        return report
+
+    def _create_fixtures(self) -> Dict[str, Any]:
+        from django.contrib.auth import get_user_model
+        from payments.models import Currency, ExchangeRate, FeeConfiguration, WalletBalance
+        from payments.models.transaction import Transaction
+
+        User = get_user_model()
+        sender = User.objects.create_user(email='bench-sender@example.com', password='BenchPass123!',
+                                          phone='+233241234567')
+        recipient = User.objects.create_user(email='bench-recipient@example.com', password='BenchPass123!')
+        # Owns a fixed page of transactions, untouched by the other operations
+        reader = User.objects.create_user(email='bench-reader@example.com', password='BenchPass123!')
+
+        usd = Currency.objects.update_or_create(
+            code='USD', defaults={'name': 'US Dollar', 'symbol': '$', 'is_base_currency': True}
+        )[0]
+        ghs = Currency.objects.update_or_create(code='GHS', defaults={'name': 'Ghana Cedi', 'symbol': '₵'})[0]
+        ExchangeRate.objects.create(from_currency=usd, to_currency=ghs, rate=Decimal('15.25'), source='manual')
+
+        FeeConfiguration.objects.create(
+            name='Benchmark domestic transfer', fee_type='domestic_transfer', calculation_method='percentage',
+            percentage_fee=Decimal('0.01'), is_platform_default=True, created_by=sender,
+        )
+        WalletBalance.objects.update_or_create(
+            user=sender, currency=ghs, defaults={'available_balance': Decimal('100000000')}
+        )
+
+        Transaction.objects.bulk_create([
+            Transaction(customer=reader.customer_profile, amount=Decimal('25.00') + i, currency='GHS',
+                        status=Transaction.COMPLETED, description=f'Benchmark transaction {i}')
+            for i in range(self.TRANSACTION_PAGE_SIZE)
+        ])
+
+        return {'sender': sender, 'recipient': recipient, 'reader': reader, 'usd': usd, 'ghs': ghs}
+
+    def _wallet_transfer(self, fixtures):
+        from payments.services.currency_service import WalletService
+
+        def operation(i):
+            WalletService.transfer_to_user(fixtures['sender'], fixtures['recipient'], fixtures['ghs'], Decimal('1.00'))
+        return operation
+
+    def _fee_calculation(self, fixtures):
+        from payments.services.fee_calculator import DynamicFeeCalculator
+
+        def operation(i):
+            DynamicFeeCalculator.calculate_fee(
+                fee_type='domestic_transfer', amount=Decimal('150.00'), currency='GHS', log_calculation=False
+            )
+        return operation
+
+    def _currency_conversion(self, fixtures):
+        from payments.services.currency_service import CurrencyService
+
+        def operation(i):
+            CurrencyService.convert_amount(Decimal('100.00'), fixtures['usd'], fixtures['ghs'])
+        return operation
+
+    def _fraud_analysis(self, fixtures):
+        from payments.fraud_detection import FraudDetectionEngine
+
+        engine = FraudDetectionEngine()
+        customer_id = fixtures['sender'].customer_profile.id
+
+        def operation(i):
+            engine.analyze_transaction({
+                'customer_id': customer_id,
+                'amount': 120 + i % 50,
+                'currency': 'GHS',
+                'email': fixtures['sender'].email,
+                'ip_address': '41.66.0.1',
+                'country': 'GH',
+                'device_fingerprint': 'bench-device',
+            })
+        return operation
+
+    def _rate_limit_check(self, fixtures):
+        from payments.throttling import AdvancedRateLimiter
+
+        limiter = AdvancedRateLimiter()
+
+        def operation(i):
+            limiter.check_rate_limit(f'user:{i % 200}', 'basic')
+        return operation
+
+    def _ussd_request(self, fixtures):
+        from payments.views.ussd import USSDHandler
+
+        def operation(i):
+            USSDHandler({
+                'sessionId': f'bench-session-{i}',
+                'msisdn': '+233241234567',
+                'text': '',
+                'network': 'MTN',
+            }).process_request()
+        return operation
+
+    def _transaction_list_api(self, fixtures):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(user=fixtures['reader'])
+
+        def operation(i):
+            response = client.get('/api/v1/payments/transactions/')
+            if response.status_code != 200:
+                raise RuntimeError(f"Transaction list returned {response.status_code}")
+        return operation
+
+    @classmethod
+    def compare(cls, report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2,
+                query_threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Return the metrics of ``report`` that are worse than ``baseline`` by
+        more than ``threshold`` (a fraction) for timings, or by more than
+        ``query_threshold`` for query counts
+        """
+        regressions = []
+        for name, current in report['operations'].items():
+            previous = baseline.get('operations', {}).get(name)
+            if not previous:
+                continue
+            for metric, higher_is_better in cls.METRICS.items():
+                if metric not in previous or not previous[metric]:
+                    continue
+                change = (current[metric] - previous[metric]) / previous[metric]
+                if higher_is_better:
+                    change = -change
+                allowed = query_threshold if metric == 'queries_per_op' else threshold
+                if change > allowed:
+                    regressions.append({
+                        'operation': name,
+                        'metric': metric,
+                        'baseline': previous[metric],
+                        'current': current[metric],
+                        'change': change,
+                    })
+        return regressions
+
+    @staticmethod
+    def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def save_baseline(report: Dict[str, Any], path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+class ProductSearchBenchmark:
+    """
+    Merchant product search over a synthetic catalogue of ``products`` rows
+    (one million by default), spread over a merchant's stores. Each query
+    shape is timed through the search index and, for comparison, through
+    the ``icontains`` scan the search endpoint used before it. The
+    catalogue is created inside a transaction that is rolled back at the end.
+    """
+
+    STORES = 10
+    VOCABULARY_SIZE = 5000
+    SYLLABLES = ['ka', 'si', 'mo', 're', 'tu', 'na', 'lo', 'be', 'di', 'fa', 'go', 'pi', 'we', 'zu', 'ya', 'ch']
+
+    def __init__(self, products: int = 1000000, iterations: int = 50, scan_iterations: int = 3,
+                 warmup: int = 2, batch_size: int = 5000, seed: int = 42):
+        self.products = products
+        self.iterations = iterations
+        self.scan_iterations = scan_iterations
+        self.warmup = warmup
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.vocabulary = self._vocabulary()
+
+    def _vocabulary(self) -> List[str]:
+        words = set()
+        while len(words) < self.VOCABULARY_SIZE:
+            words.add(''.join(self.random.choice(self.SYLLABLES) for _ in range(self.random.randint(2, 4))))
+        return sorted(words)
+
+    def run(self) -> Dict[str, Any]:
+        from merchants.search import ProductSearchIndex
+
+        report = {
+            'timestamp': time.time(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'products': self.products,
+            },
+            'operations': {},
+        }
+
+        def search(queryset, query):
+            return lambda i: ProductSearchIndex.search(queryset, query)
+
+        def scan(queryset, query):
+            return lambda i: list(ProductSearchIndex.scan(queryset, query))
+
+        try:
+            with transaction.atomic():
+                queryset, queries = self._create_catalogue()
+                for name, query in queries.items():
+                    logger.info(f"Benchmarking product search {name!r} ({query})...")
+                    report['operations'][f'search_{name}'] = measure(
+                        search(queryset, query), self.iterations, self.warmup
+                    )
+                    if self.scan_iterations:
+                        report['operations'][f'scan_{name}'] = measure(
+                            scan(queryset, query), self.scan_iterations, warmup=0
+                        )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        return report
+
+    def _create_catalogue(self):
+        from django.contrib.auth import get_user_model
+        from merchants.models import Product, Store
+
+        user = get_user_model().objects.create_user(
+            email='bench-catalogue@example.com', password='BenchPass123!', user_type=2
+        )
+        stores = Store.objects.bulk_create([
+            Store(merchant=user.merchant_profile, name=f'Benchmark store {i}') for i in range(self.STORES)
+        ])
+
+        started = time.perf_counter()
+        for batch_start in range(0, self.products, self.batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    store=stores[i % self.STORES],
+                    name=' '.join(self.random.choices(self.vocabulary, k=3)),
+                    description=' '.join(self.random.choices(self.vocabulary, k=12)),
+                    price=Decimal('9.99'),
+                    sku=f'BENCH-{i:07d}',
+                    barcode=f'{6000000000000 + i}',
+                ) for i in range(batch_start, min(batch_start + self.batch_size, self.products))
+            ])
+        logger.info(f"Created {self.products} products in {time.perf_counter() - started:.1f}s")
+
+        sample = Product.objects.filter(store__in=stores).order_by('id')[self.products // 2]
+        queries = {
+            'word': sample.name.split()[0],
+            'prefix': sample.name.split()[1][:3],
+            'two_words': ' '.join(sample.name.split()[:2]),
+            'barcode': sample.barcode,
+        }
+        return Product.objects.filter(store__merchant__user=user), queries
+
+
+class SubscriptionBillingBenchmark:
+    """
+    One subscription billing run over ``subscriptions`` due subscriptions
+    (one hundred thousand by default), charged inline through the mock
+    gateway. Claiming the renewals and charging them are timed separately.
+    The subscriptions are created inside a transaction that is rolled back
+    at the end.
+    """
+
+    PLANS = 5
+
+    def __init__(self, subscriptions: int = 100000, batch_size: int = 1000, create_batch_size: int = 5000):
+        self.subscriptions = subscriptions
+        self.batch_size = batch_size
+        self.create_batch_size = create_batch_size
+
+    def run(self) -> Dict[str, Any]:
+        from django.utils import timezone
+        from payments.services.subscription_billing_service import SubscriptionBillingRun
+
+        report = {
+            'timestamp': time.time(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'subscriptions': self.subscriptions,
+                'batch_size': self.batch_size,
+            },
+            'operations': {},
+        }
+
+        try:
+            with transaction.atomic():
+                self._create_subscriptions()
+                billing = SubscriptionBillingRun(batch_size=self.batch_size, inline=True)
+                until = timezone.now()
+                timings = {'claim': 0.0, 'charge': 0.0}
+                billed = 0
+
+                with CaptureQueriesContext(connection) as queries:
+                    while True:
+                        started = time.perf_counter()
+                        claimed, payment_ids = billing.claim_batch(until)
+                        timings['claim'] += time.perf_counter() - started
+                        if not claimed:
+                            break
+                        started = time.perf_counter()
+                        billing.charge(payment_ids)
+                        timings['charge'] += time.perf_counter() - started
+                        billed += len(payment_ids)
+
+                for name, seconds in timings.items():
+                    report['operations'][name] = {
+                        'seconds': seconds,
+                        'subscriptions_per_sec': billed / seconds if seconds else 0.0,
+                    }
+                report['operations']['total'] = {
+                    'seconds': sum(timings.values()),
+                    'subscriptions_per_sec': billed / sum(timings.values()) if billed else 0.0,
+                    'queries': len(queries),
+                }
+                report['environment']['billed'] = billed
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        return report
+
+    def _create_subscriptions(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.hashers import make_password
+        from django.utils import timezone
+        from payments.models.payment_method import PaymentMethod
+        from payments.models.subscriptions import Subscription, SubscriptionPlan
+
+        User = get_user_model()
+        plans = SubscriptionPlan.objects.bulk_create([
+            SubscriptionPlan(name=f'Benchmark plan {i}', price=Decimal('10.00') * (i + 1),
+                             billing_cycle=('monthly', 'quarterly', 'yearly')[i % 3])
+            for i in range(self.PLANS)
+        ])
+        password = make_password(None)
+        period_end = timezone.now() - timedelta(minutes=5)
+
+        started = time.perf_counter()
+        for batch_start in range(0, self.subscriptions, self.create_batch_size):
+            numbers = range(batch_start, min(batch_start + self.create_batch_size, self.subscriptions))
+            users = User.objects.bulk_create([
+                User(email=f'bench-subscriber{i}@example.com', username=f'bench-subscriber{i}', password=password)
+                for i in numbers
+            ])
+            methods = PaymentMethod.objects.bulk_create([
+                PaymentMethod(user=user, method_type='card', details={}) for user in users
+            ])
+            Subscription.objects.bulk_create([
+                Subscription(user=user, plan=plans[i % self.PLANS], status='active',
+                             current_period_start=period_end - timedelta(days=30), current_period_end=period_end,
+                             payment_method_id=str(method.pk))
+                for i, user, method in zip(numbers, users, methods)
+            ])
+        logger.info(f"Created {self.subscriptions} subscriptions in {time.perf_counter() - started:.1f}s")
+
+
+@contextmanager
+def benchmark_environment():
+    """Set up the test environment and throwaway databases for a run outside the test runner"""
+    from django.test.utils import get_runner
+
+    runner = get_runner(settings)(verbosity=0, interactive=False)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
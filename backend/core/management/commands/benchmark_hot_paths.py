@@ -0,0 +1,69 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.hot_path_benchmarks import HotPathBenchmarkSuite, benchmark_environment
+
+class Command(BaseCommand):
+    help = 'Benchmark the payment hot paths and fail on regressions against a saved baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, help='Iterations per operation (default: per-operation)')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed warm-up calls per operation')
+        parser.add_argument('--operation', action='append', dest='operations',
+                            choices=HotPathBenchmarkSuite.OPERATIONS, help='Only run this operation (repeatable)')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE_PATH, help='Baseline JSON path')
+        parser.add_argument('--save-baseline', action='store_true', help='Save this run as the new baseline')
+        parser.add_argument('--threshold', type=float, default=settings.BENCHMARK_REGRESSION_THRESHOLD,
+                            help='Allowed slowdown as a fraction of the baseline (0.2 = 20%%)')
+        parser.add_argument('--query-threshold', type=float, default=0.0,
+                            help='Allowed growth in queries per operation as a fraction of the baseline')
+        parser.add_argument('--output', help='Also write this run to a JSON file')
+
+    def handle(self, *args, **options):
+        suite = HotPathBenchmarkSuite(
+            iterations=options['iterations'], warmup=options['warmup'], operations=options['operations']
+        )
+        with benchmark_environment():
+            from django.db import connection
+
+            if connection.vendor != 'sqlite':
+                self.stdout.write(self.style.WARNING(
+                    f'Running on {connection.vendor}; baselines are recorded on SQLite '
+                    '(use --settings=core.test_settings)'
+                ))
+            report = suite.run()
+
+        self.stdout.write(f"{'operation':<24}{'ops/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for name, result in report['operations'].items():
+            self.stdout.write(
+                f"{name:<24}{result['ops_per_sec']:>12.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['queries_per_op']:>10.1f}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if options['save_baseline']:
+            HotPathBenchmarkSuite.save_baseline(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        baseline = HotPathBenchmarkSuite.load_baseline(options['baseline'])
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(
+                f"No baseline at {options['baseline']}; run with --save-baseline to record one"
+            ))
+            return
+
+        regressions = HotPathBenchmarkSuite.compare(
+            report, baseline, threshold=options['threshold'], query_threshold=options['query_threshold']
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(
+                    f"{regression['operation']} {regression['metric']}: {regression['baseline']:.2f} -> "
+                    f"{regression['current']:.2f} ({regression['change']:+.0%} worse)"
+                )
+            raise CommandError(f"{len(regressions)} benchmark regressions past the allowed threshold")
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
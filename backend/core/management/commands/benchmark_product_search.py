@@ -0,0 +1,34 @@
+import json
+from django.core.management.base import BaseCommand
+from core.hot_path_benchmarks import ProductSearchBenchmark, benchmark_environment
+
+class Command(BaseCommand):
+    help = 'Benchmark indexed merchant product search against the icontains scan on a synthetic catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000, help='Catalogue size')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed searches per query shape')
+        parser.add_argument('--scan-iterations', type=int, default=3,
+                            help='Timed icontains scans per query shape (0 skips the scan)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Products per bulk insert')
+        parser.add_argument('--output', help='Also write the results to a JSON file')
+
+    def handle(self, *args, **options):
+        benchmark = ProductSearchBenchmark(
+            products=options['products'], iterations=options['iterations'],
+            scan_iterations=options['scan_iterations'], batch_size=options['batch_size']
+        )
+        with benchmark_environment():
+            report = benchmark.run()
+
+        self.stdout.write(f"{report['environment']['products']} products on {report['environment']['database']}")
+        self.stdout.write(f"{'operation':<24}{'ops/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for name, result in report['operations'].items():
+            self.stdout.write(
+                f"{name:<24}{result['ops_per_sec']:>12.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['queries_per_op']:>10.1f}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
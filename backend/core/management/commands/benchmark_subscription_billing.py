@@ -0,0 +1,34 @@
+import json
+from django.core.management.base import BaseCommand
+from core.hot_path_benchmarks import SubscriptionBillingBenchmark, benchmark_environment
+
+class Command(BaseCommand):
+    help = 'Benchmark one batched subscription billing run over a synthetic set of due subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscriptions', type=int, default=100000, help='Due subscriptions to bill')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Subscriptions claimed per batch')
+        parser.add_argument('--create-batch-size', type=int, default=5000, help='Subscriptions per bulk insert')
+        parser.add_argument('--output', help='Also write the results to a JSON file')
+
+    def handle(self, *args, **options):
+        benchmark = SubscriptionBillingBenchmark(
+            subscriptions=options['subscriptions'], batch_size=options['batch_size'],
+            create_batch_size=options['create_batch_size']
+        )
+        with benchmark_environment():
+            report = benchmark.run()
+
+        environment = report['environment']
+        self.stdout.write(
+            f"{environment['billed']} of {environment['subscriptions']} subscriptions billed "
+            f"on {environment['database']} in batches of {environment['batch_size']}"
+        )
+        self.stdout.write(f"{'operation':<12}{'seconds':>10}{'subs/sec':>12}")
+        for name, result in report['operations'].items():
+            self.stdout.write(f"{name:<12}{result['seconds']:>10.2f}{result['subscriptions_per_sec']:>12.1f}")
+        self.stdout.write(f"{report['operations']['total']['queries']} queries")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.retention import get_retention_policies, purge_expired
+
+class Command(BaseCommand):
+    help = 'Delete rows past their retention period in throttled chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', help='Policies to run (default: all configured)')
+        parser.add_argument('--chunk-size', type=int, help='Rows deleted per chunk')
+        parser.add_argument('--pause', type=float, help='Seconds to sleep between chunks')
+        parser.add_argument('--max-seconds', type=float, help='Stop after this long; the next run resumes')
+
+    def handle(self, *args, **options):
+        configured = get_retention_policies()
+        names = options['policies'] or list(configured)
+        unknown = [name for name in names if name not in configured]
+        if unknown:
+            raise CommandError(f"Unknown retention policies: {', '.join(unknown)}")
+
+        purger_options = {
+            key: options[key] for key in ('chunk_size', 'pause', 'max_seconds') if options[key] is not None
+        }
+        for name in names:
+            result = purge_expired(name, **purger_options)
+            self.stdout.write(
+                f"{name}: deleted {result['deleted']} rows in {result['chunks']} chunks "
+                f"({result['rows_per_second']:.0f} rows/s)"
+                + ('' if result['completed'] else ' - stopped early, will resume')
+            )
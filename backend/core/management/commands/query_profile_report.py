@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+from core.query_profiler import QueryProfileStore
+
+class Command(BaseCommand):
+    help = 'Show the endpoints and query shapes with the most database time from the sampling query profiler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Query shapes shown per endpoint')
+        parser.add_argument('--endpoints', type=int, default=20, help='Endpoints shown')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--clear', action='store_true', help='Reset the collected profiles after reporting')
+
+    def handle(self, *args, **options):
+        report = QueryProfileStore.top_offenders(options['limit'])[:options['endpoints']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif not report:
+            self.stdout.write('No profiles yet; set QUERY_PROFILER_SAMPLE_RATE above 0 to collect them')
+        else:
+            for stats in report:
+                self.write_endpoint(stats)
+
+        if options['clear']:
+            QueryProfileStore.clear()
+
+    def write_endpoint(self, stats):
+        self.stdout.write(
+            f"{stats['endpoint']}: {stats['requests']} sampled requests, "
+            f"{stats['queries_per_request']:.1f} queries and {stats['seconds'] * 1000 / stats['requests']:.1f}ms "
+            f"of SQL per request, N+1 suspected in {stats['n_plus_one_requests']}"
+        )
+        for entry in stats['top_fingerprints']:
+            flag = ' N+1' if entry['n_plus_one_requests'] else ''
+            self.stdout.write(
+                f"  [{entry['fingerprint']}]{flag} {entry['count']} runs, {entry['seconds'] * 1000:.1f}ms, "
+                f"up to {entry['max_per_request']} per request: {entry['sql'][:160]}"
+            )
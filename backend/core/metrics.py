@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for SikaRemit
+Payment pipeline instrumentation shared by the web and Celery worker processes
+"""
+import os
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+# In-process work (fee rules, FX lookups, fraud rules) finishes in milliseconds,
+# calls to gateways and webhook receivers in hundreds of milliseconds to seconds
+LOCAL_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+NETWORK_BUCKETS = (.05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+PAYMENT_GATEWAY_LATENCY = Histogram(
+    'payment_gateway_request_seconds',
+    'Latency of payment gateway calls',
+    ['provider', 'operation'],
+    buckets=NETWORK_BUCKETS
+)
+PAYMENT_GATEWAY_REQUESTS = Counter(
+    'payment_gateway_requests_total',
+    'Payment gateway calls by outcome (success, declined or error)',
+    ['provider', 'operation', 'outcome']
+)
+PAYMENTS = Counter(
+    'payments_total',
+    'Payments and remittances by final status',
+    ['status', 'provider', 'corridor']
+)
+FRAUD_SCORING_LATENCY = Histogram(
+    'fraud_scoring_seconds',
+    'Latency of rule-based fraud scoring',
+    ['risk_level'],
+    buckets=LOCAL_BUCKETS
+)
+FEE_CALCULATION_LATENCY = Histogram(
+    'fee_calculation_seconds',
+    'Latency of dynamic fee calculation',
+    ['fee_type'],
+    buckets=LOCAL_BUCKETS
+)
+FX_LOOKUP_LATENCY = Histogram(
+    'fx_rate_lookup_seconds',
+    'Latency of exchange rate lookups by where the rate was found',
+    ['source'],
+    buckets=LOCAL_BUCKETS
+)
+WEBHOOK_DELIVERY_LATENCY = Histogram(
+    'webhook_delivery_seconds',
+    'Latency of outgoing webhook deliveries',
+    ['target', 'outcome'],
+    buckets=NETWORK_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries per request, for requests sampled by the query profiler',
+    ['endpoint'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds',
+    'Time spent in database queries per request, for requests sampled by the query profiler',
+    ['endpoint'],
+    buckets=LOCAL_BUCKETS
+)
+N_PLUS_ONE_SUSPECTS = Counter(
+    'sql_n_plus_one_suspects_total',
+    'Sampled requests that repeated one query shape often enough to look like an N+1',
+    ['endpoint']
+)
+QUEUE_DEPTH = Gauge(
+    'queue_depth',
+    'Messages or rows waiting in a work queue',
+    ['queue'],
+    multiprocess_mode='mostrecent'
+)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are written to ``PROMETHEUS_MULTIPROC_DIR`` for aggregation across processes"""
+    return 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ
+
+
+def get_registry():
+    """
+    Registry holding the metrics of every process: the files in
+    ``PROMETHEUS_MULTIPROC_DIR`` in multiprocess mode, otherwise this
+    process's default registry
+    """
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def sample_total(name: str, registry=None, **labels) -> float:
+    """Sum of the samples called ``name`` whose labels include ``labels``"""
+    total = 0.0
+    for metric in (registry or get_registry()).collect():
+        for sample in metric.samples:
+            if sample.name == name and all(sample.labels.get(key) == value for key, value in labels.items()):
+                total += sample.value
+    return total
+
+
+def mark_process_dead(pid: int):
+    """Drop the live gauges of an exited worker process (multiprocess mode only)"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+@contextmanager
+def observe_webhook(target: str):
+    """Time an outgoing webhook; the outcome is ``error`` if the block raises"""
+    started = perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        WEBHOOK_DELIVERY_LATENCY.labels(target=target, outcome=outcome).observe(perf_counter() - started)
+
+
+def record_payment(status: str, provider: Optional[str], corridor: Optional[str] = None):
+    """Count a payment or remittance reaching ``status``"""
+    PAYMENTS.labels(status=status, provider=provider or 'unknown', corridor=corridor or 'domestic').inc()
@@ -1,4 +1,4 @@
-# Core middleware package - Security middleware only
+# Core middleware package - Security middleware and the sampling query profiler
 # Note: Other middleware (RequestLoggingMiddleware, api_performance_monitor_method, etc.)
 # are in core/middleware.py (not this package)
 
@@ -7,17 +7,21 @@ from .security_middleware import (
     IPTrackingMiddleware,
     DeviceTrackingMiddleware,
     APIRateLimitMiddleware,
+    SecurityContextMiddleware,
     AuditLoggingMiddleware,
     SQLInjectionProtectionMiddleware,
     XSSProtectionMiddleware,
 )
+from .query_profiler import QueryProfilerMiddleware
 
 __all__ = [
     'SecurityHeadersMiddleware',
     'IPTrackingMiddleware',
     'DeviceTrackingMiddleware',
     'APIRateLimitMiddleware',
+    'SecurityContextMiddleware',
     'AuditLoggingMiddleware',
     'SQLInjectionProtectionMiddleware',
     'XSSProtectionMiddleware',
+    'QueryProfilerMiddleware',
 ]
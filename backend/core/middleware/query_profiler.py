@@ -0,0 +1,53 @@
+"""
+Query Profiler Middleware for SikaRemit
+Profiles the SQL of a sample of requests
+"""
+
+import logging
+import random
+from django.conf import settings
+
+from core.query_profiler import QueryProfile, record_request_profile
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """
+    Profile the SQL of a random ``QUERY_PROFILER_SAMPLE_RATE`` fraction of
+    requests (0 disables it, 1 profiles everything).
+
+    Unsampled requests cost one ``random()`` call. Sampled requests run
+    with a ``QueryProfile`` execute wrapper on every connection; their
+    query count and time are exported per endpoint (the URL route, so
+    label cardinality stays bounded), repeated query shapes are logged as
+    N+1 suspects and the top offenders are kept in ``QueryProfileStore``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_PROFILER_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        with profile.capture():
+            response = self.get_response(request)
+
+        try:
+            record_request_profile(self.endpoint(request), profile)
+        except Exception as e:
+            logger.error(f"Failed to record query profile for {request.path}: {str(e)}")
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(profile.count)
+        return response
+
+    @staticmethod
+    def endpoint(request) -> str:
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match and match.route else 'unresolved'
+        # Router patterns are regexes; drop their anchors
+        return f"{request.method} /{route.replace('^', '').replace('$', '')}"
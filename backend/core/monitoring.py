@@ -183,16 +183,13 @@ class PerformanceMonitor:
                 )
 
 # Database query monitoring
-def log_slow_queries(threshold_ms=1000):
-    """Log slow database queries"""
-    from django.db import connection
-    from django.conf import settings
-
-    if not settings.DEBUG and hasattr(connection, 'queries'):
-        for query in connection.queries:
-            duration = float(query.get('time', 0)) * 1000
-            if duration > threshold_ms:
-                logging.warning(f"Slow query ({duration:.2f}ms): {query.get('sql', '')}")
+def log_slow_queries(profile, threshold_ms=1000):
+    """
+    Log slow database queries recorded by a ``core.query_profiler.QueryProfile``
+    (works without DEBUG, unlike ``connection.queries``)
+    """
+    for query in profile.slow_queries(threshold_ms / 1000):
+        logging.warning(f"Slow query ({query['time'] * 1000:.2f}ms): {query['sql']}")
 
 # Business metrics tracking
 class BusinessMetrics:
@@ -201,12 +198,11 @@ class BusinessMetrics:
     @staticmethod
     def record_payment(payment):
         """Record payment metrics"""
+        from core.metrics import record_payment
+
         sentry_sdk.set_tag('payment_status', payment.status)
         sentry_sdk.set_tag('payment_method', payment.method)
-
-        # Add to metrics (if using Prometheus/DataDog)
-        # PAYMENT_TOTAL.labels(status=payment.status, method=payment.method).inc()
-        # PAYMENT_AMOUNT.labels(currency=payment.currency).inc(payment.amount)
+        record_payment(payment.status, payment.method, getattr(payment, 'corridor', None))
 
     @staticmethod
     def record_user_action(user, action, metadata=None):
@@ -237,7 +237,7 @@ class SecurityConfig:
             'django.middleware.security.SecurityMiddleware',
             'whitenoise.middleware.WhiteNoiseMiddleware',
             'core.middleware.security_middleware.SecurityHeadersMiddleware',
-            'core.middleware.security_middleware.APIRateLimitMiddleware',
+            'core.middleware.security_middleware.SecurityContextMiddleware',
             'core.middleware.security_middleware.SQLInjectionProtectionMiddleware',
             'core.middleware.security_middleware.XSSProtectionMiddleware',
         ]
@@ -0,0 +1,211 @@
+"""
+SQL query profiler for SikaRemit
+Records the queries of a sample of requests through ``connection.execute_wrapper``,
+without DEBUG, and keeps the most expensive query shapes per endpoint
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .metrics import N_PLUS_ONE_SUSPECTS, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_LIST = re.compile(r'(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """
+    SQL with literals and placeholders replaced by ``?`` and ``IN`` lists
+    collapsed, so queries differing only in their values look the same
+    """
+    sql = sql.replace('%s', '?')
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Short stable identifier of the normalized form of ``sql``"""
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+class QueryProfile:
+    """
+    ``execute_wrapper`` recording the SQL and duration of every query
+    run while it is installed. Fingerprinting is deferred to ``summary``
+    so the wrapper itself only adds two clock reads and an append.
+    """
+
+    def __init__(self):
+        self.queries: List[tuple] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @contextmanager
+    def capture(self, using: Optional[List[str]] = None):
+        """Install the wrapper on the ``using`` connections (every configured one by default)"""
+        with ExitStack() as stack:
+            for alias in using or connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def summary(self, n_plus_one_threshold: int = None) -> Dict[str, Any]:
+        """
+        Queries grouped by fingerprint. A fingerprint run at least
+        ``n_plus_one_threshold`` times in one request is an N+1 suspect.
+        """
+        threshold = n_plus_one_threshold or settings.QUERY_PROFILER_N_PLUS_ONE_THRESHOLD
+        groups = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        for sql, duration in self.queries:
+            group = groups[fingerprint(sql)]
+            group['sql'] = normalize_sql(sql)
+            group['count'] += 1
+            group['seconds'] += duration
+            group['max_seconds'] = max(group['max_seconds'], duration)
+
+        return {
+            'count': self.count,
+            'seconds': self.seconds,
+            'fingerprints': dict(groups),
+            'n_plus_one': [key for key, group in groups.items() if group['count'] >= threshold],
+        }
+
+    def slow_queries(self, threshold: float) -> List[Dict[str, Any]]:
+        """Queries that took longer than ``threshold`` seconds, slowest first"""
+        slow = [{'sql': sql, 'time': duration} for sql, duration in self.queries if duration > threshold]
+        return sorted(slow, key=lambda query: query['time'], reverse=True)
+
+
+def profile_queries(func: Callable, *args, **kwargs):
+    """Run ``func`` and return its result with the ``QueryProfile`` of its queries"""
+    profile = QueryProfile()
+    with profile.capture():
+        result = func(*args, **kwargs)
+    return result, profile
+
+
+class QueryProfileStore:
+    """
+    Per-endpoint aggregate of sampled profiles, kept in the cache so every
+    web worker contributes. Each endpoint keeps its ``MAX_FINGERPRINTS``
+    most expensive query shapes. Updates are read-modify-write without a
+    lock; with sampled traffic an occasional lost update only drops one
+    request's sample.
+    """
+
+    KEY = 'query_profiler:endpoint:{endpoint}'
+    ENDPOINTS_KEY = 'query_profiler:endpoints'
+    TIMEOUT = 24 * 3600
+    MAX_FINGERPRINTS = 50
+
+    @classmethod
+    def record(cls, endpoint: str, summary: Dict[str, Any]):
+        key = cls.KEY.format(endpoint=hashlib.sha1(endpoint.encode()).hexdigest()[:16])
+        stats = cache.get(key) or {
+            'endpoint': endpoint, 'requests': 0, 'queries': 0, 'seconds': 0.0,
+            'n_plus_one_requests': 0, 'fingerprints': {},
+        }
+        stats['requests'] += 1
+        stats['queries'] += summary['count']
+        stats['seconds'] += summary['seconds']
+        stats['n_plus_one_requests'] += 1 if summary['n_plus_one'] else 0
+
+        fingerprints = stats['fingerprints']
+        for key_, group in summary['fingerprints'].items():
+            entry = fingerprints.setdefault(key_, {
+                'sql': group['sql'], 'count': 0, 'seconds': 0.0, 'requests': 0,
+                'max_per_request': 0, 'n_plus_one_requests': 0,
+            })
+            entry['count'] += group['count']
+            entry['seconds'] += group['seconds']
+            entry['requests'] += 1
+            entry['max_per_request'] = max(entry['max_per_request'], group['count'])
+            entry['n_plus_one_requests'] += 1 if key_ in summary['n_plus_one'] else 0
+        if len(fingerprints) > cls.MAX_FINGERPRINTS:
+            kept = sorted(fingerprints.items(), key=lambda item: item[1]['seconds'], reverse=True)
+            stats['fingerprints'] = dict(kept[:cls.MAX_FINGERPRINTS])
+
+        endpoints = cache.get(cls.ENDPOINTS_KEY) or {}
+        if endpoints.get(endpoint) != key:
+            endpoints[endpoint] = key
+            cache.set(cls.ENDPOINTS_KEY, endpoints, cls.TIMEOUT)
+        cache.set(key, stats, cls.TIMEOUT)
+
+    @classmethod
+    def top_offenders(cls, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Endpoints by total query time, each with its ``limit`` most
+        expensive fingerprints, N+1 suspects first
+        """
+        endpoints = cache.get(cls.ENDPOINTS_KEY) or {}
+        stored = cache.get_many(list(endpoints.values()))
+        report = []
+        for stats in stored.values():
+            fingerprints = sorted(
+                ({'fingerprint': key, **entry} for key, entry in stats['fingerprints'].items()),
+                key=lambda entry: (entry['n_plus_one_requests'] > 0, entry['seconds']),
+                reverse=True,
+            )
+            report.append({
+                **{name: value for name, value in stats.items() if name != 'fingerprints'},
+                'queries_per_request': stats['queries'] / stats['requests'],
+                'top_fingerprints': fingerprints[:limit],
+            })
+        return sorted(report, key=lambda stats: stats['seconds'], reverse=True)
+
+    @classmethod
+    def clear(cls):
+        endpoints = cache.get(cls.ENDPOINTS_KEY) or {}
+        cache.delete_many(list(endpoints.values()) + [cls.ENDPOINTS_KEY])
+
+
+def record_request_profile(endpoint: str, profile: QueryProfile) -> Dict[str, Any]:
+    """Export one sampled request's profile to Prometheus, the log and the store"""
+    summary = profile.summary()
+    REQUEST_DB_QUERIES.labels(endpoint=endpoint).observe(summary['count'])
+    REQUEST_DB_SECONDS.labels(endpoint=endpoint).observe(summary['seconds'])
+
+    if summary['n_plus_one']:
+        N_PLUS_ONE_SUSPECTS.labels(endpoint=endpoint).inc()
+        for key in summary['n_plus_one']:
+            group = summary['fingerprints'][key]
+            logger.warning(
+                f"Possible N+1 on {endpoint}: {group['count']} x [{key}] {group['sql'][:200]}"
+            )
+
+    for query in profile.slow_queries(settings.QUERY_PROFILER_SLOW_QUERY_MS / 1000):
+        logger.warning(f"Slow query on {endpoint} ({query['time'] * 1000:.2f}ms): {query['sql'][:500]}")
+
+    QueryProfileStore.record(endpoint, summary)
+    return summary
@@ -0,0 +1,156 @@
+"""
+Data retention for SikaRemit
+Deletes rows past their retention period in primary-key-ordered, throttled chunks
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ROWS_PURGED = Counter(
+    'retention_rows_purged_total',
+    'Rows deleted by data retention policies',
+    ['policy']
+)
+RETENTION_PURGE_RATE = Gauge(
+    'retention_rows_purged_per_second',
+    'Rows deleted per second by the last run of a retention policy',
+    ['policy']
+)
+
+
+class RetentionPolicy:
+    """
+    Rows of ``model`` whose ``field`` is older than ``days`` (or already in
+    the past when ``days`` is 0), optionally narrowed by ``filter``.
+    """
+
+    def __init__(self, name: str, model: str, field: str, days: int = 0, filter: Dict[str, Any] = None):
+        self.name = name
+        self.model = apps.get_model(model)
+        self.field = field
+        self.days = days
+        self.filter = filter or {}
+
+    @classmethod
+    def from_settings(cls, name: str, **overrides) -> 'RetentionPolicy':
+        """Build the policy configured under ``name`` in ``DATA_RETENTION_POLICIES``"""
+        policies = get_retention_policies()
+        if name not in policies:
+            raise KeyError(f"Unknown retention policy: {name}")
+        return cls(name, **{**policies[name], **overrides})
+
+    def cutoff(self, now=None):
+        cutoff = (now or timezone.now()) - timedelta(days=self.days)
+        if self.model._meta.get_field(self.field).get_internal_type() == 'DateField':
+            return cutoff.date()
+        return cutoff
+
+    def queryset(self, now=None):
+        return self.model._default_manager.filter(
+            **self.filter, **{f'{self.field}__lt': self.cutoff(now)}
+        )
+
+
+def get_retention_policies() -> Dict[str, Dict[str, Any]]:
+    return getattr(settings, 'DATA_RETENTION_POLICIES', {})
+
+
+class RetentionPurger:
+    """
+    Purge the rows of one ``RetentionPolicy``.
+
+    Expired primary keys are read ``chunk_size`` at a time in key order
+    and each chunk is deleted in its own short transaction, so no single
+    statement holds locks over the whole table, Django's cascade collector
+    only ever sees one chunk and replicas can keep up. The purger sleeps
+    ``pause`` seconds between chunks. The last deleted key is kept in the
+    cache, so a run stopped by ``max_seconds`` (or a crash) resumes where
+    it left off; the bookmark is cleared once a run reaches the end.
+    """
+
+    PROGRESS_KEY = 'retention:progress:{name}'
+    PROGRESS_TIMEOUT = 7 * 24 * 3600
+
+    def __init__(self, policy: RetentionPolicy, chunk_size: int = None, pause: float = None,
+                 max_seconds: float = None):
+        self.policy = policy
+        self.chunk_size = chunk_size or getattr(settings, 'DATA_RETENTION_CHUNK_SIZE', 1000)
+        self.pause = getattr(settings, 'DATA_RETENTION_PAUSE_SECONDS', 0.1) if pause is None else pause
+        self.max_seconds = max_seconds
+        self.progress_key = self.PROGRESS_KEY.format(name=policy.name)
+
+    def purge(self, now=None) -> Dict[str, Any]:
+        """Delete every expired row and return rows deleted, chunks and throughput"""
+        started = time.monotonic()
+        queryset = self.policy.queryset(now)
+        last_pk = cache.get(self.progress_key)
+        resumed = last_pk is not None
+        deleted = chunks = 0
+        completed = False
+
+        while True:
+            chunk = queryset
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            pks = list(chunk.order_by('pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                completed = True
+                break
+
+            with transaction.atomic():
+                deleted += self.policy.model._default_manager.filter(pk__in=pks).delete()[1].get(
+                    self.policy.model._meta.label, 0
+                )
+            chunks += 1
+            last_pk = pks[-1]
+            cache.set(self.progress_key, last_pk, self.PROGRESS_TIMEOUT)
+
+            if len(pks) < self.chunk_size:
+                completed = True
+                break
+            if self.max_seconds is not None and time.monotonic() - started >= self.max_seconds:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+
+        if completed:
+            cache.delete(self.progress_key)
+
+        elapsed = time.monotonic() - started
+        rate = deleted / elapsed if elapsed else 0.0
+        RETENTION_ROWS_PURGED.labels(policy=self.policy.name).inc(deleted)
+        RETENTION_PURGE_RATE.labels(policy=self.policy.name).set(rate)
+        logger.info(
+            f"Retention '{self.policy.name}': deleted {deleted} rows in {chunks} chunks "
+            f"({rate:.0f} rows/s){'' if completed else ', will resume'}"
+        )
+        return {
+            'policy': self.policy.name,
+            'deleted': deleted,
+            'chunks': chunks,
+            'seconds': elapsed,
+            'rows_per_second': rate,
+            'resumed': resumed,
+            'completed': completed,
+        }
+
+
+def purge_expired(name: str, **kwargs) -> Dict[str, Any]:
+    """Run the retention policy ``name``; ``kwargs`` override the policy or purger settings"""
+    purger_options = {key: kwargs.pop(key) for key in ('chunk_size', 'pause', 'max_seconds') if key in kwargs}
+    return RetentionPurger(RetentionPolicy.from_settings(name, **kwargs), **purger_options).purge()
+
+
+def purge_all(names: List[str] = None, **purger_options) -> List[Dict[str, Any]]:
+    """Run every configured retention policy (or just ``names``)"""
+    return [purge_expired(name, **purger_options) for name in (names or get_retention_policies())]
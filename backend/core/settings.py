@@ -100,6 +100,8 @@ SPECTACULAR_SETTINGS = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Profiles the SQL of QUERY_PROFILER_SAMPLE_RATE of requests; a no-op at 0
+    'core.middleware.query_profiler.QueryProfilerMiddleware',
     'core.middleware.security_middleware.SecurityHeadersMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -109,17 +111,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'axes.middleware.AxesMiddleware',
-    'core.middleware.security_middleware.IPTrackingMiddleware',
-    'core.middleware.security_middleware.DeviceTrackingMiddleware',
+    # IP/device tracking and API rate limiting with one cache round-trip each way
+    'core.middleware.security_middleware.SecurityContextMiddleware',
     'core.middleware.security_middleware.AuditLoggingMiddleware',
 ]
 
 # Add production-only security middleware
 if IS_PRODUCTION:
-    MIDDLEWARE.insert(2, 'core.middleware.security_middleware.APIRateLimitMiddleware')
     MIDDLEWARE.append('core.middleware.security_middleware.SQLInjectionProtectionMiddleware')
     MIDDLEWARE.append('core.middleware.security_middleware.XSSProtectionMiddleware')
 
+# Payload scanning limits for XSSProtectionMiddleware
+PAYLOAD_SCAN_MAX_BYTES = int(os.environ.get('PAYLOAD_SCAN_MAX_BYTES', 1024 * 1024))
+PAYLOAD_SCAN_SKIP_CONTENT_TYPES = [
+    'multipart/form-data',
+    'application/octet-stream',
+    'image/',
+    'application/pdf',
+]
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -250,6 +260,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Base URL of the web app, for links in emails and payment redirects
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -326,8 +339,119 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'payments.tasks.process_scheduled_payments',
         'schedule': 300.0,  # Every 5 minutes
     },
+    'rescreen-sanctions-lists': {
+        'task': 'compliance.tasks.rescreen_customer_base',
+        'schedule': 3600.0,  # Every hour; no-op unless the list version changed
+    },
+    'flush-subscription-usage': {
+        'task': 'payments.tasks.flush_subscription_usage',
+        'schedule': 60.0,  # Every minute; reads only usage counted since the last flush
+    },
+    'run-subscription-billing': {
+        'task': 'payments.tasks.run_subscription_billing',
+        'schedule': 900.0,  # Every 15 minutes; reads only subscriptions whose period has ended
+    },
+    'dispatch-scheduled-reports': {
+        'task': 'merchants.tasks.dispatch_scheduled_reports',
+        'schedule': 300.0,  # Every 5 minutes; reads only due rows
+    },
+    'process-scheduled-notifications': {
+        'task': 'notifications.tasks.process_scheduled_notifications',
+        'schedule': 60.0,  # Every minute; reads only due rows
+    },
+    'purge-expired-data': {
+        'task': 'core.tasks.purge_expired_data',
+        'schedule': 3600.0,  # Hourly; resumes where a time-boxed run stopped
+    },
+    'record-queue-depths': {
+        'task': 'core.tasks.record_queue_depths',
+        'schedule': 30.0,  # Feeds the queue_depth gauge
+    },
+    'retrain-fraud-model': {
+        'task': 'payments.tasks.retrain_fraud_model',
+        'schedule': 86400.0,  # Daily; only published if it beats the live model
+    },
+    'sweep-invoice-aging': {
+        'task': 'payments.tasks.sweep_invoice_aging',
+        'schedule': 86400.0,  # Daily; overdue statuses only change with the date
+    },
 }
 
+# Bulk sanctions re-screening
+SANCTIONS_RESCREEN_CHUNK_SIZE = int(os.environ.get('SANCTIONS_RESCREEN_CHUNK_SIZE', '2000'))
+SANCTIONS_RESCREEN_WORKERS = int(os.environ.get('SANCTIONS_RESCREEN_WORKERS', str(os.cpu_count() or 1)))
+
+# Offline fraud model retraining
+FRAUD_MODEL_TRAINING_JOBS = int(os.environ.get('FRAUD_MODEL_TRAINING_JOBS', '-1'))
+FRAUD_MODEL_TRAINING_CHUNK_SIZE = int(os.environ.get('FRAUD_MODEL_TRAINING_CHUNK_SIZE', '5000'))
+FRAUD_MODEL_MIN_AUC = float(os.environ.get('FRAUD_MODEL_MIN_AUC', '0.7'))
+
+# Data retention: rows whose `field` is older than `days` (0 = already past) are purged
+DATA_RETENTION_POLICIES = {
+    'expired_notifications': {
+        'model': 'notifications.Notification',
+        'field': 'expires_at',
+        'filter': {'category': 'expiring'},
+    },
+    'ussd_analytics': {
+        'model': 'payments.USSDAnalytics',
+        'field': 'date',
+        'days': int(os.environ.get('USSD_ANALYTICS_RETENTION_DAYS', '365')),
+    },
+    'password_reset_tokens': {
+        'model': 'accounts.PasswordResetToken',
+        'field': 'expires_at',
+    },
+    'outstanding_jwt_tokens': {
+        'model': 'token_blacklist.OutstandingToken',
+        'field': 'expires_at',
+    },
+}
+DATA_RETENTION_CHUNK_SIZE = int(os.environ.get('DATA_RETENTION_CHUNK_SIZE', '1000'))
+DATA_RETENTION_PAUSE_SECONDS = float(os.environ.get('DATA_RETENTION_PAUSE_SECONDS', '0.1'))
+DATA_RETENTION_MAX_SECONDS = float(os.environ.get('DATA_RETENTION_MAX_SECONDS', '600'))
+
+# Prometheus metrics. Set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) in the
+# environment of gunicorn and Celery so /metrics/ aggregates every worker process
+METRICS_CELERY_QUEUES = [
+    queue.strip() for queue in os.environ.get(
+        'METRICS_CELERY_QUEUES',
+        'celery,notifications_web,notifications_push,notifications_email,notifications_sms'
+    ).split(',') if queue.strip()
+]
+
+# Sampling SQL query profiler (manage.py query_profile_report)
+QUERY_PROFILER_SAMPLE_RATE = float(os.environ.get('QUERY_PROFILER_SAMPLE_RATE', '0'))
+QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', '5'))
+QUERY_PROFILER_SLOW_QUERY_MS = float(os.environ.get('QUERY_PROFILER_SLOW_QUERY_MS', '500'))
+
+# Merchant product search: results per page by default, most per page, deepest offset + limit
+PRODUCT_SEARCH_DEFAULT_LIMIT = int(os.environ.get('PRODUCT_SEARCH_DEFAULT_LIMIT', '20'))
+PRODUCT_SEARCH_MAX_RESULTS = int(os.environ.get('PRODUCT_SEARCH_MAX_RESULTS', '100'))
+PRODUCT_SEARCH_MAX_WINDOW = int(os.environ.get('PRODUCT_SEARCH_MAX_WINDOW', '1000'))
+
+# Bulk merchant invitations: most rows per upload, invitations emailed per SMTP connection
+MERCHANT_INVITATION_BULK_MAX = int(os.environ.get('MERCHANT_INVITATION_BULK_MAX', '10000'))
+MERCHANT_INVITATION_EMAIL_BATCH_SIZE = int(os.environ.get('MERCHANT_INVITATION_EMAIL_BATCH_SIZE', '100'))
+
+# Subscription billing: concurrent charges per gateway ("stripe=8,paystack=4"), and for gateways not listed
+SUBSCRIPTION_BILLING_GATEWAY_CONCURRENCY = {
+    name.strip(): int(cap)
+    for name, cap in (
+        item.split('=') for item in os.environ.get('SUBSCRIPTION_BILLING_GATEWAY_CONCURRENCY', '').split(',')
+        if item.strip()
+    )
+}
+SUBSCRIPTION_BILLING_DEFAULT_CONCURRENCY = int(os.environ.get('SUBSCRIPTION_BILLING_DEFAULT_CONCURRENCY', '4'))
+
+# Invoice aging sweep: days between reminders for one overdue invoice, and reminders per email batch
+INVOICE_REMINDER_INTERVAL_DAYS = int(os.environ.get('INVOICE_REMINDER_INTERVAL_DAYS', '7'))
+INVOICE_REMINDER_BATCH_SIZE = int(os.environ.get('INVOICE_REMINDER_BATCH_SIZE', '100'))
+
+# Hot path benchmarks (manage.py benchmark_hot_paths)
+BENCHMARK_BASELINE_PATH = os.environ.get('BENCHMARK_BASELINE_PATH', str(BASE_DIR / 'benchmarks' / 'hot_paths.json'))
+BENCHMARK_REGRESSION_THRESHOLD = float(os.environ.get('BENCHMARK_REGRESSION_THRESHOLD', '0.2'))
+
 # Channels configuration for WebSocket support
 CHANNEL_LAYERS = {
     'default': {
@@ -0,0 +1,48 @@
+from celery import shared_task
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def purge_expired_data():
+    """Task to apply every data retention policy, time-boxed and resumable"""
+    from .retention import purge_all
+
+    results = purge_all(max_seconds=settings.DATA_RETENTION_MAX_SECONDS)
+    logger.info(f"Data retention purged {sum(result['deleted'] for result in results)} rows")
+    return results
+
+@shared_task
+def record_queue_depths():
+    """Task to publish how much work is waiting in the Celery and database-backed queues"""
+    from django.utils import timezone
+    from notifications.delivery import ScheduledNotificationQueue
+    from payments.models import ScheduledPayout
+    from .celery import app
+    from .metrics import QUEUE_DEPTH
+
+    now = timezone.now()
+    depths = {}
+    with app.connection_for_read() as connection:
+        try:
+            connection.ensure_connection(max_retries=1)
+        except Exception as e:
+            logger.warning(f"Could not reach the broker to read queue depths: {str(e)}")
+        else:
+            for queue in settings.METRICS_CELERY_QUEUES:
+                # A failed passive declare closes the channel, so each queue gets its own
+                try:
+                    with connection.channel() as channel:
+                        depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+                except Exception as e:
+                    logger.warning(f"Could not read the depth of queue {queue}: {str(e)}")
+
+    depths['scheduled_notifications'] = ScheduledNotificationQueue.due(now).count()
+    depths['scheduled_payouts'] = ScheduledPayout.objects.filter(
+        status__in=ScheduledPayout.DISPATCHABLE_STATUSES, next_execution__lte=now
+    ).count()
+
+    for queue, depth in depths.items():
+        QUEUE_DEPTH.labels(queue=queue).set(depth)
+    return depths
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from django_prometheus.exports import ExportToDjangoView
 from .views import HealthCheckView, AdminMetricsView, AdminSettingsViewSet, CountryViewSet
 from .api.views import AuditLogAPIView
 from . import views
@@ -26,6 +27,9 @@ urlpatterns = [
     
     # Health Check
     path('health/', HealthCheckView.as_view(), name='health-check'),
+
+    # Prometheus scrape endpoint; aggregates every worker process in multiprocess mode
+    path('metrics/', ExportToDjangoView, name='prometheus-metrics'),
     
     # Authentication (allauth)
     path('accounts/', include('allauth.urls')),
@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for SikaRemit
+Read from the working directory by ``gunicorn core.wsgi:application``
+"""
+import os
+import shutil
+
+# Workers write their Prometheus samples here and /metrics/ aggregates them.
+# Set before any worker imports prometheus_client; workers fork from this master.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/sikaremit-prometheus-web')
+
+
+def on_starting(server):
+    """Start from an empty metrics directory so samples of a previous run are not exported"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
@@ -12,8 +12,8 @@ class Command(BaseCommand):
         parser.add_argument(
             '--iterations',
             type=int,
-            default=100,
-            help='Number of iterations for each benchmark'
+            default=None,
+            help='Number of iterations for each benchmark (default: per-benchmark)'
         )
         parser.add_argument(
             '--output',
@@ -29,7 +29,7 @@ class Command(BaseCommand):
         output_file = options['output']
         
         # Run benchmarks
-        report = run_all_benchmarks()
+        report = run_all_benchmarks(iterations=iterations)
         
         # Save to file if specified
         if output_file:
@@ -0,0 +1,216 @@
+"""
+Merchant Invitation Service for SikaRemit
+Creates merchant invitations in bulk and emails them in batches, each batch
+over a single SMTP connection
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.core.validators import validate_email
+from django.db import transaction as db_transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import MerchantInvitation
+
+logger = logging.getLogger(__name__)
+
+INVITATION_TTL = timedelta(days=14)
+
+# Longest allowed value per field, from the model
+_MAX_LENGTHS = {
+    field: MerchantInvitation._meta.get_field(field).max_length
+    for field in ('email', 'business_name', 'phone_number')
+}
+_BUSINESS_TYPES = {value for value, _ in MerchantInvitation.BUSINESS_TYPES}
+
+# camelCase keys sent by the admin frontend
+_ALIASES = {'businessName': 'business_name', 'businessType': 'business_type', 'phoneNumber': 'phone_number'}
+
+
+class MerchantInvitationService:
+    """
+    Bulk merchant invitations.
+
+    ``create_bulk`` validates every row in one pass. Emails that already
+    have an account or a live pending invitation are found with one query
+    per ``LOOKUP_BATCH_SIZE`` emails, and the valid rows are inserted with
+    ``bulk_create``. Each row gets a result in the report, in upload order.
+    Invitation emails are sent after commit by ``send_merchant_invitation_emails``
+    tasks of ``MERCHANT_INVITATION_EMAIL_BATCH_SIZE`` invitations each. A task
+    sends its whole batch over one SMTP connection and marks what it sent in
+    ``email_sent_at``, so a retried batch does not email anyone twice.
+    """
+
+    LOOKUP_BATCH_SIZE = 5000
+    INSERT_BATCH_SIZE = 1000
+
+    @staticmethod
+    def _clean_row(row: Any) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """Normalise one uploaded row and return ``(data, errors)``"""
+        if not isinstance(row, dict):
+            return {}, {'non_field_errors': ['Expected an object']}
+
+        data = {'email': '', 'business_name': '', 'business_type': '', 'phone_number': '', 'notes': ''}
+        for key, value in row.items():
+            field = _ALIASES.get(key, key)
+            if field in data and value is not None:
+                data[field] = str(value).strip()
+        data['email'] = data['email'].lower()
+
+        errors = {}
+        if not data['email']:
+            errors['email'] = ['This field is required.']
+        else:
+            try:
+                validate_email(data['email'])
+            except ValidationError:
+                errors['email'] = ['Enter a valid email address.']
+        if not data['business_name']:
+            errors['business_name'] = ['Business name is required']
+        if data['business_type'] and data['business_type'] not in _BUSINESS_TYPES:
+            errors['business_type'] = [f"\"{data['business_type']}\" is not a valid choice."]
+        for field, max_length in _MAX_LENGTHS.items():
+            if len(data[field]) > max_length:
+                errors.setdefault(field, []).append(f'Ensure this field has no more than {max_length} characters.')
+        return data, errors
+
+    @classmethod
+    def _taken_emails(cls, emails: List[str], now) -> Dict[str, str]:
+        """Map each email that has an account or a live pending invitation to the reason"""
+        User = get_user_model()
+        taken = {}
+        for start in range(0, len(emails), cls.LOOKUP_BATCH_SIZE):
+            chunk = emails[start:start + cls.LOOKUP_BATCH_SIZE]
+            # Stored emails may be mixed case; ``emails`` are lowercased
+            accounts = User.objects.order_by().annotate(email_lower=Lower('email')).filter(
+                email_lower__in=chunk
+            ).annotate(reason=Value('account')).values_list('email_lower', 'reason')
+            pending = MerchantInvitation.objects.order_by().annotate(email_lower=Lower('email')).filter(
+                email_lower__in=chunk, status='pending', expires_at__gt=now
+            ).annotate(reason=Value('invitation')).values_list('email_lower', 'reason')
+            for email, reason in accounts.union(pending, all=True):
+                taken.setdefault(email, reason)
+        return taken
+
+    @classmethod
+    def create_bulk(cls, rows: List[Any], invited_by, expires_at=None) -> Dict[str, Any]:
+        """
+        Create the valid invitations among ``rows`` and queue their emails.
+
+        Returns ``{'summary': {...}, 'results': [...]}`` with one result per
+        row: ``created`` with the invitation id and token, or ``failed`` with
+        field errors.
+        """
+        now = timezone.now()
+        expires_at = expires_at or now + INVITATION_TTL
+        results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        valid: List[Tuple[int, Dict[str, str]]] = []
+        seen = {}
+
+        for index, row in enumerate(rows):
+            data, errors = cls._clean_row(row)
+            email = data.get('email')
+            if not errors and email in seen:
+                errors['email'] = [f'Duplicate of row {seen[email]}']
+            if errors:
+                results[index] = {'index': index, 'email': email or None, 'status': 'failed', 'errors': errors}
+                continue
+            seen[email] = index
+            valid.append((index, data))
+
+        taken = cls._taken_emails([data['email'] for _, data in valid], now) if valid else {}
+        invitations = []
+        for index, data in valid:
+            reason = taken.get(data['email'])
+            if reason:
+                message = ('A user with this email already exists' if reason == 'account'
+                           else 'A pending invitation for this email already exists')
+                results[index] = {'index': index, 'email': data['email'], 'status': 'failed',
+                                  'errors': {'email': [message]}}
+                continue
+            invitations.append((index, MerchantInvitation(
+                invitation_token=uuid.uuid4(), expires_at=expires_at, invited_by=invited_by, **data
+            )))
+
+        with db_transaction.atomic():
+            created = MerchantInvitation.objects.bulk_create(
+                [invitation for _, invitation in invitations], batch_size=cls.INSERT_BATCH_SIZE
+            )
+            cls.queue_emails([invitation.id for invitation in created])
+
+        for index, invitation in invitations:
+            results[index] = {'index': index, 'email': invitation.email, 'status': 'created',
+                              'id': invitation.id, 'invitation_token': str(invitation.invitation_token)}
+
+        logger.info(f"Bulk invitation upload by {invited_by}: {len(invitations)} of {len(rows)} rows created")
+        return {
+            'summary': {'total': len(rows), 'created': len(invitations), 'failed': len(rows) - len(invitations)},
+            'results': results,
+        }
+
+    @staticmethod
+    def queue_emails(invitation_ids: List[int]):
+        """Send the invitation emails in batches once the current transaction commits"""
+        from celery import group
+        from .tasks import send_merchant_invitation_emails
+
+        batch_size = settings.MERCHANT_INVITATION_EMAIL_BATCH_SIZE
+        batches = [invitation_ids[i:i + batch_size] for i in range(0, len(invitation_ids), batch_size)]
+        if batches:
+            db_transaction.on_commit(
+                lambda: group(send_merchant_invitation_emails.s(batch) for batch in batches).apply_async()
+            )
+
+    @staticmethod
+    def build_email(invitation: MerchantInvitation, connection=None) -> EmailMessage:
+        subject = "You're Invited to Join SikaRemit as a Merchant"
+        message = f"""
+Dear Merchant,
+
+You have been invited to join SikaRemit as a merchant for {invitation.business_name}.
+
+Complete your registration by following this secure link:
+{settings.FRONTEND_URL}/auth/merchant/invite/{invitation.invitation_token}
+
+This invitation will expire in 14 days. Please complete your registration before then.
+
+If you have any questions, please contact our support team.
+
+Best regards,
+SikaRemit Team
+        """.strip()
+        return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [invitation.email], connection=connection)
+
+    @classmethod
+    def send_emails(cls, invitation_ids: List[int]) -> Tuple[int, Optional[Exception]]:
+        """
+        Email the pending, not yet emailed invitations among ``invitation_ids``
+        over one SMTP connection. Returns the number sent and the error that
+        stopped the batch, if any.
+        """
+        invitations = list(MerchantInvitation.objects.filter(
+            pk__in=invitation_ids, status='pending', email_sent_at__isnull=True
+        ))
+        sent_ids = []
+        error = None
+        try:
+            with get_connection() as connection:
+                for invitation in invitations:
+                    cls.build_email(invitation, connection=connection).send()
+                    sent_ids.append(invitation.id)
+        except Exception as e:
+            error = e
+            logger.error(f"Invitation email batch stopped after {len(sent_ids)} of {len(invitations)}: {str(e)}")
+        finally:
+            if sent_ids:
+                MerchantInvitation.objects.filter(pk__in=sent_ids).update(email_sent_at=timezone.now())
+        return len(sent_ids), error
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0003_rename_merchantcustomer_merchantcustomerlegacy_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='request_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='scheduled_report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='merchants.scheduledreport'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledreport',
+            index=models.Index(fields=['status', 'next_run'], name='merchants_s_status_3f6d46_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'generating']), models.Q(('request_key', ''), _negated=True)), fields=('request_key',), name='unique_active_report_request'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# The search index DDL as of this migration, copied from merchants.search so
+# later changes to that module do not change what this migration does
+
+SQLITE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS merchants_product_fts USING fts5(
+        name, sku, barcode, description,
+        content='merchants_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_insert AFTER INSERT ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(rowid, name, sku, barcode, description)
+        VALUES (new.id, new.name, new.sku, new.barcode, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_delete AFTER DELETE ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(merchants_product_fts, rowid, name, sku, barcode, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_update
+    AFTER UPDATE OF name, sku, barcode, description ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(merchants_product_fts, rowid, name, sku, barcode, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode, old.description);
+        INSERT INTO merchants_product_fts(rowid, name, sku, barcode, description)
+        VALUES (new.id, new.name, new.sku, new.barcode, new.description);
+    END
+    """,
+    "INSERT INTO merchants_product_fts(merchants_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS merchants_product_fts_insert",
+    "DROP TRIGGER IF EXISTS merchants_product_fts_delete",
+    "DROP TRIGGER IF EXISTS merchants_product_fts_update",
+    "DROP TABLE IF EXISTS merchants_product_fts",
+]
+
+POSTGRESQL_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE merchants_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '') || ' ' || coalesce(barcode, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS merchants_product_search_idx ON merchants_product USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS merchants_product_name_trgm_idx ON merchants_product USING gin (name gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS merchants_product_name_trgm_idx",
+    "DROP INDEX IF EXISTS merchants_product_search_idx",
+    "ALTER TABLE merchants_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+INDEX_SQL = {'sqlite': SQLITE_INDEX_SQL, 'postgresql': POSTGRESQL_INDEX_SQL}
+DROP_SQL = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRESQL_DROP_SQL}
+
+
+def install_search_index(apps, schema_editor):
+    for sql in INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall_search_index(apps, schema_editor):
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0004_report_engine'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0005_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchantinvitation',
+            name='email_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
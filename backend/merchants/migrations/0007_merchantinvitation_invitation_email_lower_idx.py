@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:59
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0006_merchant_invitation_email_sent_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='merchantinvitation',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='invitation_email_lower_idx'),
+        ),
+    ]
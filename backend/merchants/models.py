@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from users.models import Merchant
 import uuid
@@ -161,6 +162,7 @@ class MerchantInvitation(models.Model):
     invited_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     invited_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    email_sent_at = models.DateTimeField(null=True, blank=True)
 
     # Acceptance Details
     accepted_at = models.DateTimeField(null=True, blank=True)
@@ -168,6 +170,9 @@ class MerchantInvitation(models.Model):
 
     class Meta:
         ordering = ['-invited_at']
+        indexes = [
+            models.Index(Lower('email'), name='invitation_email_lower_idx'),
+        ]
 
     def __str__(self):
         return f"Invitation to {self.business_name} ({self.email})"
@@ -289,6 +294,9 @@ class Report(models.Model):
         ('failed', 'Failed'),
     ]
 
+    # Statuses of a report that is still queued or being generated
+    ACTIVE_STATUSES = ['pending', 'generating']
+
     FORMAT_CHOICES = [
         ('pdf', 'PDF'),
         ('csv', 'CSV'),
@@ -319,8 +327,16 @@ class Report(models.Model):
     processing_time = models.DurationField(blank=True, null=True)
     error_message = models.TextField(blank=True)
 
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent of rows written
+    # Identifies the merchant, template, period, format and filters, so
+    # identical requests share one report while it is being generated
+    request_key = models.CharField(max_length=64, blank=True, default='')
+
     # Scheduling
     is_scheduled = models.BooleanField(default=False)
+    scheduled_report = models.ForeignKey(
+        'ScheduledReport', on_delete=models.SET_NULL, null=True, blank=True, related_name='reports'
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -328,6 +344,13 @@ class Report(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['request_key'],
+                condition=models.Q(status__in=['pending', 'generating']) & ~models.Q(request_key=''),
+                name='unique_active_report_request',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.merchant.business_name} - {self.name}"
@@ -427,7 +450,68 @@ class MerchantPayoutSettings(models.Model):
         verbose_name = "Merchant Payout Settings"
         verbose_name_plural = "Merchant Payout Settings"
 
-class ScheduledReport(models.Model):
+class _ScheduledReportMixin:
+    """Mixin for calculate_next_run and reporting_period - moved from MerchantCustomer"""
+    def calculate_next_run(self):
+        """Calculate the next run date based on frequency"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+
+        if self.frequency == 'daily':
+            self.next_run = now + timedelta(days=1)
+        elif self.frequency == 'weekly':
+            # Next Monday
+            days_ahead = (7 - now.weekday()) % 7
+            if days_ahead == 0:
+                days_ahead = 7
+            self.next_run = now + timedelta(days=days_ahead)
+        elif self.frequency == 'monthly':
+            # First day of next month
+            if now.month == 12:
+                self.next_run = now.replace(year=now.year + 1, month=1, day=1, hour=9, minute=0, second=0)
+            else:
+                self.next_run = now.replace(month=now.month + 1, day=1, hour=9, minute=0, second=0)
+        elif self.frequency == 'quarterly':
+            # First day of next quarter
+            current_quarter = ((now.month - 1) // 3) + 1
+            if current_quarter == 4:
+                next_quarter_month = 1
+                next_year = now.year + 1
+            else:
+                next_quarter_month = (current_quarter * 3) + 1
+                next_year = now.year
+            self.next_run = now.replace(year=next_year, month=next_quarter_month, day=1, hour=9, minute=0, second=0)
+
+    def reporting_period(self, run_at=None):
+        """
+        Return the ``(start_date, end_date)`` a run at ``run_at`` reports on:
+        the previous day, week, month or quarter
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+
+        run_date = timezone.localdate(run_at or timezone.now())
+
+        if self.frequency == 'daily':
+            yesterday = run_date - timedelta(days=1)
+            return yesterday, yesterday
+        if self.frequency == 'weekly':
+            return run_date - timedelta(days=7), run_date - timedelta(days=1)
+        if self.frequency == 'monthly':
+            previous_month_end = run_date.replace(day=1) - timedelta(days=1)
+            return previous_month_end.replace(day=1), previous_month_end
+        # Quarterly
+        quarter_start = run_date.replace(month=((run_date.month - 1) // 3) * 3 + 1, day=1)
+        previous_quarter_end = quarter_start - timedelta(days=1)
+        previous_quarter_start = previous_quarter_end.replace(
+            month=((previous_quarter_end.month - 1) // 3) * 3 + 1, day=1
+        )
+        return previous_quarter_start, previous_quarter_end
+
+
+class ScheduledReport(_ScheduledReportMixin, models.Model):
     """Scheduled reports for automated generation"""
     FREQUENCY_CHOICES = [
         ('daily', 'Daily'),
@@ -468,6 +552,9 @@ class ScheduledReport(models.Model):
 
     class Meta:
         ordering = ['next_run']
+        indexes = [
+            models.Index(fields=['status', 'next_run']),
+        ]
 
     def __str__(self):
         return f"{self.merchant.business_name} - {self.name} ({self.frequency})"
@@ -512,37 +599,3 @@ class MerchantCustomerLegacy(models.Model):
     def __str__(self):
         return f"{self.customer_email} - {self.merchant.business_name}"
 
-
-class _ScheduledReportMixin:
-    """Mixin for calculate_next_run - moved from MerchantCustomer"""
-    def calculate_next_run(self):
-        """Calculate the next run date based on frequency"""
-        from datetime import timedelta
-        from django.utils import timezone
-
-        now = timezone.now()
-
-        if self.frequency == 'daily':
-            self.next_run = now + timedelta(days=1)
-        elif self.frequency == 'weekly':
-            # Next Monday
-            days_ahead = (7 - now.weekday()) % 7
-            if days_ahead == 0:
-                days_ahead = 7
-            self.next_run = now + timedelta(days=days_ahead)
-        elif self.frequency == 'monthly':
-            # First day of next month
-            if now.month == 12:
-                self.next_run = now.replace(year=now.year + 1, month=1, day=1, hour=9, minute=0, second=0)
-            else:
-                self.next_run = now.replace(month=now.month + 1, day=1, hour=9, minute=0, second=0)
-        elif self.frequency == 'quarterly':
-            # First day of next quarter
-            current_quarter = ((now.month - 1) // 3) + 1
-            if current_quarter == 4:
-                next_quarter_month = 1
-                next_year = now.year + 1
-            else:
-                next_quarter_month = (current_quarter * 3) + 1
-                next_year = now.year
-            self.next_run = now.replace(year=next_year, month=next_quarter_month, day=1, hour=9, minute=0, second=0)
@@ -0,0 +1,434 @@
+"""
+Merchant Report Engine for SikaRemit
+Renders report templates to CSV, Excel, JSON or PDF files on Celery workers
+and dispatches scheduled reports when they come due
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.exports import StreamingExport
+from payments.models.transaction import Transaction
+
+from .models import Product, Report, ScheduledReport
+
+logger = logging.getLogger(__name__)
+
+REPORT_EXTENSIONS = {'csv': 'csv', 'excel': 'xlsx', 'json': 'json', 'pdf': 'pdf'}
+
+# Report.filters keys that narrow transaction-based reports
+TRANSACTION_FILTERS = ('status', 'currency')
+
+
+class ReportCancelled(Exception):
+    """The report stopped being ``generating`` while its file was written"""
+
+
+class MerchantReportEngine:
+    """
+    Generate merchant ``Report`` files from their ``ReportTemplate``.
+
+    ``request`` creates the report row and queues ``generate_merchant_report``
+    once the transaction commits. Identical requests (same merchant, template,
+    period, format and filters) made while one is still pending or generating
+    get that report back instead of a new one; a partial unique constraint on
+    ``request_key`` settles concurrent requests.
+
+    ``generate`` claims a pending report with a conditional UPDATE, so a
+    duplicate task is a no-op, then streams the rows from a database
+    cursor in ``EXPORT_CHUNK_SIZE`` chunks into a temporary file and saves
+    it to default storage. ``progress`` is updated after every chunk; if
+    the report was cancelled meanwhile, generation stops.
+    """
+
+    # A report not updated for this long while generating was lost with its
+    # worker: a redelivered task may take it over, and after FAIL_AFTER it
+    # is failed so the merchant can regenerate it
+    STALE_AFTER = timedelta(hours=1)
+    FAIL_AFTER = timedelta(hours=6)
+
+    @staticmethod
+    def effective_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """The filters that change a report's rows"""
+        filters = filters or {}
+        return {key: filters[key] for key in TRANSACTION_FILTERS if filters.get(key)}
+
+    @classmethod
+    def request_key(cls, merchant_id: int, template_id: int, start_date, end_date, format_type: str,
+                    filters: Optional[Dict[str, Any]] = None, scheduled_report_id: int = None) -> str:
+        """
+        Hash identifying a report's contents. Runs of different schedules are
+        kept apart, since each emails its own recipients.
+        """
+        payload = json.dumps(
+            [merchant_id, template_id, str(start_date), str(end_date), format_type,
+             cls.effective_filters(filters), scheduled_report_id],
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @classmethod
+    def request(cls, merchant, template, start_date, end_date, format_type: str = 'pdf',
+                filters: Optional[Dict[str, Any]] = None, **fields) -> Tuple[Report, bool]:
+        """
+        Return ``(report, created)``: a new queued report, or the identical
+        one already pending or generating
+        """
+        if isinstance(start_date, str):
+            start_date = parse_date(start_date)
+        if isinstance(end_date, str):
+            end_date = parse_date(end_date)
+        scheduled_report = fields.get('scheduled_report')
+        key = cls.request_key(
+            merchant.id, template.id, start_date, end_date, format_type, filters,
+            scheduled_report.id if scheduled_report else None
+        )
+
+        existing = Report.objects.filter(request_key=key, status__in=Report.ACTIVE_STATUSES).first()
+        if existing is not None:
+            return existing, False
+
+        try:
+            with db_transaction.atomic():
+                report = Report.objects.create(
+                    merchant=merchant,
+                    template=template,
+                    start_date=start_date,
+                    end_date=end_date,
+                    format=format_type,
+                    filters=filters or {},
+                    request_key=key,
+                    **fields
+                )
+        except IntegrityError:
+            # An identical request won the race
+            return Report.objects.get(request_key=key, status__in=Report.ACTIVE_STATUSES), False
+
+        cls.enqueue(report)
+        return report, True
+
+    @classmethod
+    def regenerate(cls, report: Report) -> Report:
+        """
+        Reset a finished report and queue it again. Returns the report that
+        will be generated, which is an identical active one if there is one.
+        """
+        key = cls.request_key(
+            report.merchant_id, report.template_id, report.start_date, report.end_date, report.format,
+            report.filters, report.scheduled_report_id
+        )
+        try:
+            with db_transaction.atomic():
+                report.status = 'pending'
+                report.request_key = key
+                report.progress = 0
+                report.error_message = ''
+                report.file_url = None
+                report.file_size = None
+                report.record_count = 0
+                report.processing_time = None
+                report.completed_at = None
+                report.save()
+        except IntegrityError:
+            report.refresh_from_db()
+            return Report.objects.get(request_key=key, status__in=Report.ACTIVE_STATUSES)
+
+        cls.enqueue(report)
+        return report
+
+    @staticmethod
+    def enqueue(report: Report):
+        """Queue generation of ``report`` once the current transaction commits"""
+        from .tasks import generate_merchant_report
+
+        db_transaction.on_commit(lambda: generate_merchant_report.delay(report.id))
+
+    @staticmethod
+    def storage_path(report: Report) -> str:
+        return f"reports/merchants/{report.merchant_id}/{report.id}.{REPORT_EXTENSIONS[report.format]}"
+
+    @classmethod
+    def generate(cls, report_id: int) -> Optional[str]:
+        """Write the file of a pending report and return its storage path"""
+        started = timezone.now()
+        claimed = Report.objects.filter(
+            Q(status='pending') | Q(status='generating', updated_at__lt=started - cls.STALE_AFTER), pk=report_id
+        ).update(status='generating', progress=0, updated_at=started)
+        if not claimed:
+            logger.info(f"Report {report_id} is not pending, skipping")
+            return None
+
+        report = Report.objects.select_related('template', 'merchant__user', 'scheduled_report').get(pk=report_id)
+        path = cls.storage_path(report)
+        try:
+            export = cls.build_export(report)
+            total = export.queryset.count()
+
+            def update_progress(count):
+                percent = min(count * 100 // total, 99) if total else 99
+                if not Report.objects.filter(pk=report_id, status='generating').update(
+                        progress=percent, updated_at=timezone.now()):
+                    raise ReportCancelled()
+
+            export.progress_callback = update_progress
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            stored_path, count = export.save(path, report.format)
+        except ReportCancelled:
+            logger.info(f"Report {report_id} was cancelled during generation")
+            return None
+        except Exception as e:
+            logger.error(f"Report {report_id} generation failed: {str(e)}")
+            Report.objects.filter(pk=report_id, status='generating').update(
+                status='failed', error_message=str(e), updated_at=timezone.now()
+            )
+            raise e
+
+        finished = timezone.now()
+        completed = Report.objects.filter(pk=report_id, status='generating').update(
+            status='completed',
+            progress=100,
+            file_url=default_storage.url(stored_path),
+            file_size=default_storage.size(stored_path),
+            record_count=count,
+            processing_time=finished - started,
+            completed_at=finished,
+            error_message='',
+            updated_at=finished
+        )
+        if not completed:
+            logger.info(f"Report {report_id} was cancelled during generation")
+            default_storage.delete(stored_path)
+            return None
+
+        logger.info(f"Report {report_id} written to {stored_path} ({count} rows in {finished - started})")
+        if report.scheduled_report and report.scheduled_report.email_recipients:
+            cls.send_to_recipients(report, default_storage.url(stored_path))
+        return stored_path
+
+    @staticmethod
+    def send_to_recipients(report: Report, file_url: str):
+        try:
+            send_mail(
+                subject=f"Your scheduled report: {report.name}",
+                message=(
+                    f"{report.template.name} for {report.start_date} to {report.end_date} is ready.\n\n"
+                    f"Download it here: {file_url}"
+                ),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=report.scheduled_report.email_recipients,
+                fail_silently=False
+            )
+        except Exception as e:
+            logger.error(f"Failed to email scheduled report {report.id}: {str(e)}")
+
+    @classmethod
+    def fail_stale(cls, now=None) -> int:
+        """Fail reports whose worker stopped updating them, so they can be regenerated"""
+        now = now or timezone.now()
+        return Report.objects.filter(status='generating', updated_at__lt=now - cls.FAIL_AFTER).update(
+            status='failed', error_message='Report generation timed out', updated_at=now
+        )
+
+    # Report definitions
+
+    @classmethod
+    def build_export(cls, report: Report) -> StreamingExport:
+        builders = {
+            'sales_summary': cls._sales_summary,
+            'transaction_detail': cls._transaction_detail,
+            'customer_analysis': cls._customer_analysis,
+            'product_performance': cls._product_performance,
+            'financial_overview': cls._financial_overview,
+            'payout_history': cls._payout_history,
+        }
+        report_type = report.template.report_type
+        if report_type not in builders:
+            raise ValueError(f"Unsupported report type: {report_type}")
+
+        queryset, columns, summary = builders[report_type](report)
+        period = [('Merchant', report.merchant.business_name), ('Period', f"{report.start_date} to {report.end_date}")]
+        return StreamingExport(queryset, columns, title=report.name, summary=period + summary)
+
+    @staticmethod
+    def _period_filter(report: Report, field: str = 'created_at') -> Dict[str, datetime]:
+        """Half-open datetime range over the report's dates, so an index on ``field`` can be used"""
+        tz = timezone.get_current_timezone()
+        return {
+            f'{field}__gte': timezone.make_aware(datetime.combine(report.start_date, time.min), tz),
+            f'{field}__lt': timezone.make_aware(datetime.combine(report.end_date + timedelta(days=1), time.min), tz),
+        }
+
+    @classmethod
+    def _transactions(cls, report: Report):
+        queryset = Transaction.objects.filter(merchant=report.merchant, **cls._period_filter(report))
+        return queryset.filter(**cls.effective_filters(report.filters))
+
+    @staticmethod
+    def _totals(queryset) -> List[Tuple[str, Any]]:
+        totals = queryset.aggregate(count=Count('id'), amount=Sum('amount'))
+        return [('Transactions', totals['count']), ('Total Amount', totals['amount'] or 0)]
+
+    @classmethod
+    def _sales_summary(cls, report: Report):
+        queryset = cls._transactions(report).filter(status=Transaction.COMPLETED)
+        rows = (
+            queryset.annotate(day=TruncDate('created_at'))
+            .values('day', 'currency')
+            .annotate(transactions=Count('id'), total=Sum('amount'), average=Avg('amount'))
+            .order_by('day', 'currency')
+        )
+        columns = [
+            ('Date', 'day'), ('Currency', 'currency'), ('Transactions', 'transactions'),
+            ('Total', 'total'), ('Average', 'average'),
+        ]
+        return rows, columns, cls._totals(queryset)
+
+    @classmethod
+    def _transaction_detail(cls, report: Report):
+        queryset = cls._transactions(report)
+        columns = [
+            ('ID', 'id'), ('Date', 'created_at'), ('Customer', 'customer__user__email'),
+            ('Amount', 'amount'), ('Currency', 'currency'), ('Status', 'status'),
+            ('Payment Method', 'payment_method__method_type'), ('Description', 'description'),
+        ]
+        return queryset.order_by('id'), columns, cls._totals(queryset)
+
+    @classmethod
+    def _customer_analysis(cls, report: Report):
+        queryset = cls._transactions(report)
+        rows = (
+            queryset.values('customer_id', 'customer__user__email')
+            .annotate(
+                transactions=Count('id'), total=Sum('amount'), average=Avg('amount'),
+                completed=Count('id', filter=Q(status=Transaction.COMPLETED)),
+                first_seen=Min('created_at'), last_seen=Max('created_at')
+            )
+            .order_by('-total', 'customer_id')
+        )
+        columns = [
+            ('Customer', 'customer__user__email'), ('Transactions', 'transactions'), ('Completed', 'completed'),
+            ('Total', 'total'), ('Average', 'average'), ('First Transaction', 'first_seen'),
+            ('Last Transaction', 'last_seen'),
+        ]
+        summary = [('Customers', queryset.values('customer_id').distinct().count())] + cls._totals(queryset)
+        return rows, columns, summary
+
+    @classmethod
+    def _financial_overview(cls, report: Report):
+        queryset = cls._transactions(report)
+        rows = (
+            queryset.values('currency', 'status')
+            .annotate(transactions=Count('id'), total=Sum('amount'), average=Avg('amount'))
+            .order_by('currency', 'status')
+        )
+        columns = [
+            ('Currency', 'currency'), ('Status', 'status'), ('Transactions', 'transactions'),
+            ('Total', 'total'), ('Average', 'average'),
+        ]
+        return rows, columns, cls._totals(queryset)
+
+    @staticmethod
+    def _product_performance(report: Report):
+        queryset = Product.objects.filter(store__merchant=report.merchant)
+        columns = [
+            ('SKU', 'sku'), ('Product', 'name'), ('Store', 'store__name'), ('Price', 'price'),
+            ('Stock', 'stock_quantity'), ('Low Stock Threshold', 'low_stock_threshold'),
+            ('Available', 'is_available'), ('Added', 'created_at'),
+        ]
+        summary = [
+            ('Products', queryset.count()),
+            ('Available', queryset.filter(is_available=True).count()),
+        ]
+        return queryset.order_by('id'), columns, summary
+
+    @classmethod
+    def _payout_history(cls, report: Report):
+        from accounts.models import Payout
+
+        queryset = Payout.objects.filter(merchant=report.merchant.user, **cls._period_filter(report))
+        columns = [
+            ('ID', 'id'), ('Reference', 'reference'), ('Amount', 'amount'), ('Method', 'method'),
+            ('Status', 'status'), ('Requested', 'created_at'), ('Processed', 'processed_at'),
+        ]
+        totals = queryset.aggregate(count=Count('id'), amount=Sum('amount'))
+        summary = [('Payouts', totals['count']), ('Total Amount', totals['amount'] or 0)]
+        return queryset.order_by('id'), columns, summary
+
+
+class ScheduledReportDispatcher:
+    """
+    Create and queue the reports of due ``ScheduledReport`` rows.
+
+    Due schedules are claimed in batches with ``SELECT ... FOR UPDATE SKIP
+    LOCKED``; each gets a report for the period before its due time and its
+    ``next_run`` is advanced in the same transaction, so concurrent
+    dispatchers never run a schedule twice. Report generation is queued
+    once the batch commits.
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, batch_size: int = None, max_batches: int = None):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.max_batches = max_batches
+
+    def dispatch_batch(self, now=None) -> int:
+        """Run up to ``batch_size`` due schedules and return how many were run"""
+        now = now or timezone.now()
+        with db_transaction.atomic():
+            schedules = list(
+                ScheduledReport.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('merchant', 'template')
+                .filter(status='active', is_active=True, next_run__lte=now)
+                .order_by('next_run', 'id')[:self.batch_size]
+            )
+            for schedule in schedules:
+                start_date, end_date = schedule.reporting_period(schedule.next_run)
+                MerchantReportEngine.request(
+                    schedule.merchant,
+                    schedule.template,
+                    start_date,
+                    end_date,
+                    format_type=schedule.format,
+                    filters=schedule.filters,
+                    name=f"{schedule.name} - {start_date} to {end_date}",
+                    is_scheduled=True,
+                    scheduled_report=schedule
+                )
+                schedule.last_run = now
+                schedule.calculate_next_run()
+                schedule.save(update_fields=['last_run', 'next_run', 'updated_at'])
+        return len(schedules)
+
+    def dispatch(self, now=None) -> Dict[str, Any]:
+        """Run every due schedule, batch by batch"""
+        now = now or timezone.now()
+        dispatched = batches = 0
+
+        while self.max_batches is None or batches < self.max_batches:
+            count = self.dispatch_batch(now)
+            if not count:
+                break
+            dispatched += count
+            batches += 1
+            if count < self.batch_size:
+                break
+
+        stale = MerchantReportEngine.fail_stale(now)
+        if stale:
+            logger.warning(f"Failed {stale} reports that were generating for over {MerchantReportEngine.FAIL_AFTER}")
+
+        return {'dispatched': dispatched, 'batches': batches, 'stale_reports': stale}
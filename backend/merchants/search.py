@@ -0,0 +1,208 @@
+"""
+Product Search for SikaRemit
+Ranked, prefix-matching full-text search over merchant catalogues, backed by
+a tsvector and trigram index on PostgreSQL or an FTS5 table on SQLite
+"""
+
+import logging
+import re
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Word characters without the underscore, which both FTS5's unicode61
+# tokenizer and PostgreSQL's parser treat as a separator
+_TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+
+SQLITE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS merchants_product_fts USING fts5(
+        name, sku, barcode, description,
+        content='merchants_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_insert AFTER INSERT ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(rowid, name, sku, barcode, description)
+        VALUES (new.id, new.name, new.sku, new.barcode, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_delete AFTER DELETE ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(merchants_product_fts, rowid, name, sku, barcode, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS merchants_product_fts_update
+    AFTER UPDATE OF name, sku, barcode, description ON merchants_product BEGIN
+        INSERT INTO merchants_product_fts(merchants_product_fts, rowid, name, sku, barcode, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode, old.description);
+        INSERT INTO merchants_product_fts(rowid, name, sku, barcode, description)
+        VALUES (new.id, new.name, new.sku, new.barcode, new.description);
+    END
+    """,
+    "INSERT INTO merchants_product_fts(merchants_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS merchants_product_fts_insert",
+    "DROP TRIGGER IF EXISTS merchants_product_fts_delete",
+    "DROP TRIGGER IF EXISTS merchants_product_fts_update",
+    "DROP TABLE IF EXISTS merchants_product_fts",
+]
+
+POSTGRESQL_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE merchants_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '') || ' ' || coalesce(barcode, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS merchants_product_search_idx ON merchants_product USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS merchants_product_name_trgm_idx ON merchants_product USING gin (name gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS merchants_product_name_trgm_idx",
+    "DROP INDEX IF EXISTS merchants_product_search_idx",
+    "ALTER TABLE merchants_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+class ProductSearchIndex:
+    """
+    Full-text index over product name, SKU, barcode and description.
+
+    On PostgreSQL the index is a stored generated ``tsvector`` column
+    (name weighted above SKU/barcode, above description) with a GIN index,
+    plus a trigram GIN index on the name for typo-tolerant matches. On
+    SQLite it is an external-content FTS5 table kept in step by triggers.
+    Either way every product insert, update or delete, including bulk
+    ones, updates the index in the same statement. Other databases fall
+    back to an unindexed ``icontains`` scan.
+
+    Every query word is prefix matched and all words must match. Exact SKU
+    or barcode matches rank first, for POS scanners; the rest are ordered
+    by relevance. Results are windowed: ``limit`` is capped at
+    ``PRODUCT_SEARCH_MAX_RESULTS`` and ``offset + limit`` at
+    ``PRODUCT_SEARCH_MAX_WINDOW``, since ranking past the first pages costs
+    more than it is worth.
+
+    On SQLite, a migration that rebuilds ``merchants_product`` (most field
+    alterations do) drops the triggers; run ``install`` again after it.
+    """
+
+    MAX_QUERY_TOKENS = 8
+
+    @staticmethod
+    def install(schema_editor):
+        vendor = schema_editor.connection.vendor
+        statements = {'sqlite': SQLITE_INDEX_SQL, 'postgresql': POSTGRESQL_INDEX_SQL}.get(vendor, [])
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    @staticmethod
+    def uninstall(schema_editor):
+        vendor = schema_editor.connection.vendor
+        statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRESQL_DROP_SQL}.get(vendor, [])
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    @classmethod
+    def tokens(cls, query: str) -> List[str]:
+        return _TOKEN.findall(query.lower())[:cls.MAX_QUERY_TOKENS]
+
+    @staticmethod
+    def window(limit=None, offset=None) -> Tuple[int, int]:
+        """
+        Clamp ``limit`` to the configured caps. The page is cut off at
+        ``PRODUCT_SEARCH_MAX_WINDOW``, so an offset at or past it gets a
+        limit of 0 rather than being moved back to the last page.
+        """
+        max_results = settings.PRODUCT_SEARCH_MAX_RESULTS
+        max_window = settings.PRODUCT_SEARCH_MAX_WINDOW
+        try:
+            limit = int(limit) if limit not in (None, '') else settings.PRODUCT_SEARCH_DEFAULT_LIMIT
+            offset = int(offset) if offset not in (None, '') else 0
+        except (TypeError, ValueError):
+            limit, offset = settings.PRODUCT_SEARCH_DEFAULT_LIMIT, 0
+        offset = max(0, offset)
+        limit = max(1, min(limit, max_results))
+        limit = max(0, min(limit, max_window - offset))
+        return limit, offset
+
+    @classmethod
+    def search(cls, queryset, query: str, limit=None, offset=None) -> list:
+        """Products of ``queryset`` matching ``query``, best first"""
+        limit, offset = cls.window(limit, offset)
+        tokens = cls.tokens(query)
+        if not tokens or not limit:
+            return []
+
+        vendor = connection.vendor
+        if vendor == 'sqlite':
+            ids = cls._sqlite_ids(queryset, query.strip(), tokens, limit, offset)
+        elif vendor == 'postgresql':
+            ids = cls._postgresql_ids(queryset, query.strip(), tokens, limit, offset)
+        else:
+            return list(cls.scan(queryset, query.strip()).order_by('name', 'id')[offset:offset + limit])
+
+        products = queryset.in_bulk(ids)
+        return [products[product_id] for product_id in ids if product_id in products]
+
+    @staticmethod
+    def scan(queryset, query: str):
+        """Unindexed substring match, for databases without a search index"""
+        return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+
+    @staticmethod
+    def _scope(queryset) -> Tuple[str, list]:
+        """
+        ``AND EXISTS (...)`` restricting matches to ``queryset``, unless it is
+        unfiltered. Correlated on the primary key, so it costs one indexed
+        lookup per match instead of materialising every id in scope.
+        """
+        if not queryset.query.where:
+            return '', []
+        scoped = queryset.order_by().filter(pk=RawSQL('p.id', [])).values('pk')
+        sql, params = scoped.query.sql_with_params()
+        return f' AND EXISTS ({sql})', list(params)
+
+    @classmethod
+    def _sqlite_ids(cls, queryset, query, tokens, limit, offset) -> List[int]:
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        scope_sql, scope_params = cls._scope(queryset)
+        sql = (
+            "SELECT p.id FROM merchants_product_fts JOIN merchants_product p ON p.id = merchants_product_fts.rowid "
+            f"WHERE merchants_product_fts MATCH %s{scope_sql} "
+            "ORDER BY CASE WHEN p.sku = %s OR p.barcode = %s THEN 0 ELSE 1 END, "
+            "bm25(merchants_product_fts, 10.0, 5.0, 5.0, 1.0), p.id "
+            "LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, *scope_params, query, query, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    @classmethod
+    def _postgresql_ids(cls, queryset, query, tokens, limit, offset) -> List[int]:
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        scope_sql, scope_params = cls._scope(queryset)
+        sql = (
+            "SELECT p.id FROM merchants_product p "
+            f"WHERE (p.search_vector @@ to_tsquery('simple', %s) OR p.name %% %s){scope_sql} "
+            "ORDER BY CASE WHEN p.sku = %s OR p.barcode = %s THEN 0 ELSE 1 END, "
+            "ts_rank(p.search_vector, to_tsquery('simple', %s)) + similarity(p.name, %s) DESC, p.id "
+            "LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tsquery, query, *scope_params, query, query, tsquery, query, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
@@ -150,11 +150,11 @@ class ReportSerializer(serializers.ModelSerializer):
         model = Report
         fields = [
             'id', 'template', 'template_name', 'name', 'description', 'status', 'format',
-            'start_date', 'end_date', 'filters', 'file_url', 'file_size',
+            'start_date', 'end_date', 'filters', 'file_url', 'file_size', 'progress',
             'record_count', 'processing_time', 'error_message', 'is_scheduled',
             'created_at', 'updated_at', 'completed_at', 'duration_days', 'merchant_name'
         ]
-        read_only_fields = ['file_url', 'file_size', 'record_count', 'processing_time', 'error_message', 'completed_at', 'duration_days']
+        read_only_fields = ['file_url', 'file_size', 'progress', 'record_count', 'processing_time', 'error_message', 'completed_at', 'duration_days']
 
     def validate(self, data):
         """Validate date range"""
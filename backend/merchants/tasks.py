@@ -0,0 +1,41 @@
+from celery import shared_task
+from .reports import MerchantReportEngine, ScheduledReportDispatcher
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task(acks_late=True)
+def generate_merchant_report(report_id):
+    """
+    Render a pending merchant report to file storage
+    Acked late so the report of a worker that died is redelivered and taken over once stale
+    """
+    return MerchantReportEngine.generate(report_id)
+
+@shared_task
+def dispatch_scheduled_reports():
+    """
+    Queue the reports of scheduled reports that are due
+    Safe to run from several beat/dispatcher replicas at once
+    """
+    try:
+        result = ScheduledReportDispatcher().dispatch()
+        logger.info(f"Dispatched {result['dispatched']} scheduled reports in {result['batches']} batches")
+        return result['dispatched']
+
+    except Exception as e:
+        logger.error(f"Scheduled report dispatch error: {str(e)}")
+        raise e
+
+@shared_task(bind=True, max_retries=3)
+def send_merchant_invitation_emails(self, invitation_ids):
+    """
+    Email a batch of merchant invitations over one SMTP connection
+    Invitations already emailed are skipped, so a retry resumes where the batch stopped
+    """
+    from .invitations import MerchantInvitationService
+
+    sent, error = MerchantInvitationService.send_emails(invitation_ids)
+    if error is not None:
+        raise self.retry(exc=error, countdown=60 * (self.request.retries + 1))
+    return sent
@@ -6,6 +6,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Sum, Count
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from payments.models.transaction import Transaction
 from invoice.models import Invoice, InvoiceItem
@@ -16,6 +17,9 @@ from .serializers import StoreSerializer, ProductSerializer, OnboardingSerialize
 from users.permissions import IsMerchantUser, IsOwnerOrAdmin, IsAdminUser
 from users.models import Merchant
 from .permissions import SubscriptionRequiredMixin
+from .reports import MerchantReportEngine
+from .invitations import INVITATION_TTL, MerchantInvitationService
+from .search import ProductSearchIndex
 from notifications.services import NotificationService
 
 class MerchantApplicationViewSet(viewsets.ModelViewSet):
@@ -159,7 +163,7 @@ class MerchantInvitationViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Create invitation and send email"""
-        invitation = serializer.save(invited_by=self.request.user)
+        invitation = serializer.save(invited_by=self.request.user, expires_at=timezone.now() + INVITATION_TTL)
 
         # Send invitation email
         NotificationService.send_email_notification_to_address(
@@ -233,28 +237,20 @@ SikaRemit Team
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        """Create multiple invitations at once"""
+        """Create multiple invitations at once, reporting the outcome of each row"""
         invitations_data = request.data.get('invitations', [])
-        if not invitations_data:
+        if not invitations_data or not isinstance(invitations_data, list):
             return Response({'error': 'No invitations provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(invitations_data) > settings.MERCHANT_INVITATION_BULK_MAX:
+            return Response(
+                {'error': f'At most {settings.MERCHANT_INVITATION_BULK_MAX} invitations can be uploaded at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        created_invitations = []
-        errors = []
-
-        for i, inv_data in enumerate(invitations_data):
-            serializer = self.get_serializer(data=inv_data)
-            if serializer.is_valid():
-                invitation = serializer.save(invited_by=request.user)
-                created_invitations.append(serializer.data)
-                # TODO: Send invitation email
-            else:
-                errors.append({'index': i, 'errors': serializer.errors})
-
-        response_data = {'created': created_invitations}
-        if errors:
-            response_data['errors'] = errors
-
-        return Response(response_data, status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED)
+        report = MerchantInvitationService.create_bulk(invitations_data, invited_by=request.user)
+        return Response(
+            report, status=status.HTTP_207_MULTI_STATUS if report['summary']['failed'] else status.HTTP_201_CREATED
+        )
 
 @api_view(['GET'])
 def validate_invitation_token(request, token):
@@ -436,14 +432,16 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def search(self, request):
-        """Search products by name/description"""
+        """Search products by name, SKU, barcode and description, best matches first"""
         query = request.query_params.get('q', '').strip()
         if not query:
             return Response([])
-            
-        products = self.get_queryset().filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query)
+
+        products = ProductSearchIndex.search(
+            self.get_queryset().select_related('store'),
+            query,
+            limit=request.query_params.get('limit'),
+            offset=request.query_params.get('offset')
         )
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
@@ -575,8 +573,9 @@ class ReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
         return Report.objects.filter(merchant=self.request.user.merchant_profile)
 
     def perform_create(self, serializer):
-        """Automatically set the merchant when creating a report"""
-        serializer.save(merchant=self.request.user.merchant_profile)
+        """Automatically set the merchant when creating a report and queue its generation"""
+        report = serializer.save(merchant=self.request.user.merchant_profile)
+        MerchantReportEngine.enqueue(report)
 
     @action(detail=True, methods=['post'])
     def regenerate(self, request, pk=None):
@@ -586,18 +585,9 @@ class ReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
             return Response({'error': 'Report is still processing'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Reset report status and trigger regeneration
-        report.status = 'pending'
-        report.error_message = ''
-        report.file_url = None
-        report.file_size = None
-        report.record_count = 0
-        report.processing_time = None
-        report.completed_at = None
-        report.save()
-
-        # TODO: Trigger async report generation
+        regenerated = MerchantReportEngine.regenerate(report)
 
-        return Response({'message': 'Report regeneration started'})
+        return Response({'message': 'Report regeneration started', 'report_id': regenerated.id})
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -643,21 +633,22 @@ class ReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
         except ReportTemplate.DoesNotExist:
             return Response({'error': 'Invalid template'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create report
-        report = Report.objects.create(
-            merchant=request.user.merchant_profile,
-            template=template,
-            name=f"{template.name} - {start_date} to {end_date}",
-            start_date=start_date,
-            end_date=end_date,
-            format=format_type,
-            filters=request.query_params.dict()
+        if format_type not in dict(Report.FORMAT_CHOICES):
+            return Response({'error': 'Invalid format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Create report, or join an identical one that is still generating
+        report, created = MerchantReportEngine.request(
+            request.user.merchant_profile,
+            template,
+            start_date,
+            end_date,
+            format_type=format_type,
+            filters=request.query_params.dict(),
+            name=f"{template.name} - {start_date} to {end_date}"
         )
 
-        # TODO: Trigger async report generation
-
         serializer = self.get_serializer(report)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 class ScheduledReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
     """API for scheduled reports"""
@@ -669,10 +660,13 @@ class ScheduledReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
         return ScheduledReport.objects.filter(merchant=self.request.user.merchant_profile)
 
     def perform_create(self, serializer):
-        """Automatically set the merchant and created_by when creating a scheduled report"""
+        """Automatically set the merchant, created_by and first run when creating a scheduled report"""
+        schedule = ScheduledReport(frequency=serializer.validated_data['frequency'])
+        schedule.calculate_next_run()
         serializer.save(
             merchant=self.request.user.merchant_profile,
-            created_by=self.request.user
+            created_by=self.request.user,
+            next_run=schedule.next_run
         )
 
     @action(detail=True, methods=['post'])
@@ -703,15 +697,16 @@ class ScheduledReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
             return Response({'error': 'Scheduled report is not active'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Create a one-time report based on the schedule
-        report = Report.objects.create(
-            merchant=scheduled_report.merchant,
-            template=scheduled_report.template,
-            name=f"{scheduled_report.name} - Manual Run",
-            start_date=timezone.now().date() - timedelta(days=30),  # Last 30 days
-            end_date=timezone.now().date(),
-            format=scheduled_report.format,
+        report, _ = MerchantReportEngine.request(
+            scheduled_report.merchant,
+            scheduled_report.template,
+            timezone.now().date() - timedelta(days=30),  # Last 30 days
+            timezone.now().date(),
+            format_type=scheduled_report.format,
             filters=scheduled_report.filters,
-            is_scheduled=True
+            name=f"{scheduled_report.name} - Manual Run",
+            is_scheduled=True,
+            scheduled_report=scheduled_report
         )
 
         # Update last_run
@@ -719,8 +714,6 @@ class ScheduledReportViewSet(SubscriptionRequiredMixin, viewsets.ModelViewSet):
         scheduled_report.calculate_next_run()
         scheduled_report.save()
 
-        # TODO: Trigger async report generation
-
         serializer = ReportSerializer(report)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -0,0 +1,324 @@
+"""
+Asynchronous notification delivery
+Delivers stored notifications per channel from Celery workers once the creating transaction commits
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from prometheus_client import Counter, Histogram
+
+from .models import Notification, NotificationPreferences
+from .services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_DELIVERY_LATENCY = Histogram(
+    'notification_delivery_latency_seconds',
+    'Time from notification creation to delivery',
+    ['channel'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+)
+NOTIFICATION_DELIVERIES = Counter(
+    'notification_deliveries_total',
+    'Notification delivery attempts by outcome',
+    ['channel', 'outcome']
+)
+
+
+class NotificationDeliveryError(Exception):
+    """A channel failed to deliver and the attempt should be retried"""
+
+
+class NotificationDelivery:
+    """
+    Deliver a notification through each of its channels from a worker.
+
+    ``schedule`` registers an ``on_commit`` hook that enqueues one
+    ``deliver_notification_channel`` task per channel on that channel's
+    queue (``notifications_<channel>``), so the caller only pays for the
+    INSERT and each channel gets its own worker pool and concurrency.
+    Every attempt is recorded under ``delivery_metrics['channels']`` along
+    with ``delivery_attempts`` and ``last_attempt``; ``delivered`` and
+    ``delivered_at`` are set once every channel has been delivered or
+    skipped.
+    """
+
+    EMAIL_LEVELS = ['warning', 'error', 'payment', 'security']
+    SMS_LEVELS = ['error', 'security']
+    CHANNELS = ['web', 'push', 'email', 'sms']
+    QUEUE_PREFIX = 'notifications_'
+    MAX_ATTEMPTS = Notification.MAX_DELIVERY_ATTEMPTS
+
+    DELIVERED = 'delivered'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+
+    # Columns written by a delivery attempt
+    DELIVERY_FIELDS = ['delivered', 'delivery_attempts', 'last_attempt', 'delivery_metrics', 'push_sent']
+
+    @classmethod
+    def channels_for(cls, notification) -> List[str]:
+        """Channels a notification is delivered through, based on its level"""
+        channels = ['web', 'push']
+        if notification.level in cls.EMAIL_LEVELS:
+            channels.append('email')
+        if notification.level in cls.SMS_LEVELS:
+            channels.append('sms')
+        return channels
+
+    @classmethod
+    def queue_for(cls, channel: str) -> str:
+        return f"{cls.QUEUE_PREFIX}{channel}"
+
+    @classmethod
+    def schedule(cls, notification, channels: List[str] = None):
+        """Enqueue per-channel delivery once the current transaction commits"""
+        notification_id = notification.id
+        channels = channels or cls.channels_for(notification)
+
+        def enqueue():
+            from .tasks import deliver_notification_channel
+
+            for channel in channels:
+                try:
+                    deliver_notification_channel.apply_async(
+                        (notification_id, channel), queue=cls.queue_for(channel)
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to enqueue {channel} delivery for notification {notification_id}: {str(e)}")
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def deliver(cls, notification_id: int, channel: str) -> str:
+        """
+        Deliver one channel and record the attempt.
+
+        Returns ``delivered`` or ``skipped``; raises ``NotificationDeliveryError``
+        when the channel failed and should be retried. Channels that already
+        succeeded are not sent again.
+        """
+        notification = Notification.objects.select_related('user').filter(pk=notification_id).first()
+        if notification is None:
+            logger.info(f"Notification {notification_id} no longer exists, skipping {channel} delivery")
+            return cls.SKIPPED
+
+        previous = notification.delivery_metrics.get('channels', {}).get(channel, {})
+        if previous.get('status') in (cls.DELIVERED, cls.SKIPPED):
+            return previous['status']
+
+        try:
+            outcome = getattr(cls, f'_send_{channel}')(notification)
+            error = None
+        except Exception as e:
+            outcome, error = cls.FAILED, str(e)
+
+        cls.record(notification_id, channel, outcome, error=error)
+        if outcome == cls.FAILED:
+            raise NotificationDeliveryError(f"{channel} delivery of notification {notification_id} failed: {error}")
+        return outcome
+
+    @classmethod
+    def deliver_now(cls, notification, now=None) -> bool:
+        """
+        Send every outstanding channel from this process.
+
+        The delivery state is updated on ``notification`` but not saved, so
+        callers can save it (``DELIVERY_FIELDS``) one row or one batch at a
+        time. Returns whether every channel is now delivered or skipped.
+        """
+        now = now or timezone.now()
+        channels = notification.delivery_metrics.get('channels', {})
+        for channel in cls.channels_for(notification):
+            if channels.get(channel, {}).get('status') in (cls.DELIVERED, cls.SKIPPED):
+                continue
+            try:
+                outcome = getattr(cls, f'_send_{channel}')(notification)
+                error = None
+            except Exception as e:
+                outcome, error = cls.FAILED, str(e)
+            cls.apply_outcome(notification, channel, outcome, now, error=error)
+        return notification.delivered
+
+    @classmethod
+    def record(cls, notification_id: int, channel: str, outcome: str, error: str = None):
+        """Record a delivery attempt on the notification row"""
+        with transaction.atomic():
+            notification = Notification.objects.select_for_update().filter(pk=notification_id).first()
+            if notification is None:
+                return
+            cls.apply_outcome(notification, channel, outcome, timezone.now(), error=error)
+            notification.save(update_fields=cls.DELIVERY_FIELDS)
+
+    @classmethod
+    def apply_outcome(cls, notification, channel: str, outcome: str, now, error: str = None):
+        """Update the delivery state of ``notification`` in memory for one channel attempt"""
+        metrics = notification.delivery_metrics or {}
+        channels = metrics.setdefault('channels', {})
+        entry = channels.setdefault(channel, {'attempts': 0})
+        entry['attempts'] += 1
+        entry['status'] = outcome
+        entry['last_attempt'] = now.isoformat()
+        if error:
+            entry['error'] = error
+        else:
+            entry.pop('error', None)
+
+        if outcome == cls.DELIVERED:
+            due_at = notification.scheduled_for if notification.category == Notification.SCHEDULED else None
+            latency = (now - (due_at or notification.created_at)).total_seconds()
+            entry['delivered_at'] = now.isoformat()
+            entry['latency_ms'] = round(latency * 1000)
+            NOTIFICATION_DELIVERY_LATENCY.labels(channel=channel).observe(latency)
+            if channel == 'push':
+                notification.push_sent = True
+
+        if all(channels.get(name, {}).get('status') in (cls.DELIVERED, cls.SKIPPED)
+               for name in cls.channels_for(notification)):
+            metrics.setdefault('delivered_at', now.isoformat())
+            notification.delivered = True
+
+        # Same bookkeeping as NotificationService.deliver_with_retry
+        notification.delivery_attempts = max(item['attempts'] for item in channels.values())
+        notification.last_attempt = now
+        notification.delivery_metrics = metrics
+        NOTIFICATION_DELIVERIES.labels(channel=channel, outcome=outcome).inc()
+
+    @classmethod
+    def _send_web(cls, notification) -> str:
+        if not NotificationService.send_web_notification(notification.user, notification):
+            raise NotificationDeliveryError("websocket group_send failed")
+        return cls.DELIVERED
+
+    @classmethod
+    def _send_push(cls, notification) -> str:
+        from fcm_django.models import FCMDevice
+        from firebase_admin import messaging
+
+        prefs, _ = NotificationPreferences.objects.get_or_create(user=notification.user)
+        if not prefs.push_enabled:
+            return cls.SKIPPED
+
+        device = FCMDevice.objects.filter(user=notification.user, active=True).first()
+        if not device:
+            return cls.SKIPPED
+
+        result = device.send_message(messaging.Message(
+            notification=messaging.Notification(title=notification.title, body=notification.message),
+            data={
+                **{key: str(value) for key, value in notification.metadata.items()},
+                'notification_id': str(notification.id),
+                'type': notification.notification_type or ''
+            }
+        ))
+        if not isinstance(result, messaging.SendResponse):
+            raise NotificationDeliveryError(f"FCM send failed: {result}")
+        return cls.DELIVERED
+
+    @classmethod
+    def _send_email(cls, notification) -> str:
+        if not notification.user.email:
+            return cls.SKIPPED
+        if not NotificationService.send_email_notification_to_address(
+            notification.user.email, notification.title, notification.message
+        ):
+            raise NotificationDeliveryError("email send failed")
+        return cls.DELIVERED
+
+    @classmethod
+    def _send_sms(cls, notification) -> str:
+        if not notification.user.phone:
+            return cls.SKIPPED
+        if not NotificationService.send_sms_notification(
+            notification.user, f"{notification.title}: {notification.message}"
+        ):
+            raise NotificationDeliveryError("SMS send failed")
+        return cls.DELIVERED
+
+
+class ScheduledNotificationQueue:
+    """
+    Deliver scheduled notifications as they fall due.
+
+    Undelivered scheduled notifications are read through a partial index
+    on ``scheduled_for`` (``category='scheduled'``, ``delivered=False``,
+    attempts left), so a run only touches due rows no matter how many
+    notifications exist. Each batch is claimed with ``SELECT ... FOR
+    UPDATE SKIP LOCKED``: the claim counts as a delivery attempt, so the
+    rows enter retry backoff and other runs pass them over. The claim is
+    committed before anything is sent, then the batch is delivered
+    in-process, with no row locks held, and written back with one
+    ``bulk_update``. Failed rows, and rows whose run died, wait
+    ``retry_delay`` before the next attempt and drop out of the queue after
+    ``MAX_DELIVERY_ATTEMPTS``.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, batch_size: int = None, max_batches: int = None):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.max_batches = max_batches
+
+    @staticmethod
+    def due(now=None):
+        """Scheduled notifications that are due and not in retry backoff"""
+        now = now or timezone.now()
+        ready = Q(delivery_attempts=0)
+        for attempts in range(1, Notification.MAX_DELIVERY_ATTEMPTS):
+            ready |= Q(
+                delivery_attempts=attempts,
+                last_attempt__lte=now - timedelta(seconds=NotificationService.retry_delay(attempts))
+            )
+        return Notification.objects.filter(
+            ready,
+            category=Notification.SCHEDULED,
+            delivered=False,
+            delivery_attempts__lt=Notification.MAX_DELIVERY_ATTEMPTS,
+            scheduled_for__lte=now,
+        )
+
+    def claim_batch(self, now=None) -> List[Notification]:
+        """Claim up to ``batch_size`` due notifications, recording the attempt"""
+        now = now or timezone.now()
+        with transaction.atomic():
+            batch = list(
+                self.due(now).select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .order_by('scheduled_for', 'id')[:self.batch_size]
+            )
+            if batch:
+                Notification.objects.filter(pk__in=[notification.id for notification in batch]).update(
+                    delivery_attempts=F('delivery_attempts') + 1, last_attempt=now
+                )
+        return batch
+
+    def deliver_batch(self, now=None) -> Tuple[int, int]:
+        """Claim and deliver up to ``batch_size`` due notifications as ``(claimed, delivered)``"""
+        now = now or timezone.now()
+        batch = self.claim_batch(now)
+        delivered = sum(NotificationDelivery.deliver_now(notification, now) for notification in batch)
+        if batch:
+            Notification.objects.bulk_update(batch, NotificationDelivery.DELIVERY_FIELDS)
+        return len(batch), delivered
+
+    def dispatch(self, now=None) -> Dict[str, int]:
+        """Deliver every due notification, batch by batch"""
+        now = now or timezone.now()
+        claimed = delivered = batches = 0
+
+        while self.max_batches is None or batches < self.max_batches:
+            batch_claimed, batch_delivered = self.deliver_batch(now)
+            claimed += batch_claimed
+            delivered += batch_delivered
+            if batch_claimed:
+                batches += 1
+            if batch_claimed < self.batch_size:
+                break
+
+        if claimed:
+            logger.info(f"Scheduled notifications: {delivered} of {claimed} delivered in {batches} batches")
+        return {'claimed': claimed, 'delivered': delivered, 'failed': claimed - delivered, 'batches': batches}
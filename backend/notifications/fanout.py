@@ -0,0 +1,251 @@
+"""
+Bulk notification fan-out
+Creates one notification per recipient and delivers them per channel in batches
+"""
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import QuerySet
+
+from .models import Notification, NotificationPreferences
+from .realtime import RealtimeService
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationFanout:
+    """
+    Deliver the same notification to many users.
+
+    Recipients are processed ``CHUNK_SIZE`` at a time. For each chunk the
+    notifications are inserted with one ``bulk_create``, preferences and
+    FCM devices are loaded with one query each, web messages are sent from
+    a single event loop, push messages go to FCM ``FCM_BATCH_SIZE`` tokens
+    per call, emails share one SMTP connection and SMS share one Twilio
+    client. ``stats`` holds per-channel counts and throughput and is passed
+    to ``progress_callback`` after every chunk.
+    """
+
+    CHUNK_SIZE = 1000
+    FCM_BATCH_SIZE = 500  # FCM limit per batch request
+
+    EMAIL_LEVELS = ['warning', 'error', 'payment', 'security']
+    SMS_LEVELS = ['error', 'security']
+    CHANNELS = ['web', 'push', 'email', 'sms']
+
+    DEFAULT_PREFERENCES = {
+        'email_enabled': True,
+        'sms_enabled': False,
+        'push_enabled': True,
+        'web_enabled': True,
+    }
+
+    def __init__(self, title: str, message: str, level: str = 'info', notification_type: str = None,
+                 metadata: Dict[str, Any] = None, chunk_size: int = None,
+                 progress_callback: Callable[[Dict[str, Any]], None] = None):
+        self.title = title
+        self.message = message
+        self.level = level
+        self.notification_type = notification_type
+        self.metadata = metadata or {}
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.progress_callback = progress_callback
+        self.stats = {
+            'users': 0,
+            'notifications': 0,
+            'elapsed_seconds': 0.0,
+            'channels': {
+                channel: {'sent': 0, 'failed': 0, 'skipped': 0, 'seconds': 0.0, 'per_second': 0.0}
+                for channel in self.CHANNELS
+            },
+        }
+
+    def send(self, users: Iterable) -> Dict[str, Any]:
+        """Fan out to ``users`` (a queryset or an iterable of users) and return the stats"""
+        started = time.monotonic()
+        for chunk in self._chunks(users):
+            self._send_chunk(chunk)
+            self.stats['elapsed_seconds'] = time.monotonic() - started
+
+            logger.info(
+                f"Notification fan-out '{self.title}': {self.stats['notifications']} created, " +
+                ', '.join(f"{channel} {counts['sent']} sent/{counts['failed']} failed"
+                          for channel, counts in self.stats['channels'].items())
+            )
+            if self.progress_callback:
+                self.progress_callback(self.stats)
+        return self.stats
+
+    def _chunks(self, users: Iterable):
+        if isinstance(users, QuerySet):
+            users = users.only('id', 'email', 'phone').iterator(chunk_size=self.chunk_size)
+
+        chunk = []
+        for user in users:
+            chunk.append(user)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _measure(self, channel: str, started: float, sent: int = 0, failed: int = 0, skipped: int = 0):
+        counts = self.stats['channels'][channel]
+        counts['sent'] += sent
+        counts['failed'] += failed
+        counts['skipped'] += skipped
+        counts['seconds'] += time.monotonic() - started
+        counts['per_second'] = counts['sent'] / counts['seconds'] if counts['seconds'] else 0.0
+
+    def _send_chunk(self, users: List):
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user=user,
+                title=self.title,
+                message=self.message,
+                level=self.level,
+                notification_type=self.notification_type,
+                metadata=self.metadata
+            )
+            for user in users
+        ])
+        preferences = self._load_preferences([user.id for user in users])
+
+        self.stats['users'] += len(users)
+        self.stats['notifications'] += len(notifications)
+
+        enabled = {channel: [] for channel in self.CHANNELS}
+        for user, notification in zip(users, notifications):
+            prefs = preferences[user.id]
+            for channel in self.CHANNELS:
+                if prefs[f'{channel}_enabled']:
+                    enabled[channel].append((user, notification))
+
+        self._send_web(enabled['web'], skipped=len(users) - len(enabled['web']))
+        self._send_push(enabled['push'], skipped=len(users) - len(enabled['push']))
+        if self.level in self.EMAIL_LEVELS:
+            self._send_email(enabled['email'], skipped=len(users) - len(enabled['email']))
+        if self.level in self.SMS_LEVELS:
+            self._send_sms(enabled['sms'], skipped=len(users) - len(enabled['sms']))
+
+    def _load_preferences(self, user_ids: List[int]) -> Dict[int, Dict[str, bool]]:
+        fields = list(self.DEFAULT_PREFERENCES)
+        preferences = {
+            row['user_id']: row
+            for row in NotificationPreferences.objects.filter(user_id__in=user_ids).values('user_id', *fields)
+        }
+        missing = [user_id for user_id in user_ids if user_id not in preferences]
+        if missing:
+            NotificationPreferences.objects.bulk_create(
+                [NotificationPreferences(user_id=user_id, **self.DEFAULT_PREFERENCES) for user_id in missing],
+                ignore_conflicts=True
+            )
+            preferences.update({user_id: dict(self.DEFAULT_PREFERENCES) for user_id in missing})
+        return preferences
+
+    def _send_web(self, recipients: List, skipped: int = 0):
+        started = time.monotonic()
+        sent, failed = RealtimeService.group_send_many([
+            (f"notifications_{user.id}", {
+                "type": "notification.message",
+                "notification": {
+                    "id": notification.id,
+                    "title": notification.title,
+                    "message": notification.message,
+                    "created_at": notification.created_at.isoformat()
+                }
+            })
+            for user, notification in recipients
+        ])
+        self._measure('web', started, sent=sent, failed=failed, skipped=skipped)
+
+    def _send_push(self, recipients: List, skipped: int = 0):
+        started = time.monotonic()
+        if not recipients:
+            self._measure('push', started, skipped=skipped)
+            return
+
+        from fcm_django.models import FCMDevice
+        from firebase_admin import messaging
+
+        notification_by_user = {user.id: notification for user, notification in recipients}
+        devices = list(FCMDevice.objects.filter(
+            user_id__in=list(notification_by_user), active=True
+        ).values_list('user_id', 'registration_id'))
+
+        data = {key: str(value) for key, value in self.metadata.items()}
+        messages = []
+        for user_id, token in devices:
+            notification = notification_by_user[user_id]
+            messages.append((notification.id, messaging.Message(
+                token=token,
+                notification=messaging.Notification(title=self.title, body=self.message),
+                data={**data, 'notification_id': str(notification.id), 'type': self.notification_type or ''}
+            )))
+
+        sent_ids, sent, failed = set(), 0, 0
+        for start in range(0, len(messages), self.FCM_BATCH_SIZE):
+            batch = messages[start:start + self.FCM_BATCH_SIZE]
+            try:
+                response = messaging.send_all([message for _, message in batch])
+            except Exception as e:
+                logger.error(f"FCM batch of {len(batch)} failed: {str(e)}")
+                failed += len(batch)
+                continue
+            for (notification_id, _), result in zip(batch, response.responses):
+                if result.success:
+                    sent_ids.add(notification_id)
+                    sent += 1
+                else:
+                    failed += 1
+
+        if sent_ids:
+            Notification.objects.filter(pk__in=sent_ids).update(push_sent=True)
+        # Users without a registered device count as skipped
+        skipped += len(notification_by_user) - len({user_id for user_id, _ in devices})
+        self._measure('push', started, sent=sent, failed=failed, skipped=skipped)
+
+    def _send_email(self, recipients: List, skipped: int = 0):
+        started = time.monotonic()
+        messages = [
+            EmailMessage(self.title, self.message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            for user, _ in recipients if user.email
+        ]
+        skipped += len(recipients) - len(messages)
+
+        sent = failed = 0
+        if messages:
+            try:
+                # One connection for the whole chunk
+                sent = get_connection(fail_silently=False).send_messages(messages) or 0
+                failed = len(messages) - sent
+            except Exception as e:
+                logger.error(f"Bulk email of {len(messages)} messages failed: {str(e)}")
+                failed = len(messages)
+        self._measure('email', started, sent=sent, failed=failed, skipped=skipped)
+
+    def _send_sms(self, recipients: List, skipped: int = 0):
+        started = time.monotonic()
+        with_phone = [(user, notification) for user, notification in recipients if user.phone]
+        skipped += len(recipients) - len(with_phone)
+        recipients = with_phone
+        sent = failed = 0
+        if recipients:
+            from twilio.rest import Client
+
+            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+            for user, _ in recipients:
+                try:
+                    client.messages.create(
+                        body=f"{self.title}: {self.message}",
+                        from_=settings.TWILIO_PHONE_NUMBER,
+                        to=user.phone
+                    )
+                    sent += 1
+                except Exception as e:
+                    logger.error(f"SMS send to user {user.id} failed: {str(e)}")
+                    failed += 1
+        self._measure('sms', started, sent=sent, failed=failed, skipped=skipped)
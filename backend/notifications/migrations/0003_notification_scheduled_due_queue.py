@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+def mark_delivered(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.filter(delivery_metrics__has_key='delivered_at').update(delivered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='delivered',
+            field=models.BooleanField(default=False, help_text='Every channel has been delivered or skipped'),
+        ),
+        migrations.RunPython(mark_delivered, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('category', 'scheduled'), ('delivered', False), ('delivery_attempts__lt', 3)), fields=['scheduled_for'], name='notification_scheduled_due'),
+        ),
+    ]
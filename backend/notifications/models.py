@@ -1,6 +1,9 @@
 from django.db import models
 from users.models import User
 
+# Delivery attempts before a notification stops being retried
+MAX_DELIVERY_ATTEMPTS = 3
+
 class NotificationPreferences(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_prefs')
     email_enabled = models.BooleanField(default=True)
@@ -177,6 +180,8 @@ class Notification(models.Model):
         (EXPIRING, 'Expiring'),
         (ACTIONABLE, 'Actionable'),
     ]
+
+    MAX_DELIVERY_ATTEMPTS = MAX_DELIVERY_ATTEMPTS
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -197,6 +202,19 @@ class Notification(models.Model):
     delivery_attempts = models.PositiveSmallIntegerField(default=0)
     last_attempt = models.DateTimeField(null=True, blank=True)
     delivery_metrics = models.JSONField(default=dict)
+    delivered = models.BooleanField(default=False, help_text="Every channel has been delivered or skipped")
+
+    class Meta:
+        indexes = [
+            # Due queue for scheduled notifications
+            models.Index(
+                fields=['scheduled_for'],
+                name='notification_scheduled_due',
+                condition=models.Q(
+                    category='scheduled', delivered=False, delivery_attempts__lt=MAX_DELIVERY_ATTEMPTS
+                ),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.email}"
@@ -1,11 +1,12 @@
 """
 Real-time utilities for sending WebSocket updates
 """
+import asyncio
 import json
 import logging
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,9 @@ channel_layer = get_channel_layer()
 class RealtimeService:
     """Service for sending real-time updates to connected clients"""
 
+    # Concurrent group sends when fanning out to many users
+    SEND_CONCURRENCY = 500
+
     @staticmethod
     def send_balance_update(user_id: int, balance_data: Dict[str, Any]) -> None:
         """Send balance update to specific user"""
@@ -82,5 +86,34 @@ class RealtimeService:
     @staticmethod
     def send_bulk_notification(user_ids: list, notification: Dict[str, Any]) -> None:
         """Send notification to multiple users"""
-        for user_id in user_ids:
-            RealtimeService.send_notification(user_id, notification)
+        sent, failed = RealtimeService.group_send_many([
+            (f'notifications_{user_id}', {'type': 'notification_message', 'notification': notification})
+            for user_id in user_ids
+        ])
+        logger.info(f"Sent notification to {sent} users ({failed} failed)")
+
+    @staticmethod
+    def group_send_many(messages: List[Tuple[str, Dict[str, Any]]]) -> Tuple[int, int]:
+        """
+        Send ``(group, message)`` pairs from one event loop, ``SEND_CONCURRENCY``
+        at a time, instead of one ``async_to_sync`` round trip per group.
+        Returns ``(sent, failed)``.
+        """
+        async def send_all():
+            sent = failed = 0
+            for start in range(0, len(messages), RealtimeService.SEND_CONCURRENCY):
+                results = await asyncio.gather(*(
+                    channel_layer.group_send(group, message)
+                    for group, message in messages[start:start + RealtimeService.SEND_CONCURRENCY]
+                ), return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        failed += 1
+                        logger.error(f"Failed to send group message: {result}")
+                    else:
+                        sent += 1
+            return sent, failed
+
+        if not messages:
+            return 0, 0
+        return async_to_sync(send_all)()
@@ -26,6 +26,12 @@ class NotificationService:
             logger.error(f"Email send to {email} failed: {str(e)}")
             return False
 
+    @classmethod
+    def send_email_notification(cls, user, subject, message):
+        if not user.email:
+            return False
+        return cls.send_email_notification_to_address(user.email, subject, message)
+
     @staticmethod
     def send_sms_notification(user, message):
         if not user.phone:
@@ -45,6 +51,12 @@ class NotificationService:
 
     @classmethod
     def create_notification(cls, user, title, message, level='info', notification_type=None, metadata=None):
+        """
+        Store a notification and deliver it from the notification workers.
+        Channels are enqueued on commit, so the caller only pays for the INSERT.
+        """
+        from .delivery import NotificationDelivery
+
         notification = Notification.objects.create(
             user=user,
             title=title,
@@ -53,21 +65,7 @@ class NotificationService:
             notification_type=notification_type,
             metadata=metadata or {}
         )
-        
-        # Send email for important notifications
-        if level in ['warning', 'error', 'payment', 'security']:
-            cls.send_email_notification(user, title, message)
-            
-        # Send SMS for critical notifications
-        if level in ['error', 'security']:
-            cls.send_sms_notification(user, f"{title}: {message}")
-            
-        # Send web notification
-        cls.send_web_notification(user, notification)
-        
-        # Send push notification
-        cls.send_push_notification(user, notification)
-        
+        NotificationDelivery.schedule(notification)
         return notification
 
     @classmethod
@@ -158,56 +156,34 @@ class NotificationService:
             return False
 
     @classmethod
-    def create_bulk_notifications(cls, users, title, message, **kwargs):
-        notifications = []
-        for user in users:
-            notification = cls.create_notification(user, title, message, **kwargs)
-            notifications.append(notification)
-        return notifications
+    def create_bulk_notifications(cls, users, title, message, progress_callback=None, **kwargs):
+        """
+        Notify many users at once through the batched fan-out pipeline.
+        Returns per-channel delivery counts and throughput.
+        """
+        from .fanout import NotificationFanout
+
+        return NotificationFanout(title, message, progress_callback=progress_callback, **kwargs).send(users)
+
+    @staticmethod
+    def retry_delay(attempts):
+        """Exponential backoff in seconds before retrying after ``attempts`` failed deliveries"""
+        return min(60 * (2 ** (attempts - 1)), 3600)
 
     @classmethod
-    def deliver_with_retry(cls, notification, max_attempts=3):
+    def deliver_with_retry(cls, notification, max_attempts=Notification.MAX_DELIVERY_ATTEMPTS):
+        """Deliver every outstanding channel now and save the delivery state in one write"""
+        from .delivery import NotificationDelivery
+
         if notification.delivery_attempts >= max_attempts:
             return False
-            
+        if notification.category == Notification.SCHEDULED and notification.scheduled_for > timezone.now():
+            return True  # Will be handled by scheduler
+
         try:
-            notification.delivery_attempts += 1
-            notification.last_attempt = timezone.now()
-            notification.save()
-            
-            # Exponential backoff
-            delay = min(60 * (2 ** (notification.delivery_attempts - 1)), 3600)
-            
-            if notification.category == 'scheduled' and notification.scheduled_for > timezone.now():
-                return True  # Will be handled by scheduler
-                
-            success = cls._deliver_notification(notification)
-            
-            if success:
-                notification.delivery_metrics['delivered_at'] = timezone.now().isoformat()
-                notification.save()
-                return True
-                
-            return False
+            delivered = NotificationDelivery.deliver_now(notification)
+            notification.save(update_fields=NotificationDelivery.DELIVERY_FIELDS)
+            return delivered
         except Exception as e:
             logger.error(f"Notification delivery failed: {str(e)}")
             return False
-    
-    @classmethod
-    def _deliver_notification(cls, notification):
-        # Actual delivery logic for all channels
-        # Send email for important notifications
-        if notification.level in ['warning', 'error', 'payment', 'security']:
-            cls.send_email_notification(notification.user, notification.title, notification.message)
-            
-        # Send SMS for critical notifications
-        if notification.level in ['error', 'security']:
-            cls.send_sms_notification(notification.user, f"{notification.title}: {notification.message}")
-            
-        # Send web notification
-        cls.send_web_notification(notification.user, notification)
-        
-        # Send push notification
-        cls.send_push_notification(notification.user, notification)
-        
-        return True
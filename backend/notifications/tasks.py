@@ -1,6 +1,5 @@
 from celery import shared_task
-from django.utils import timezone
-from .models import Notification
+from .delivery import NotificationDelivery, NotificationDeliveryError, ScheduledNotificationQueue
 from .services import NotificationService
 import logging
 
@@ -8,21 +7,39 @@ logger = logging.getLogger(__name__)
 
 @shared_task
 def process_scheduled_notifications():
-    """Task to deliver scheduled notifications that are ready"""
-    now = timezone.now()
-    notifications = Notification.objects.filter(
-        category='scheduled',
-        scheduled_for__lte=now,
-        delivery_metrics__has_key='delivered_at',
-    )
-    
-    for notification in notifications:
-        NotificationService.deliver_with_retry(notification)
+    """Task to deliver scheduled notifications that are due"""
+    return ScheduledNotificationQueue().dispatch()
 
 @shared_task
 def cleanup_expired_notifications():
     """Task to remove expired notifications"""
-    Notification.objects.filter(
-        category='expiring',
-        expires_at__lte=timezone.now()
-    ).delete()
+    from core.retention import purge_expired
+
+    return purge_expired('expired_notifications')
+
+@shared_task
+def fan_out_notification(user_ids, title, message, level='info', notification_type=None, metadata=None):
+    """Task to deliver one notification to many users in batches"""
+    from users.models import User
+
+    stats = NotificationService.create_bulk_notifications(
+        User.objects.filter(id__in=user_ids, is_active=True).order_by('id'),
+        title,
+        message,
+        level=level,
+        notification_type=notification_type,
+        metadata=metadata
+    )
+    logger.info(f"Fan-out '{title}' finished in {stats['elapsed_seconds']:.1f}s: {stats['channels']}")
+    return stats
+
+@shared_task(bind=True, acks_late=True, max_retries=NotificationDelivery.MAX_ATTEMPTS - 1)
+def deliver_notification_channel(self, notification_id, channel):
+    """Task to deliver one channel of a stored notification, retrying with backoff"""
+    try:
+        return NotificationDelivery.deliver(notification_id, channel)
+    except NotificationDeliveryError as e:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Giving up on {channel} delivery of notification {notification_id}: {str(e)}")
+            return NotificationDelivery.FAILED
+        raise self.retry(exc=e, countdown=NotificationService.retry_delay(self.request.retries + 1))
@@ -0,0 +1,194 @@
+"""
+Tests for asynchronous notification delivery
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from core.celery import app
+from notifications.delivery import NotificationDelivery, ScheduledNotificationQueue
+from notifications.models import Notification, NotificationPreferences
+from notifications.services import NotificationService
+from notifications.tasks import deliver_notification_channel, process_scheduled_notifications
+
+User = get_user_model()
+
+
+@patch.object(NotificationService, 'send_web_notification', return_value=True)
+class NotificationDeliveryTests(TestCase):
+    """Tests for NotificationDelivery"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='delivery@example.com', password='TestPass123!')
+        mail.outbox = []
+
+    def _notify(self, level='payment'):
+        return NotificationService.create_notification(
+            self.user, 'Wallet Credit', 'Your wallet has been credited', level=level,
+            notification_type=Notification.WALLET_CREDIT
+        )
+
+    def test_create_notification_only_inserts_and_enqueues_on_commit(self, mock_web):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(1):
+                notification = self._notify()
+
+        self.assertEqual(len(callbacks), 1)
+        mock_web.assert_not_called()
+        self.assertEqual(mail.outbox, [])
+
+        with patch.object(deliver_notification_channel, 'apply_async') as mock_apply:
+            callbacks[0]()
+
+        self.assertEqual(
+            [(call.args[0], call.kwargs['queue']) for call in mock_apply.call_args_list],
+            [((notification.id, 'web'), 'notifications_web'),
+             ((notification.id, 'push'), 'notifications_push'),
+             ((notification.id, 'email'), 'notifications_email')]
+        )
+
+    def test_channels_are_delivered_and_recorded(self, mock_web):
+        app.conf.task_always_eager = True
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = self._notify()
+        finally:
+            app.conf.task_always_eager = False
+
+        notification.refresh_from_db()
+        channels = notification.delivery_metrics['channels']
+        self.assertEqual(channels['web']['status'], NotificationDelivery.DELIVERED)
+        self.assertEqual(channels['email']['status'], NotificationDelivery.DELIVERED)
+        self.assertIn('latency_ms', channels['email'])
+        # No FCM device registered
+        self.assertEqual(channels['push']['status'], NotificationDelivery.SKIPPED)
+        self.assertNotIn('sms', channels)
+        self.assertIn('delivered_at', notification.delivery_metrics)
+        self.assertEqual(notification.delivery_attempts, 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_push_opt_out_is_skipped(self, mock_web):
+        NotificationPreferences.objects.create(user=self.user, push_enabled=False)
+        notification = self._notify(level='info')
+
+        self.assertEqual(NotificationDelivery.deliver(notification.id, 'push'), NotificationDelivery.SKIPPED)
+
+    @patch.object(NotificationService, 'send_email_notification_to_address', return_value=False)
+    def test_failed_channel_is_retried_then_given_up(self, mock_email, mock_web):
+        notification = self._notify()
+
+        app.conf.task_always_eager = True
+        try:
+            result = deliver_notification_channel.apply(args=(notification.id, 'email')).get()
+        finally:
+            app.conf.task_always_eager = False
+
+        self.assertEqual(result, NotificationDelivery.FAILED)
+        self.assertEqual(mock_email.call_count, NotificationDelivery.MAX_ATTEMPTS)
+        notification.refresh_from_db()
+        email = notification.delivery_metrics['channels']['email']
+        self.assertEqual((email['attempts'], email['status']), (3, NotificationDelivery.FAILED))
+        self.assertEqual(notification.delivery_attempts, 3)
+        self.assertNotIn('delivered_at', notification.delivery_metrics)
+
+    def test_delivered_channel_is_not_sent_again(self, mock_web):
+        notification = self._notify()
+
+        NotificationDelivery.deliver(notification.id, 'email')
+        NotificationDelivery.deliver(notification.id, 'email')
+
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_retry_delay_backs_off_exponentially(self, mock_web):
+        self.assertEqual(
+            [NotificationService.retry_delay(attempts) for attempts in (1, 2, 3, 10)], [60, 120, 240, 3600]
+        )
+
+
+@patch.object(NotificationService, 'send_web_notification', return_value=True)
+class ScheduledNotificationQueueTests(TestCase):
+    """Tests for ScheduledNotificationQueue"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='scheduled@example.com', password='TestPass123!')
+        self.now = timezone.now()
+        mail.outbox = []
+
+    def _scheduled(self, minutes_ago=5, **kwargs):
+        return Notification.objects.create(
+            user=self.user, title='Reminder', message='Your bill is due', level='warning',
+            category=Notification.SCHEDULED, scheduled_for=self.now - timedelta(minutes=minutes_ago), **kwargs
+        )
+
+    def test_only_due_undelivered_notifications_are_delivered(self, mock_web):
+        due = [self._scheduled(), self._scheduled(minutes_ago=1)]
+        future = self._scheduled(minutes_ago=-30)
+        done = self._scheduled(delivered=True)
+        Notification.objects.create(user=self.user, title='Now', message='Not scheduled')
+
+        result = ScheduledNotificationQueue(batch_size=1).dispatch(self.now)
+
+        self.assertEqual(result, {'claimed': 2, 'delivered': 2, 'failed': 0, 'batches': 2})
+        self.assertEqual(len(mail.outbox), 2)
+        for notification in due:
+            notification.refresh_from_db()
+            self.assertTrue(notification.delivered)
+            self.assertEqual(notification.delivery_attempts, 1)
+            self.assertGreaterEqual(notification.delivery_metrics['channels']['email']['latency_ms'], 60000)
+        future.refresh_from_db()
+        done.refresh_from_db()
+        self.assertEqual((future.delivered, future.delivery_attempts), (False, 0))
+        self.assertEqual(done.delivery_attempts, 0)
+        self.assertEqual(ScheduledNotificationQueue().dispatch(self.now)['claimed'], 0)
+
+    @patch.object(NotificationService, 'send_email_notification_to_address', return_value=False)
+    def test_failed_notifications_back_off_then_give_up(self, mock_email, mock_web):
+        notification = self._scheduled()
+        queue = ScheduledNotificationQueue()
+
+        self.assertEqual(queue.dispatch(self.now)['failed'], 1)
+        # Waits retry_delay(1) before the next attempt
+        self.assertFalse(queue.due(self.now + timedelta(seconds=30)).exists())
+        queue.dispatch(self.now + timedelta(seconds=61))
+        queue.dispatch(self.now + timedelta(seconds=61 + 121))
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.delivery_attempts, Notification.MAX_DELIVERY_ATTEMPTS)
+        self.assertFalse(notification.delivered)
+        # Web was delivered on the first run and is not sent again
+        self.assertEqual(mock_web.call_count, 1)
+        self.assertFalse(queue.due(self.now + timedelta(days=1)).exists())
+
+    def test_claim_is_recorded_before_anything_is_sent(self, mock_web):
+        notification = self._scheduled()
+        claims = []
+
+        def worker_lost(claimed, now=None):
+            claims.append(Notification.objects.values_list('delivery_attempts', 'last_attempt').get(pk=claimed.pk))
+            raise RuntimeError('worker lost')
+
+        with patch.object(NotificationDelivery, 'deliver_now', side_effect=worker_lost):
+            with self.assertRaises(RuntimeError):
+                ScheduledNotificationQueue().dispatch(self.now)
+
+        self.assertEqual(claims, [(1, self.now)])
+        # The lost run's claim keeps the row from other runs until its retry delay is over
+        self.assertEqual(ScheduledNotificationQueue().dispatch(self.now + timedelta(seconds=30))['claimed'], 0)
+        self.assertEqual(ScheduledNotificationQueue().dispatch(self.now + timedelta(seconds=61))['delivered'], 1)
+        notification.refresh_from_db()
+        self.assertTrue(notification.delivered)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_due_queue_reads_the_partial_index(self, mock_web):
+        plan = ScheduledNotificationQueue.due(self.now).explain()
+
+        self.assertIn('notification_scheduled_due', plan)
+
+    def test_beat_task_delivers_due_notifications(self, mock_web):
+        self._scheduled()
+
+        self.assertEqual(process_scheduled_notifications()['delivered'], 1)
@@ -0,0 +1,99 @@
+"""
+Tests for the bulk notification fan-out
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from fcm_django.models import FCMDevice
+
+from notifications.fanout import NotificationFanout
+from notifications.models import Notification, NotificationPreferences
+from notifications.realtime import RealtimeService
+from notifications.services import NotificationService
+
+User = get_user_model()
+
+
+def fcm_response(messages):
+    return SimpleNamespace(responses=[SimpleNamespace(success=True) for _ in messages])
+
+
+@patch('firebase_admin.messaging.send_all', side_effect=fcm_response)
+class NotificationFanoutTests(TestCase):
+    """Tests for NotificationFanout"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'fanout{i}@example.com', password='TestPass123!')
+            for i in range(6)
+        ]
+        NotificationPreferences.objects.create(user=self.users[0], push_enabled=False)
+        NotificationPreferences.objects.create(user=self.users[1], web_enabled=False, email_enabled=False)
+        for user in self.users[:4]:
+            FCMDevice.objects.create(user=user, registration_id=f'token-{user.id}', type='android')
+        mail.outbox = []
+
+    def test_notifications_are_created_and_delivered_per_channel(self, mock_send_all):
+        stats = NotificationService.create_bulk_notifications(
+            User.objects.filter(email__startswith='fanout'), 'Payment update', 'Your payout has been sent',
+            level='payment', notification_type=Notification.PAYMENT_SUCCESSFUL, metadata={'batch': 7}
+        )
+
+        self.assertEqual(stats['notifications'], 6)
+        self.assertEqual(Notification.objects.filter(title='Payment update').count(), 6)
+        channels = stats['channels']
+        self.assertEqual((channels['web']['sent'], channels['web']['skipped']), (5, 1))
+        # User 0 opted out of push, users 4 and 5 have no device
+        self.assertEqual((channels['push']['sent'], channels['push']['skipped']), (3, 3))
+        self.assertEqual(Notification.objects.filter(push_sent=True).count(), 3)
+        self.assertEqual(channels['email']['sent'], 5)
+        self.assertEqual(len(mail.outbox), 5)
+        # SMS is only for errors and security alerts
+        self.assertEqual(channels['sms']['sent'], 0)
+
+        (messages,), _ = mock_send_all.call_args
+        self.assertEqual(messages[0].data['batch'], '7')
+        self.assertEqual(NotificationPreferences.objects.count(), 6)
+
+    def test_push_is_sent_in_fcm_sized_batches(self, mock_send_all):
+        with patch.object(NotificationFanout, 'FCM_BATCH_SIZE', 2):
+            NotificationFanout('Hello', 'World').send(self.users)
+
+        self.assertEqual([len(call.args[0]) for call in mock_send_all.call_args_list], [2, 1])
+
+    def test_queries_per_chunk_do_not_grow_with_recipients(self, mock_send_all):
+        with CaptureQueriesContext(connection) as small:
+            NotificationFanout('Hello', 'World', chunk_size=10).send(self.users[2:4])
+        with CaptureQueriesContext(connection) as large:
+            NotificationFanout('Hello', 'World', chunk_size=10).send(self.users[:6])
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_progress_is_reported_per_chunk(self, mock_send_all):
+        progress = []
+
+        NotificationFanout('Hello', 'World', chunk_size=4, progress_callback=lambda stats: progress.append(
+            stats['notifications']
+        )).send(self.users)
+
+        self.assertEqual(progress, [4, 6])
+
+
+class RealtimeBulkSendTests(TestCase):
+    """Tests for RealtimeService.send_bulk_notification"""
+
+    def test_bulk_notification_is_sent_to_every_user_group(self):
+        with patch('notifications.realtime.channel_layer') as mock_layer:
+            mock_layer.group_send = AsyncMock(side_effect=[None, ConnectionError('down'), None])
+            sent, failed = RealtimeService.group_send_many([
+                (f'notifications_{user_id}', {'type': 'notification_message', 'notification': {}})
+                for user_id in (1, 2, 3)
+            ])
+
+        self.assertEqual((sent, failed), (2, 1))
+        self.assertEqual(mock_layer.group_send.await_count, 3)
@@ -6,12 +6,15 @@ ML-based fraud scoring, risk management, and transaction monitoring
 from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Count, Sum, Q
 from django.core.cache import cache
 from django.utils import timezone
 import logging
 import hashlib
 import json
+from time import perf_counter
+
+from core.metrics import FRAUD_SCORING_LATENCY
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +35,13 @@ class FraudRule:
         self.weight = weight
         self.threshold = threshold
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         """
         Evaluate the rule against transaction data
         
+        ``profile`` is the customer's ``CustomerFeatures`` from the fraud
+        feature store, fetched once by the engine and shared by all rules.
+        
         Returns:
             Tuple of (triggered, score, reason)
         """
@@ -48,18 +54,12 @@ class VelocityRule(FraudRule):
     def __init__(self):
         super().__init__('velocity_check', weight=0.3, threshold=5)
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
-        from .models import Payment
-        
-        customer_id = transaction_data.get('customer_id')
-        amount = transaction_data.get('amount', 0)
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
+        if profile is None:
+            return (False, 0.0, "")
         
         # Check transactions in last hour
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-        recent_transactions = Payment.objects.filter(
-            customer_id=customer_id,
-            created_at__gte=one_hour_ago
-        ).count()
+        recent_transactions = profile.count_since(3600)
         
         if recent_transactions >= self.threshold:
             score = min(1.0, recent_transactions / (self.threshold * 2))
@@ -78,22 +78,17 @@ class AmountAnomalyRule(FraudRule):
     def __init__(self):
         super().__init__('amount_anomaly', weight=0.25, threshold=3.0)
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
-        from .models import Payment
-        
-        customer_id = transaction_data.get('customer_id')
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         amount = Decimal(str(transaction_data.get('amount', 0)))
         
-        # Get customer's average transaction amount
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        avg_amount = Payment.objects.filter(
-            customer_id=customer_id,
-            created_at__gte=thirty_days_ago,
-            status='completed'
-        ).aggregate(Avg('amount'))['amount__avg']
-        
-        if avg_amount and amount > (avg_amount * self.threshold):
-            score = min(1.0, float(amount / (avg_amount * self.threshold)))
+        # Customer's average completed transaction amount
+        avg_amount = None
+        if profile is not None and profile.completed_count:
+            avg_amount = Decimal(str(round(profile.amount_mean, 2)))
+        
+        threshold = Decimal(str(self.threshold))
+        if avg_amount and amount > (avg_amount * threshold):
+            score = min(1.0, float(amount / (avg_amount * threshold)))
             return (
                 True,
                 score * self.weight,
@@ -109,13 +104,11 @@ class GeolocationRule(FraudRule):
     def __init__(self):
         super().__init__('geolocation_check', weight=0.2, threshold=1000)  # km
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
-        customer_id = transaction_data.get('customer_id')
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         current_ip = transaction_data.get('ip_address')
         
         # Get last transaction location
-        cache_key = f"last_location:{customer_id}"
-        last_location = cache.get(cache_key)
+        last_location = profile.last_ip if profile is not None else None
         
         if last_location and current_ip:
             # In production, use IP geolocation service
@@ -132,10 +125,6 @@ class GeolocationRule(FraudRule):
                     f"Location changed by {distance}km in short time"
                 )
         
-        # Cache current location
-        if current_ip:
-            cache.set(cache_key, current_ip, 3600)
-        
         return (False, 0.0, "")
 
 
@@ -145,29 +134,20 @@ class DeviceFingerprintRule(FraudRule):
     def __init__(self):
         super().__init__('device_fingerprint', weight=0.15, threshold=0.5)
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
-        customer_id = transaction_data.get('customer_id')
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         device_fingerprint = transaction_data.get('device_fingerprint')
         
-        if not device_fingerprint:
+        if not device_fingerprint or profile is None:
             return (False, 0.0, "")
         
-        # Check if device is known
-        cache_key = f"known_devices:{customer_id}"
-        known_devices = cache.get(cache_key, set())
-        
-        if device_fingerprint not in known_devices:
-            # New device
-            if len(known_devices) > 0:
-                return (
-                    True,
-                    self.weight,
-                    "Transaction from new/unknown device"
-                )
-            
-            # Add to known devices
-            known_devices.add(device_fingerprint)
-            cache.set(cache_key, known_devices, 86400 * 30)  # 30 days
+        # New device for a customer with known devices
+        known_devices = profile.known_devices
+        if known_devices and device_fingerprint not in known_devices:
+            return (
+                True,
+                self.weight,
+                "Transaction from new/unknown device"
+            )
         
         return (False, 0.0, "")
 
@@ -178,7 +158,7 @@ class BINCheckRule(FraudRule):
     def __init__(self):
         super().__init__('bin_check', weight=0.2, threshold=0.7)
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         card_bin = transaction_data.get('card_bin')
         
         if not card_bin:
@@ -217,7 +197,7 @@ class EmailDomainRule(FraudRule):
     def __init__(self):
         super().__init__('email_domain', weight=0.1, threshold=0.5)
     
-    def evaluate(self, transaction_data: Dict) -> Tuple[bool, float, str]:
+    def evaluate(self, transaction_data: Dict, profile=None) -> Tuple[bool, float, str]:
         email = transaction_data.get('email', '')
         
         if not email or '@' not in email:
@@ -272,13 +252,25 @@ class FraudDetectionEngine:
                 'requires_review': bool
             }
         """
+        from .services.fraud_feature_store import FraudFeatureStore
+        
+        started = perf_counter()
         triggered_rules = []
         total_score = 0.0
         
+        # One feature store read shared by every rule
+        customer_id = transaction_data.get('customer_id')
+        profile = None
+        if customer_id:
+            try:
+                profile = FraudFeatureStore.get(customer_id)
+            except Exception as e:
+                logger.error(f"Error loading fraud features for customer {customer_id}: {str(e)}")
+        
         # Evaluate all rules
         for rule in self.rules:
             try:
-                triggered, score, reason = rule.evaluate(transaction_data)
+                triggered, score, reason = rule.evaluate(transaction_data, profile)
                 
                 if triggered:
                     triggered_rules.append({
@@ -311,10 +303,21 @@ class FraudDetectionEngine:
             'analyzed_at': datetime.now().isoformat()
         }
         
-        # Log high-risk transactions
+        # Log high-risk transactions; only remember the context of the rest
         if risk_level in [FraudRiskLevel.HIGH, FraudRiskLevel.CRITICAL]:
             self._log_high_risk_transaction(transaction_data, result)
+        elif customer_id:
+            try:
+                FraudFeatureStore.observe_context(
+                    customer_id,
+                    device_fingerprint=transaction_data.get('device_fingerprint'),
+                    ip_address=transaction_data.get('ip_address'),
+                    country=transaction_data.get('country'),
+                )
+            except Exception as e:
+                logger.error(f"Error recording fraud context for customer {customer_id}: {str(e)}")
         
+        FRAUD_SCORING_LATENCY.labels(risk_level=risk_level).observe(perf_counter() - started)
         return result
     
     def _calculate_risk_level(self, risk_score: float) -> str:
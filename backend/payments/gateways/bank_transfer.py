@@ -11,6 +11,7 @@ logger = logging.getLogger(__name__)
 
 class BankTransferGateway(PaymentGateway):
     """Real bank transfer payment gateway implementation with multiple provider support"""
+    metrics_name = 'bank_transfer'
 
     def __init__(self):
         # Support multiple banking providers
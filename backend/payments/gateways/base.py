@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from functools import wraps
+from time import perf_counter
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -13,6 +15,7 @@ import requests
 import hmac
 import hashlib
 from django.http import JsonResponse
+from core.metrics import PAYMENT_GATEWAY_LATENCY, PAYMENT_GATEWAY_REQUESTS
 
 logger = logging.getLogger(__name__)
 
@@ -37,13 +40,47 @@ class CircuitBreakerMixin:
             logger.error(f"Gateway request failed: {str(e)}")
             raise
 
+def _instrument_gateway_call(method, operation):
+    """Time a gateway call and count it as success, declined or error"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = perf_counter()
+        outcome = 'error'
+        try:
+            result = method(self, *args, **kwargs)
+            outcome = 'success' if isinstance(result, dict) and result.get('success') else 'declined'
+            return result
+        finally:
+            PAYMENT_GATEWAY_LATENCY.labels(provider=self.metrics_name, operation=operation).observe(
+                perf_counter() - started
+            )
+            PAYMENT_GATEWAY_REQUESTS.labels(provider=self.metrics_name, operation=operation, outcome=outcome).inc()
+    wrapper._instrumented = True
+    return wrapper
+
+
 class PaymentGateway(CircuitBreakerMixin, ABC):
     """Base interface for all payment gateways"""
+
+    # Provider label on the gateway metrics
+    metrics_name = None
+    INSTRUMENTED_METHODS = {'process_payment': 'payment', 'refund_payment': 'refund'}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not cls.__dict__.get('metrics_name'):
+            cls.metrics_name = cls.__dict__.get('PROVIDER_NAME') or cls.__name__.replace('Gateway', '').lower()
+        for name, operation in cls.INSTRUMENTED_METHODS.items():
+            method = cls.__dict__.get(name)
+            if method and not getattr(method, '__isabstractmethod__', False) and not hasattr(method, '_instrumented'):
+                setattr(cls, name, _instrument_gateway_call(method, operation))
     
     @abstractmethod
     def process_payment(self, amount, currency, payment_method, customer, merchant, metadata=None):
         """
         Process payment with gateway
+        metadata['idempotency_key'], when given, is passed to the provider so
+        a repeated call with the same key does not charge twice
         Returns: {
             'success': bool,
             'transaction_id': str,
@@ -65,7 +65,7 @@ class FlutterwaveGateway(PaymentGateway):
 
             # Prepare payment data based on payment method type
             payment_data = {
-                "tx_ref": f"SikaRemit-{metadata.get('transaction_id', 'unknown')}-{int(time.time())}",
+                "tx_ref": metadata.get('idempotency_key') or f"SikaRemit-{metadata.get('transaction_id', 'unknown')}-{int(time.time())}",
                 "amount": str(amount_in_minor),
                 "currency": currency,
                 "redirect_url": f"{settings.FRONTEND_URL}/payment/callback",
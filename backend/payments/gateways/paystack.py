@@ -38,19 +38,24 @@ class PaystackGateway(PaymentGateway):
             # Paystack amounts are in kobo/pesewas (multiply by 100)
             amount_in_kobo = int(amount * 100)
             
+            payload = {
+                "email": customer.user.email if customer.user else "test@example.com",
+                "amount": amount_in_kobo,
+                "currency": currency,
+                "metadata": metadata or {},
+                "callback_url": f"{getattr(settings, 'PAYSTACK_CALLBACK_URL', 'http://localhost:3000/paystack/callback')}?reference={payment_method.id}"
+            }
+            # Paystack rejects a reference it has seen, so a retried charge is not made twice
+            if (metadata or {}).get('idempotency_key'):
+                payload["reference"] = metadata['idempotency_key']
+
             response = requests.post(
                 f"{self.base_url}/transaction/initialize",
                 headers={
                     "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
                     "Content-Type": "application/json"
                 },
-                json={
-                    "email": customer.user.email if customer.user else "test@example.com",
-                    "amount": amount_in_kobo,
-                    "currency": currency,
-                    "metadata": metadata or {},
-                    "callback_url": f"{getattr(settings, 'PAYSTACK_CALLBACK_URL', 'http://localhost:3000/paystack/callback')}?reference={payment_method.id}"
-                }
+                json=payload
             )
             
             if response.status_code == 200:
@@ -14,6 +14,7 @@ logger = logging.getLogger(__name__)
 
 class QRPaymentGateway(PaymentGateway):
     """Complete QR Code payment gateway implementation with scanning and processing"""
+    metrics_name = 'qr'
 
     def __init__(self):
         self.expiry_minutes = getattr(settings, 'QR_PAYMENT_EXPIRY', 15)
@@ -57,7 +57,8 @@ class StripeGateway(PaymentGateway):
                 payment_method=payment_method.details.get('payment_method_id'),
                 customer=customer.stripe_customer_id,
                 confirm=True,
-                metadata=metadata or {}
+                metadata=metadata or {},
+                idempotency_key=(metadata or {}).get('idempotency_key')
             )
             
             return {
@@ -1,7 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from ...models import ScheduledPayout
-from ...services import PaymentService
+from ...services.scheduled_payout_service import ScheduledPayoutDispatcher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,31 +7,22 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Process all scheduled payouts that are due'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Payouts claimed per batch')
+        parser.add_argument('--inline', action='store_true',
+                            help='Pay claimed payouts in this process instead of on Celery workers')
+
     def handle(self, *args, **options):
-        due_payouts = ScheduledPayout.objects.filter(
-            next_execution__lte=timezone.now(),
-            status=ScheduledPayout.ACTIVE
-        )
-        
-        if not due_payouts.exists():
+        result = ScheduledPayoutDispatcher(
+            batch_size=options['batch_size'],
+            inline=options['inline'],
+        ).dispatch()
+
+        if not result['dispatched']:
             logger.info("No scheduled payouts to process")
             return
-            
-        logger.info(f"Processing {due_payouts.count()} scheduled payouts")
-        
-        for payout in due_payouts:
-            try:
-                # Process payout via PaymentService
-                PaymentService.process_payout(
-                    merchant=payout.merchant,
-                    amount=payout.amount
-                )
-                
-                # Update next execution time
-                payout.calculate_next_execution()
-                payout.save()
-                
-                logger.info(f"Processed payout {payout.id} for {payout.merchant.business_name}")
-                
-            except Exception as e:
-                logger.error(f"Failed to process payout {payout.id}: {str(e)}")
+
+        logger.info(f"Dispatched {result['dispatched']} scheduled payouts in {result['batches']} batches")
+        self.stdout.write(self.style.SUCCESS(
+            f"Dispatched {result['dispatched']} scheduled payouts in {result['batches']} batches"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from ...services.invoice_aging_service import InvoiceAgingSweeper
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Update overdue invoice statuses and aging summaries, and queue overdue invoice reminders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only sweep this user\'s invoices (repeatable)')
+        parser.add_argument('--no-reminders', action='store_true', help='Do not queue overdue reminders')
+
+    def handle(self, *args, **options):
+        result = InvoiceAgingSweeper(user_ids=options['user_ids']).sweep(
+            send_reminders=not options['no_reminders']
+        )
+
+        logger.info(f"Invoice aging sweep: {result}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {result['marked_overdue']} invoices overdue and cleared {result['cleared']}, "
+            f"wrote {result['summaries']} aging summaries and queued {result['reminders']} reminders"
+        ))
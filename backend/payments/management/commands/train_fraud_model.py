@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from payments.services.fraud_model_training_service import FraudModelTrainer
+
+
+class Command(BaseCommand):
+    help = 'Retrain the fraud detection model on labeled transactions and publish it if it beats the live model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', action='store_true', help='Train on synthetic data instead of labels')
+        parser.add_argument('--since-days', type=int, default=None, help='Only use transactions from the last N days')
+        parser.add_argument('--n-jobs', type=int, default=None, help='Parallel training jobs (default: all cores)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Transactions featurized per chunk')
+        parser.add_argument('--force', action='store_true', help='Publish even if holdout checks fail')
+
+    def handle(self, *args, **options):
+        result = FraudModelTrainer(
+            n_jobs=options['n_jobs'],
+            chunk_size=options['chunk_size'],
+        ).train(synthetic=options['synthetic'], since_days=options['since_days'], force=options['force'])
+
+        summary = f"{result['samples']} samples ({result['fraud_labels']} fraud) from {result['source']} data"
+        if result['status'] == 'skipped':
+            self.stdout.write(self.style.WARNING(f"Skipped: {result['reason']} ({summary})"))
+            return
+
+        metrics = result['metrics']
+        summary += (
+            f", holdout ROC AUC {metrics['roc_auc']:.3f}, precision {metrics['precision']:.3f}, "
+            f"recall {metrics['recall']:.3f}, trained in {result['training_seconds']:.1f}s"
+        )
+        if result['status'] == 'published':
+            self.stdout.write(self.style.SUCCESS(f"Published fraud model {result['version']}: {summary}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"Rejected fraud model {result['version']}: {result['reason']} ({summary})"))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_managers'),
+        ('payments', '0006_allow_null_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudFeatureProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('amount_mean', models.FloatField(default=0.0)),
+                ('amount_m2', models.FloatField(default=0.0, help_text='Sum of squared deviations from the mean')),
+                ('hour_histogram', models.JSONField(default=list)),
+                ('known_devices', models.JSONField(default=list)),
+                ('known_countries', models.JSONField(default=list)),
+                ('last_ip', models.CharField(blank=True, max_length=45)),
+                ('recent_activity', models.JSONField(default=list)),
+                ('last_transaction_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fraud_feature_profile', to='users.customer')),
+            ],
+        ),
+    ]
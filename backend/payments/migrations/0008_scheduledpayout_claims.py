@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_fraudfeatureprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpayout',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a dispatcher claimed the due run', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledpayout',
+            name='last_executed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scheduledpayout',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('active', 'Active'), ('paused', 'Paused'), ('completed', 'Completed'), ('processing', 'Processing'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpayout',
+            index=models.Index(fields=['status', 'next_execution'], name='payments_sc_status_c989df_idx'),
+        ),
+    ]
@@ -0,0 +1,197 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:40
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0005_remove_product_store_alter_adminactivity_action_type_and_more'),
+        ('payments', '0008_scheduledpayout_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessClient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_name', models.CharField(max_length=200)),
+                ('contact_person', models.CharField(blank=True, max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('address_line_1', models.CharField(max_length=255)),
+                ('address_line_2', models.CharField(blank=True, max_length=255)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('postal_code', models.CharField(blank=True, max_length=20)),
+                ('country', models.CharField(max_length=100)),
+                ('tax_id', models.CharField(blank=True, max_length=50)),
+                ('registration_number', models.CharField(blank=True, max_length=50)),
+                ('default_payment_terms', models.PositiveIntegerField(default=30)),
+                ('default_currency', models.CharField(default='USD', max_length=3)),
+                ('notes', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='business_clients', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['company_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_number', models.CharField(blank=True, max_length=50)),
+                ('reference_number', models.CharField(blank=True, max_length=50)),
+                ('issue_date', models.DateField(default=django.utils.timezone.now)),
+                ('due_date', models.DateField()),
+                ('payment_terms', models.PositiveIntegerField(default=30)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=5)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('amount_due', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('sent', 'Sent'), ('viewed', 'Viewed'), ('paid', 'Paid'), ('partially_paid', 'Partially Paid'), ('overdue', 'Overdue'), ('cancelled', 'Cancelled')], default='draft', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('terms_and_conditions', models.TextField(blank=True)),
+                ('footer', models.TextField(blank=True)),
+                ('pdf_file', models.FileField(blank=True, null=True, upload_to='invoices/')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('viewed_at', models.DateTimeField(blank=True, null=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('is_recurring', models.BooleanField(default=False)),
+                ('recurring_frequency', models.CharField(blank=True, choices=[('weekly', 'Weekly'), ('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('yearly', 'Yearly')], max_length=20)),
+                ('next_recurring_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='payments.businessclient')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='invoice_logos/')),
+                ('primary_color', models.CharField(default='#2563eb', max_length=7)),
+                ('secondary_color', models.CharField(default='#6b7280', max_length=7)),
+                ('company_name', models.CharField(max_length=200)),
+                ('company_address', models.TextField()),
+                ('company_phone', models.CharField(blank=True, max_length=20)),
+                ('company_email', models.EmailField(max_length=254)),
+                ('company_website', models.URLField(blank=True)),
+                ('company_tax_id', models.CharField(blank=True, max_length=50)),
+                ('default_notes', models.TextField(blank=True)),
+                ('default_terms', models.TextField(blank=True)),
+                ('footer_text', models.TextField(blank=True)),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-is_default', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_type', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('push', 'Push Notification')], default='email', max_length=20)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('scheduled_for', models.DateTimeField()),
+                ('is_sent', models.BooleanField(default=False)),
+                ('is_successful', models.BooleanField(default=False)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='payments.invoice')),
+            ],
+            options={
+                'ordering': ['scheduled_for'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoicePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('payment_method', models.CharField(choices=[('bank_transfer', 'Bank Transfer'), ('credit_card', 'Credit Card'), ('debit_card', 'Debit Card'), ('cash', 'Cash'), ('check', 'Check'), ('wallet', 'Digital Wallet'), ('other', 'Other')], default='bank_transfer', max_length=20)),
+                ('transaction_reference', models.CharField(blank=True, max_length=100)),
+                ('payment_date', models.DateField(default=django.utils.timezone.now)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='payments.invoice')),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_payments', to=settings.AUTH_USER_MODEL)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoice_payments', to='accounts.transaction')),
+            ],
+            options={
+                'ordering': ['-payment_date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_number_sequences', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InvoiceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0'))])),
+                ('total_price', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('sku', models.CharField(blank=True, max_length=100)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=5)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='payments.invoice')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='payments.invoicetemplate'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicenumbersequence',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_invoice_sequence_per_user_day'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='invoice',
+            unique_together={('user', 'invoice_number')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='businessclient',
+            unique_together={('user', 'email')},
+        ),
+    ]
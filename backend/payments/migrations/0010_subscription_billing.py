@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_invoicing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'current_period_end'], name='payments_su_status_3dfdc2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptionpayment',
+            constraint=models.UniqueConstraint(fields=('subscription', 'billing_period_start'), name='unique_subscription_payment_period'),
+        ),
+    ]
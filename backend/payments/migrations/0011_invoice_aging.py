@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:05
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0010_subscription_billing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceAgingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('current_count', models.PositiveIntegerField(default=0)),
+                ('current_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('days_0_30_count', models.PositiveIntegerField(default=0)),
+                ('days_0_30_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('days_31_60_count', models.PositiveIntegerField(default=0)),
+                ('days_31_60_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('days_61_90_count', models.PositiveIntegerField(default=0)),
+                ('days_61_90_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('days_over_90_count', models.PositiveIntegerField(default=0)),
+                ('days_over_90_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('total_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=15)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['currency'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='payments_in_status_68daea_idx'),
+        ),
+        migrations.AddField(
+            model_name='invoiceagingsummary',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_aging_summaries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='invoiceagingsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'currency'), name='unique_invoice_aging_per_user_currency'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0011_invoice_aging'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpayout',
+            name='failed_attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Failed attempts at the current run'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_scheduledpayout_failed_attempts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscriptionpayment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('refunded', 'Refunded')], default='pending', max_length=20),
+        ),
+    ]
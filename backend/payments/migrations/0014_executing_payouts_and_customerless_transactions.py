@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_managers'),
+        ('payments', '0013_subscription_payment_processing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scheduledpayout',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('active', 'Active'), ('paused', 'Paused'), ('completed', 'Completed'), ('processing', 'Processing'), ('executing', 'Executing'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='users.customer'),
+        ),
+    ]
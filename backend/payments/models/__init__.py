@@ -13,6 +13,8 @@ from .analytics import AnalyticsMetric, DashboardSnapshot, MerchantAnalytics, Tr
 from .dispute import Dispute
 from .bills import Bill
 from .webhook import Webhook, WebhookEvent
+from .fraud_features import FraudFeatureProfile
+from .invoices import BusinessClient, InvoiceTemplate, InvoiceNumberSequence, Invoice, InvoiceItem, InvoicePayment, InvoiceReminder, InvoiceAgingSummary
 
 # Import POS models
 from .pos import POSDevice, POSTransaction
@@ -55,4 +57,13 @@ __all__ = [
     'DomesticTransfer',
     'Webhook',
     'WebhookEvent',
+    'FraudFeatureProfile',
+    'BusinessClient',
+    'InvoiceTemplate',
+    'InvoiceNumberSequence',
+    'Invoice',
+    'InvoiceItem',
+    'InvoicePayment',
+    'InvoiceReminder',
+    'InvoiceAgingSummary',
 ]
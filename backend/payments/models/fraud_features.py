@@ -0,0 +1,37 @@
+from django.db import models
+from users.models import Customer
+
+
+class FraudFeatureProfile(models.Model):
+    """
+    Running fraud and behavioral features for one customer.
+
+    Maintained incrementally as transactions are created and completed
+    (see ``payments.services.fraud_feature_store``) and read by the rule
+    engine, the ML scorer and behavioral analysis instead of re-querying
+    transaction history.
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='fraud_feature_profile')
+
+    # Every transaction/payment seen, whatever its outcome
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    # Welford running statistics over completed amounts
+    completed_count = models.PositiveIntegerField(default=0)
+    amount_mean = models.FloatField(default=0.0)
+    amount_m2 = models.FloatField(default=0.0, help_text="Sum of squared deviations from the mean")
+
+    # Completed transactions per hour of day (UTC), 24 buckets
+    hour_histogram = models.JSONField(default=list)
+
+    known_devices = models.JSONField(default=list)
+    known_countries = models.JSONField(default=list)
+    last_ip = models.CharField(max_length=45, blank=True)
+
+    # [key, unix timestamp, completed] for activity in the last 24 hours
+    recent_activity = models.JSONField(default=list)
+    last_transaction_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fraud features for customer {self.customer_id}"
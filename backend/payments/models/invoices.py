@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -119,6 +121,44 @@ class InvoiceTemplate(models.Model):
         super().save(*args, **kwargs)
 
 
+class InvoiceNumberSequence(models.Model):
+    """
+    Per-user daily counter behind invoice numbers
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='invoice_number_sequences')
+    day = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_invoice_sequence_per_user_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, user, count=1, day=None):
+        """
+        Reserve ``count`` consecutive numbers for ``user`` on ``day`` and
+        return the first. The counter row stays locked by the increment
+        until the surrounding transaction ends, so concurrent callers get
+        disjoint ranges.
+        """
+        day = day or timezone.localdate()
+        with transaction.atomic():
+            counters = cls.objects.filter(user=user, day=day)
+            if not counters.update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(user=user, day=day, last_value=count)
+                    return 1
+                except IntegrityError:
+                    # Another caller created today's counter first
+                    counters.update(last_value=F('last_value') + count)
+            return counters.values_list('last_value', flat=True).get() - count + 1
+
+
 class Invoice(models.Model):
     """
     Main invoice model
@@ -139,7 +179,7 @@ class Invoice(models.Model):
     template = models.ForeignKey(InvoiceTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices')
 
     # Invoice details
-    invoice_number = models.CharField(max_length=50, unique=True, blank=True)
+    invoice_number = models.CharField(max_length=50, blank=True)
     reference_number = models.CharField(max_length=50, blank=True)
 
     # Dates
@@ -190,6 +230,9 @@ class Invoice(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'invoice_number']
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+        ]
 
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.client.company_name}"
@@ -199,6 +242,21 @@ class Invoice(models.Model):
         if not self.invoice_number:
             self.invoice_number = self._generate_invoice_number()
 
+        if self._state.adding or kwargs.get('update_fields') is not None:
+            self._save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            # Items change the stored subtotal directly, so this instance may
+            # hold an older one; writing it back would undo those changes
+            stored = Invoice.objects.select_for_update().filter(pk=self.pk).values_list(
+                'subtotal', flat=True
+            ).first()
+            if stored is not None:
+                self.subtotal = stored
+            self._save(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
         # Calculate totals
         self._calculate_totals()
 
@@ -209,32 +267,18 @@ class Invoice(models.Model):
 
     def _generate_invoice_number(self):
         """Generate unique invoice number"""
-        today = timezone.now().date()
-        date_prefix = today.strftime('%Y%m%d')
-
-        # Find the next number for today
-        existing_invoices = Invoice.objects.filter(
-            user=self.user,
-            invoice_number__startswith=date_prefix
-        ).order_by('-invoice_number')
-
-        if existing_invoices.exists():
-            last_number = existing_invoices.first().invoice_number
-            try:
-                next_num = int(last_number.split('-')[-1]) + 1
-            except (ValueError, IndexError):
-                next_num = 1
-        else:
-            next_num = 1
+        today = timezone.localdate()
+        return self.format_invoice_number(today, InvoiceNumberSequence.reserve(self.user, day=today))
 
-        return f"INV-{date_prefix}-{next_num:04d}"
+    @staticmethod
+    def format_invoice_number(day, number):
+        return f"INV-{day.strftime('%Y%m%d')}-{number:04d}"
 
     def _calculate_totals(self):
-        """Calculate invoice totals"""
-        # Calculate subtotal from items
-        items_total = sum(item.total_price for item in self.items.all())
-        self.subtotal = items_total
-
+        """
+        Calculate invoice totals from the subtotal, which ``InvoiceItem``
+        keeps up to date as items are saved and deleted
+        """
         # Calculate tax
         if self.tax_rate > 0:
             self.tax_amount = (self.subtotal * self.tax_rate) / 100
@@ -247,12 +291,31 @@ class Invoice(models.Model):
         # Update amount due
         self.amount_due = self.total_amount - self.amount_paid
 
+    @classmethod
+    def apply_subtotal_change(cls, invoice_id, delta):
+        """
+        Add ``delta`` to an invoice's subtotal and recompute the amounts that
+        derive from it, in one UPDATE against the stored row
+        """
+        if not delta:
+            return
+        subtotal = F('subtotal') + Value(delta)
+        tax_amount = Round(subtotal * F('tax_rate') / Value(Decimal('100')), 2)
+        total_amount = subtotal + tax_amount - F('discount_amount')
+        cls.objects.filter(pk=invoice_id).update(
+            subtotal=subtotal,
+            tax_amount=tax_amount,
+            total_amount=total_amount,
+            amount_due=total_amount - F('amount_paid'),
+            updated_at=timezone.now()
+        )
+
     def _update_status(self):
         """Update invoice status based on payments and dates"""
         if self.status == 'cancelled':
             return
 
-        if self.amount_paid >= self.total_amount:
+        if self.total_amount > 0 and self.amount_paid >= self.total_amount:
             self.status = 'paid'
             if not self.paid_at:
                 self.paid_at = timezone.now()
@@ -293,7 +356,7 @@ class Invoice(models.Model):
             self.sent_at = timezone.now()
             if self.status == 'draft':
                 self.status = 'sent'
-            self.save()
+            self.save(update_fields=['sent_at', 'status', 'updated_at'])
 
     def record_payment(self, amount, payment_method=None, transaction=None, notes=''):
         """Record a payment against this invoice"""
@@ -312,6 +375,23 @@ class Invoice(models.Model):
         return payment
 
 
+class InvoiceItemQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the items and take their totals off their invoices' subtotals"""
+        with transaction.atomic():
+            rows = list(self.select_for_update().values_list('pk', 'invoice_id', 'total_price'))
+            result = InvoiceItem._base_manager.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            removed = {}
+            for _, invoice_id, total_price in rows:
+                removed[invoice_id] = removed.get(invoice_id, Decimal('0')) + total_price
+            for invoice_id, total in removed.items():
+                Invoice.apply_subtotal_change(invoice_id, -total)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class InvoiceItem(models.Model):
     """
     Individual line items on an invoice
@@ -333,16 +413,47 @@ class InvoiceItem(models.Model):
     # Timestamps
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = InvoiceItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['created_at']
 
     def __str__(self):
         return f"{self.description} - {self.invoice.invoice_number}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        item = super().from_db(db, field_names, values)
+        # What the invoice subtotal currently counts for this item
+        item._counted = (item.__dict__.get('invoice_id'), item.__dict__.get('total_price'))
+        return item
+
     def save(self, *args, **kwargs):
         # Calculate total price
         self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            counted_invoice_id, counted_total = getattr(self, '_counted', (None, None))
+            if counted_invoice_id is not None and counted_invoice_id != self.invoice_id:
+                Invoice.apply_subtotal_change(counted_invoice_id, -counted_total)
+                counted_total = None
+            self._update_invoice_subtotal(self.total_price - (counted_total or Decimal('0')))
+        self._counted = (self.invoice_id, self.total_price)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._update_invoice_subtotal(-self.total_price)
+        self._counted = (None, None)
+        return result
+
+    def _update_invoice_subtotal(self, delta):
+        Invoice.apply_subtotal_change(self.invoice_id, delta)
+        # Keep a loaded invoice in step, so saving it does not write back a stale subtotal
+        invoice = self._state.fields_cache.get('invoice')
+        if invoice is not None and delta:
+            invoice.subtotal += delta
+            invoice._calculate_totals()
 
 
 class InvoicePayment(models.Model):
@@ -426,3 +537,44 @@ class InvoiceReminder(models.Model):
 
     def __str__(self):
         return f"Reminder for {self.invoice.invoice_number} ({self.reminder_type})"
+
+
+class InvoiceAgingSummary(models.Model):
+    """
+    Outstanding invoice amounts per user and currency, by days overdue.
+    Rebuilt by the invoice aging sweep; ``computed_at`` says how fresh it is.
+    """
+    BUCKETS = ['current', 'days_0_30', 'days_31_60', 'days_61_90', 'days_over_90']
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='invoice_aging_summaries')
+    currency = models.CharField(max_length=3)
+
+    # Not yet due
+    current_count = models.PositiveIntegerField(default=0)
+    current_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+
+    # Overdue by up to 30, 31-60, 61-90 and more than 90 days
+    days_0_30_count = models.PositiveIntegerField(default=0)
+    days_0_30_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+    days_31_60_count = models.PositiveIntegerField(default=0)
+    days_31_60_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+    days_61_90_count = models.PositiveIntegerField(default=0)
+    days_61_90_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+    days_over_90_count = models.PositiveIntegerField(default=0)
+    days_over_90_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+
+    total_outstanding = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0'))
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['currency']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'currency'], name='unique_invoice_aging_per_user_currency'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.currency}: {self.total_outstanding} outstanding"
+
+    @property
+    def overdue_amount(self):
+        return self.total_outstanding - self.current_amount
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import croniter
 import datetime
 
@@ -7,25 +8,50 @@ class ScheduledPayout(models.Model):
     ACTIVE = 'active'
     PAUSED = 'paused'
     COMPLETED = 'completed'
+    PROCESSING = 'processing'
+    EXECUTING = 'executing'
+    FAILED = 'failed'
 
     STATUS_CHOICES = [
         (PENDING, 'Pending'),
         (ACTIVE, 'Active'),
         (PAUSED, 'Paused'),
         (COMPLETED, 'Completed'),
+        (PROCESSING, 'Processing'),
+        (EXECUTING, 'Executing'),
+        (FAILED, 'Failed'),
     ]
 
+    # Statuses a due payout is dispatched from
+    DISPATCHABLE_STATUSES = [PENDING, ACTIVE]
+
+    # Claimed runs not yet settled. An EXECUTING run is already with the
+    # gateway, so it is never dispatched again automatically.
+    IN_FLIGHT_STATUSES = [PROCESSING, EXECUTING]
+
+    # A failed run is retried until this many attempts in a row have failed.
+    # After that the payout stays FAILED until someone reactivates it.
+    MAX_ATTEMPTS = 3
+
     merchant = models.ForeignKey('users.Merchant', on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     schedule = models.CharField(max_length=100)  # cron expression
     next_execution = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a dispatcher claimed the due run")
+    last_executed_at = models.DateTimeField(null=True, blank=True)
+    failed_attempts = models.PositiveSmallIntegerField(default=0, help_text="Failed attempts at the current run")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def calculate_next_execution(self):
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_execution']),
+        ]
+
+    def calculate_next_execution(self, base=None):
         """Calculate next execution time based on cron schedule"""
-        base = datetime.datetime.now()
+        base = base or timezone.now()
         iter = croniter.croniter(self.schedule, base)
         self.next_execution = iter.get_next(datetime.datetime)
 
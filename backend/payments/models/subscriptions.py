@@ -165,6 +165,13 @@ class Subscription(models.Model):
         ('pending', 'Pending Activation'),
     ]
 
+    # Length of one billing period per plan billing cycle
+    BILLING_CYCLE_DAYS = {
+        'monthly': 30,
+        'quarterly': 90,
+        'yearly': 365,
+    }
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriptions')
     plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE)
 
@@ -195,6 +202,9 @@ class Subscription(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'plan']  # One subscription per plan per user
+        indexes = [
+            models.Index(fields=['status', 'current_period_end']),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s {self.plan.name} subscription"
@@ -234,12 +244,9 @@ class Subscription(models.Model):
 
     def set_next_billing_date(self):
         """Set the next billing date based on plan cycle"""
-        if self.plan.billing_cycle == 'monthly':
-            self.current_period_end = self.current_period_start + timedelta(days=30)
-        elif self.plan.billing_cycle == 'quarterly':
-            self.current_period_end = self.current_period_start + timedelta(days=90)
-        elif self.plan.billing_cycle == 'yearly':
-            self.current_period_end = self.current_period_start + timedelta(days=365)
+        days = self.BILLING_CYCLE_DAYS.get(self.plan.billing_cycle)
+        if days:
+            self.current_period_end = self.current_period_start + timedelta(days=days)
 
     def activate(self):
         """Activate the subscription"""
@@ -304,6 +311,7 @@ class SubscriptionPayment(models.Model):
     """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('refunded', 'Refunded'),
@@ -338,6 +346,12 @@ class SubscriptionPayment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One charge per subscription per billing period
+            models.UniqueConstraint(
+                fields=['subscription', 'billing_period_start'], name='unique_subscription_payment_period'
+            ),
+        ]
 
     def __str__(self):
         return f"Payment for {self.subscription} - {self.amount} {self.currency}"
@@ -405,6 +419,16 @@ class SubscriptionUsage(models.Model):
     def __str__(self):
         return f"{self.subscription.user.username} - {self.feature.name}: {self.current_usage}/{self.limit or '∞'}"
 
+    @property
+    def live_usage(self):
+        """Usage including metered increments not yet flushed to ``current_usage``"""
+        if self.pk is None:
+            return self.current_usage
+        if not hasattr(self, '_live_usage'):
+            from ..services.usage_metering_service import UsageMeter
+            self._live_usage = UsageMeter.current(self)
+        return self._live_usage
+
     @property
     def usage_percentage(self):
         """Calculate usage percentage"""
@@ -412,17 +436,21 @@ class SubscriptionUsage(models.Model):
             return 0  # Unlimited
         if self.limit == 0:
             return 100
-        return min((self.current_usage / self.limit) * 100, 100)
+        return min((self.live_usage / self.limit) * 100, 100)
 
     @property
     def is_over_limit(self):
         """Check if usage exceeds limit"""
-        return self.limit and self.current_usage >= self.limit
+        return self.limit and self.live_usage >= self.limit
 
     def increment_usage(self, amount=1):
-        """Increment usage counter"""
-        self.current_usage += amount
-        self.save()
+        """
+        Increment usage counter. The increment is counted in the cache and
+        written to ``current_usage`` by the next usage flush.
+        """
+        from ..services.usage_metering_service import UsageMeter
+
+        self._live_usage = UsageMeter.increment(self, amount)
 
         # Check if over limit and trigger alerts
         if self.is_over_limit:
@@ -430,8 +458,10 @@ class SubscriptionUsage(models.Model):
 
     def reset_usage(self):
         """Reset usage counter for new period"""
-        self.current_usage = 0
-        self.save()
+        from ..services.usage_metering_service import UsageMeter
+
+        UsageMeter.reset(self)
+        self.current_usage = self._live_usage = 0
 
     def _trigger_over_limit_alert(self):
         """Trigger alert when usage exceeds limit"""
@@ -1,11 +1,13 @@
 from django.template.loader import render_to_string
 from django.http import HttpResponse
-from django.db.models import Sum
+from django.db.models import Sum, Case, When, Value, F, CharField
+from django.db.models.functions import TruncDate
 from .models.payment import Payment
+from core.exports import StreamingExport
 from datetime import datetime, timedelta
 import csv
-import xlsxwriter
 import io
+import tempfile
 
 class PaymentReporter:
     """
@@ -13,7 +15,8 @@ class PaymentReporter:
     """
     
     def __init__(self, queryset=None):
-        self.queryset = queryset or Payment.objects.all()
+        # Compare against None: truthiness would evaluate the whole queryset
+        self.queryset = queryset if queryset is not None else Payment.objects.all()
     
     def generate_html_report(self, template='payments/report_template.html', context=None):
         """Generate HTML report using Django template"""
@@ -42,26 +45,29 @@ class PaymentReporter:
         buffer.seek(0)
         return buffer
     
+    def get_export(self):
+        """Streaming export of the report rows, resolved in SQL rather than per row"""
+        status_display = Case(
+            *[When(status=value, then=Value(label)) for value, label in Payment.STATUS_CHOICES],
+            default=F('status'),
+            output_field=CharField()
+        )
+        queryset = self.queryset.annotate(
+            report_date=TruncDate('created_at'),
+            status_display=status_display
+        ).order_by('id')
+        return StreamingExport(queryset, [
+            ('ID', 'id'),
+            ('Date', 'report_date'),
+            ('Customer', 'customer__user__email'),
+            ('Amount', 'amount'),
+            ('Status', 'status_display'),
+        ])
+    
     def generate_excel_report(self):
-        """Generate Excel report"""
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet()
-        
-        # Excel formatting
-        header_format = workbook.add_format({'bold': True, 'bg_color': '#D7E4BC'})
-        
-        # Write data
-        worksheet.write_row(0, 0, ["ID", "Date", "Customer", "Amount", "Status"], header_format)
-        
-        for row, payment in enumerate(self.queryset, start=1):
-            worksheet.write(row, 0, payment.id)
-            worksheet.write(row, 1, payment.created_at.strftime('%Y-%m-%d'))
-            worksheet.write(row, 2, str(payment.customer))
-            worksheet.write(row, 3, float(payment.amount))
-            worksheet.write(row, 4, payment.get_status_display())
-        
-        workbook.close()
+        """Generate Excel report into a temporary file"""
+        output = tempfile.TemporaryFile()
+        self.get_export().write_xlsx(output)
         output.seek(0)
         return output
     
@@ -101,9 +107,8 @@ def custom_report_view(request):
         response.write(reporter.generate_pdf_report().read())
         return response
     elif format == 'excel':
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="payment_report.xlsx"'
-        response.write(reporter.generate_excel_report().read())
-        return response
+        return reporter.get_export().xlsx_response('payment_report.xlsx')
+    elif format == 'csv':
+        return reporter.get_export().csv_response('payment_report.csv')
     else:
         return HttpResponse(reporter.generate_html_report())
@@ -66,6 +66,7 @@ class SubscriptionPaymentSerializer(serializers.ModelSerializer):
 class SubscriptionUsageSerializer(serializers.ModelSerializer):
     """Serializer for subscription usage"""
     feature = SubscriptionFeatureSerializer(read_only=True)
+    current_usage = serializers.IntegerField(source='live_usage', read_only=True)
     usage_percentage = serializers.ReadOnlyField()
     is_over_limit = serializers.ReadOnlyField()
 
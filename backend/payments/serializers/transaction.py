@@ -44,14 +44,24 @@ class AdminTransactionSerializer(TransactionSerializer):
             'dispute_id', 'dispute_status', 'dispute_reason', 'dispute_created_at'
         ]
 
+    @staticmethod
+    def _get_dispute(obj):
+        # The admin list selects the reverse one-to-one, so a missing dispute
+        # is already cached and this lookup never hits the database.
+        return getattr(obj, 'dispute', None)
+
     def get_dispute_id(self, obj):
-        return obj.dispute.id if hasattr(obj, 'dispute') else None
+        dispute = self._get_dispute(obj)
+        return dispute.id if dispute else None
 
     def get_dispute_status(self, obj):
-        return obj.dispute.status if hasattr(obj, 'dispute') else None
+        dispute = self._get_dispute(obj)
+        return dispute.status if dispute else None
 
     def get_dispute_reason(self, obj):
-        return obj.dispute.reason if hasattr(obj, 'dispute') else None
+        dispute = self._get_dispute(obj)
+        return dispute.reason if dispute else None
 
     def get_dispute_created_at(self, obj):
-        return obj.dispute.created_at if hasattr(obj, 'dispute') else None
+        dispute = self._get_dispute(obj)
+        return dispute.created_at if dispute else None
@@ -12,6 +12,10 @@ import json
 import hashlib
 from decimal import Decimal
 
+from .sanctions_screening_service import (
+    MATCH_THRESHOLD, get_loaded_index, load_index, name_similarity, sanctions_list_version
+)
+
 logger = logging.getLogger(__name__)
 
 class PEPSanctionsService:
@@ -49,13 +53,30 @@ class PEPSanctionsService:
     }
 
     CACHE_KEY_SANCTIONS = 'compliance_sanctions_data'
+    CACHE_KEY_SANCTIONS_VERSION = 'compliance_sanctions_version'
     CACHE_KEY_PEP = 'compliance_pep_data'
     CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
 
     def __init__(self):
-        self.sanctions_data = self._load_sanctions_data()
+        self.sanctions_index = self._get_sanctions_index()
+        self.sanctions_data = self.sanctions_index.sanctions_data
         self.pep_cache = {}
 
+    def _get_sanctions_index(self):
+        """
+        Return the screening index for the current list version.
+
+        The index is built once per process per list version; later instances
+        only read the version stamp from the cache instead of the whole list.
+        """
+        index = get_loaded_index(cache.get(self.CACHE_KEY_SANCTIONS_VERSION))
+        if index is not None:
+            return index
+
+        sanctions_data = self._load_sanctions_data()
+        version = cache.get(self.CACHE_KEY_SANCTIONS_VERSION) or sanctions_list_version(sanctions_data)
+        return load_index(sanctions_data, version)
+
     def screen_individual(self, individual_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Comprehensive screening of an individual
@@ -162,6 +183,8 @@ class PEPSanctionsService:
             # Try to load from cache first
             cached_data = cache.get(self.CACHE_KEY_SANCTIONS)
             if cached_data:
+                if cache.get(self.CACHE_KEY_SANCTIONS_VERSION) is None:
+                    cache.set(self.CACHE_KEY_SANCTIONS_VERSION, sanctions_list_version(cached_data), self.CACHE_TIMEOUT)
                 return cached_data
 
             # Load from external sources
@@ -179,7 +202,10 @@ class PEPSanctionsService:
 
             # Cache the data
             if sanctions_data:
-                cache.set(self.CACHE_KEY_SANCTIONS, sanctions_data, self.CACHE_TIMEOUT)
+                cache.set_many({
+                    self.CACHE_KEY_SANCTIONS: sanctions_data,
+                    self.CACHE_KEY_SANCTIONS_VERSION: sanctions_list_version(sanctions_data),
+                }, self.CACHE_TIMEOUT)
 
             return sanctions_data
 
@@ -239,51 +265,31 @@ class PEPSanctionsService:
         """
         Screen individual against sanctions lists
         """
-        matches = []
-        search_names = [name.lower()] + [alias.lower() for alias in aliases]
-
-        for source, sanctions_list in self.sanctions_data.items():
-            for entry in sanctions_list:
-                entry_name = entry.get('name', '').lower()
-
-                # Check for name matches
-                for search_name in search_names:
-                    if self._calculate_name_similarity(search_name, entry_name) > 0.8:
-                        matches.append({
-                            'source': source,
-                            'matched_name': entry['name'],
-                            'sanctions_type': entry.get('sanctions_type', 'unknown'),
-                            'match_confidence': self._calculate_name_similarity(search_name, entry_name),
-                            'entity_type': entry.get('type', 'unknown')
-                        })
-                        break
-
-        return matches
+        return [
+            {
+                'source': match['source'],
+                'matched_name': match['entry']['name'],
+                'sanctions_type': match['entry'].get('sanctions_type', 'unknown'),
+                'match_confidence': match['score'],
+                'entity_type': match['entry'].get('type', 'unknown')
+            }
+            for match in self.sanctions_index.screen([name] + list(aliases), MATCH_THRESHOLD)
+        ]
 
     def _screen_entity_sanctions(self, entity_name: str, aliases: List[str], country: str = None) -> List[Dict[str, Any]]:
         """
         Screen entity against sanctions lists
         """
-        matches = []
-        search_names = [entity_name.lower()] + [alias.lower() for alias in aliases]
-
-        for source, sanctions_list in self.sanctions_data.items():
-            for entry in sanctions_list:
-                if entry.get('type') == 'entity':
-                    entry_name = entry.get('name', '').lower()
-
-                    for search_name in search_names:
-                        if self._calculate_name_similarity(search_name, entry_name) > 0.8:
-                            matches.append({
-                                'source': source,
-                                'matched_name': entry['name'],
-                                'sanctions_type': entry.get('sanctions_type', 'unknown'),
-                                'match_confidence': self._calculate_name_similarity(search_name, entry_name),
-                                'country': country
-                            })
-                            break
-
-        return matches
+        return [
+            {
+                'source': match['source'],
+                'matched_name': match['entry']['name'],
+                'sanctions_type': match['entry'].get('sanctions_type', 'unknown'),
+                'match_confidence': match['score'],
+                'country': country
+            }
+            for match in self.sanctions_index.screen([entity_name] + list(aliases), MATCH_THRESHOLD, entry_type='entity')
+        ]
 
     def _screen_pep_database(self, name: str, aliases: List[str], dob: str = None, nationality: str = None) -> List[Dict[str, Any]]:
         """
@@ -353,20 +359,9 @@ class PEPSanctionsService:
 
     def _calculate_name_similarity(self, name1: str, name2: str) -> float:
         """
-        Calculate similarity between two names (simplified)
+        Calculate similarity between two names
         """
-        # This is a very basic implementation
-        # In production, would use more sophisticated algorithms like Levenshtein distance
-        name1_words = set(name1.lower().split())
-        name2_words = set(name2.lower().split())
-
-        if not name1_words or not name2_words:
-            return 0.0
-
-        intersection = name1_words.intersection(name2_words)
-        union = name1_words.union(name2_words)
-
-        return len(intersection) / len(union) if union else 0.0
+        return name_similarity(name1, name2)
 
     def _calculate_overall_risk(self, sanctions_matches: List[Dict], pep_matches: List[Dict]) -> str:
         """
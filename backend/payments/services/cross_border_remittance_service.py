@@ -11,6 +11,7 @@ from decimal import Decimal
 import logging
 import uuid
 from typing import Dict, Any, Optional
+from core.metrics import record_payment
 
 logger = logging.getLogger(__name__)
 
@@ -268,10 +269,12 @@ class CrossBorderRemittanceService:
                 customer, payment_method, amount, source_currency, remittance
             )
             
+            corridor = f'{sender_country}-{recipient_country}'
             if not payment_result['success']:
                 remittance.status = RemittanceStatus.FAILED
                 remittance.exemption_notes = payment_result.get('error')
                 remittance.save()
+                record_payment(remittance.status, remittance.payment_method, corridor)
                 return {
                     'success': False,
                     'error': payment_result.get('error', 'Payment failed'),
@@ -295,6 +298,7 @@ class CrossBorderRemittanceService:
                 logger.warning(f"Delivery initiation failed but continuing: {delivery_result.get('error')}")
             
             remittance.save()
+            record_payment(remittance.status, remittance.payment_method, corridor)
             
             # Send notifications
             self._send_remittance_notifications(remittance, 'initiated')
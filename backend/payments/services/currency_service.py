@@ -11,6 +11,8 @@ from typing import Optional, Dict, List, Tuple, Any
 from datetime import timedelta, datetime
 import time
 import statistics
+from time import perf_counter
+from core.metrics import FX_LOOKUP_LATENCY
 
 logger = logging.getLogger(__name__)
 
@@ -171,26 +173,35 @@ class CurrencyService:
         if from_currency == to_currency:
             return Decimal('1.0')
 
+        started = perf_counter()
+        rate, source = CurrencyService._lookup_exchange_rate(from_currency, to_currency, use_cache)
+        FX_LOOKUP_LATENCY.labels(source=source).observe(perf_counter() - started)
+        return rate
+
+    @staticmethod
+    def _lookup_exchange_rate(from_currency: Currency, to_currency: Currency,
+                              use_cache: bool) -> Tuple[Optional[Decimal], str]:
+        """Return the rate and where it was found: cache, database, inverse or missing"""
         # Try cache first
         if use_cache:
             cached_rates = cache.get(CurrencyService.CACHE_KEY_RATES)
             if cached_rates and from_currency.is_base_currency:
                 rate = cached_rates.get(to_currency.code)
                 if rate:
-                    return Decimal(str(rate))
+                    return Decimal(str(rate)), 'cache'
 
         # Try database - admin-set rates
         rate_obj = ExchangeRate.get_latest_rate(from_currency, to_currency)
         if rate_obj:
-            return rate_obj.rate
+            return rate_obj.rate, 'database'
         
         # Try inverse rate
         inverse_rate = ExchangeRate.get_latest_rate(to_currency, from_currency)
         if inverse_rate and inverse_rate.rate > 0:
-            return Decimal('1') / inverse_rate.rate
+            return Decimal('1') / inverse_rate.rate, 'inverse'
 
         # No rate found - return None (caller should handle)
-        return None
+        return None, 'missing'
 
     @staticmethod
     def convert_amount(amount: Decimal, from_currency: Currency, to_currency: Currency) -> Optional[Decimal]:
@@ -302,8 +313,8 @@ class WalletService:
         Send notification for balance changes with improved error handling
         """
         try:
-            from accounts.models import Notification
-            from accounts.api.notifications import NotificationService
+            from notifications.models import Notification
+            from notifications.services import NotificationService
             
             # Get current balance
             balance = WalletService.get_wallet_balance(user, currency)
@@ -318,7 +329,7 @@ class WalletService:
                 title=title,
                 message=message,
                 level='payment',
-                notification_type='WALLET_BALANCE',  # Updated to match model
+                notification_type=Notification.WALLET_CREDIT if transaction_type == 'credit' else Notification.WALLET_DEBIT,
                 metadata={
                     'currency': currency.code,
                     'amount': float(amount),
@@ -333,12 +344,15 @@ class WalletService:
             logger.error(f"Failed to send balance notification: {str(e)}", exc_info=True)
             # Attempt one retry
             try:
+                from notifications.models import Notification
+                from notifications.services import NotificationService
+
                 NotificationService.create_notification(
                     user=user,
                     title="Wallet Update",
                     message=f"Your {currency.code} wallet balance has changed",
                     level='payment',
-                    notification_type='WALLET_BALANCE'
+                    notification_type=Notification.WALLET_CREDIT if transaction_type == 'credit' else Notification.WALLET_DEBIT
                 )
             except Exception as retry_ex:
                 logger.error(f"Retry also failed for balance notification: {str(retry_ex)}")
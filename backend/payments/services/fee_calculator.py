@@ -1,8 +1,12 @@
+import json
 import logging
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
 from django.utils import timezone
 from django.db.models import Q
 from typing import Optional, Dict, Any
+from core.metrics import FEE_CALCULATION_LATENCY
 from ..models import FeeConfiguration, FeeCalculationLog
 
 logger = logging.getLogger(__name__)
@@ -51,53 +55,54 @@ class DynamicFeeCalculator:
             Dict with fee calculation result
         """
 
-        try:
-            # Find applicable fee configurations
-            fee_config = DynamicFeeCalculator._find_applicable_fee_config(
-                fee_type, merchant, corridor_from, corridor_to, currency
-            )
+        with FEE_CALCULATION_LATENCY.labels(fee_type=fee_type).time():
+            try:
+                # Find applicable fee configurations
+                fee_config = DynamicFeeCalculator._find_applicable_fee_config(
+                    fee_type, merchant, corridor_from, corridor_to, currency
+                )
 
-            if not fee_config:
-                # Fallback to legacy hardcoded fees for backward compatibility
-                logger.warning(f"No fee configuration found for {fee_type}, using legacy calculation")
-                return DynamicFeeCalculator._legacy_fee_calculation(fee_type, amount, corridor_from, corridor_to)
+                if not fee_config:
+                    # Fallback to legacy hardcoded fees for backward compatibility
+                    logger.warning(f"No fee configuration found for {fee_type}, using legacy calculation")
+                    return DynamicFeeCalculator._legacy_fee_calculation(fee_type, amount, corridor_from, corridor_to)
+
+                # Calculate the fee
+                result = fee_config.calculate_fee(amount, currency)
+
+                if not result.success:
+                    logger.error(f"Fee calculation failed: {result.error}")
+                    return {
+                        'success': False,
+                        'error': result.error,
+                        'total_fee': 0,
+                        'fee_config_id': fee_config.id,
+                    }
+
+                # Log the calculation if requested
+                if log_calculation and transaction_id:
+                    DynamicFeeCalculator._log_calculation(
+                        fee_type, transaction_id, amount, fee_config, result, merchant, user, corridor_from, corridor_to, currency
+                    )
 
-            # Calculate the fee
-            result = fee_config.calculate_fee(amount, currency)
+                return {
+                    'success': True,
+                    'total_fee': result.fee_amount,
+                    'fee_config_id': fee_config.id,
+                    'fee_config_name': fee_config.name,
+                    'calculation_method': fee_config.calculation_method,
+                    'breakdown': result.breakdown,
+                    'merchant_specific': fee_config.merchant is not None,
+                }
 
-            if not result.success:
-                logger.error(f"Fee calculation failed: {result.error}")
+            except Exception as e:
+                logger.error(f"Fee calculation error for {fee_type}: {str(e)}")
                 return {
                     'success': False,
-                    'error': result.error,
+                    'error': f"Calculation error: {str(e)}",
                     'total_fee': 0,
-                    'fee_config_id': fee_config.id,
                 }
 
-            # Log the calculation if requested
-            if log_calculation and transaction_id:
-                DynamicFeeCalculator._log_calculation(
-                    fee_type, transaction_id, amount, fee_config, result, merchant, user, corridor_from, corridor_to, currency
-                )
-
-            return {
-                'success': True,
-                'total_fee': result.fee_amount,
-                'fee_config_id': fee_config.id,
-                'fee_config_name': fee_config.name,
-                'calculation_method': fee_config.calculation_method,
-                'breakdown': result.breakdown,
-                'merchant_specific': fee_config.merchant is not None,
-            }
-
-        except Exception as e:
-            logger.error(f"Fee calculation error for {fee_type}: {str(e)}")
-            return {
-                'success': False,
-                'error': f"Calculation error: {str(e)}",
-                'total_fee': 0,
-            }
-
     @staticmethod
     def _find_applicable_fee_config(fee_type, merchant, corridor_from, corridor_to, currency):
         """
@@ -212,19 +217,21 @@ class DynamicFeeCalculator:
         Log the fee calculation for audit purposes
         """
         try:
-            FeeCalculationLog.objects.create(
-                transaction_type=fee_type,
-                transaction_id=str(transaction_id),
-                amount=amount,
-                fee_configuration=fee_config,
-                calculated_fee=result.fee_amount,
-                breakdown=result.breakdown,
-                merchant=merchant,
-                user=user,
-                corridor_from=corridor_from,
-                corridor_to=corridor_to,
-                currency=currency,
-            )
+            # Savepoint so a failed audit row cannot break the caller's transaction
+            with db_transaction.atomic():
+                FeeCalculationLog.objects.create(
+                    transaction_type=fee_type,
+                    transaction_id=str(transaction_id),
+                    amount=amount,
+                    fee_configuration=fee_config,
+                    calculated_fee=result.fee_amount,
+                    breakdown=json.loads(json.dumps(result.breakdown, cls=DjangoJSONEncoder)),
+                    merchant=merchant,
+                    user=user,
+                    corridor_from=corridor_from,
+                    corridor_to=corridor_to,
+                    currency=currency,
+                )
         except Exception as e:
             logger.error(f"Failed to log fee calculation: {str(e)}")
 
@@ -12,7 +12,7 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import timedelta, datetime
 import numpy as np
 import pandas as pd
-from collections import defaultdict, Counter
+from collections import defaultdict
 import statistics
 import math
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
@@ -21,6 +21,10 @@ from sklearn.model_selection import train_test_split
 import joblib
 import os
 import json
+import shutil
+import threading
+import time
+from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +37,12 @@ class MLFraudDetectionService:
     MODEL_PATH = 'ml_models/fraud_detection'
     FEATURES_PATH = 'ml_models/features'
 
+    # Columns the model is trained on, in order
+    DEFAULT_FEATURE_COLUMNS = [
+        'amount', 'frequency_score', 'geographic_score',
+        'time_score', 'device_score', 'behavioral_score'
+    ]
+
     # Fraud detection thresholds
     HIGH_RISK_SCORE = 0.8
     MEDIUM_RISK_SCORE = 0.6
@@ -48,29 +58,26 @@ class MLFraudDetectionService:
         'behavioral_anomaly': 0.15
     }
 
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.feature_columns = []
-        self._load_or_train_model()
+    # Transaction.metadata key holding analyst fraud labels
+    FRAUD_LABEL_KEY = 'fraud_label'
 
-    def _load_or_train_model(self):
-        """
-        Load existing model or train new one
-        """
-        try:
-            model_path = os.path.join(settings.MEDIA_ROOT, self.MODEL_PATH + '.pkl')
-            if os.path.exists(model_path):
-                self.model = joblib.load(model_path)
-                logger.info("Loaded existing fraud detection model")
-            else:
-                self._train_initial_model()
-        except Exception as e:
-            logger.error(f"Failed to load/train fraud detection model: {str(e)}")
-            # Fallback to rule-based detection
-            self.model = None
+    # Completed transactions needed before amount and behavior features count
+    MIN_AMOUNT_HISTORY = 5
+
+    def __init__(self, registry: 'FraudModelRegistry' = None):
+        # The model itself lives in a process-wide registry, so creating a
+        # service per request costs nothing
+        self.registry = registry or fraud_model_registry
+
+    @property
+    def model(self):
+        return self.registry.get().model
 
-    def _train_initial_model(self):
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.registry.get().feature_columns
+
+    def _train_initial_model(self) -> Optional['FraudModel']:
         """
         Train initial fraud detection model with synthetic/historical data
         """
@@ -78,75 +85,56 @@ class MLFraudDetectionService:
             # Generate synthetic training data
             training_data = self._generate_synthetic_training_data()
 
-            if training_data:
+            if training_data is not None:
                 X = training_data.drop('is_fraud', axis=1)
                 y = training_data['is_fraud']
 
                 # Train model
-                self.model = RandomForestClassifier(
+                model = RandomForestClassifier(
                     n_estimators=100,
                     max_depth=10,
                     random_state=42,
                     class_weight='balanced'
                 )
 
-                self.model.fit(X, y)
-                self.feature_columns = list(X.columns)
-
-                # Save model
-                os.makedirs(os.path.dirname(os.path.join(settings.MEDIA_ROOT, self.MODEL_PATH)), exist_ok=True)
-                joblib.dump(self.model, os.path.join(settings.MEDIA_ROOT, self.MODEL_PATH + '.pkl'))
+                model.fit(X, y)
+                bundle = self.registry.publish(model, list(X.columns), version='initial')
 
                 logger.info("Trained and saved initial fraud detection model")
+                return bundle
 
         except Exception as e:
             logger.error(f"Failed to train fraud detection model: {str(e)}")
+        return None
 
-    def _generate_synthetic_training_data(self) -> Optional[pd.DataFrame]:
+    def _generate_synthetic_training_data(self, n_samples: int = 10000,
+                                          seed: int = 42) -> Optional[pd.DataFrame]:
         """
         Generate synthetic training data for fraud detection
+
+        Every column is drawn for all rows at once, with the fraud and normal
+        distributions selected per row by the label.
         """
         try:
             # This would be replaced with real historical data in production
-            np.random.seed(42)
-
-            n_samples = 10000
+            rng = np.random.RandomState(seed)
             fraud_ratio = 0.05  # 5% fraud rate
-
-            data = []
-
-            for i in range(n_samples):
-                is_fraud = np.random.random() < fraud_ratio
-
-                # Generate features based on fraud patterns
-                if is_fraud:
-                    # Fraudulent transaction patterns
-                    amount = np.random.exponential(500) + 100  # Higher amounts
-                    frequency_score = np.random.beta(2, 5) * 10  # Higher frequency
-                    geographic_score = np.random.beta(2, 2)  # Unusual locations
-                    time_score = np.random.beta(2, 3)  # Unusual times
-                    device_score = np.random.beta(2, 2)  # New devices
-                    behavioral_score = np.random.beta(2, 2)  # Unusual behavior
-                else:
-                    # Normal transaction patterns
-                    amount = np.random.exponential(100) + 10  # Normal amounts
-                    frequency_score = np.random.beta(5, 2) * 10  # Normal frequency
-                    geographic_score = np.random.beta(5, 1)  # Normal locations
-                    time_score = np.random.beta(3, 2)  # Normal times
-                    device_score = np.random.beta(3, 1)  # Known devices
-                    behavioral_score = np.random.beta(3, 1)  # Normal behavior
-
-                data.append({
-                    'amount': amount,
-                    'frequency_score': frequency_score,
-                    'geographic_score': geographic_score,
-                    'time_score': time_score,
-                    'device_score': device_score,
-                    'behavioral_score': behavioral_score,
-                    'is_fraud': int(is_fraud)
-                })
-
-            return pd.DataFrame(data)
+            is_fraud = rng.random_sample(n_samples) < fraud_ratio
+
+            def draw(fraud_values, normal_values):
+                return np.where(is_fraud, fraud_values, normal_values)
+
+            return pd.DataFrame({
+                # Fraud: higher amounts, higher frequency, unusual locations,
+                # times, devices and behavior
+                'amount': draw(rng.exponential(500, n_samples) + 100, rng.exponential(100, n_samples) + 10),
+                'frequency_score': draw(rng.beta(2, 5, n_samples), rng.beta(5, 2, n_samples)) * 10,
+                'geographic_score': draw(rng.beta(2, 2, n_samples), rng.beta(5, 1, n_samples)),
+                'time_score': draw(rng.beta(2, 3, n_samples), rng.beta(3, 2, n_samples)),
+                'device_score': draw(rng.beta(2, 2, n_samples), rng.beta(3, 1, n_samples)),
+                'behavioral_score': draw(rng.beta(2, 2, n_samples), rng.beta(3, 1, n_samples)),
+                'is_fraud': is_fraud.astype(int),
+            })
 
         except Exception as e:
             logger.error(f"Failed to generate training data: {str(e)}")
@@ -157,210 +145,174 @@ class MLFraudDetectionService:
         Analyze a transaction for fraud using ML and rule-based detection
         """
         try:
-            # Extract features from transaction
-            features = self._extract_transaction_features(transaction)
-
-            # Calculate fraud score
-            fraud_score = self._calculate_fraud_score(features)
-
-            # ML prediction if model is available
-            ml_prediction = None
-            ml_confidence = None
-
-            if self.model and features:
-                try:
-                    feature_vector = np.array([[
-                        features.get(col, 0) for col in self.feature_columns
-                    ]])
-                    ml_prediction = self.model.predict_proba(feature_vector)[0][1]
-                    ml_confidence = max(ml_prediction, 1 - ml_prediction)
-                except Exception as e:
-                    logger.warning(f"ML prediction failed: {str(e)}")
+            return self.score_batch([transaction])[0]
+
+        except Exception as e:
+            logger.error(f"Fraud analysis failed for transaction {transaction.id}: {str(e)}")
+            return {
+                'transaction_id': transaction.id,
+                'error': str(e),
+                'risk_level': 'unknown',
+                'requires_review': True
+            }
+
+    def score_batch(self, transactions, point_in_time: bool = False) -> List[Dict[str, Any]]:
+        """
+        Analyze many transactions at once.
+
+        Features for the whole batch come from the fraud feature store in one
+        fetch and the model scores every row in a single ``predict_proba``
+        call, so this is the entry point for queue-based scoring. Backfills
+        pass ``point_in_time=True`` to compare each transaction with history
+        as it was when the transaction was made. Results are in input order
+        and have the same shape as ``analyze_transaction``.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return []
+
+        # Take one snapshot so a concurrent model swap cannot mix versions
+        bundle = self.registry.get()
+        as_of = [transaction.created_at for transaction in transactions] if point_in_time else None
+        features = self._extract_batch_features(transactions, as_of=as_of)
+
+        fraud_scores = np.zeros(len(transactions))
+        for feature, weight in self.FEATURE_WEIGHTS.items():
+            if feature in features:
+                fraud_scores += features[feature] * weight
+        fraud_scores = np.minimum(fraud_scores, 1.0)
+
+        ml_predictions = None
+        if bundle.model is not None:
+            try:
+                feature_frame = pd.DataFrame({
+                    column: features.get(column, np.zeros(len(transactions)))
+                    for column in bundle.feature_columns
+                })
+                ml_predictions = bundle.model.predict_proba(feature_frame)[:, 1]
+            except Exception as e:
+                logger.warning(f"ML prediction failed: {str(e)}")
+
+        timestamp = timezone.now().isoformat()
+        results = []
+        for index, transaction in enumerate(transactions):
+            row = {name: values[index].item() for name, values in features.items()}
+            fraud_score = float(fraud_scores[index])
+            ml_prediction = float(ml_predictions[index]) if ml_predictions is not None else None
+            ml_confidence = max(ml_prediction, 1 - ml_prediction) if ml_prediction is not None else None
 
             # Determine risk level
             risk_level = self._determine_risk_level(fraud_score, ml_prediction)
 
-            # Generate recommendations
-            recommendations = self._generate_recommendations(fraud_score, risk_level, features)
-
-            result = {
+            results.append({
                 'transaction_id': transaction.id,
                 'fraud_score': fraud_score,
                 'risk_level': risk_level,
                 'ml_prediction': ml_prediction,
                 'ml_confidence': ml_confidence,
-                'features_analyzed': features,
-                'recommendations': recommendations,
+                'model_version': bundle.version,
+                'features_analyzed': row,
+                'recommendations': self._generate_recommendations(fraud_score, risk_level, row),
                 'requires_review': risk_level in ['high', 'critical'],
                 'auto_block': risk_level == 'critical',
-                'timestamp': timezone.now().isoformat()
-            }
+                'timestamp': timestamp
+            })
 
             # Log high-risk transactions
             if risk_level in ['high', 'critical']:
                 logger.warning(f"High-risk transaction detected: {transaction.id}, score: {fraud_score}")
 
-            return result
-
-        except Exception as e:
-            logger.error(f"Fraud analysis failed for transaction {transaction.id}: {str(e)}")
-            return {
-                'transaction_id': transaction.id,
-                'error': str(e),
-                'risk_level': 'unknown',
-                'requires_review': True
-            }
+        return results
 
     def _extract_transaction_features(self, transaction) -> Dict[str, float]:
         """
         Extract fraud detection features from transaction
         """
         try:
-            user = transaction.customer.user
-            now = timezone.now()
-
-            features = {}
-
-            # Amount-based features
-            features['amount'] = float(transaction.amount)
-            features['amount_anomaly'] = self._calculate_amount_anomaly(transaction)
-
-            # Frequency-based features
-            features['frequency_score'] = self._calculate_frequency_score(user, transaction)
-
-            # Geographic features
-            features['geographic_score'] = self._calculate_geographic_score(user, transaction)
-
-            # Time-based features
-            features['time_score'] = self._calculate_time_anomaly(transaction)
-
-            # Device/browser features (simplified)
-            features['device_score'] = self._calculate_device_score(transaction)
-
-            # Behavioral features
-            features['behavioral_score'] = self._calculate_behavioral_score(user, transaction)
-
-            # Historical features
-            features['user_transaction_count'] = self._get_user_transaction_count(user)
-            features['user_fraud_history'] = self._get_user_fraud_history(user)
-
-            return features
+            features = self._extract_batch_features([transaction])
+            return {name: values[0].item() for name, values in features.items()}
 
         except Exception as e:
             logger.error(f"Feature extraction failed: {str(e)}")
             return {}
 
-    def _calculate_amount_anomaly(self, transaction) -> float:
-        """
-        Calculate amount anomaly score
+    def _extract_batch_features(self, transactions: List[Any], as_of: List[datetime] = None) -> Dict[str, np.ndarray]:
         """
-        try:
-            user = transaction.customer.user
-            amount = float(transaction.amount)
-
-            # Get user's historical transaction amounts
-            historical_amounts = list(transaction.customer.customer_transactions.filter(
-                status='completed',
-                created_at__gte=timezone.now() - timedelta(days=90)
-            ).values_list('amount', flat=True))
-
-            if len(historical_amounts) < 5:
-                return 0.0  # Not enough history
-
-            # Calculate z-score
-            mean_amount = statistics.mean(historical_amounts)
-            std_amount = statistics.stdev(historical_amounts) if len(historical_amounts) > 1 else 1
-
-            if std_amount == 0:
-                return 1.0 if amount != mean_amount else 0.0
+        Extract fraud detection features for a batch of transactions.
 
-            z_score = abs(amount - mean_amount) / std_amount
-
-            # Convert to 0-1 scale (higher = more anomalous)
-            return min(z_score / 3.0, 1.0)  # Cap at 3 standard deviations
-
-        except Exception as e:
-            logger.error(f"Amount anomaly calculation failed: {str(e)}")
-            return 0.5
-
-    def _calculate_frequency_score(self, user, transaction) -> float:
-        """
-        Calculate transaction frequency anomaly score
+        Returns one array per feature, aligned with ``transactions``. Each
+        transaction is compared with its customer's history (transactions and
+        payments alike). By default that is the history in the fraud feature
+        store as it stands now, read for every customer in one fetch with no
+        history queried. Given one ``as_of`` time per transaction, such as
+        its creation time for training and backfills, the same history is
+        rebuilt as it was at that time instead. Either way the features are
+        computed by the code below. Known devices and countries are not
+        timestamped, so both read the customers' current sets.
         """
-        try:
-            # Count transactions in last 24 hours
-            recent_transactions = transaction.customer.customer_transactions.filter(
-                created_at__gte=timezone.now() - timedelta(hours=24)
-            ).count()
+        from .fraud_feature_store import FraudFeatureStore
 
-            # Count transactions in last hour
-            very_recent = transaction.customer.customer_transactions.filter(
-                created_at__gte=timezone.now() - timedelta(hours=1)
-            ).count()
+        now = timezone.now()
+        size = len(transactions)
+        created = [transaction.created_at or now for transaction in transactions]
+        amounts = np.array([float(transaction.amount) for transaction in transactions])
+        hours = np.array([moment.hour for moment in created])
+        customer_ids = [transaction.customer_id for transaction in transactions]
+        profiles = FraudFeatureStore.get_many(customer_ids)
 
-            # Calculate frequency score
-            frequency_score = min(recent_transactions / 10.0, 1.0)  # Normalize to 0-1
-            frequency_score += min(very_recent / 5.0, 1.0)  # Add burst activity
-
-            return min(frequency_score, 1.0)
-
-        except Exception as e:
-            return 0.0
-
-    def _calculate_geographic_score(self, user, transaction) -> float:
-        """
-        Calculate geographic anomaly score
-        """
-        try:
-            # This would use IP geolocation in production
-            # For now, return neutral score
-            return 0.0
-
-        except Exception as e:
-            return 0.0
-
-    def _calculate_time_anomaly(self, transaction) -> float:
-        """
-        Calculate time-based anomaly score
-        """
-        try:
-            hour = transaction.created_at.hour
-
-            # Flag transactions during unusual hours (2-5 AM)
-            if 2 <= hour <= 5:
-                return 0.8
-
-            # Slightly flag late night/early morning
-            if hour >= 22 or hour <= 6:
-                return 0.4
-
-            return 0.0
-
-        except Exception as e:
-            logger.error(f"Time anomaly calculation failed: {str(e)}")
-            return 0.0
-
-    def _calculate_device_score(self, transaction) -> float:
-        """
-        Calculate device/browser anomaly score
-        """
-        try:
-            # This would use device/browser fingerprinting in production
-            # For now, return neutral score
-            return 0.0
-
-        except Exception as e:
-            logger.error(f"Device score calculation failed: {str(e)}")
-            return 0.0
-
-    def _get_user_transaction_count(self, user) -> int:
-        """Get total transaction count for user"""
-        return user.customer.customer_transactions.count()
+        if as_of is None:
+            history = FraudFeatureStore.summarize([profiles[customer_id] for customer_id in customer_ids], created)
+        else:
+            history = FraudFeatureStore.summarize_as_of(customer_ids, [moment or now for moment in as_of])
+
+        # Frequency: activity in the last 24 hours plus burst in the last hour
+        frequency_score = np.minimum(
+            np.minimum(history['last_day'] / 10.0, 1.0) + np.minimum(history['last_hour'] / 5.0, 1.0), 1.0
+        )
+
+        # Amount: z-score against the customer's completed amounts
+        completed_count = history['completed_count']
+        enough_history = completed_count >= self.MIN_AMOUNT_HISTORY
+        mean, std = history['amount_mean'], history['amount_std']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            flat = std <= 1e-9 * np.maximum(np.abs(mean), 1.0)
+            anomaly = np.where(
+                flat,
+                (~np.isclose(amounts, mean)).astype(float),
+                np.minimum(np.abs(amounts - mean) / np.where(flat, 1.0, std) / 3.0, 1.0)  # Cap at 3 standard deviations
+            )
+            # Behavior: share of past transactions made far from this hour of day
+            nearby_hours = (hours[:, None] + np.array([-1, 0, 1])) % 24
+            nearby = history['hour_histogram'][np.arange(size)[:, None], nearby_hours].sum(axis=1)
+            behavioral_score = np.where(enough_history, 1.0 - nearby / completed_count, 0.0)
+        amount_anomaly = np.where(enough_history, anomaly, 0.0)
+
+        geographic_score = np.zeros(size)
+        device_score = np.zeros(size)
+        for index, transaction in enumerate(transactions):
+            profile = profiles[transaction.customer_id]
+            metadata = getattr(transaction, 'metadata', None) or {}
+            device, country = metadata.get('device_fingerprint'), metadata.get('country')
+            if device and profile.known_devices:
+                device_score[index] = 0.0 if device in profile.known_devices else 1.0
+            if country and profile.known_countries:
+                geographic_score[index] = 0.0 if country in profile.known_countries else 1.0
+
+        # Flag transactions during unusual hours (2-5 AM), slightly flag late night
+        time_score = np.where((hours >= 2) & (hours <= 5), 0.8,
+                              np.where((hours >= 22) | (hours <= 6), 0.4, 0.0))
 
-    def _get_user_fraud_history(self, user) -> int:
-        """Get user's fraud history score"""
-        # Placeholder - would check fraud database in production
-        return 0
+        return {
+            'amount': amounts,
+            'amount_anomaly': amount_anomaly,
+            'frequency_score': frequency_score,
+            'geographic_score': geographic_score,
+            'time_score': time_score,
+            'device_score': device_score,
+            'behavioral_score': behavioral_score,
+            'user_transaction_count': history['transaction_count'],
+            'user_fraud_history': np.zeros(size, dtype=int),
+        }
 
     def _calculate_fraud_score(self, features: Dict[str, float]) -> float:
         """
@@ -430,9 +382,18 @@ class MLFraudDetectionService:
         Update ML model with human feedback for continuous learning
         """
         try:
-            # This would update the model with new labeled data
-            # Implementation would depend on the specific ML pipeline
-            logger.info(f"Model update requested for transaction {transaction_id}: fraud={is_fraud}")
+            from payments.models.transaction import Transaction
+
+            # Record the label; the offline training pipeline
+            # (FraudModelTrainer) learns from labeled transactions
+            metadata = Transaction.objects.filter(pk=transaction_id).values_list('metadata', flat=True).first()
+            if metadata is None and not Transaction.objects.filter(pk=transaction_id).exists():
+                logger.warning(f"Cannot label unknown transaction {transaction_id}")
+                return
+
+            metadata = dict(metadata or {}, **{self.FRAUD_LABEL_KEY: bool(is_fraud)})
+            Transaction.objects.filter(pk=transaction_id).update(metadata=metadata)
+            logger.info(f"Recorded fraud label for transaction {transaction_id}: fraud={is_fraud}")
 
         except Exception as e:
             logger.error(f"Model update failed: {str(e)}")
@@ -460,6 +421,133 @@ class MLFraudDetectionService:
             return {}
 
 
+@dataclass(frozen=True)
+class FraudModel:
+    """An immutable snapshot of the loaded model and the columns it expects"""
+    model: Any
+    feature_columns: List[str]
+    version: Optional[str] = None
+    artifact_mtime: Optional[float] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class FraudModelRegistry:
+    """
+    Process-wide holder of the fraud detection model.
+
+    The artifact is loaded on first use (or at worker start via ``warm_up``)
+    and shared by every ``MLFraudDetectionService`` instance. The artifact's
+    modification time is re-checked at most every ``RELOAD_CHECK_INTERVAL``
+    seconds; when a new artifact is published the model is swapped in without
+    a restart. Readers always get a complete ``FraudModel`` snapshot.
+    """
+
+    RELOAD_CHECK_INTERVAL = 60  # seconds
+
+    def __init__(self, artifact_path: str = None):
+        self._artifact_path = artifact_path
+        self._lock = threading.Lock()
+        self._bundle: Optional[FraudModel] = None
+        self._checked_at = 0.0
+
+    @property
+    def artifact_path(self) -> str:
+        return self._artifact_path or getattr(
+            settings, 'FRAUD_MODEL_PATH',
+            os.path.join(settings.MEDIA_ROOT, MLFraudDetectionService.MODEL_PATH + '.pkl')
+        )
+
+    def versioned_path(self, version: str) -> str:
+        root, extension = os.path.splitext(self.artifact_path)
+        return f"{root}-{version}{extension}"
+
+    def get(self) -> FraudModel:
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+            return bundle
+
+        with self._lock:
+            if self._bundle is None or time.monotonic() - self._checked_at >= self.RELOAD_CHECK_INTERVAL:
+                self._checked_at = time.monotonic()
+                self._bundle = self._load_if_changed(self._bundle)
+            return self._bundle
+
+    def _load_if_changed(self, current: Optional[FraudModel]) -> FraudModel:
+        try:
+            mtime = os.path.getmtime(self.artifact_path)
+        except OSError:
+            mtime = None
+
+        if mtime is None or (current is not None and current.artifact_mtime == mtime):
+            return current or FraudModel(None, list(MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS))
+
+        try:
+            artifact = joblib.load(self.artifact_path)
+        except Exception as e:
+            logger.error(f"Failed to load fraud detection model: {str(e)}")
+            # Keep serving the previous model, fall back to rule-based detection
+            return current or FraudModel(None, list(MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS))
+
+        if isinstance(artifact, dict):
+            bundle = FraudModel(artifact['model'], list(artifact['feature_columns']),
+                                artifact.get('version'), mtime, artifact.get('metadata'))
+        else:
+            # Bare estimator pickled by older releases
+            columns = getattr(artifact, 'feature_names_in_', MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS)
+            bundle = FraudModel(artifact, list(columns), None, mtime)
+
+        logger.info(f"Loaded fraud detection model {bundle.version or 'unversioned'}")
+        return bundle
+
+    def swap(self, model, feature_columns: List[str], version: str = None) -> FraudModel:
+        """Replace the in-process model immediately"""
+        with self._lock:
+            previous = self._bundle
+            self._bundle = FraudModel(model, list(feature_columns), version,
+                                      previous.artifact_mtime if previous else None)
+            self._checked_at = time.monotonic()
+            return self._bundle
+
+    def publish(self, model, feature_columns: List[str], version: str = None,
+                metadata: Dict[str, Any] = None) -> FraudModel:
+        """
+        Write a model artifact and swap it in.
+
+        The artifact is written next to its final path and renamed into place,
+        so other processes never load a partially written file. Versioned
+        models are also kept as ``<name>-<version>.pkl`` for rollback.
+        """
+        path = self.artifact_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        artifact = {'model': model, 'feature_columns': list(feature_columns),
+                    'version': version, 'metadata': metadata}
+        joblib.dump(artifact, tmp_path)
+        if version:
+            versioned_tmp_path = f"{self.versioned_path(version)}.{os.getpid()}.tmp"
+            shutil.copyfile(tmp_path, versioned_tmp_path)
+            os.replace(versioned_tmp_path, self.versioned_path(version))
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._bundle = FraudModel(model, list(feature_columns), version, os.path.getmtime(path), metadata)
+            self._checked_at = time.monotonic()
+            return self._bundle
+
+    def warm_up(self, train_if_missing: bool = True) -> FraudModel:
+        """
+        Load the model ahead of the first request; called at worker start.
+        Training the initial model happens here, never on the request path.
+        """
+        bundle = self.get()
+        if bundle.model is None and train_if_missing:
+            bundle = MLFraudDetectionService(registry=self)._train_initial_model() or bundle
+        return bundle
+
+
+fraud_model_registry = FraudModelRegistry()
+
+
 class BehavioralAnalysisService:
     """
     User behavioral analysis for fraud detection
@@ -503,24 +591,22 @@ class BehavioralAnalysisService:
         Build behavioral profile for user
         """
         try:
-            # Get user's transaction history
-            transactions = user.customer.customer_transactions.filter(
-                status='completed'
-            ).order_by('-created_at')[:100]  # Last 100 transactions
+            from .fraud_feature_store import FraudFeatureStore
 
-            if not transactions:
+            customer_id = getattr(getattr(user, 'customer_profile', None), 'pk', None)
+            if customer_id is None:
                 return self._create_empty_profile()
 
-            # Analyze patterns
-            amounts = [float(t.amount) for t in transactions]
-            hours = [t.created_at.hour for t in transactions]
+            features = FraudFeatureStore.get(customer_id)
+            if not features.completed_count:
+                return self._create_empty_profile()
 
             return {
-                'avg_amount': statistics.mean(amounts) if amounts else 0,
-                'std_amount': statistics.stdev(amounts) if len(amounts) > 1 else 0,
-                'common_hours': Counter(hours).most_common(3),
-                'transaction_count': len(transactions),
-                'last_transaction': transactions[0].created_at if transactions else None
+                'avg_amount': features.amount_mean,
+                'std_amount': features.amount_std,
+                'common_hours': features.common_hours(3),
+                'transaction_count': features.completed_count,
+                'last_transaction': features.last_transaction_at
             }
 
         except Exception as e:
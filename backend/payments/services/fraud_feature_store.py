@@ -0,0 +1,445 @@
+"""
+Fraud Feature Store for SikaRemit
+Per-customer fraud/behavioral features shared by the rule engine, the ML
+scorer and behavioral analysis, maintained incrementally as payments happen
+"""
+
+import logging
+import math
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from ..models.fraud_features import FraudFeatureProfile
+
+logger = logging.getLogger(__name__)
+
+
+class CustomerFeatures:
+    """Read-only view of one customer's cached feature profile"""
+
+    def __init__(self, customer_id: int, data: Dict[str, Any]):
+        self.customer_id = customer_id
+        self._data = data
+
+    @property
+    def transaction_count(self) -> int:
+        return self._data['transaction_count']
+
+    @property
+    def completed_count(self) -> int:
+        return self._data['completed_count']
+
+    @property
+    def amount_mean(self) -> float:
+        return self._data['amount_mean']
+
+    @property
+    def amount_std(self) -> float:
+        """Sample standard deviation of completed amounts"""
+        count = self._data['completed_count']
+        if count < 2:
+            return 0.0
+        return math.sqrt(max(self._data['amount_m2'], 0.0) / (count - 1))
+
+    @property
+    def hour_histogram(self) -> List[int]:
+        return self._data['hour_histogram']
+
+    @property
+    def known_devices(self) -> List[str]:
+        return self._data['known_devices']
+
+    @property
+    def known_countries(self) -> List[str]:
+        return self._data['known_countries']
+
+    @property
+    def last_ip(self) -> str:
+        return self._data['last_ip']
+
+    @property
+    def last_transaction_at(self):
+        timestamp = self._data['last_transaction_at']
+        return timezone.datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) if timestamp else None
+
+    def count_since(self, seconds: float, at=None) -> int:
+        """Transactions created in the ``seconds`` up to and including ``at`` (default now)"""
+        end = (at or timezone.now()).timestamp()
+        start = end - seconds
+        return sum(1 for _, created, _ in self._data['recent_activity'] if start <= created <= end)
+
+    def common_hours(self, limit: int = 3) -> List[tuple]:
+        """Most frequent hours of day for completed transactions, as ``(hour, count)``"""
+        ranked = sorted(
+            ((hour, count) for hour, count in enumerate(self.hour_histogram) if count),
+            key=lambda item: item[1], reverse=True
+        )
+        return ranked[:limit]
+
+
+class FraudFeatureStore:
+    """
+    Cache-first store of ``FraudFeatureProfile`` rows.
+
+    Reads come from the cache, then the database, and profiles that do not
+    exist yet are bootstrapped from transaction history in a few grouped
+    queries; ``get_many`` resolves a whole batch of customers that way.
+    Writes happen in ``record_transaction`` (on create and on completion)
+    under a row lock: a Welford update of the amount statistics, an hour of
+    day histogram bucket and a 24-hour activity log used for velocity.
+    """
+
+    CACHE_KEY_PREFIX = 'fraud_features'
+    CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+    # Activity kept for velocity features
+    ACTIVITY_WINDOW = 24 * 60 * 60
+    MAX_RECENT_ACTIVITY = 500
+
+    # Most recent devices/countries remembered per customer
+    MAX_KNOWN_VALUES = 20
+
+    @classmethod
+    def _cache_key(cls, customer_id: int) -> str:
+        return f"{cls.CACHE_KEY_PREFIX}:{customer_id}"
+
+    @staticmethod
+    def _history_models():
+        from ..models.payment import Payment
+        from ..models.transaction import Transaction
+        return [Transaction, Payment]
+
+    @staticmethod
+    def _activity_key(instance) -> str:
+        return f"{instance._meta.model_name}:{instance.pk}"
+
+    @staticmethod
+    def _serialize(profile: FraudFeatureProfile) -> Dict[str, Any]:
+        return {
+            'transaction_count': profile.transaction_count,
+            'completed_count': profile.completed_count,
+            'amount_mean': profile.amount_mean,
+            'amount_m2': profile.amount_m2,
+            'hour_histogram': list(profile.hour_histogram) or [0] * 24,
+            'known_devices': list(profile.known_devices),
+            'known_countries': list(profile.known_countries),
+            'last_ip': profile.last_ip,
+            'recent_activity': [list(entry) for entry in profile.recent_activity],
+            'last_transaction_at': (
+                profile.last_transaction_at.timestamp() if profile.last_transaction_at else None
+            ),
+        }
+
+    @classmethod
+    def get(cls, customer_id: int) -> CustomerFeatures:
+        return cls.get_many([customer_id])[customer_id]
+
+    @classmethod
+    def get_many(cls, customer_ids: Iterable[int]) -> Dict[int, CustomerFeatures]:
+        """Features for every customer in one cache round-trip (plus DB work on misses)"""
+        customer_ids = list(dict.fromkeys(customer_ids))
+        keys = {cls._cache_key(customer_id): customer_id for customer_id in customer_ids}
+        found = {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+        missing = [customer_id for customer_id in customer_ids if customer_id not in found]
+        if missing:
+            loaded = {
+                profile.customer_id: cls._serialize(profile)
+                for profile in FraudFeatureProfile.objects.filter(customer_id__in=missing)
+            }
+            unseen = [customer_id for customer_id in missing if customer_id not in loaded]
+            if unseen:
+                profiles = cls._bootstrap(unseen)
+                cls._persist_new(profiles)
+                loaded.update({customer_id: cls._serialize(profile) for customer_id, profile in profiles.items()})
+
+            cache.set_many({cls._cache_key(customer_id): data for customer_id, data in loaded.items()},
+                           cls.CACHE_TIMEOUT)
+            found.update(loaded)
+
+        return {customer_id: CustomerFeatures(customer_id, found[customer_id]) for customer_id in customer_ids}
+
+    @classmethod
+    def summarize(cls, profiles: List[CustomerFeatures], at: List) -> Dict[str, np.ndarray]:
+        """
+        History arrays for one row per profile, as the profiles stand now.
+
+        Activity is counted up to each row's ``at``. ``summarize_as_of``
+        returns the same arrays rebuilt from history, so the fraud features
+        computed from either are the same.
+        """
+        return {
+            'transaction_count': np.array([profile.transaction_count for profile in profiles], dtype=int),
+            'completed_count': np.array([profile.completed_count for profile in profiles], dtype=int),
+            'amount_mean': np.array([profile.amount_mean for profile in profiles], dtype=float),
+            'amount_std': np.array([profile.amount_std for profile in profiles], dtype=float),
+            'last_day': np.array([profile.count_since(cls.ACTIVITY_WINDOW, at=moment)
+                                  for profile, moment in zip(profiles, at)], dtype=int),
+            'last_hour': np.array([profile.count_since(3600, at=moment)
+                                   for profile, moment in zip(profiles, at)], dtype=int),
+            'hour_histogram': np.array([profile.hour_histogram for profile in profiles], dtype=float).reshape(-1, 24),
+        }
+
+    @classmethod
+    def summarize_as_of(cls, customer_ids: List[int], as_of: List) -> Dict[str, np.ndarray]:
+        """
+        The ``summarize`` arrays for each customer as they were at the matching
+        ``as_of`` time, rebuilt from the same history the profiles are built
+        from. History is fetched with one query per model and windowed with
+        sorted timestamps and prefix sums.
+        """
+        size = len(customer_ids)
+        ids = np.array(customer_ids)
+        times = np.array([moment.timestamp() for moment in as_of])
+
+        rows = defaultdict(list)
+        for model in cls._history_models():
+            history = model.objects.filter(
+                customer_id__in=set(customer_ids), created_at__lte=max(as_of)
+            ).order_by().values_list('customer_id', 'created_at', 'status', 'amount')
+            for customer_id, created_at, status, amount in history:
+                rows[customer_id].append((
+                    created_at.timestamp(), status == 'completed', float(amount),
+                    created_at.astimezone(dt_timezone.utc).hour
+                ))
+
+        summary = {
+            'transaction_count': np.zeros(size, dtype=int),
+            'completed_count': np.zeros(size, dtype=int),
+            'amount_mean': np.zeros(size),
+            'amount_std': np.zeros(size),
+            'last_day': np.zeros(size, dtype=int),
+            'last_hour': np.zeros(size, dtype=int),
+            'hour_histogram': np.zeros((size, 24)),
+        }
+        for customer_id in np.unique(ids):
+            positions = np.nonzero(ids == customer_id)[0]
+            at = times[positions]
+            history = sorted(rows.get(customer_id, []))
+
+            created = np.array([row[0] for row in history], dtype=float)
+            upper = np.searchsorted(created, at, side='right')
+            summary['transaction_count'][positions] = upper
+            summary['last_day'][positions] = upper - np.searchsorted(created, at - cls.ACTIVITY_WINDOW, side='left')
+            summary['last_hour'][positions] = upper - np.searchsorted(created, at - 3600, side='left')
+
+            completed = [row for row in history if row[1]]
+            if not completed:
+                continue
+            amounts = np.array([row[2] for row in completed])
+            count = np.searchsorted(np.array([row[0] for row in completed]), at, side='right')
+            sums = np.concatenate(([0.0], np.cumsum(amounts)))
+            squares = np.concatenate(([0.0], np.cumsum(amounts ** 2)))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.where(count > 0, sums[count] / count, 0.0)
+                m2 = np.maximum(squares[count] - count * mean ** 2, 0.0)
+                std = np.where(count > 1, np.sqrt(m2 / (count - 1)), 0.0)
+            summary['completed_count'][positions] = count
+            summary['amount_mean'][positions] = mean
+            summary['amount_std'][positions] = std
+
+            hours = np.zeros((len(completed) + 1, 24))
+            hours[np.arange(1, len(completed) + 1), [row[3] for row in completed]] = 1
+            summary['hour_histogram'][positions] = np.cumsum(hours, axis=0)[count]
+
+        return summary
+
+    @staticmethod
+    def _persist_new(profiles: Dict[int, FraudFeatureProfile]):
+        from users.models import Customer
+
+        existing = set(Customer.objects.filter(pk__in=list(profiles)).values_list('pk', flat=True))
+        FraudFeatureProfile.objects.bulk_create(
+            [profile for customer_id, profile in profiles.items() if customer_id in existing],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def _bootstrap(cls, customer_ids: List[int]) -> Dict[int, FraudFeatureProfile]:
+        """Build unsaved profiles from existing history with grouped queries"""
+        profiles = {
+            customer_id: FraudFeatureProfile(
+                customer_id=customer_id, hour_histogram=[0] * 24,
+                known_devices=[], known_countries=[], recent_activity=[]
+            )
+            for customer_id in customer_ids
+        }
+        since = timezone.now() - timezone.timedelta(seconds=cls.ACTIVITY_WINDOW)
+        completed = Q(status='completed')
+
+        for model in cls._history_models():
+            history = model.objects.filter(customer_id__in=customer_ids).order_by()
+
+            totals = history.values('customer_id').annotate(
+                total=Count('id'),
+                completed=Count('id', filter=completed),
+                amount_sum=Sum('amount', filter=completed),
+                amount_squares=Sum(F('amount') * F('amount'), filter=completed),
+                last_completed=Max('created_at', filter=completed),
+            )
+            for row in totals:
+                profile = profiles[row['customer_id']]
+                profile.transaction_count += row['total']
+                count = row['completed']
+                if count:
+                    mean = float(row['amount_sum']) / count
+                    m2 = float(row['amount_squares']) - count * mean * mean
+                    cls._merge_statistics(profile, count, mean, m2)
+                if row['last_completed'] and (
+                    profile.last_transaction_at is None or row['last_completed'] > profile.last_transaction_at
+                ):
+                    profile.last_transaction_at = row['last_completed']
+
+            hours = history.filter(completed).annotate(
+                hour=ExtractHour('created_at', tzinfo=dt_timezone.utc)
+            ).values_list('customer_id', 'hour').annotate(count=Count('id'))
+            for customer_id, hour, count in hours:
+                profiles[customer_id].hour_histogram[hour] += count
+
+            label = model._meta.model_name
+            recent = history.filter(created_at__gte=since).values_list('customer_id', 'pk', 'created_at', 'status')
+            for customer_id, pk, created_at, status in recent:
+                profiles[customer_id].recent_activity.append(
+                    [f"{label}:{pk}", created_at.timestamp(), status == 'completed']
+                )
+
+        for profile in profiles.values():
+            profile.recent_activity.sort(key=lambda entry: entry[1])
+            del profile.recent_activity[:-cls.MAX_RECENT_ACTIVITY]
+        return profiles
+
+    @staticmethod
+    def _merge_statistics(profile: FraudFeatureProfile, count: int, mean: float, m2: float):
+        """Combine another set's (count, mean, M2) into the profile (Chan et al.)"""
+        total = profile.completed_count + count
+        delta = mean - profile.amount_mean
+        profile.amount_m2 += m2 + delta * delta * profile.completed_count * count / total
+        profile.amount_mean += delta * count / total
+        profile.completed_count = total
+
+    @classmethod
+    def _apply(cls, profile: FraudFeatureProfile, key: str, created_at, amount: float,
+               created: bool, completed: bool):
+        """Fold one transaction event into the profile"""
+        now = timezone.now().timestamp()
+        activity = [entry for entry in profile.recent_activity if entry[1] >= now - cls.ACTIVITY_WINDOW]
+        entry = next((entry for entry in activity if entry[0] == key), None)
+        timestamp = created_at.timestamp()
+
+        if created:
+            profile.transaction_count += 1
+            if entry is None and timestamp >= now - cls.ACTIVITY_WINDOW:
+                entry = [key, timestamp, False]
+                activity.append(entry)
+
+        # A completion is only counted once; repeated saves find the entry
+        # already marked. Completions of activity older than the window
+        # cannot be de-duplicated and are always counted.
+        if completed and not (entry and entry[2]):
+            if entry:
+                entry[2] = True
+
+            # Welford's online update
+            profile.completed_count += 1
+            delta = amount - profile.amount_mean
+            profile.amount_mean += delta / profile.completed_count
+            profile.amount_m2 += delta * (amount - profile.amount_mean)
+
+            histogram = list(profile.hour_histogram) or [0] * 24
+            histogram[created_at.astimezone(dt_timezone.utc).hour] += 1
+            profile.hour_histogram = histogram
+            if profile.last_transaction_at is None or created_at > profile.last_transaction_at:
+                profile.last_transaction_at = created_at
+
+        profile.recent_activity = activity[-cls.MAX_RECENT_ACTIVITY:]
+
+    @classmethod
+    def record_transaction(cls, instance, created: bool = False, completed: bool = None):
+        """
+        Update the customer's features for a created or completed
+        ``Transaction``/``Payment``. Other saves do not change any feature.
+
+        ``completed`` says whether this save moved the instance into
+        ``completed``; the save signal works it out from the stored status,
+        so saving an already completed row again counts nothing. It
+        defaults to the instance's current status.
+        """
+        if completed is None:
+            completed = instance.status == 'completed'
+        if not (created or completed) or not instance.customer_id:
+            return
+
+        customer_id = instance.customer_id
+        with db_transaction.atomic():
+            profile = FraudFeatureProfile.objects.select_for_update().filter(customer_id=customer_id).first()
+            if profile is None:
+                # Bootstrapping reads the history this instance is already part of
+                profile = cls._bootstrap([customer_id])[customer_id]
+                cls._persist_new({customer_id: profile})
+            else:
+                cls._apply(profile, cls._activity_key(instance), instance.created_at or timezone.now(),
+                           float(instance.amount), created, completed)
+                profile.save()
+
+        cache.set(cls._cache_key(customer_id), cls._serialize(profile), cls.CACHE_TIMEOUT)
+
+    @classmethod
+    def observe_context(cls, customer_id: int, device_fingerprint: str = None,
+                        ip_address: str = None, country: str = None):
+        """Remember the device, IP and country a customer transacted from"""
+        if not customer_id or not (device_fingerprint or ip_address or country):
+            return
+
+        # Make sure the profile row exists before locking it
+        cls.get(customer_id)
+        with db_transaction.atomic():
+            profile = FraudFeatureProfile.objects.select_for_update().filter(customer_id=customer_id).first()
+            if profile is None:
+                return
+
+            for field, value in (('known_devices', device_fingerprint), ('known_countries', country)):
+                if not value:
+                    continue
+                values = [known for known in getattr(profile, field) if known != value]
+                values.append(value)
+                setattr(profile, field, values[-cls.MAX_KNOWN_VALUES:])
+            if ip_address:
+                profile.last_ip = ip_address
+            profile.save(update_fields=['known_devices', 'known_countries', 'last_ip', 'updated_at'])
+
+        cache.set(cls._cache_key(customer_id), cls._serialize(profile), cls.CACHE_TIMEOUT)
+
+    @classmethod
+    def rebuild(cls, customer_ids: Iterable[int]) -> Dict[int, CustomerFeatures]:
+        """
+        Recompute profiles from history, e.g. after bulk ``QuerySet.update()``
+        calls that bypass the save signals. Known devices/countries are kept.
+        """
+        customer_ids = list(customer_ids)
+        existing = {
+            profile.customer_id: profile
+            for profile in FraudFeatureProfile.objects.filter(customer_id__in=customer_ids)
+        }
+        profiles = cls._bootstrap(customer_ids)
+        for customer_id, profile in profiles.items():
+            previous = existing.get(customer_id)
+            if previous is not None:
+                profile.known_devices = previous.known_devices
+                profile.known_countries = previous.known_countries
+                profile.last_ip = previous.last_ip
+
+        with db_transaction.atomic():
+            FraudFeatureProfile.objects.filter(customer_id__in=customer_ids).delete()
+            cls._persist_new(profiles)
+
+        cache.delete_many([cls._cache_key(customer_id) for customer_id in customer_ids])
+        return cls.get_many(customer_ids)
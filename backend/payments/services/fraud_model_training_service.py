@@ -0,0 +1,193 @@
+"""
+Fraud Model Training Service for SikaRemit
+Offline retraining of the fraud detection model on labeled transaction history
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import (
+    average_precision_score, f1_score, precision_score, recall_score, roc_auc_score
+)
+from sklearn.model_selection import train_test_split
+
+from .fraud_detection_ml_service import FraudModel, FraudModelRegistry, MLFraudDetectionService, fraud_model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class FraudModelTrainer:
+    """
+    Train, evaluate and publish the fraud detection model.
+
+    Labels are the analyst verdicts stored on ``Transaction.metadata`` by
+    ``MLFraudDetectionService.update_model_with_feedback``. Labeled
+    transactions are streamed in chunks and featurized by the same extractor
+    that scores live traffic, as of each row's creation time, so every row
+    sees history only up to then. The candidate model is scored on a stratified holdout and
+    only published when it clears ``min_auc`` and does at least as well as
+    the live model on the same holdout. Publishing swaps the artifact
+    atomically; workers pick it up through the model registry.
+    """
+
+    CHUNK_SIZE = 5000
+    HOLDOUT_FRACTION = 0.2
+    MIN_LABELED_SAMPLES = 500
+    MIN_FRAUD_LABELS = 25
+    MIN_AUC = 0.7
+    SYNTHETIC_SAMPLES = 10000
+
+    def __init__(self, registry: FraudModelRegistry = None, chunk_size: int = None, n_jobs: int = None,
+                 holdout_fraction: float = None, min_labeled_samples: int = None,
+                 min_fraud_labels: int = None, min_auc: float = None):
+        self.registry = registry or fraud_model_registry
+        self.service = MLFraudDetectionService(registry=self.registry)
+        self.chunk_size = chunk_size or getattr(settings, 'FRAUD_MODEL_TRAINING_CHUNK_SIZE', self.CHUNK_SIZE)
+        self.n_jobs = n_jobs or getattr(settings, 'FRAUD_MODEL_TRAINING_JOBS', -1)
+        self.holdout_fraction = holdout_fraction or self.HOLDOUT_FRACTION
+        self.min_labeled_samples = (
+            self.MIN_LABELED_SAMPLES if min_labeled_samples is None else min_labeled_samples
+        )
+        self.min_fraud_labels = self.MIN_FRAUD_LABELS if min_fraud_labels is None else min_fraud_labels
+        self.min_auc = getattr(settings, 'FRAUD_MODEL_MIN_AUC', self.MIN_AUC) if min_auc is None else min_auc
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return list(MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS)
+
+    def labeled_transactions(self, since_days: int = None):
+        from ..models.transaction import Transaction
+
+        queryset = Transaction.objects.filter(
+            metadata__has_key=MLFraudDetectionService.FRAUD_LABEL_KEY
+        ).only('id', 'customer_id', 'amount', 'created_at', 'metadata').order_by('id')
+        if since_days:
+            queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(days=since_days))
+        return queryset
+
+    def extract_labeled_features(self, since_days: int = None) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Feature matrix and labels for every labeled transaction, built chunk by chunk"""
+        frames, labels, chunk = [], [], []
+        for transaction in self.labeled_transactions(since_days).iterator(chunk_size=self.chunk_size):
+            chunk.append(transaction)
+            if len(chunk) >= self.chunk_size:
+                frames.append(self._featurize(chunk))
+                labels.append(self._labels(chunk))
+                chunk = []
+        if chunk:
+            frames.append(self._featurize(chunk))
+            labels.append(self._labels(chunk))
+
+        if not frames:
+            return pd.DataFrame(columns=self.feature_columns), np.zeros(0, dtype=int)
+        return pd.concat(frames, ignore_index=True), np.concatenate(labels)
+
+    def _featurize(self, transactions) -> pd.DataFrame:
+        features = self.service._extract_batch_features(
+            transactions, as_of=[transaction.created_at for transaction in transactions]
+        )
+        return pd.DataFrame({column: features[column] for column in self.feature_columns})
+
+    @staticmethod
+    def _labels(transactions) -> np.ndarray:
+        key = MLFraudDetectionService.FRAUD_LABEL_KEY
+        return np.array([bool((transaction.metadata or {}).get(key)) for transaction in transactions], dtype=int)
+
+    @staticmethod
+    def evaluate(model, X: pd.DataFrame, y: np.ndarray) -> Dict[str, float]:
+        """Holdout metrics for a fitted classifier"""
+        probabilities = model.predict_proba(X)[:, 1]
+        predictions = probabilities >= 0.5
+        return {
+            'roc_auc': float(roc_auc_score(y, probabilities)),
+            'average_precision': float(average_precision_score(y, probabilities)),
+            'precision': float(precision_score(y, predictions, zero_division=0)),
+            'recall': float(recall_score(y, predictions, zero_division=0)),
+            'f1': float(f1_score(y, predictions, zero_division=0)),
+            'holdout_samples': int(len(y)),
+        }
+
+    def _evaluate_current(self, bundle: FraudModel, X: pd.DataFrame, y: np.ndarray) -> Optional[Dict[str, float]]:
+        if bundle.model is None or not set(bundle.feature_columns) <= set(X.columns):
+            return None
+        try:
+            return self.evaluate(bundle.model, X[bundle.feature_columns], y)
+        except Exception as e:
+            logger.warning(f"Could not evaluate current fraud model {bundle.version}: {str(e)}")
+            return None
+
+    def train(self, synthetic: bool = False, since_days: int = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Run the pipeline once.
+
+        ``synthetic`` trains on generated data instead of labels (for new
+        installs); ``force`` publishes even if the holdout checks fail.
+        Returns a summary whose ``status`` is published, rejected or skipped.
+        """
+        started = time.monotonic()
+        if synthetic:
+            data = self.service._generate_synthetic_training_data(self.SYNTHETIC_SAMPLES)
+            X, y = data[self.feature_columns], data['is_fraud'].to_numpy()
+        else:
+            X, y = self.extract_labeled_features(since_days)
+
+        fraud_labels = int(y.sum())
+        result = {
+            'source': 'synthetic' if synthetic else 'labeled',
+            'samples': int(len(y)),
+            'fraud_labels': fraud_labels,
+        }
+        if len(y) < self.min_labeled_samples or fraud_labels < self.min_fraud_labels or fraud_labels == len(y):
+            result.update(status='skipped', reason='Not enough labeled transactions of each class')
+            logger.info(f"Fraud model training skipped: {result}")
+            return result
+
+        X_train, X_holdout, y_train, y_holdout = train_test_split(
+            X, y, test_size=self.holdout_fraction, stratify=y, random_state=42
+        )
+        model = RandomForestClassifier(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42,
+            class_weight='balanced',
+            n_jobs=self.n_jobs
+        )
+        model.fit(X_train, y_train)
+        # Request-path predictions are small; don't fan out threads per call
+        model.set_params(n_jobs=1)
+
+        metrics = self.evaluate(model, X_holdout, y_holdout)
+        current = self.registry.get()
+        baseline = self._evaluate_current(current, X_holdout, y_holdout)
+        version = timezone.now().strftime('%Y%m%d%H%M%S')
+        result.update(
+            version=version,
+            metrics=metrics,
+            baseline_version=current.version,
+            baseline_metrics=baseline,
+            training_seconds=round(time.monotonic() - started, 3),
+        )
+
+        if not force and metrics['roc_auc'] < self.min_auc:
+            result.update(status='rejected', reason=f"Holdout ROC AUC below {self.min_auc}")
+        elif not force and baseline and metrics['roc_auc'] < baseline['roc_auc']:
+            result.update(status='rejected', reason=f"Worse than current model {current.version} on holdout")
+        else:
+            self.registry.publish(model, list(X.columns), version=version, metadata={
+                'source': result['source'],
+                'samples': result['samples'],
+                'fraud_labels': fraud_labels,
+                'metrics': metrics,
+                'trained_at': timezone.now().isoformat(),
+            })
+            result['status'] = 'published'
+
+        logger.info(f"Fraud model training {result['status']}: version {version}, metrics {metrics}")
+        return result
@@ -0,0 +1,199 @@
+"""
+Invoice Aging Service for SikaRemit
+Keeps invoice overdue statuses and per-user aging summaries up to date with
+set-based queries, and sends overdue invoice reminders in batches
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction as db_transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from ..models.invoices import Invoice, InvoiceAgingSummary, InvoiceReminder
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceAgingSweeper:
+    """
+    Nightly (and on-demand) invoice aging sweep.
+
+    ``mark_overdue`` applies the date rules of ``Invoice._update_status`` to
+    every invoice at once with two UPDATEs, so statuses no longer wait for
+    the invoice to be saved. ``refresh_summaries`` rebuilds
+    ``InvoiceAgingSummary`` from one grouped aggregate over outstanding
+    invoices. ``queue_reminders`` creates email reminders for overdue
+    invoices that have not had one in ``INVOICE_REMINDER_INTERVAL_DAYS``.
+    It bulk-creates them and sends them from ``send_invoice_reminders``
+    tasks, each batch over one SMTP connection.
+
+    An invoice is outstanding once it has been sent and while it has an
+    amount due and is neither paid nor cancelled.
+    """
+
+    BATCH_SIZE = 1000
+
+    # (bucket, fewest days overdue, most days overdue)
+    BUCKET_RANGES = [
+        ('current', None, 0),
+        ('days_0_30', 1, 30),
+        ('days_31_60', 31, 60),
+        ('days_61_90', 61, 90),
+        ('days_over_90', 91, None),
+    ]
+
+    def __init__(self, today=None, user_ids: Optional[List[int]] = None):
+        self.today = today or timezone.localdate()
+        self.user_ids = user_ids
+
+    def _invoices(self):
+        invoices = Invoice.objects.all()
+        if self.user_ids is not None:
+            invoices = invoices.filter(user_id__in=self.user_ids)
+        return invoices
+
+    def _outstanding(self):
+        return self._invoices().filter(sent_at__isnull=False, amount_due__gt=0).exclude(
+            status__in=['paid', 'cancelled']
+        )
+
+    def mark_overdue(self) -> Tuple[int, int]:
+        """
+        Move unpaid invoices past their due date to ``overdue``, and sent
+        invoices whose due date was moved back into the future out of it.
+        Returns both counts.
+        """
+        now = timezone.now()
+        unpaid = self._invoices().filter(amount_paid__lte=0)
+        overdue = unpaid.filter(status__in=['draft', 'sent', 'viewed'], due_date__lt=self.today).update(
+            status='overdue', updated_at=now
+        )
+        cleared = unpaid.filter(status='overdue', due_date__gte=self.today, sent_at__isnull=False).update(
+            status='sent', updated_at=now
+        )
+        return overdue, cleared
+
+    def _bucket_filter(self, fewest: Optional[int], most: Optional[int]) -> Q:
+        bucket = Q()
+        if fewest is not None:
+            bucket &= Q(due_date__lte=self.today - timedelta(days=fewest))
+        if most is not None:
+            bucket &= Q(due_date__gte=self.today - timedelta(days=most))
+        return bucket
+
+    def refresh_summaries(self) -> int:
+        """Rebuild the aging summaries in scope. Returns the number written."""
+        aggregates = {}
+        for name, fewest, most in self.BUCKET_RANGES:
+            bucket = self._bucket_filter(fewest, most)
+            aggregates[f'{name}_count'] = Count('id', filter=bucket)
+            aggregates[f'{name}_amount'] = Sum('amount_due', filter=bucket, default=Decimal('0'))
+        rows = self._outstanding().order_by().values('user_id', 'currency').annotate(
+            total_outstanding=Sum('amount_due'), **aggregates
+        )
+
+        now = timezone.now()
+        summaries = [InvoiceAgingSummary(computed_at=now, **row) for row in rows]
+        with db_transaction.atomic():
+            stale = InvoiceAgingSummary.objects.all()
+            if self.user_ids is not None:
+                stale = stale.filter(user_id__in=self.user_ids)
+            stale.delete()
+            InvoiceAgingSummary.objects.bulk_create(summaries, batch_size=self.BATCH_SIZE)
+        return len(summaries)
+
+    @staticmethod
+    def build_reminder(invoice: Invoice, days_overdue: int, now) -> InvoiceReminder:
+        client = invoice.client
+        return InvoiceReminder(
+            invoice=invoice,
+            reminder_type='email',
+            subject=f'Payment Reminder: Invoice {invoice.invoice_number}',
+            message=(
+                f'Dear {client.contact_person or client.company_name},\n\n'
+                f'This is a reminder that invoice {invoice.invoice_number} for {invoice.currency} '
+                f'{invoice.amount_due} is overdue by {days_overdue} days.\n\n'
+                'Please arrange payment at your earliest convenience.'
+            ),
+            scheduled_for=now,
+            created_at=now
+        )
+
+    def queue_reminders(self) -> int:
+        """Create reminders for overdue invoices and queue them for sending. Returns the number queued."""
+        from celery import group
+        from ..tasks import send_invoice_reminders
+
+        now = timezone.now()
+        reminded = InvoiceReminder.objects.filter(
+            invoice=OuterRef('pk'),
+            created_at__gte=now - timedelta(days=settings.INVOICE_REMINDER_INTERVAL_DAYS)
+        )
+        due = self._outstanding().filter(status='overdue').exclude(Exists(reminded)).select_related('client')
+
+        reminders = []
+        with db_transaction.atomic():
+            for invoice in due.iterator(chunk_size=self.BATCH_SIZE):
+                reminders.append(self.build_reminder(invoice, (self.today - invoice.due_date).days, now))
+            InvoiceReminder.objects.bulk_create(reminders, batch_size=self.BATCH_SIZE)
+
+            reminder_ids = [reminder.id for reminder in reminders]
+            batch_size = settings.INVOICE_REMINDER_BATCH_SIZE
+            batches = [reminder_ids[i:i + batch_size] for i in range(0, len(reminder_ids), batch_size)]
+            if batches:
+                db_transaction.on_commit(
+                    lambda: group(send_invoice_reminders.s(batch) for batch in batches).apply_async()
+                )
+        return len(reminders)
+
+    def sweep(self, send_reminders: bool = True) -> Dict[str, Any]:
+        """Update overdue statuses, then the aging summaries, then queue reminders"""
+        overdue, cleared = self.mark_overdue()
+        result = {
+            'marked_overdue': overdue,
+            'cleared': cleared,
+            'summaries': self.refresh_summaries(),
+            'reminders': self.queue_reminders() if send_reminders else 0,
+        }
+        logger.info(f"Invoice aging sweep for {self.today}: {result}")
+        return result
+
+    @staticmethod
+    def build_email(reminder: InvoiceReminder, connection=None) -> EmailMessage:
+        return EmailMessage(
+            reminder.subject, reminder.message, settings.DEFAULT_FROM_EMAIL, [reminder.invoice.client.email],
+            connection=connection
+        )
+
+    @classmethod
+    def send_reminders(cls, reminder_ids: List[int]) -> Tuple[int, Optional[Exception]]:
+        """
+        Email the unsent reminders among ``reminder_ids`` over one SMTP
+        connection. Returns the number sent and the error that stopped the
+        batch, if any.
+        """
+        reminders = list(InvoiceReminder.objects.filter(
+            pk__in=reminder_ids, reminder_type='email', is_sent=False
+        ).select_related('invoice__client'))
+        sent_ids = []
+        error = None
+        try:
+            with get_connection() as connection:
+                for reminder in reminders:
+                    cls.build_email(reminder, connection=connection).send()
+                    sent_ids.append(reminder.id)
+        except Exception as e:
+            error = e
+            logger.error(f"Invoice reminder batch stopped after {len(sent_ids)} of {len(reminders)}: {str(e)}")
+        finally:
+            if sent_ids:
+                InvoiceReminder.objects.filter(pk__in=sent_ids).update(
+                    is_sent=True, is_successful=True, sent_at=timezone.now()
+                )
+        return len(sent_ids), error
@@ -0,0 +1,103 @@
+"""
+Invoice Service for SikaRemit
+Creates invoices in bulk from an invoice template
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models.invoices import Invoice, InvoiceItem, InvoiceNumberSequence
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceService:
+    """
+    Bulk invoice creation.
+
+    ``create_from_template`` reserves all the invoice numbers it needs from
+    the user's ``InvoiceNumberSequence`` in one increment, works out every
+    total in Python and inserts the invoices and their items with
+    ``bulk_create``, so the number of queries does not grow with the number
+    of invoices.
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def _item(entry: Dict[str, Any]) -> InvoiceItem:
+        item = InvoiceItem(
+            description=entry['description'],
+            quantity=Decimal(str(entry['quantity'])),
+            unit_price=Decimal(str(entry['unit_price'])),
+            sku=entry.get('sku', ''),
+            tax_rate=Decimal(str(entry.get('tax_rate', 0)))
+        )
+        item.total_price = item.quantity * item.unit_price
+        return item
+
+    @classmethod
+    def create_from_template(cls, template, entries: List[Dict[str, Any]], issue_date=None) -> List[Invoice]:
+        """
+        Create one invoice per entry, in the template owner's name.
+
+        Each entry has a ``client`` and a list of ``items`` (``description``,
+        ``quantity``, ``unit_price`` and optionally ``sku`` and
+        ``tax_rate``), and may override ``due_date``, ``tax_rate``,
+        ``discount_amount``, ``currency``, ``reference_number`` and
+        ``notes``. Notes, terms and footer default to the template's.
+        """
+        if not entries:
+            return []
+
+        user = template.user
+        issue_date = issue_date or timezone.localdate()
+        invoices = []
+        items = []
+        for entry in entries:
+            client = entry['client']
+            if client.user_id != user.id:
+                raise ValueError(f"Client {client.id} does not belong to the template's owner")
+
+            invoice = Invoice(
+                user=user,
+                client=client,
+                template=template,
+                reference_number=entry.get('reference_number', ''),
+                issue_date=issue_date,
+                due_date=entry.get('due_date') or issue_date + timedelta(days=client.default_payment_terms),
+                payment_terms=client.default_payment_terms,
+                currency=entry.get('currency') or client.default_currency,
+                tax_rate=Decimal(str(entry.get('tax_rate', 0))),
+                discount_amount=Decimal(str(entry.get('discount_amount', 0))),
+                notes=entry.get('notes') or template.default_notes,
+                terms_and_conditions=template.default_terms,
+                footer=template.footer_text
+            )
+            invoice_items = [cls._item(item) for item in entry.get('items', [])]
+            invoice.subtotal = sum((item.total_price for item in invoice_items), Decimal('0'))
+            invoice._calculate_totals()
+            invoice._update_status()
+            invoices.append(invoice)
+            items.append(invoice_items)
+
+        with db_transaction.atomic():
+            first = InvoiceNumberSequence.reserve(user, count=len(invoices), day=issue_date)
+            for number, invoice in enumerate(invoices, start=first):
+                invoice.invoice_number = Invoice.format_invoice_number(issue_date, number)
+
+            Invoice.objects.bulk_create(invoices, batch_size=cls.BATCH_SIZE)
+            for invoice, invoice_items in zip(invoices, items):
+                for item in invoice_items:
+                    item.invoice = invoice
+            InvoiceItem.objects.bulk_create(
+                [item for invoice_items in items for item in invoice_items], batch_size=cls.BATCH_SIZE
+            )
+
+        logger.info(f"Created {len(invoices)} invoices for user {user.id} from template {template.id}")
+        return invoices
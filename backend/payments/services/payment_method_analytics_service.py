@@ -0,0 +1,95 @@
+"""
+Payment Method Analytics Service for SikaRemit
+Per-method usage statistics computed in one grouped query and cached per method
+"""
+
+import logging
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, Sum, Avg, Max, Q
+from django.utils import timezone
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentMethodAnalyticsService:
+    """
+    Aggregates transaction usage for every payment method a user owns.
+
+    Results are cached per (payment method, day window). Each method has a
+    version stamp that is bumped whenever one of its transactions completes,
+    so stale entries are never read again and simply expire.
+    """
+
+    CACHE_KEY_PREFIX = 'payment_method_analytics'
+    CACHE_TIMEOUT = 300  # 5 minutes
+
+    @classmethod
+    def _version_key(cls, payment_method_id: int) -> str:
+        return f"{cls.CACHE_KEY_PREFIX}:version:{payment_method_id}"
+
+    @classmethod
+    def _stats_key(cls, payment_method_id: int, days: int, version) -> str:
+        return f"{cls.CACHE_KEY_PREFIX}:{payment_method_id}:{version}:{days}d"
+
+    @classmethod
+    def get_usage_stats(cls, user, days: int = 30, method_ids: List[int] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Return usage stats keyed by payment method id for the last ``days`` days.
+
+        ``method_ids`` are the user's payment methods, for callers that have
+        loaded them already. Methods without transactions in the window are
+        absent from the result.
+        """
+        if method_ids is None:
+            from ..models.payment_method import PaymentMethod
+            method_ids = list(PaymentMethod.objects.filter(user=user).values_list('id', flat=True))
+
+        versions = cache.get_many([cls._version_key(method_id) for method_id in method_ids])
+        keys = {
+            method_id: cls._stats_key(method_id, days, versions.get(cls._version_key(method_id), 0))
+            for method_id in method_ids
+        }
+        found = cache.get_many(list(keys.values()))
+        stats = {method_id: found[key] for method_id, key in keys.items() if key in found}
+
+        missing = [method_id for method_id in method_ids if keys[method_id] not in found]
+        if missing:
+            from ..models.transaction import Transaction
+
+            start_date = timezone.now() - timedelta(days=days)
+            rows = (
+                Transaction.objects
+                .filter(payment_method_id__in=missing, created_at__gte=start_date)
+                .values('payment_method')
+                .annotate(
+                    total_transactions=Count('id'),
+                    completed_transactions=Count('id', filter=Q(status=Transaction.COMPLETED)),
+                    total_amount=Sum('amount'),
+                    avg_transaction=Avg('amount'),
+                    last_used=Max('created_at'),
+                )
+                .order_by()
+            )
+            computed = {
+                row['payment_method']: {
+                    'total_transactions': row['total_transactions'],
+                    'completed_transactions': row['completed_transactions'],
+                    'total_amount': float(row['total_amount'] or 0),
+                    'avg_transaction': float(row['avg_transaction'] or 0),
+                    'last_used': row['last_used'],
+                }
+                for row in rows
+            }
+            # Unused methods are cached as empty so they are not aggregated again
+            cache.set_many({keys[method_id]: computed.get(method_id, {}) for method_id in missing}, cls.CACHE_TIMEOUT)
+            stats.update(computed)
+
+        return {method_id: usage for method_id, usage in stats.items() if usage}
+
+    @classmethod
+    def invalidate_method_cache(cls, payment_method_id: int):
+        """Drop every cached day window for a payment method by bumping its version stamp"""
+        cache.set(cls._version_key(payment_method_id), time.time_ns(), None)
@@ -377,15 +377,16 @@ class PaymentServiceWithKYC:
                 amount=amount,
                 currency='USD',
                 status=Transaction.PENDING,
-                transaction_type=Transaction.PAYOUT
+                description=f"Payout to {merchant.business_name}",
+                metadata={'type': 'payout'}
             )
             
             # Process payout via merchant's default payout method
             payout_method = merchant.default_payout_method
             if payout_method.method_type == PaymentMethod.BANK:
-                result = PaymentService._process_bank_payout(merchant, amount)
+                result = PaymentServiceWithKYC._process_bank_payout(merchant, amount)
             elif payout_method.method_type == PaymentMethod.MOBILE_MONEY:
-                result = PaymentService._process_mobile_payout(merchant, amount)
+                result = PaymentServiceWithKYC._process_mobile_payout(merchant, amount)
             else:
                 raise ValueError(f"Unsupported payout method: {payout_method.method_type}")
             
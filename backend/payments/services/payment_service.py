@@ -2,6 +2,7 @@ from django.db import transaction
 import logging
 from typing import Dict, Optional
 from django.conf import settings
+from core.metrics import record_payment
 from ..gateway_hierarchy import gateway_registry
 
 logger = logging.getLogger(__name__)
@@ -122,6 +123,7 @@ class PaymentProcessor(BasePaymentProcessor):
                 txn.status = Transaction.FAILED
                 txn.save()
                 logger.error(f"Payment failed: {txn.id}. Reason: {gateway_response.get('error')}")
+            record_payment(txn.status, getattr(gateway, 'metrics_name', None) or type(gateway).__name__.lower())
                 
             return txn
             
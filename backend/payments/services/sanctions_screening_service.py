@@ -0,0 +1,382 @@
+"""
+Sanctions Screening Service for SikaRemit
+Prebuilt fuzzy name index for OFAC/EU sanctions and PEP list screening
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name-level score above which an entry is reported as a match
+MATCH_THRESHOLD = 0.8
+
+# Tokens shorter than this only ever match exactly (initials, "al", "bin", ...)
+MIN_FUZZY_TOKEN_LENGTH = 4
+
+# Minimum trigram Dice coefficient for two tokens to count as a fuzzy match
+TOKEN_SIMILARITY_THRESHOLD = 0.7
+
+# Similarity credited to two tokens that share a Soundex code. It is below
+# MATCH_THRESHOLD, so a sound-alike token never carries a name on its own.
+PHONETIC_MATCH_SCORE = 0.75
+
+# Minimum trigram Dice coefficient for a shared Soundex code to count
+# ("smith"/"snead" share one but no trigrams)
+PHONETIC_MIN_GRAM_SIMILARITY = 0.2
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _digit
+
+
+def normalize_name(name: str) -> List[str]:
+    """
+    Split a name into lowercase ASCII tokens.
+
+    Accents are folded ("José" -> "jose") and punctuation is treated as a
+    separator, so "AL-ASSAD, Bashar" and "al assad bashar" produce the same
+    tokens. Duplicates are dropped because names are compared as token sets.
+    """
+    if not name:
+        return []
+    folded = unicodedata.normalize('NFKD', name)
+    chars = []
+    for char in folded:
+        if unicodedata.combining(char):
+            continue
+        chars.append(char.lower() if char.isalnum() else ' ')
+    return list(dict.fromkeys(''.join(chars).split()))
+
+
+def phonetic_key(token: str) -> str:
+    """American Soundex code of a token ("mohammed" and "muhammad" -> "m530")"""
+    letters = [char for char in token if char.isalpha()]
+    if not letters:
+        return token
+    code = [letters[0]]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if char not in 'hw':
+            previous = digit
+    return ''.join(code).ljust(4, '0')
+
+
+def token_grams(token: str) -> frozenset:
+    """Character trigrams of a token, padded so the first and last letters weigh in"""
+    padded = f' {token} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def token_similarity(token1: str, token2: str) -> float:
+    """
+    Similarity of two normalized tokens in [0, 1].
+
+    Exact matches score 1.0. Longer tokens may also match on trigram overlap
+    (typos, transliteration variants), or on a shared Soundex code when they
+    also share some trigrams.
+    """
+    if token1 == token2:
+        return 1.0
+    if len(token1) < MIN_FUZZY_TOKEN_LENGTH or len(token2) < MIN_FUZZY_TOKEN_LENGTH:
+        return 0.0
+    grams1, grams2 = token_grams(token1), token_grams(token2)
+    score = 2 * len(grams1 & grams2) / (len(grams1) + len(grams2))
+    if score >= TOKEN_SIMILARITY_THRESHOLD:
+        return score
+    if score >= PHONETIC_MIN_GRAM_SIMILARITY and phonetic_key(token1) == phonetic_key(token2):
+        return PHONETIC_MATCH_SCORE
+    return 0.0
+
+
+def _soft_jaccard(pairs: List[Tuple[float, int, int]], size1: int, size2: int) -> float:
+    """
+    Token-set Jaccard where fuzzy token matches count fractionally.
+
+    ``pairs`` holds ``(similarity, token1_index, token2_index)`` for every
+    matching token pair; each token is paired at most once, best pairs first.
+    With exact matches only this is the plain Jaccard index.
+    """
+    pairs.sort(reverse=True)
+    used1, used2 = set(), set()
+    matched = 0.0
+    for similarity, index1, index2 in pairs:
+        if index1 in used1 or index2 in used2:
+            continue
+        used1.add(index1)
+        used2.add(index2)
+        matched += similarity
+    return matched / (size1 + size2 - matched) if matched else 0.0
+
+
+def name_similarity(name1: str, name2: str) -> float:
+    """Score two names without an index (used for ad-hoc comparisons)"""
+    tokens1, tokens2 = normalize_name(name1), normalize_name(name2)
+    if not tokens1 or not tokens2:
+        return 0.0
+    pairs = []
+    for index1, token1 in enumerate(tokens1):
+        for index2, token2 in enumerate(tokens2):
+            similarity = token_similarity(token1, token2)
+            if similarity:
+                pairs.append((similarity, index1, index2))
+    return _soft_jaccard(pairs, len(tokens1), len(tokens2))
+
+
+def sanctions_list_version(sanctions_data: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Content fingerprint of a set of sanctions lists"""
+    payload = json.dumps(sanctions_data, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def entry_fingerprint(source: str, entry: Dict[str, Any]) -> str:
+    """Content fingerprint of one list entry; changes whenever any field does"""
+    payload = json.dumps([source, entry], sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def diff_sanctions_lists(sanctions_data: Dict[str, List[Dict[str, Any]]],
+                         previous_fingerprints: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Entries of ``sanctions_data`` that are new or changed since the list whose
+    entry fingerprints are ``previous_fingerprints``. Removed entries are not
+    returned since they can no longer produce a hit.
+    """
+    previous = set(previous_fingerprints)
+    diff = {}
+    for source, sanctions_list in sanctions_data.items():
+        changed = [entry for entry in sanctions_list if entry_fingerprint(source, entry) not in previous]
+        if changed:
+            diff[source] = changed
+    return diff
+
+
+class SanctionsScreeningIndex:
+    """
+    In-memory fuzzy index over every entry of the loaded sanctions lists.
+
+    Entry names are normalized into token sets once, at build time. Distinct
+    tokens form a vocabulary with three posting tables:
+
+    * token -> entries containing it
+    * Soundex code -> vocabulary tokens
+    * character trigram -> vocabulary tokens
+
+    A screen first expands each query token to the similar vocabulary tokens
+    (exact, phonetic and trigram neighbours), then counts how many query
+    tokens every candidate entry matches. Entries that cannot reach the match
+    threshold even if every matched token were exact are pruned before
+    scoring, so only a handful of entries are ever scored, each exactly once.
+    """
+
+    def __init__(self, sanctions_data: Dict[str, List[Dict[str, Any]]], version: str = None):
+        started = time.perf_counter()
+        self.sanctions_data = sanctions_data
+        self.version = version or sanctions_list_version(sanctions_data)
+
+        self.entries: List[Tuple[str, Dict[str, Any]]] = []
+        self.entry_tokens: List[Tuple[int, ...]] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self.token_postings: List[List[int]] = []
+        self.token_gram_counts: List[int] = []
+        self.phonetic_postings: Dict[str, List[int]] = {}
+        self.gram_postings: Dict[str, List[int]] = {}
+
+        for source, sanctions_list in sanctions_data.items():
+            for entry in sanctions_list:
+                token_ids = tuple(self._add_token(token) for token in normalize_name(entry.get('name', '')))
+                if not token_ids:
+                    continue
+                entry_id = len(self.entries)
+                self.entries.append((source, entry))
+                self.entry_tokens.append(token_ids)
+                for token_id in token_ids:
+                    self.token_postings[token_id].append(entry_id)
+
+        self.build_time = time.perf_counter() - started
+        logger.info(
+            f"Built sanctions screening index {self.version}: {len(self.entries)} entries, "
+            f"{len(self.tokens)} distinct tokens in {self.build_time:.2f}s"
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add_token(self, token: str) -> int:
+        token_id = self.vocabulary.get(token)
+        if token_id is not None:
+            return token_id
+
+        token_id = len(self.tokens)
+        self.vocabulary[token] = token_id
+        self.tokens.append(token)
+        self.token_postings.append([])
+        if len(token) >= MIN_FUZZY_TOKEN_LENGTH:
+            grams = token_grams(token)
+            self.token_gram_counts.append(len(grams))
+            for gram in grams:
+                self.gram_postings.setdefault(gram, []).append(token_id)
+            self.phonetic_postings.setdefault(phonetic_key(token), []).append(token_id)
+        else:
+            self.token_gram_counts.append(0)
+        return token_id
+
+    def _similar_tokens(self, token: str) -> Dict[int, float]:
+        """Vocabulary tokens similar to ``token``, with their similarity"""
+        matches = {}
+        token_id = self.vocabulary.get(token)
+        if token_id is not None:
+            matches[token_id] = 1.0
+        if len(token) < MIN_FUZZY_TOKEN_LENGTH:
+            return matches
+
+        grams = token_grams(token)
+        shared_counts: Dict[int, int] = {}
+        for gram in grams:
+            for candidate_id in self.gram_postings.get(gram, ()):
+                shared_counts[candidate_id] = shared_counts.get(candidate_id, 0) + 1
+        gram_count = len(grams)
+        phonetic_ids = set(self.phonetic_postings.get(phonetic_key(token), ()))
+        for candidate_id, shared in shared_counts.items():
+            score = 2 * shared / (gram_count + self.token_gram_counts[candidate_id])
+            if score < TOKEN_SIMILARITY_THRESHOLD:
+                if score < PHONETIC_MIN_GRAM_SIMILARITY or candidate_id not in phonetic_ids:
+                    continue
+                score = PHONETIC_MATCH_SCORE
+            if score > matches.get(candidate_id, 0.0):
+                matches[candidate_id] = score
+        return matches
+
+    def search(self, name: str, threshold: float = MATCH_THRESHOLD,
+               entry_type: str = None) -> List[Tuple[int, float]]:
+        """
+        Return ``(entry_id, score)`` for every entry scoring above ``threshold``,
+        best match first. ``entry_type`` restricts results to e.g. entities.
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+
+        query_size = len(query)
+        similar = [self._similar_tokens(token) for token in query]
+
+        # A candidate matching m query tokens scores at most m / query_size, so
+        # it must match more than threshold * query_size of them. Any entry it
+        # is worth scoring therefore shows up among the first
+        # (query_size - required + 1) query tokens; scanning the most
+        # selective tokens first keeps the candidate set small.
+        required = min(query_size, int(threshold * query_size) + 1)
+        candidate_sets = []
+        for matches in similar:
+            if len(matches) == 1:
+                candidate_sets.append(self.token_postings[next(iter(matches))])
+            else:
+                entry_ids = set()
+                for token_id in matches:
+                    entry_ids.update(self.token_postings[token_id])
+                candidate_sets.append(entry_ids)
+        candidate_sets.sort(key=len)
+
+        hits: Dict[int, int] = {}
+        prefix = query_size - required + 1
+        for position, entry_ids in enumerate(candidate_sets):
+            if position < prefix:
+                for entry_id in entry_ids:
+                    hits[entry_id] = hits.get(entry_id, 0) + 1
+            else:
+                if not isinstance(entry_ids, set):
+                    entry_ids = set(entry_ids)
+                for entry_id in hits:
+                    if entry_id in entry_ids:
+                        hits[entry_id] += 1
+
+        results = []
+        for entry_id, matched in hits.items():
+            if matched < required:
+                continue
+            token_ids = self.entry_tokens[entry_id]
+            entry_size = len(token_ids)
+            best_case = min(matched, entry_size)
+            if best_case / (query_size + entry_size - best_case) <= threshold:
+                continue
+            if entry_type and self.entries[entry_id][1].get('type') != entry_type:
+                continue
+
+            pairs = []
+            for query_index, matches in enumerate(similar):
+                for entry_index, token_id in enumerate(token_ids):
+                    similarity = matches.get(token_id)
+                    if similarity:
+                        pairs.append((similarity, query_index, entry_index))
+            score = _soft_jaccard(pairs, query_size, entry_size)
+            if score > threshold:
+                results.append((entry_id, score))
+
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results
+
+    def screen(self, names: Iterable[str], threshold: float = MATCH_THRESHOLD,
+               entry_type: str = None) -> List[Dict[str, Any]]:
+        """
+        Screen a name and its aliases; each entry is reported once with the
+        best score any of the names achieved.
+        """
+        best: Dict[int, float] = {}
+        for name in names:
+            for entry_id, score in self.search(name, threshold, entry_type):
+                if score > best.get(entry_id, 0.0):
+                    best[entry_id] = score
+
+        matches = []
+        for entry_id, score in sorted(best.items(), key=lambda item: item[1], reverse=True):
+            source, entry = self.entries[entry_id]
+            matches.append({'source': source, 'entry': entry, 'score': round(score, 4)})
+        return matches
+
+
+_index_lock = threading.Lock()
+_current_index: Optional[SanctionsScreeningIndex] = None
+
+
+def get_loaded_index(version: Optional[str]) -> Optional[SanctionsScreeningIndex]:
+    """The process-wide index, if one has been built for ``version``"""
+    index = _current_index
+    if version is not None and index is not None and index.version == version:
+        return index
+    return None
+
+
+def load_index(sanctions_data: Dict[str, List[Dict[str, Any]]], version: str) -> SanctionsScreeningIndex:
+    """
+    Build the index for a list version and keep it for the life of the process.
+
+    Only one version is held at a time; concurrent callers asking for the same
+    version wait for a single build instead of each building their own.
+    """
+    global _current_index
+    with _index_lock:
+        index = get_loaded_index(version)
+        if index is None:
+            index = SanctionsScreeningIndex(sanctions_data, version)
+            _current_index = index
+        return index
+
+
+def clear_loaded_index():
+    """Drop the process-wide index (tests, or after a forced list refresh)"""
+    global _current_index
+    with _index_lock:
+        _current_index = None
@@ -0,0 +1,186 @@
+"""
+Scheduled Payout Service for SikaRemit
+Claims due scheduled payouts and fans their execution out to Celery workers
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models.scheduled_payout import ScheduledPayout
+from ..models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class PayoutAttemptFailed(Exception):
+    """A payout attempt did not complete, so its savepoint is rolled back"""
+
+
+class ScheduledPayoutDispatcher:
+    """
+    Dispatch due ``ScheduledPayout`` rows without double-paying.
+
+    Due rows are claimed in batches with ``SELECT ... FOR UPDATE SKIP
+    LOCKED`` and flipped to ``processing`` in the same transaction with a
+    single UPDATE, so any number of dispatchers can run at once and each
+    row is claimed by exactly one of them. Claimed rows are sent to
+    ``execute_scheduled_payout`` as a Celery group of ``chunks``. The worker
+    re-checks the claim under a row lock and marks it ``executing`` before
+    paying, so a redelivered task for an already started run is a no-op.
+    """
+
+    BATCH_SIZE = 1000
+    TASK_CHUNK_SIZE = 100
+
+    # Claims older than this were probably lost with their worker
+    STALE_CLAIM_AFTER = timedelta(hours=1)
+
+    # Wait before retrying a failed run, doubled after each further failure
+    RETRY_BACKOFF = timedelta(minutes=30)
+
+    def __init__(self, batch_size: int = None, task_chunk_size: int = None,
+                 max_batches: int = None, inline: bool = False):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.task_chunk_size = task_chunk_size or self.TASK_CHUNK_SIZE
+        self.max_batches = max_batches
+        self.inline = inline
+
+    def claim_batch(self, now=None) -> List[Tuple[int, str, str]]:
+        """Claim up to ``batch_size`` due payouts as ``(id, scheduled_for, previous_status)``"""
+        now = now or timezone.now()
+        with db_transaction.atomic():
+            rows = list(
+                ScheduledPayout.objects.select_for_update(skip_locked=True)
+                .filter(status__in=ScheduledPayout.DISPATCHABLE_STATUSES, next_execution__lte=now)
+                .order_by('next_execution', 'id')
+                .values_list('id', 'next_execution', 'status')[:self.batch_size]
+            )
+            if rows:
+                ScheduledPayout.objects.filter(pk__in=[row[0] for row in rows]).update(
+                    status=ScheduledPayout.PROCESSING, claimed_at=now, updated_at=now
+                )
+        return [(payout_id, scheduled_for.isoformat(), status) for payout_id, scheduled_for, status in rows]
+
+    def release(self, batch: List[Tuple[int, str, str]]):
+        """Return claimed payouts to their previous status (dispatch failed)"""
+        by_status = defaultdict(list)
+        for payout_id, _, status in batch:
+            by_status[status].append(payout_id)
+        for status, payout_ids in by_status.items():
+            ScheduledPayout.objects.filter(pk__in=payout_ids, status=ScheduledPayout.PROCESSING).update(
+                status=status, claimed_at=None
+            )
+
+    def _send(self, batch: List[Tuple[int, str, str]]):
+        from ..tasks import execute_scheduled_payout
+
+        arguments = [(payout_id, scheduled_for) for payout_id, scheduled_for, _ in batch]
+        if self.inline:
+            for payout_id, scheduled_for in arguments:
+                self.execute(payout_id, scheduled_for)
+            return
+        execute_scheduled_payout.chunks(arguments, self.task_chunk_size).group().apply_async()
+
+    def dispatch(self, now=None) -> Dict[str, Any]:
+        """Claim and send every due payout, batch by batch"""
+        now = now or timezone.now()
+        dispatched = batches = 0
+
+        while self.max_batches is None or batches < self.max_batches:
+            batch = self.claim_batch(now)
+            if not batch:
+                break
+            try:
+                self._send(batch)
+            except Exception:
+                self.release(batch)
+                raise
+            dispatched += len(batch)
+            batches += 1
+            if len(batch) < self.batch_size:
+                break
+
+        stale = ScheduledPayout.objects.filter(
+            status__in=ScheduledPayout.IN_FLIGHT_STATUSES, claimed_at__lt=now - self.STALE_CLAIM_AFTER
+        ).count()
+        if stale:
+            logger.warning(f"{stale} scheduled payouts have been processing for over {self.STALE_CLAIM_AFTER}")
+
+        return {'dispatched': dispatched, 'batches': batches, 'stale_claims': stale}
+
+    @staticmethod
+    def execute(payout_id: int, scheduled_for: str) -> str:
+        """
+        Pay one claimed payout run and schedule the next one.
+
+        The run is skipped unless it is still claimed for the same
+        ``scheduled_for`` time. It is marked ``executing`` and committed
+        before the gateway is called, so no row lock is held over the
+        network and a redelivered task skips it. Only a payout whose
+        transaction ``completed`` counts; anything else (declined, error)
+        is rolled back inside a savepoint, leaving no half-written payout
+        transaction, and the run is retried after ``RETRY_BACKOFF``,
+        doubling each time. Once ``ScheduledPayout.MAX_ATTEMPTS`` attempts
+        in a row have failed the payout is marked ``failed`` and is no
+        longer dispatched.
+        """
+        from . import PaymentService
+
+        with db_transaction.atomic():
+            payout = ScheduledPayout.objects.select_for_update().select_related('merchant').filter(
+                pk=payout_id
+            ).first()
+            if (payout is None or payout.status != ScheduledPayout.PROCESSING
+                    or payout.next_execution != parse_datetime(scheduled_for)):
+                logger.info(f"Scheduled payout {payout_id} run {scheduled_for} already handled, skipping")
+                return 'skipped'
+            started = timezone.now()
+            payout.status = ScheduledPayout.EXECUTING
+            payout.claimed_at = started
+            payout.save(update_fields=['status', 'claimed_at', 'updated_at'])
+
+        error = None
+        try:
+            with db_transaction.atomic():
+                result = PaymentService.process_payout(merchant=payout.merchant, amount=payout.amount)
+                if result.get('status') != Transaction.COMPLETED:
+                    raise PayoutAttemptFailed(result.get('error') or f"Payout {result.get('status', 'not completed')}")
+        except Exception as e:
+            error = str(e)
+
+        with db_transaction.atomic():
+            payout = ScheduledPayout.objects.select_for_update().filter(pk=payout_id).first()
+            if payout is None or payout.status != ScheduledPayout.EXECUTING or payout.claimed_at != started:
+                logger.warning(f"Scheduled payout {payout_id} run {scheduled_for} changed while paying, not recording")
+                return 'skipped'
+
+            now = timezone.now()
+            payout.claimed_at = None
+            if error is None:
+                payout.status = ScheduledPayout.ACTIVE
+                payout.failed_attempts = 0
+                payout.last_executed_at = now
+                payout.calculate_next_execution(base=max(payout.next_execution, now))
+            else:
+                payout.failed_attempts += 1
+                if payout.failed_attempts < ScheduledPayout.MAX_ATTEMPTS:
+                    payout.status = ScheduledPayout.ACTIVE
+                    payout.next_execution = now + ScheduledPayoutDispatcher.RETRY_BACKOFF * 2 ** (payout.failed_attempts - 1)
+                    logger.warning(
+                        f"Scheduled payout {payout.id} attempt {payout.failed_attempts} failed, "
+                        f"retrying at {payout.next_execution}: {error}"
+                    )
+                else:
+                    payout.status = ScheduledPayout.FAILED
+                    logger.error(f"Failed to process scheduled payout {payout.id}: {error}")
+            payout.save(update_fields=[
+                'status', 'claimed_at', 'failed_attempts', 'last_executed_at', 'next_execution', 'updated_at'
+            ])
+
+        return payout.status
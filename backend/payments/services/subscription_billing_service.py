@@ -0,0 +1,306 @@
+"""
+Subscription Billing Service for SikaRemit
+Renews subscriptions whose billing period has ended in claimed batches, and
+charges the renewals through the payment gateways
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models.payment_method import PaymentMethod
+from ..models.subscriptions import Subscription, SubscriptionDiscount, SubscriptionPayment, SubscriptionPlan
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionBillingRun:
+    """
+    Bill every subscription whose current period has ended.
+
+    Due subscriptions are claimed in batches with ``SELECT ... FOR UPDATE
+    SKIP LOCKED``. In the same transaction their periods are moved on with
+    one UPDATE per billing cycle, and one pending ``SubscriptionPayment``
+    per renewal is inserted with ``bulk_create``. A subscription is only
+    due again once its new period has ended, and payments are unique per
+    subscription and period start, so each period is billed once however
+    many runs overlap. Discounts recorded on a subscription at sign-up
+    (``metadata['discount_applied']``) are applied from a map loaded once
+    per batch.
+
+    The pending payments are charged by ``charge_subscription_payments``
+    tasks, or in-process with ``inline``. ``charge`` claims its payments,
+    then calls each payment's gateway from a thread pool of that gateway's
+    ``SUBSCRIPTION_BILLING_GATEWAY_CONCURRENCY`` size.
+    """
+
+    BATCH_SIZE = 1000
+    TASK_CHUNK_SIZE = 200
+    BILLABLE_STATUSES = ('active', 'trial')
+
+    # Payments pending or processing for longer than this were probably lost with their task
+    STALE_PAYMENT_AFTER = timedelta(hours=1)
+
+    def __init__(self, batch_size: int = None, task_chunk_size: int = None,
+                 max_batches: int = None, inline: bool = False):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.task_chunk_size = task_chunk_size or self.TASK_CHUNK_SIZE
+        self.max_batches = max_batches
+        self.inline = inline
+        self.plans: Dict[int, SubscriptionPlan] = {}
+        self.discounts: Dict[int, Tuple[Optional[SubscriptionDiscount], set]] = {}
+
+    def _load(self, rows):
+        """Add the plans and discounts of ``rows`` not seen yet to the run's maps"""
+        plan_ids = {row[1] for row in rows} - self.plans.keys()
+        if plan_ids:
+            self.plans.update(SubscriptionPlan.objects.in_bulk(plan_ids))
+
+        discount_ids = {(row[4] or {}).get('discount_applied') for row in rows} - {None} - self.discounts.keys()
+        if discount_ids:
+            for discount in SubscriptionDiscount.objects.filter(pk__in=discount_ids).prefetch_related(
+                'applicable_plans'
+            ):
+                self.discounts[discount.id] = (discount, {plan.id for plan in discount.applicable_plans.all()})
+            for discount_id in discount_ids - self.discounts.keys():
+                self.discounts[discount_id] = (None, set())
+
+    def amount(self, plan: SubscriptionPlan, metadata: Optional[dict]):
+        """Price of one period of ``plan``, after the subscription's discount"""
+        discount, plan_ids = self.discounts.get((metadata or {}).get('discount_applied'), (None, set()))
+        if discount is None or (plan_ids and plan.id not in plan_ids):
+            return plan.price
+        return discount.apply_discount(plan.price)
+
+    def claim_batch(self, until) -> Tuple[int, List[int]]:
+        """
+        Renew up to ``batch_size`` due subscriptions, or cancel those set to
+        end with their period. Returns the number claimed and the ids of the
+        new payments.
+        """
+        now = timezone.now()
+        with db_transaction.atomic():
+            rows = list(
+                Subscription.objects.select_for_update(skip_locked=True)
+                .filter(status__in=self.BILLABLE_STATUSES, current_period_end__lte=until)
+                .order_by('current_period_end', 'id')
+                .values_list('id', 'plan_id', 'current_period_end', 'cancel_at_period_end', 'metadata',
+                             'payment_method_id')[:self.batch_size]
+            )
+            if not rows:
+                return 0, []
+            self._load(rows)
+
+            canceled = [row[0] for row in rows if row[3]]
+            if canceled:
+                Subscription.objects.filter(pk__in=canceled).update(status='canceled', updated_at=now)
+
+            by_cycle = defaultdict(list)
+            payments = []
+            for subscription_id, plan_id, period_end, cancel, metadata, payment_method_id in rows:
+                plan = self.plans[plan_id]
+                days = Subscription.BILLING_CYCLE_DAYS.get(plan.billing_cycle)
+                if cancel or not days:
+                    continue
+                by_cycle[days].append(subscription_id)
+                payments.append(SubscriptionPayment(
+                    subscription_id=subscription_id,
+                    amount=self.amount(plan, metadata),
+                    currency=plan.currency,
+                    billing_period_start=period_end,
+                    billing_period_end=period_end + timedelta(days=days),
+                    payment_method=payment_method_id[:50],
+                    status='pending'
+                ))
+
+            for days, subscription_ids in by_cycle.items():
+                Subscription.objects.filter(pk__in=subscription_ids).update(
+                    current_period_start=F('current_period_end'),
+                    current_period_end=F('current_period_end') + timedelta(days=days),
+                    updated_at=now
+                )
+            SubscriptionPayment.objects.bulk_create(payments, batch_size=self.batch_size)
+
+        return len(rows), [payment.id for payment in payments]
+
+    def _send(self, payment_ids: List[int]):
+        from ..tasks import charge_subscription_payments
+
+        if self.inline:
+            self.charge(payment_ids)
+            return
+        for start in range(0, len(payment_ids), self.task_chunk_size):
+            charge_subscription_payments.delay(payment_ids[start:start + self.task_chunk_size])
+
+    def dispatch(self, until=None) -> Dict[str, Any]:
+        """Renew and charge every subscription due by ``until`` (default now), batch by batch"""
+        until = until or timezone.now()
+        billed = batches = 0
+
+        while self.max_batches is None or batches < self.max_batches:
+            claimed, payment_ids = self.claim_batch(until)
+            if not claimed:
+                break
+            if payment_ids:
+                self._send(payment_ids)
+            billed += len(payment_ids)
+            batches += 1
+            if claimed < self.batch_size:
+                break
+
+        stale = list(SubscriptionPayment.objects.filter(self._stale(timezone.now())).values_list(
+            'id', flat=True
+        )[:self.batch_size])
+        if stale:
+            logger.warning(f"Re-sending {len(stale)} subscription payments left pending or processing")
+            self._send(stale)
+
+        return {'billed': billed, 'batches': batches, 'resent': len(stale)}
+
+    @classmethod
+    def _stale(cls, now) -> Q:
+        cutoff = now - cls.STALE_PAYMENT_AFTER
+        return Q(status='pending', created_at__lt=cutoff) | Q(status='processing', updated_at__lt=cutoff)
+
+    @staticmethod
+    def idempotency_key(payment: SubscriptionPayment) -> str:
+        """Gateway idempotency key of a payment, the same for every attempt at it"""
+        return f"subscription-payment-{payment.id}"
+
+    @staticmethod
+    def _concurrency(gateway_name: str) -> int:
+        caps = settings.SUBSCRIPTION_BILLING_GATEWAY_CONCURRENCY
+        return max(1, caps.get(gateway_name, settings.SUBSCRIPTION_BILLING_DEFAULT_CONCURRENCY))
+
+    @classmethod
+    def charge(cls, payment_ids: List[int], processor=None) -> Dict[str, int]:
+        """
+        Charge the pending payments among ``payment_ids``.
+
+        The payments are first claimed: locked, moved to ``processing`` and
+        committed. A payment that another worker is charging, or has charged,
+        is skipped, unless its claim has gone stale. The gateways are then
+        called with no transaction open, from per-gateway thread pools, and
+        the results are stored afterwards. Every call carries the payment's
+        ``idempotency_key``, so charging a stale claim again after a crash
+        does not charge the customer twice.
+        """
+        from . import PaymentProcessor
+        from ..gateway_hierarchy import gateway_registry
+
+        processor = processor or PaymentProcessor()
+        results = {'completed': 0, 'failed': 0}
+
+        claimed_at = timezone.now()
+        with db_transaction.atomic():
+            payments = list(
+                SubscriptionPayment.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('subscription__user__customer_profile')
+                .filter(Q(status='pending') | cls._stale(claimed_at), pk__in=payment_ids)
+            )
+            if not payments:
+                return results
+            SubscriptionPayment.objects.filter(pk__in=[payment.id for payment in payments]).update(
+                status='processing', updated_at=claimed_at
+            )
+
+        method_ids = {int(p.payment_method) for p in payments if p.payment_method.isdigit()}
+        methods = PaymentMethod.objects.in_bulk(method_ids)
+
+        by_gateway = defaultdict(list)
+        outcomes: Dict[int, Dict[str, Any]] = {}
+        for payment in payments:
+            method = methods.get(int(payment.payment_method)) if payment.payment_method.isdigit() else None
+            if method is None or method.user_id != payment.subscription.user_id:
+                outcomes[payment.id] = {'success': False, 'error': 'No usable payment method on file'}
+                continue
+            name = gateway_registry.get_gateway_for_method(method.method_type)
+            if name not in processor.gateways:
+                name = 'mock' if 'mock' in processor.gateways else None
+            if name is None:
+                outcomes[payment.id] = {'success': False, 'error': f'No gateway for {method.method_type}'}
+                continue
+            by_gateway[name].append((payment, method))
+
+        def call(gateway, payment, method):
+            try:
+                return gateway.process_payment(
+                    amount=payment.amount, currency=payment.currency, payment_method=method,
+                    customer=payment.subscription.user.customer_profile, merchant=None,
+                    metadata={'subscription_payment_id': payment.id,
+                              'billing_period_start': payment.billing_period_start.isoformat(),
+                              'idempotency_key': cls.idempotency_key(payment)}
+                )
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+        pools = [
+            (ThreadPoolExecutor(max_workers=cls._concurrency(name), thread_name_prefix=f'billing-{name}'),
+             processor.get_gateway(name), charges)
+            for name, charges in by_gateway.items()
+        ]
+        try:
+            futures = [
+                (payment, pool.submit(call, gateway, payment, method))
+                for pool, gateway, charges in pools for payment, method in charges
+            ]
+            for payment, future in futures:
+                outcomes[payment.id] = future.result()
+        finally:
+            for pool, _, _ in pools:
+                pool.shutdown(wait=True)
+
+        cls._record(payments, outcomes, claimed_at, results)
+        logger.info(f"Charged {len(payments)} subscription payments: {results}")
+        return results
+
+    @staticmethod
+    def _record(payments: List[SubscriptionPayment], outcomes: Dict[int, Dict[str, Any]], claimed_at,
+                results: Dict[str, int]):
+        """Store the gateway outcomes of payments still held by the claim made at ``claimed_at``"""
+        now = timezone.now()
+        with db_transaction.atomic():
+            held = set(
+                SubscriptionPayment.objects.select_for_update()
+                .filter(pk__in=[payment.id for payment in payments], status='processing', updated_at=claimed_at)
+                .values_list('id', flat=True)
+            )
+            payments = [payment for payment in payments if payment.id in held]
+
+            active, past_due = [], []
+            for payment in payments:
+                outcome = outcomes[payment.id] or {}
+                if outcome.get('success'):
+                    payment.status = 'completed'
+                    payment.transaction_id = str(outcome.get('transaction_id', ''))[:100]
+                    payment.processed_at = now
+                    active.append(payment.subscription_id)
+                    results['completed'] += 1
+                else:
+                    payment.status = 'failed'
+                    payment.failure_reason = str(outcome.get('error') or outcome.get('message') or 'Declined')
+                    payment.retry_count += 1
+                    payment.next_retry_date = now + timedelta(days=1)
+                    past_due.append(payment.subscription_id)
+                    results['failed'] += 1
+                payment.updated_at = now
+
+            SubscriptionPayment.objects.bulk_update(
+                payments, ['status', 'transaction_id', 'processed_at', 'failure_reason', 'retry_count',
+                           'next_retry_date', 'updated_at']
+            )
+            if active:
+                Subscription.objects.filter(pk__in=active, status__in=['trial', 'past_due']).update(
+                    status='active', updated_at=now
+                )
+            if past_due:
+                Subscription.objects.filter(pk__in=past_due, status__in=['active', 'trial']).update(
+                    status='past_due', updated_at=now
+                )
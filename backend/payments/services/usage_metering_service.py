@@ -0,0 +1,236 @@
+"""
+Usage Metering Service for SikaRemit
+Counts metered feature usage in the cache and flushes it to SubscriptionUsage in batches
+"""
+
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models.subscriptions import SubscriptionUsage
+
+logger = logging.getLogger(__name__)
+
+
+class UsageMeter:
+    """
+    Metered usage counters for ``SubscriptionUsage`` records.
+
+    Each record has two cache counters, both changed only with atomic
+    ``incr``/``decr``:
+
+    * ``pending`` - usage not yet written to the database. ``flush`` moves
+      it into ``current_usage`` with one ``F()`` UPDATE per distinct
+      amount.
+    * ``total`` - ``current_usage`` plus everything pending, which is what
+      limit checks read. It is seeded from the database when missing and
+      expires after ``TOTAL_TIMEOUT`` so it is re-seeded now and then.
+
+    The first increment after a flush also claims the next slot of a
+    sequence in the cache and records the usage id there, so ``flush`` only
+    reads the records that changed. Recording an increment therefore costs a
+    few cache round-trips and no database write.
+    """
+
+    CACHE_KEY_PREFIX = 'subscription_usage'
+    TOTAL_TIMEOUT = 60 * 60 * 24
+    FLUSH_BATCH_SIZE = 1000
+
+    # A record whose slot was lost is queued again by its first increment after this
+    DIRTY_TIMEOUT = 60 * 60
+
+    # A slot still unwritten this many seconds after a flush first found it was lost
+    LOST_SLOT_AFTER = 30
+
+    SEQUENCE_KEY = f'{CACHE_KEY_PREFIX}:dirty_sequence'
+    FLUSHED_KEY = f'{CACHE_KEY_PREFIX}:flushed_sequence'
+    STALLED_KEY = f'{CACHE_KEY_PREFIX}:stalled_slot'
+
+    # Held while pending usage moves to the database and while totals are
+    # seeded or reset from it, so neither sees usage that is in neither place
+    WRITE_LOCK_KEY = f'{CACHE_KEY_PREFIX}:write_lock'
+    WRITE_LOCK_TIMEOUT = 60
+    WRITE_LOCK_WAIT = 5
+
+    @classmethod
+    def _key(cls, kind: str, usage_id) -> str:
+        return f"{cls.CACHE_KEY_PREFIX}:{kind}:{usage_id}"
+
+    @staticmethod
+    def _incr(key: str, amount: int, timeout=None) -> int:
+        """Atomically add ``amount`` to ``key``, creating it when missing"""
+        try:
+            return cache.incr(key, amount)
+        except ValueError:
+            if cache.add(key, amount, timeout):
+                return amount
+            return cache.incr(key, amount)
+
+    @classmethod
+    def _mark_dirty(cls, usage_id: int):
+        if not cache.add(cls._key('dirty', usage_id), True, cls.DIRTY_TIMEOUT):
+            return
+        cache.add(cls.SEQUENCE_KEY, 0, None)
+        slot = cache.incr(cls.SEQUENCE_KEY)
+        cache.set(cls._key('slot', slot), usage_id, None)
+
+    @classmethod
+    @contextmanager
+    def _write_lock(cls):
+        """Hold ``WRITE_LOCK_KEY``, waiting up to ``WRITE_LOCK_WAIT`` seconds for it"""
+        deadline = time.monotonic() + cls.WRITE_LOCK_WAIT
+        acquired = cache.add(cls.WRITE_LOCK_KEY, True, cls.WRITE_LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.01)
+            acquired = cache.add(cls.WRITE_LOCK_KEY, True, cls.WRITE_LOCK_TIMEOUT)
+        if not acquired:
+            logger.warning("Usage write lock still held after the wait, going ahead without it")
+        try:
+            yield
+        finally:
+            if acquired:
+                cache.delete(cls.WRITE_LOCK_KEY)
+
+    @classmethod
+    def _seed_totals(cls, usage_ids: List[int]) -> Dict[int, int]:
+        """Store ``current_usage`` plus pending usage as the total of each record"""
+        with cls._write_lock():
+            stored = dict(SubscriptionUsage.objects.filter(pk__in=usage_ids).values_list('id', 'current_usage'))
+            pending = cache.get_many([cls._key('pending', usage_id) for usage_id in usage_ids])
+        totals = {}
+        for usage_id in usage_ids:
+            total = stored.get(usage_id, 0) + pending.get(cls._key('pending', usage_id), 0)
+            if not cache.add(cls._key('total', usage_id), total, cls.TOTAL_TIMEOUT):
+                total = cache.get(cls._key('total', usage_id), total)
+            totals[usage_id] = total
+        return totals
+
+    @classmethod
+    def increment(cls, usage: SubscriptionUsage, amount: int = 1) -> int:
+        """Record ``amount`` of usage and return the record's new total"""
+        cls._incr(cls._key('pending', usage.id), amount)
+        cls._mark_dirty(usage.id)
+        try:
+            return cache.incr(cls._key('total', usage.id), amount)
+        except ValueError:
+            # The seed reads the pending counter, which already includes this increment
+            return cls._seed_totals([usage.id])[usage.id]
+
+    @classmethod
+    def current_many(cls, usages: Iterable[SubscriptionUsage]) -> Dict[int, int]:
+        """Current usage of each record, by id, in one cache round-trip (plus a query on misses)"""
+        usage_ids = [usage.id for usage in usages]
+        found = cache.get_many([cls._key('total', usage_id) for usage_id in usage_ids])
+        totals = {usage_id: found[cls._key('total', usage_id)]
+                  for usage_id in usage_ids if cls._key('total', usage_id) in found}
+        missing = [usage_id for usage_id in usage_ids if usage_id not in totals]
+        if missing:
+            totals.update(cls._seed_totals(missing))
+        return totals
+
+    @classmethod
+    def current(cls, usage: SubscriptionUsage) -> int:
+        return cls.current_many([usage])[usage.id]
+
+    @classmethod
+    def prefetch(cls, usages: List[SubscriptionUsage]) -> List[SubscriptionUsage]:
+        """Load ``live_usage`` for all of ``usages`` at once"""
+        totals = cls.current_many(usages)
+        for usage in usages:
+            usage._live_usage = totals[usage.id]
+        return usages
+
+    @classmethod
+    def reset(cls, usage: SubscriptionUsage):
+        """Zero the record's usage, dropping anything not yet flushed"""
+        with cls._write_lock():
+            cache.delete_many([cls._key('pending', usage.id), cls._key('total', usage.id)])
+            SubscriptionUsage.objects.filter(pk=usage.id).update(current_usage=0, updated_at=timezone.now())
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Write pending usage to the database. Returns the number of records
+        updated.
+
+        Only one flush should run at a time (``flush_subscription_usage``
+        holds a lock). A record's dirty mark is cleared before its pending
+        usage is read, so an increment that lands meanwhile marks it again
+        for the next flush.
+        """
+        flushed = cache.get(cls.FLUSHED_KEY, 0)
+        head = cache.get(cls.SEQUENCE_KEY, 0)
+        if head < flushed:
+            # The sequence was evicted and started again
+            flushed = 0
+        updated = 0
+        stalled = cache.get(cls.STALLED_KEY)
+
+        while flushed < head:
+            numbers = range(flushed + 1, min(head, flushed + cls.FLUSH_BATCH_SIZE) + 1)
+            found = cache.get_many([cls._key('slot', number) for number in numbers])
+            # A slot is claimed before its usage id is written. Stop at one still
+            # being written, unless it has been missing for LOST_SLOT_AFTER.
+            ready = []
+            for number in numbers:
+                usage_id = found.get(cls._key('slot', number))
+                if usage_id is None:
+                    if stalled is None or stalled[0] != number:
+                        stalled = (number, time.time())
+                        cache.set(cls.STALLED_KEY, stalled, None)
+                        break
+                    if time.time() - stalled[1] < cls.LOST_SLOT_AFTER:
+                        break
+                ready.append(usage_id)
+            if not ready:
+                break
+
+            updated += cls._flush_usage({usage_id for usage_id in ready if usage_id is not None})
+            cache.delete_many([cls._key('slot', number) for number in numbers[:len(ready)]])
+            flushed += len(ready)
+            cache.set(cls.FLUSHED_KEY, flushed, None)
+            if len(ready) < len(numbers):
+                break
+
+        return updated
+
+    @classmethod
+    def _flush_usage(cls, usage_ids) -> int:
+        cache.delete_many([cls._key('dirty', usage_id) for usage_id in usage_ids])
+        with cls._write_lock():
+            return cls._move_pending(usage_ids)
+
+    @classmethod
+    def _move_pending(cls, usage_ids) -> int:
+        pending = cache.get_many([cls._key('pending', usage_id) for usage_id in usage_ids])
+
+        by_amount = defaultdict(list)
+        for usage_id in usage_ids:
+            amount = pending.get(cls._key('pending', usage_id), 0)
+            if amount > 0:
+                cache.decr(cls._key('pending', usage_id), amount)
+                by_amount[amount].append(usage_id)
+
+        try:
+            now = timezone.now()
+            with db_transaction.atomic():
+                for amount, ids in by_amount.items():
+                    SubscriptionUsage.objects.filter(pk__in=ids).update(
+                        current_usage=F('current_usage') + amount, updated_at=now
+                    )
+        except Exception:
+            # Put the usage back so the next flush writes it
+            for amount, ids in by_amount.items():
+                for usage_id in ids:
+                    cls._incr(cls._key('pending', usage_id), amount)
+                    cls._mark_dirty(usage_id)
+            raise
+
+        return sum(len(ids) for ids in by_amount.values())
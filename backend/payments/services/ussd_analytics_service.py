@@ -406,10 +406,11 @@ class USSDAnalyticsService:
         Clean up old analytics records to prevent database bloat
         """
         try:
-            cutoff_date = timezone.now().date() - timedelta(days=days_to_keep)
-            deleted_count = USSDAnalytics.objects.filter(date__lt=cutoff_date).delete()
-            logger.info(f"Cleaned up {deleted_count[0]} old USSD analytics records")
-            return deleted_count[0]
+            from core.retention import purge_expired
+
+            deleted_count = purge_expired('ussd_analytics', days=days_to_keep)['deleted']
+            logger.info(f"Cleaned up {deleted_count} old USSD analytics records")
+            return deleted_count
         except Exception as e:
             logger.error(f"Failed to cleanup old analytics: {str(e)}")
             return 0
@@ -32,6 +32,36 @@ def register_gateways(sender, instance, created, **kwargs):
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to register payment gateways: {str(e)}")
 
+def invalidate_payment_method_analytics(sender, instance, created, **kwargs):
+    """Drop cached analytics of the transaction's payment method when the transaction completes"""
+    # Read, not popped: update_fraud_features runs after this receiver and clears it
+    previous_status = instance.__dict__.get('_previous_status')
+    completed = instance.status == sender.COMPLETED and (created or previous_status != sender.COMPLETED)
+    if not completed or not instance.payment_method_id:
+        return
+
+    from .services.payment_method_analytics_service import PaymentMethodAnalyticsService
+
+    PaymentMethodAnalyticsService.invalidate_method_cache(instance.payment_method_id)
+
+def remember_previous_status(sender, instance, **kwargs):
+    """Note the stored status of a completed transaction about to be saved again"""
+    if instance._state.adding or instance.pk is None or instance.status != 'completed':
+        return
+    instance._previous_status = sender._base_manager.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+def update_fraud_features(sender, instance, created, **kwargs):
+    """Fold created transactions, and transactions that just completed, into the customer's fraud features"""
+    from .services.fraud_feature_store import FraudFeatureStore
+
+    previous_status = instance.__dict__.pop('_previous_status', None)
+    completed = instance.status == 'completed' and (created or previous_status != 'completed')
+    try:
+        FraudFeatureStore.record_transaction(instance, created=created, completed=completed)
+    except Exception as e:
+        # Feature upkeep must never fail the payment itself
+        logger.error(f"Failed to update fraud features for {sender.__name__} {instance.pk}: {e}")
+
 def auto_sync_to_accounting(sender, instance, created, **kwargs):
     """Automatically sync new payments to accounting system"""
     if created and instance.amount > 0:
@@ -59,12 +89,17 @@ def handle_exemption_status(sender, instance, **kwargs):
 
 def connect_signals():
     """Connect signals after Django apps are ready"""
-    from django.db.models.signals import post_save
+    from django.db.models.signals import post_save, pre_save
     
     Transaction = apps.get_model('payments', 'Transaction')
     Payment = apps.get_model('payments', 'Payment')
     CrossBorderRemittance = apps.get_model('payments', 'CrossBorderRemittance')
     
     post_save.connect(register_gateways, sender=Transaction)
+    post_save.connect(invalidate_payment_method_analytics, sender=Transaction)
+    pre_save.connect(remember_previous_status, sender=Transaction)
+    pre_save.connect(remember_previous_status, sender=Payment)
+    post_save.connect(update_fraud_features, sender=Transaction)
+    post_save.connect(update_fraud_features, sender=Payment)
     post_save.connect(auto_sync_to_accounting, sender=Payment)
     post_save.connect(handle_exemption_status, sender=CrossBorderRemittance)
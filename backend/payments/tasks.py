@@ -5,6 +5,7 @@ from .services import PaymentService
 from .models.transaction import Transaction
 from .models.payment_method import PaymentMethod
 from users.models import Customer, Merchant
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,47 +45,29 @@ def process_payment_async(self, customer_id, merchant_id, amount, currency, paym
 @shared_task
 def process_scheduled_payments():
     """
-    Process scheduled payments that are due
+    Claim scheduled payouts that are due and fan them out to workers
+    Safe to run from several beat/dispatcher replicas at once
     """
-    from django.utils import timezone
-    from .models.scheduled_payout import ScheduledPayout
+    from .services.scheduled_payout_service import ScheduledPayoutDispatcher
 
     try:
-        # Get due scheduled payments
-        due_payments = ScheduledPayout.objects.filter(
-            status=ScheduledPayout.PENDING,
-            next_execution__lte=timezone.now()
-        )
-
-        processed = 0
-        for payment in due_payments:
-            try:
-                # Process the payment
-                result = process_payment_async.delay(
-                    customer_id=payment.merchant.user.id,
-                    merchant_id=payment.merchant.id,
-                    amount=payment.amount,
-                    currency='USD',
-                    payment_method_id=payment.payment_method.id,
-                    metadata={'scheduled_payment_id': payment.id}
-                )
-
-                payment.status = ScheduledPayout.PROCESSING
-                payment.save()
-                processed += 1
-
-            except Exception as e:
-                logger.error(f"Failed to process scheduled payment {payment.id}: {str(e)}")
-                payment.status = ScheduledPayout.FAILED
-                payment.save()
-
-        logger.info(f"Processed {processed} scheduled payments")
-        return processed
+        result = ScheduledPayoutDispatcher().dispatch()
+        logger.info(f"Dispatched {result['dispatched']} scheduled payments in {result['batches']} batches")
+        return result['dispatched']
 
     except Exception as e:
         logger.error(f"Scheduled payment processing error: {str(e)}")
         raise e
 
+@shared_task
+def execute_scheduled_payout(payout_id, scheduled_for):
+    """
+    Pay one claimed scheduled payout run
+    """
+    from .services.scheduled_payout_service import ScheduledPayoutDispatcher
+
+    return ScheduledPayoutDispatcher.execute(payout_id, scheduled_for)
+
 @shared_task
 def process_webhook_notifications():
     """
@@ -118,3 +101,125 @@ def process_webhook_notifications():
     except Exception as e:
         logger.error(f"Webhook notification processing error: {str(e)}")
         raise e
+
+@shared_task
+def score_transactions_for_fraud(transaction_ids):
+    """
+    Score a batch of transactions with the fraud model in one pass
+    Used for backfills and queue-based scoring
+    """
+    from .services.fraud_detection_ml_service import MLFraudDetectionService
+
+    transactions = Transaction.objects.filter(id__in=transaction_ids).order_by('id')
+    results = MLFraudDetectionService().score_batch(transactions)
+
+    flagged = [result['transaction_id'] for result in results if result['requires_review']]
+    logger.info(f"Fraud-scored {len(results)} transactions, {len(flagged)} flagged for review")
+    return {'scored': len(results), 'flagged': flagged}
+
+FRAUD_TRAINING_LOCK_KEY = 'fraud_model_training_lock'
+FRAUD_TRAINING_LOCK_TIMEOUT = 60 * 60 * 6  # 6 hours
+
+@shared_task
+def retrain_fraud_model(synthetic=False, since_days=None, force=False):
+    """
+    Retrain the fraud model on labeled history and publish it if it beats
+    the live model on a holdout; workers hot-swap the new artifact
+    """
+    from .services.fraud_model_training_service import FraudModelTrainer
+
+    if not cache.add(FRAUD_TRAINING_LOCK_KEY, True, FRAUD_TRAINING_LOCK_TIMEOUT):
+        logger.info("Fraud model training already in progress, skipping")
+        return None
+
+    try:
+        return FraudModelTrainer().train(synthetic=synthetic, since_days=since_days, force=force)
+    finally:
+        cache.delete(FRAUD_TRAINING_LOCK_KEY)
+
+USAGE_FLUSH_LOCK_KEY = 'subscription_usage_flush_lock'
+USAGE_FLUSH_LOCK_TIMEOUT = 60 * 10  # 10 minutes
+
+@shared_task
+def flush_subscription_usage():
+    """
+    Write metered subscription usage counted in the cache to SubscriptionUsage
+    """
+    from .services.usage_metering_service import UsageMeter
+
+    if not cache.add(USAGE_FLUSH_LOCK_KEY, True, USAGE_FLUSH_LOCK_TIMEOUT):
+        logger.info("Subscription usage flush already in progress, skipping")
+        return None
+
+    try:
+        return UsageMeter.flush()
+    finally:
+        cache.delete(USAGE_FLUSH_LOCK_KEY)
+
+@shared_task
+def run_subscription_billing():
+    """
+    Renew subscriptions whose billing period has ended and queue their charges
+    Safe to run from several beat/dispatcher replicas at once
+    """
+    from .services.subscription_billing_service import SubscriptionBillingRun
+
+    try:
+        result = SubscriptionBillingRun().dispatch()
+        logger.info(f"Billed {result['billed']} subscriptions in {result['batches']} batches")
+        return result['billed']
+
+    except Exception as e:
+        logger.error(f"Subscription billing error: {str(e)}")
+        raise e
+
+@shared_task(acks_late=True)
+def charge_subscription_payments(payment_ids):
+    """
+    Charge a chunk of pending subscription renewal payments
+    Payments no longer pending are skipped, so a redelivered chunk is harmless
+    """
+    from .services.subscription_billing_service import SubscriptionBillingRun
+
+    return SubscriptionBillingRun.charge(payment_ids)
+
+INVOICE_AGING_LOCK_KEY = 'invoice_aging_sweep_lock'
+INVOICE_AGING_LOCK_TIMEOUT = 60 * 60  # 1 hour
+
+def invoice_aging_lock_key(user_ids=None):
+    """Lock key for one sweep scope, so on-demand refreshes neither wait on nor block the full sweep"""
+    if user_ids is None:
+        return INVOICE_AGING_LOCK_KEY
+    scope = ','.join(str(user_id) for user_id in sorted(set(user_ids)))
+    return f"{INVOICE_AGING_LOCK_KEY}:users:{hashlib.md5(scope.encode()).hexdigest()}"
+
+@shared_task
+def sweep_invoice_aging(user_ids=None, send_reminders=True):
+    """
+    Update overdue invoice statuses and aging summaries, and queue overdue reminders
+    Runs nightly; pass user_ids to refresh only those users' invoices on demand
+    """
+    from .services.invoice_aging_service import InvoiceAgingSweeper
+
+    lock_key = invoice_aging_lock_key(user_ids)
+    if not cache.add(lock_key, True, INVOICE_AGING_LOCK_TIMEOUT):
+        logger.info("Invoice aging sweep already in progress, skipping")
+        return None
+
+    try:
+        return InvoiceAgingSweeper(user_ids=user_ids).sweep(send_reminders=send_reminders)
+    finally:
+        cache.delete(lock_key)
+
+@shared_task(bind=True, max_retries=3)
+def send_invoice_reminders(self, reminder_ids):
+    """
+    Email a batch of overdue invoice reminders over one SMTP connection
+    Reminders already sent are skipped, so a retry resumes where the batch stopped
+    """
+    from .services.invoice_aging_service import InvoiceAgingSweeper
+
+    sent, error = InvoiceAgingSweeper.send_reminders(reminder_ids)
+    if error is not None:
+        raise self.retry(exc=error, countdown=60 * (self.request.retries + 1))
+    return sent
@@ -0,0 +1,81 @@
+"""
+Tests for the admin transaction list
+Guards against per-row queries creeping back into the admin serializer
+"""
+
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class AdminTransactionListQueryTests(TestCase):
+    """Query-count regression tests for AdminTransactionViewSet.list"""
+
+    url = '/api/v1/payments/admin/transactions/'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='AdminPass123!'
+        )
+        self.customer_user = User.objects.create_user(
+            email='customer@example.com',
+            password='TestPass123!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _create_transactions(self, count):
+        from payments.models import Dispute
+        from payments.models.transaction import Transaction
+
+        for i in range(count):
+            transaction = Transaction.objects.create(
+                customer=self.customer_user.customer_profile,
+                amount=Decimal('10.00') + i,
+                currency='GHS',
+            )
+            # Every other transaction carries a dispute so both branches are exercised
+            if i % 2 == 0:
+                Dispute.objects.create(
+                    transaction=transaction,
+                    reason='Item not received',
+                    created_by=self.admin
+                )
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_list_includes_dispute_fields(self):
+        """Disputed rows expose dispute data, undisputed rows expose nulls"""
+        self._create_transactions(2)
+
+        _, data = self._count_list_queries()
+
+        disputed = [row for row in data if row['dispute_id'] is not None]
+        undisputed = [row for row in data if row['dispute_id'] is None]
+        self.assertEqual(len(disputed), 1)
+        self.assertEqual(len(undisputed), 1)
+        self.assertEqual(disputed[0]['dispute_status'], 'open')
+        self.assertEqual(disputed[0]['dispute_reason'], 'Item not received')
+        self.assertIsNone(undisputed[0]['dispute_status'])
+
+    def test_query_count_does_not_scale_with_rows(self):
+        """Listing 20 rows costs the same number of queries as listing 4"""
+        self._create_transactions(4)
+        small_count, small_data = self._count_list_queries()
+
+        self._create_transactions(16)
+        large_count, large_data = self._count_list_queries()
+
+        self.assertEqual(len(small_data), 4)
+        self.assertEqual(len(large_data), 20)
+        self.assertEqual(small_count, large_count)
@@ -0,0 +1,288 @@
+"""
+Tests for ML fraud detection
+Tests for the shared model registry and batch scoring
+"""
+
+import os
+import shutil
+import statistics
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from sklearn.ensemble import RandomForestClassifier
+
+from payments.services.fraud_detection_ml_service import FraudModelRegistry, MLFraudDetectionService
+from payments.services.fraud_feature_store import FraudFeatureStore
+
+User = get_user_model()
+
+
+def train_small_model(seed=0):
+    rng = np.random.RandomState(seed)
+    columns = MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS
+    X = pd.DataFrame(rng.rand(200, len(columns)), columns=columns)
+    y = (X['amount'] > 0.5).astype(int)
+    return RandomForestClassifier(n_estimators=5, random_state=seed).fit(X, y), columns
+
+
+class FraudModelRegistryTests(TestCase):
+    """Tests for FraudModelRegistry"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.registry = FraudModelRegistry(os.path.join(self.tmpdir, 'fraud_detection.pkl'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_missing_artifact_never_trains_on_request_path(self):
+        service = MLFraudDetectionService(registry=self.registry)
+
+        self.assertIsNone(service.model)
+        self.assertEqual(service.feature_columns, MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS)
+        self.assertFalse(os.path.exists(self.registry.artifact_path))
+
+    def test_model_is_loaded_once_and_shared(self):
+        model, columns = train_small_model()
+        FraudModelRegistry(self.registry.artifact_path).publish(model, columns, version='v1')
+
+        first = MLFraudDetectionService(registry=self.registry)
+        second = MLFraudDetectionService(registry=self.registry)
+
+        self.assertEqual(first.registry.get().version, 'v1')
+        self.assertIs(first.model, second.model)
+
+    def test_published_artifact_is_hot_swapped(self):
+        publisher = FraudModelRegistry(self.registry.artifact_path)
+        publisher.publish(*train_small_model(), version='v1')
+        self.assertEqual(self.registry.get().version, 'v1')
+
+        publisher.publish(*train_small_model(seed=1), version='v2')
+        os.utime(self.registry.artifact_path, (1, 1))
+        self.registry._checked_at -= FraudModelRegistry.RELOAD_CHECK_INTERVAL
+
+        self.assertEqual(self.registry.get().version, 'v2')
+
+
+class ScoreBatchTests(TestCase):
+    """Tests for MLFraudDetectionService.score_batch"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        registry = FraudModelRegistry(os.path.join(self.tmpdir, 'fraud_detection.pkl'))
+        registry.swap(*train_small_model(), version='test')
+        self.service = MLFraudDetectionService(registry=registry)
+        self.user = User.objects.create_user(email='fraud@example.com', password='TestPass123!')
+        self.customer = self.user.customer_profile
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        cache.clear()
+
+    def _create_transaction(self, amount, status='completed', age=timedelta(0), customer=None, metadata=None):
+        from payments.models.transaction import Transaction
+
+        transaction = Transaction.objects.create(
+            customer=customer or self.customer, amount=Decimal(amount), currency='GHS', metadata=metadata or {}
+        )
+        # Set the final status and age without firing the notification signals,
+        # then recompute the features the signals would have maintained
+        Transaction.objects.filter(pk=transaction.pk).update(
+            status=status, created_at=timezone.now() - age
+        )
+        FraudFeatureStore.rebuild([transaction.customer_id])
+        transaction.refresh_from_db()
+        return transaction
+
+    def test_amount_anomaly_uses_completed_history(self):
+        amounts = ['10.00', '12.00', '11.00', '9.00', '13.00']
+        for days, amount in enumerate(amounts, start=1):
+            self._create_transaction(amount, age=timedelta(days=days))
+        self._create_transaction('500.00', status='failed', age=timedelta(days=2))
+        transaction = self._create_transaction('40.00', status='pending')
+
+        features = self.service._extract_transaction_features(transaction)
+
+        history = [float(a) for a in amounts]
+        z_score = abs(40.0 - statistics.mean(history)) / statistics.stdev(history)
+        self.assertAlmostEqual(features['amount_anomaly'], min(z_score / 3.0, 1.0))
+        self.assertEqual(features['user_transaction_count'], 7)
+
+    def test_frequency_counts_recent_activity(self):
+        for minutes in (10, 120, 180):
+            self._create_transaction('5.00', age=timedelta(minutes=minutes))
+        transaction = self._create_transaction('5.00', status='pending')
+
+        features = self.service._extract_transaction_features(transaction)
+
+        # 4 in the last day, 2 in the last hour (including this one)
+        self.assertAlmostEqual(features['frequency_score'], 0.4 + 0.4)
+
+    def test_batch_matches_single_transaction_analysis(self):
+        other = User.objects.create_user(email='other@example.com', password='TestPass123!').customer_profile
+        transactions = [
+            self._create_transaction(str(10 + i), age=timedelta(hours=i)) for i in range(8)
+        ] + [self._create_transaction('75.00', customer=other)]
+
+        batch = self.service.score_batch(transactions)
+
+        self.assertEqual([r['transaction_id'] for r in batch], [t.id for t in transactions])
+        for transaction, result in zip(transactions, batch):
+            single = self.service.analyze_transaction(transaction)
+            self.assertEqual(result['features_analyzed'], single['features_analyzed'])
+            self.assertAlmostEqual(result['ml_prediction'], single['ml_prediction'])
+            self.assertEqual(result['model_version'], 'test')
+
+    def test_query_count_independent_of_batch_size(self):
+        transactions = [self._create_transaction('20.00', age=timedelta(hours=i)) for i in range(10)]
+
+        for point_in_time in (False, True):
+            cache.clear()
+            with CaptureQueriesContext(connection) as single:
+                self.service.score_batch(transactions[:1], point_in_time=point_in_time)
+            cache.clear()
+            with CaptureQueriesContext(connection) as batch:
+                self.service.score_batch(transactions, point_in_time=point_in_time)
+
+            self.assertEqual(len(single.captured_queries), len(batch.captured_queries))
+
+        # With warm features live scoring does not touch the database
+        self.service.score_batch(transactions)
+        with CaptureQueriesContext(connection) as warm:
+            self.service.score_batch(transactions)
+        self.assertEqual(len(warm.captured_queries), 0)
+
+    def test_live_features_match_point_in_time_for_new_transactions(self):
+        for days, amount in enumerate(['10.00', '14.00', '11.00', '9.00', '13.00', '12.00'], start=1):
+            self._create_transaction(amount, age=timedelta(days=days))
+        self._create_transaction('8.00', age=timedelta(minutes=30))
+        transaction = self._create_transaction('45.00', status='pending')
+
+        (live,) = self.service.score_batch([transaction])
+        (backfill,) = self.service.score_batch([transaction], point_in_time=True)
+
+        for name, value in backfill['features_analyzed'].items():
+            self.assertAlmostEqual(live['features_analyzed'][name], value, msg=name)
+
+
+    def test_training_features_match_live_features(self):
+        from payments.models.payment import Payment
+        from payments.models.payment_method import PaymentMethod
+        from payments.services.fraud_model_training_service import FraudModelTrainer
+
+        # Completed history older than 90 days, a recent payment and a known device and country
+        for days, amount in enumerate(['10.00', '14.00', '11.00', '9.00', '13.00', '12.00'], start=1):
+            self._create_transaction(amount, age=timedelta(days=days * 40))
+        method = PaymentMethod.objects.create(user=self.user, method_type='card', details={})
+        # bulk_create skips the accounting sync signal
+        Payment.objects.bulk_create([
+            Payment(customer=self.customer, amount=Decimal('30.00'), payment_method=method, status='completed')
+        ])
+        Payment.objects.filter(customer=self.customer).update(created_at=timezone.now() - timedelta(minutes=20))
+        FraudFeatureStore.rebuild([self.customer.id])
+        FraudFeatureStore.observe_context(self.customer.id, device_fingerprint='phone', country='GH')
+        transaction = self._create_transaction(
+            '45.00', status='pending', metadata={'device_fingerprint': 'laptop', 'country': 'GH'}
+        )
+
+        live = self.service._extract_transaction_features(transaction)
+        trained = FraudModelTrainer(registry=self.service.registry)._featurize([transaction]).iloc[0]
+
+        self.assertEqual((live['device_score'], live['geographic_score']), (1.0, 0.0))
+        self.assertGreater(live['amount_anomaly'], 0)
+        for column in MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS:
+            self.assertAlmostEqual(trained[column], live[column], msg=column)
+
+class FraudModelTrainerTests(TestCase):
+    """Tests for the offline training pipeline"""
+
+    def setUp(self):
+        from payments.services.fraud_model_training_service import FraudModelTrainer
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.registry = FraudModelRegistry(os.path.join(self.tmpdir, 'fraud_detection.pkl'))
+        self.service = MLFraudDetectionService(registry=self.registry)
+        self.trainer = FraudModelTrainer(
+            registry=self.registry, chunk_size=7, n_jobs=1,
+            min_labeled_samples=20, min_fraud_labels=5, min_auc=0.5
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        cache.clear()
+
+    def _label_history(self, count=40):
+        from payments.models.transaction import Transaction
+
+        customers = [
+            User.objects.create_user(email=f'train{i}@example.com', password='TestPass123!').customer_profile
+            for i in range(3)
+        ]
+        for i in range(count):
+            is_fraud = i % 4 == 0
+            transaction = Transaction.objects.create(
+                customer=customers[i % 3], amount=Decimal(700 + i if is_fraud else 10 + i),
+                currency='GHS', metadata={'channel': 'app'}
+            )
+            self.service.update_model_with_feedback(transaction.id, is_fraud)
+
+    def test_synthetic_data_is_generated_column_wise(self):
+        data = self.service._generate_synthetic_training_data(n_samples=20000)
+
+        self.assertEqual(list(data.columns), MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS + ['is_fraud'])
+        self.assertEqual(len(data), 20000)
+        self.assertAlmostEqual(data['is_fraud'].mean(), 0.05, delta=0.01)
+        fraud, normal = data[data['is_fraud'] == 1], data[data['is_fraud'] == 0]
+        self.assertGreater(fraud['amount'].mean(), normal['amount'].mean())
+
+    def test_feedback_labels_are_extracted_in_chunks(self):
+        self._label_history(count=15)
+
+        X, y = self.trainer.extract_labeled_features()
+
+        self.assertEqual(list(X.columns), MLFraudDetectionService.DEFAULT_FEATURE_COLUMNS)
+        self.assertEqual(len(X), 15)
+        self.assertEqual(int(y.sum()), 4)
+        self.assertEqual(X['amount'].tolist()[:2], [700.0, 11.0])
+
+    def test_trained_model_is_published_with_version_and_metrics(self):
+        self._label_history()
+
+        result = self.trainer.train()
+
+        self.assertEqual(result['status'], 'published')
+        self.assertEqual(result['samples'], 40)
+        self.assertGreaterEqual(result['metrics']['roc_auc'], 0.5)
+        self.assertTrue(os.path.exists(self.registry.versioned_path(result['version'])))
+
+        # Other workers load the new artifact from disk
+        loaded = FraudModelRegistry(self.registry.artifact_path).get()
+        self.assertEqual(loaded.version, result['version'])
+        self.assertEqual(loaded.metadata['metrics'], result['metrics'])
+        self.assertEqual(loaded.model.n_jobs, 1)
+
+    def test_models_failing_the_holdout_are_not_published(self):
+        self._label_history()
+        self.trainer.min_auc = 1.01
+
+        result = self.trainer.train()
+
+        self.assertEqual(result['status'], 'rejected')
+        self.assertFalse(os.path.exists(self.registry.artifact_path))
+
+    def test_training_is_skipped_without_enough_labels(self):
+        self._label_history(count=8)
+
+        result = self.trainer.train()
+
+        self.assertEqual(result['status'], 'skipped')
+        self.assertEqual(result['samples'], 8)
@@ -0,0 +1,154 @@
+"""
+Tests for the fraud feature store
+Tests for incremental feature upkeep and its use by the fraud engines
+"""
+
+import statistics
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from payments.fraud_detection import FraudDetectionEngine
+from payments.models.fraud_features import FraudFeatureProfile
+from payments.models.transaction import Transaction
+from payments.services.fraud_detection_ml_service import BehavioralAnalysisService
+from payments.services.fraud_feature_store import FraudFeatureStore
+
+User = get_user_model()
+
+
+class FraudFeatureStoreTests(TestCase):
+    """Tests for FraudFeatureStore"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='features@example.com', password='TestPass123!')
+        self.customer = self.user.customer_profile
+
+    def tearDown(self):
+        cache.clear()
+
+    def _create_transaction(self, amount, status='completed', age=timedelta(0)):
+        transaction = Transaction.objects.create(
+            customer=self.customer, amount=Decimal(amount), currency='GHS', metadata={}
+        )
+        # Bypasses the save signals, like any bulk status change
+        Transaction.objects.filter(pk=transaction.pk).update(status=status, created_at=timezone.now() - age)
+        transaction.refresh_from_db()
+        return transaction
+
+    def _forget(self):
+        FraudFeatureProfile.objects.filter(customer=self.customer).delete()
+        cache.clear()
+
+    def test_profile_is_bootstrapped_from_history(self):
+        amounts = ['10.00', '25.00', '17.50', '30.00']
+        for hours, amount in enumerate(amounts, start=1):
+            self._create_transaction(amount, age=timedelta(hours=hours * 10))
+        self._create_transaction('999.00', status='failed', age=timedelta(minutes=5))
+        self._forget()
+
+        features = FraudFeatureStore.get(self.customer.pk)
+
+        history = [float(amount) for amount in amounts]
+        self.assertEqual(features.transaction_count, 5)
+        self.assertEqual(features.completed_count, 4)
+        self.assertAlmostEqual(features.amount_mean, statistics.mean(history))
+        self.assertAlmostEqual(features.amount_std, statistics.stdev(history))
+        self.assertEqual(sum(features.hour_histogram), 4)
+        self.assertEqual(features.count_since(3600), 1)
+        self.assertEqual(features.count_since(86400), 3)
+        self.assertTrue(FraudFeatureProfile.objects.filter(customer=self.customer).exists())
+
+    def test_incremental_updates_match_rebuild(self):
+        for days, amount in enumerate(['12.00', '8.00', '15.00'], start=1):
+            self._create_transaction(amount, age=timedelta(days=days))
+        self._forget()
+        FraudFeatureStore.get(self.customer.pk)
+
+        # Creation is recorded by the save signal
+        transaction = Transaction.objects.create(
+            customer=self.customer, amount=Decimal('40.00'), currency='GHS', metadata={}
+        )
+        self.assertEqual(FraudFeatureStore.get(self.customer.pk).transaction_count, 4)
+
+        # Completion is counted once however many times it is saved
+        transaction.status = Transaction.COMPLETED
+        FraudFeatureStore.record_transaction(transaction)
+        FraudFeatureStore.record_transaction(transaction)
+        Transaction.objects.filter(pk=transaction.pk).update(status=Transaction.COMPLETED)
+        incremental = FraudFeatureStore.get(self.customer.pk)
+
+        rebuilt = FraudFeatureStore.rebuild([self.customer.pk])[self.customer.pk]
+
+        self.assertEqual(incremental.completed_count, 4)
+        self.assertAlmostEqual(incremental.amount_mean, rebuilt.amount_mean)
+        self.assertAlmostEqual(incremental.amount_std, rebuilt.amount_std)
+        self.assertEqual(incremental.hour_histogram, rebuilt.hour_histogram)
+        self.assertEqual(incremental.count_since(86400), rebuilt.count_since(86400))
+
+    def test_saving_a_completed_transaction_again_changes_nothing(self):
+        self._create_transaction('20.00', age=timedelta(days=2))
+        # Older than the activity window, so only the stored status tells a re-save apart
+        transaction = self._create_transaction('35.00', status='pending', age=timedelta(days=3))
+        self._forget()
+        FraudFeatureStore.get(self.customer.pk)
+
+        transaction.status = Transaction.COMPLETED
+        transaction.save()
+        completed = FraudFeatureStore.get(self.customer.pk)
+
+        for _ in range(3):
+            transaction.save()
+        Transaction.objects.get(pk=transaction.pk).save()
+        resaved = FraudFeatureStore.get(self.customer.pk)
+
+        self.assertEqual(completed.completed_count, 2)
+        self.assertEqual(resaved.completed_count, 2)
+        self.assertEqual(resaved.amount_mean, completed.amount_mean)
+        self.assertEqual(resaved.amount_std, completed.amount_std)
+        self.assertEqual(resaved.hour_histogram, completed.hour_histogram)
+
+    def test_warm_features_are_read_without_queries(self):
+        other = User.objects.create_user(email='other@example.com', password='TestPass123!').customer_profile
+        FraudFeatureStore.get_many([self.customer.pk, other.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            features = FraudFeatureStore.get_many([self.customer.pk, other.pk])
+
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertEqual(set(features), {self.customer.pk, other.pk})
+
+    def test_rules_share_the_profile_and_remember_context(self):
+        engine = FraudDetectionEngine()
+        data = {'customer_id': self.customer.pk, 'amount': 10, 'device_fingerprint': 'device-a',
+                'ip_address': '10.0.0.1', 'country': 'GH'}
+
+        first = engine.analyze_transaction(data)
+        second = engine.analyze_transaction(dict(data, device_fingerprint='device-b'))
+
+        self.assertEqual(first['triggered_rules'], [])
+        self.assertEqual([rule['rule'] for rule in second['triggered_rules']], ['device_fingerprint'])
+        features = FraudFeatureStore.get(self.customer.pk)
+        self.assertEqual(features.known_devices, ['device-a', 'device-b'])
+        self.assertEqual(features.known_countries, ['GH'])
+        self.assertEqual(features.last_ip, '10.0.0.1')
+
+    def test_behavioral_profile_reads_the_store(self):
+        amounts = ['20.00', '22.00', '18.00']
+        for days, amount in enumerate(amounts, start=1):
+            self._create_transaction(amount, age=timedelta(days=days))
+        self._forget()
+
+        profile = BehavioralAnalysisService()._build_user_profile(self.user)
+
+        self.assertEqual(profile['transaction_count'], 3)
+        self.assertAlmostEqual(profile['avg_amount'], 20.0)
+        self.assertAlmostEqual(profile['std_amount'], 2.0)
+        self.assertEqual(sum(count for _, count in profile['common_hours']), 3)
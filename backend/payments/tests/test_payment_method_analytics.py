@@ -0,0 +1,119 @@
+"""
+Tests for payment method analytics
+Tests for grouped aggregation, caching and cache invalidation
+"""
+
+from django.test import TestCase
+from django.db import connection
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class PaymentMethodAnalyticsTests(TestCase):
+    """Tests for PaymentMethodViewSet.analytics"""
+
+    url = '/api/v1/payments/methods/analytics/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='TestPass123!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_method(self, last4='4242'):
+        from payments.models.payment_method import PaymentMethod
+
+        return PaymentMethod.objects.create(
+            user=self.user,
+            method_type=PaymentMethod.CARD,
+            details={'brand': 'Visa', 'last4': last4}
+        )
+
+    def _create_transaction(self, method, amount, status='completed'):
+        from payments.models.transaction import Transaction
+
+        transaction = Transaction.objects.create(
+            customer=self.user.customer_profile,
+            payment_method=method,
+            amount=Decimal(amount),
+            currency='GHS',
+            metadata={}
+        )
+        # Set the final status without firing the creation notification signals
+        Transaction.objects.filter(pk=transaction.pk).update(status=status)
+        transaction.status = status
+        return transaction
+
+    def test_aggregates_per_method(self):
+        """Totals, averages and success rate are computed per method"""
+        card = self._create_method()
+        unused = self._create_method(last4='1111')
+        self._create_transaction(card, '100.00')
+        self._create_transaction(card, '50.00', status='failed')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        methods = {m['id']: m for m in response.json()['methods']}
+        self.assertEqual(methods[card.id]['total_transactions'], 2)
+        self.assertEqual(methods[card.id]['total_amount'], 150.0)
+        self.assertEqual(methods[card.id]['avg_transaction'], 75.0)
+        self.assertEqual(methods[card.id]['success_rate'], 50.0)
+        self.assertIsNotNone(methods[card.id]['last_used'])
+        self.assertEqual(methods[unused.id]['total_transactions'], 0)
+        self.assertEqual(methods[unused.id]['success_rate'], 100.0)
+        self.assertIsNone(methods[unused.id]['last_used'])
+
+    def test_query_count_independent_of_method_count(self):
+        """Ten payment methods cost the same number of queries as one"""
+        method = self._create_method()
+        self._create_transaction(method, '10.00')
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(self.url, {'days': 7})
+
+        for i in range(9):
+            extra = self._create_method(last4=f'{i:04d}')
+            self._create_transaction(extra, '10.00')
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.url, {'days': 7})
+
+        self.assertEqual(len(single.captured_queries), len(many.captured_queries))
+
+    def test_completed_transaction_invalidates_cache(self):
+        """Completing a transaction refreshes the cached analytics"""
+        method = self._create_method()
+        pending = self._create_transaction(method, '20.00', status='pending')
+
+        first = self.client.get(self.url).json()
+        self.assertEqual(first['methods'][0]['success_rate'], 0.0)
+
+        pending.status = 'completed'
+        pending.save()
+
+        second = self.client.get(self.url).json()
+        self.assertEqual(second['methods'][0]['success_rate'], 100.0)
+
+    def test_saving_a_completed_transaction_keeps_the_cache(self):
+        """Only the change to completed invalidates, without looking up the payment method"""
+        from payments.services.payment_method_analytics_service import PaymentMethodAnalyticsService
+
+        method = self._create_method()
+        completed = self._create_transaction(method, '20.00')
+        self.client.get(self.url)
+        version = cache.get(PaymentMethodAnalyticsService._version_key(method.id))
+
+        completed.description = 'Edited'
+        with CaptureQueriesContext(connection) as queries:
+            completed.save()
+
+        self.assertEqual(cache.get(PaymentMethodAnalyticsService._version_key(method.id)), version)
+        self.assertFalse(any('paymentmethod' in query['sql'].lower() for query in queries.captured_queries))
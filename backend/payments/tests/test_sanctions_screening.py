@@ -0,0 +1,246 @@
+"""
+Tests for sanctions screening
+Tests for the fuzzy screening index and its reuse across service instances
+"""
+
+from unittest.mock import patch
+from django.test import TestCase
+from django.core.cache import cache
+
+from payments.services.advanced_compliance_service import PEPSanctionsService
+from payments.services.sanctions_screening_service import (
+    MATCH_THRESHOLD, SanctionsScreeningIndex, clear_loaded_index, name_similarity, normalize_name, phonetic_key
+)
+
+SANCTIONS_DATA = {
+    'ofac': [
+        {'name': 'Viktor Anatolyevich Bout', 'type': 'individual', 'sanctions_type': 'ofac_sdn'},
+        {'name': 'Mohammed Al-Rashid', 'type': 'individual', 'sanctions_type': 'ofac_sdn'},
+        {'name': 'Kofi Mensah Boateng', 'type': 'individual', 'sanctions_type': 'ofac_sdn'},
+    ],
+    'eu': [
+        {'name': 'Example EU Sanctioned Entity', 'type': 'entity', 'sanctions_type': 'eu_sanctions'},
+        {'name': 'José Ramírez Trading', 'type': 'entity', 'sanctions_type': 'eu_sanctions'},
+    ],
+}
+
+
+class ScreeningIndexTests(TestCase):
+    """Tests for SanctionsScreeningIndex"""
+
+    def setUp(self):
+        self.index = SanctionsScreeningIndex(SANCTIONS_DATA)
+
+    def _matched_names(self, name, **kwargs):
+        return [match['entry']['name'] for match in self.index.screen([name], **kwargs)]
+
+    def test_normalization(self):
+        self.assertEqual(normalize_name('AL-RASHID, Mohammed'), ['al', 'rashid', 'mohammed'])
+        self.assertEqual(normalize_name('José  Ramírez'), ['jose', 'ramirez'])
+        self.assertEqual(phonetic_key('mohammed'), phonetic_key('muhammad'))
+
+    def test_exact_and_reordered_names_match(self):
+        self.assertEqual(self._matched_names('Viktor Anatolyevich Bout'), ['Viktor Anatolyevich Bout'])
+        self.assertEqual(self._matched_names('BOUT, Viktor Anatolyevich'), ['Viktor Anatolyevich Bout'])
+
+    def test_spelling_variants_match(self):
+        self.assertIn('Mohammed Al-Rashid', self._matched_names('Muhammad al Rashid'))
+        self.assertIn('Viktor Anatolyevich Bout', self._matched_names('Viktor Anatoliyevich Bout'))
+        self.assertIn('José Ramírez Trading', self._matched_names('Jose Ramirez Trading'))
+
+    def test_partial_or_unrelated_names_do_not_match(self):
+        self.assertEqual(self._matched_names('Kofi Mensah'), [])
+        self.assertEqual(self._matched_names('Ama Owusu'), [])
+        self.assertEqual(self._matched_names(''), [])
+
+    def test_entry_type_filter(self):
+        self.assertEqual(self._matched_names('Kofi Mensah Boateng', entry_type='entity'), [])
+        self.assertEqual(
+            self._matched_names('Example EU Sanctioned Entity', entry_type='entity'),
+            ['Example EU Sanctioned Entity']
+        )
+
+    def test_scores_match_unindexed_similarity(self):
+        query = 'Muhammad al Rashid'
+        (match,) = self.index.screen([query])
+        self.assertAlmostEqual(match['score'], name_similarity(query, match['entry']['name']), places=4)
+
+    def test_at_least_as_accurate_as_word_jaccard(self):
+        """Every pair the previous word-set Jaccard matcher accepted is still a match"""
+        for entries in SANCTIONS_DATA.values():
+            for entry in entries:
+                words = entry['name'].lower().split()
+                for query in (entry['name'].lower(), ' '.join(reversed(words))):
+                    self.assertIn(entry['name'], self._matched_names(query))
+
+    def test_sound_alike_names_are_not_matches(self):
+        """A shared Soundex code alone does not make two different people match"""
+        pairs = [('John Smith', 'John Snead'), ('Robert Johnson', 'Rupert Johnson'),
+                 ('Kwame Mensah', 'Kwame Manasseh')]
+        index = SanctionsScreeningIndex({'ofac': [{'name': listed, 'type': 'individual'} for listed, _ in pairs]})
+
+        for listed, query in pairs:
+            self.assertLess(name_similarity(listed, query), MATCH_THRESHOLD)
+            self.assertEqual(index.screen([query]), [])
+
+    def test_precision_on_near_miss_names(self):
+        """Spelling variants of listed names match; different people sharing some names do not"""
+        variants = {
+            'Muhammad al Rashid': 'Mohammed Al-Rashid',
+            'Rashid, Mohamed Al': 'Mohammed Al-Rashid',
+            'Viktor Anatoliyevich Bout': 'Viktor Anatolyevich Bout',
+            'Kofi Mensa Boateng': 'Kofi Mensah Boateng',
+            'Jose Ramires Trading': 'José Ramírez Trading',
+        }
+        near_misses = [
+            'Mohammed Al-Rahman', 'Mahmoud Al Rashid', 'Victor Bout', 'Viktor Anatolyevich Petrov',
+            'Kofi Mensah', 'Kofi Manasseh Boateng', 'Kwame Mensah Boateng', 'Jose Ramirez', 'Ramirez Trading',
+        ]
+
+        matched_variants = [query for query, listed in variants.items() if self._matched_names(query)[:1] == [listed]]
+        false_positives = [query for query in near_misses if self._matched_names(query)]
+
+        self.assertEqual(matched_variants, list(variants))
+        self.assertEqual(false_positives, [])
+
+
+class PEPSanctionsServiceIndexTests(TestCase):
+    """Tests for PEPSanctionsService sanctions screening"""
+
+    def setUp(self):
+        cache.clear()
+        clear_loaded_index()
+        cache.set(PEPSanctionsService.CACHE_KEY_SANCTIONS, SANCTIONS_DATA)
+
+    def tearDown(self):
+        clear_loaded_index()
+        cache.clear()
+
+    def test_screen_individual_reports_each_entry_once(self):
+        result = PEPSanctionsService().screen_individual({
+            'name': 'Mohammed Al Rashid',
+            'aliases': ['Muhammad Al-Rashid'],
+        })
+
+        self.assertEqual(len(result['sanctions_matches']), 1)
+        match = result['sanctions_matches'][0]
+        self.assertEqual(match['matched_name'], 'Mohammed Al-Rashid')
+        self.assertEqual(match['match_confidence'], 1.0)
+        self.assertEqual(result['overall_risk'], 'critical')
+
+    def test_screen_entity_only_matches_entities(self):
+        result = PEPSanctionsService().screen_entity({'name': 'Jose Ramirez Trading'})
+
+        self.assertEqual([m['matched_name'] for m in result['sanctions_matches']], ['José Ramírez Trading'])
+
+    def test_index_is_built_once_per_list_version(self):
+        first = PEPSanctionsService()
+
+        with patch.object(PEPSanctionsService, '_load_sanctions_data') as mock_load:
+            second = PEPSanctionsService()
+        mock_load.assert_not_called()
+        self.assertIs(first.sanctions_index, second.sanctions_index)
+
+        updated = dict(SANCTIONS_DATA, un=[{'name': 'New Listed Person', 'type': 'individual'}])
+        cache.delete(PEPSanctionsService.CACHE_KEY_SANCTIONS_VERSION)
+        cache.set(PEPSanctionsService.CACHE_KEY_SANCTIONS, updated)
+        third = PEPSanctionsService()
+
+        self.assertIsNot(third.sanctions_index, first.sanctions_index)
+        self.assertEqual(len(third.sanctions_index), 6)
+
+
+class SanctionsRescreeningJobTests(TestCase):
+    """Tests for the bulk customer base re-screen"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        User = get_user_model()
+        self.listed = User.objects.create_user(
+            email='listed@example.com', password='TestPass123!',
+            first_name='Mohammed', last_name='Al Rashid'
+        )
+        for i in range(5):
+            User.objects.create_user(
+                email=f'clean{i}@example.com', password='TestPass123!',
+                first_name='Ama', last_name=f'Owusu{i}'
+            )
+        self.later = User.objects.create_user(
+            email='later@example.com', password='TestPass123!',
+            first_name='Nikolai', last_name='Petrov'
+        )
+
+    def _run(self, sanctions_data, **kwargs):
+        from compliance.sanctions_rescreening import SanctionsRescreeningJob
+        from payments.services.sanctions_screening_service import sanctions_list_version
+
+        kwargs.setdefault('workers', 1)
+        kwargs.setdefault('chunk_size', 2)
+        return SanctionsRescreeningJob(sanctions_data, sanctions_list_version(sanctions_data), **kwargs).run()
+
+    def test_first_run_screens_everyone_against_full_list(self):
+        run = self._run(SANCTIONS_DATA)
+
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(run.users_screened, 7)
+        self.assertEqual(run.entries_screened, 5)
+        self.assertEqual(run.checkpoint_user_id, self.later.pk)
+        self.assertEqual(list(run.hits.values_list('user_id', 'matched_name')),
+                         [(self.listed.pk, 'Mohammed Al-Rashid')])
+
+    def test_list_update_only_screens_new_entries(self):
+        first = self._run(SANCTIONS_DATA)
+        updated = dict(SANCTIONS_DATA, un=[{'name': 'Nikolai Petrov', 'type': 'individual'}])
+
+        second = self._run(updated)
+
+        self.assertEqual(second.previous_run, first)
+        self.assertEqual(second.entries_screened, 1)
+        self.assertEqual(list(second.hits.values_list('user_id', flat=True)), [self.later.pk])
+        # Re-running the same list version is a no-op
+        self.assertEqual(self._run(updated), second)
+
+    def test_crashed_run_resumes_from_checkpoint(self):
+        from compliance.sanctions_rescreening import SanctionsRescreeningJob
+
+        original = SanctionsRescreeningJob._record_chunk
+        calls = []
+
+        def crash_on_second_chunk(job, run, *args):
+            calls.append(args[0])
+            if len(calls) == 2:
+                raise RuntimeError('worker lost')
+            return original(job, run, *args)
+
+        with patch.object(SanctionsRescreeningJob, '_record_chunk', crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self._run(SANCTIONS_DATA)
+
+        resumed = self._run(SANCTIONS_DATA)
+
+        self.assertEqual(resumed.status, 'completed')
+        self.assertEqual(resumed.users_screened, 7)
+        self.assertEqual(resumed.hits.count(), 1)
+
+    def test_hits_already_stored_are_not_counted_again(self):
+        from compliance.sanctions_rescreening import SanctionsRescreeningJob
+
+        original = SanctionsRescreeningJob._record_chunk
+
+        def record_twice(job, run, last_user_id, users, names, hits):
+            original(job, run, last_user_id, users, names, hits)
+            # The same hits delivered again, e.g. by an overlapping job
+            original(job, run, last_user_id, 0, 0, hits)
+
+        with patch.object(SanctionsRescreeningJob, '_record_chunk', record_twice):
+            run = self._run(SANCTIONS_DATA)
+
+        self.assertEqual(run.hits.count(), 1)
+        self.assertEqual(run.hit_count, 1)
+
+    def test_parallel_workers_match_inline_results(self):
+        run = self._run(SANCTIONS_DATA, workers=2)
+
+        self.assertEqual(run.users_screened, 7)
+        self.assertEqual(list(run.hits.values_list('user_id', flat=True)), [self.listed.pk])
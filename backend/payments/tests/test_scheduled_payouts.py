@@ -0,0 +1,215 @@
+"""
+Tests for scheduled payouts
+Tests for claim-based dispatching and idempotent execution
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.celery import app
+from payments.models.payment_method import PaymentMethod
+from payments.models.scheduled_payout import ScheduledPayout
+from payments.models.transaction import Transaction
+from payments.services import PaymentService
+from payments.services.scheduled_payout_service import ScheduledPayoutDispatcher
+from payments.tasks import execute_scheduled_payout, process_scheduled_payments
+from users.models import Merchant
+
+User = get_user_model()
+
+COMPLETED_PAYOUT = {'success': True, 'transaction_id': 'tx', 'status': Transaction.COMPLETED}
+
+
+class ScheduledPayoutDispatcherTests(TestCase):
+    """Tests for ScheduledPayoutDispatcher"""
+
+    def setUp(self):
+        user = User.objects.create_user(email='payouts@example.com', password='TestPass123!', user_type=2)
+        self.merchant = user.merchant_profile
+        self.now = timezone.now()
+
+    def _payout(self, minutes_ago=5, status=ScheduledPayout.ACTIVE, amount='50.00'):
+        return ScheduledPayout.objects.create(
+            merchant=self.merchant, amount=Decimal(amount), schedule='0 9 * * *',
+            next_execution=self.now - timedelta(minutes=minutes_ago), status=status
+        )
+
+    def test_only_due_dispatchable_payouts_are_claimed_once(self):
+        due = [self._payout(), self._payout(status=ScheduledPayout.PENDING)]
+        self._payout(minutes_ago=-60)
+        self._payout(status=ScheduledPayout.PAUSED)
+
+        claimed = ScheduledPayoutDispatcher().claim_batch(self.now)
+
+        self.assertEqual(sorted(row[0] for row in claimed), sorted(payout.id for payout in due))
+        self.assertEqual(
+            ScheduledPayout.objects.filter(status=ScheduledPayout.PROCESSING, claimed_at=self.now).count(), 2
+        )
+        # A second dispatcher finds nothing left to claim
+        self.assertEqual(ScheduledPayoutDispatcher().claim_batch(self.now), [])
+
+    def test_dispatch_fans_out_in_chunks(self):
+        payouts = [self._payout(minutes_ago=minutes) for minutes in range(1, 6)]
+
+        with patch.object(execute_scheduled_payout, 'chunks') as mock_chunks:
+            result = ScheduledPayoutDispatcher(batch_size=2, task_chunk_size=3).dispatch(self.now)
+
+        self.assertEqual(result['dispatched'], 5)
+        self.assertEqual(result['batches'], 3)
+        sent = [arguments for call in mock_chunks.call_args_list for arguments in call.args[0]]
+        self.assertEqual(sorted(payout_id for payout_id, _ in sent), sorted(p.id for p in payouts))
+        self.assertEqual({call.args[1] for call in mock_chunks.call_args_list}, {3})
+        self.assertEqual(mock_chunks.return_value.group.return_value.apply_async.call_count, 3)
+
+    def test_failed_send_releases_claims(self):
+        payout = self._payout(status=ScheduledPayout.PENDING)
+
+        with patch.object(execute_scheduled_payout, 'chunks', side_effect=ConnectionError('broker down')):
+            with self.assertRaises(ConnectionError):
+                ScheduledPayoutDispatcher().dispatch(self.now)
+
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, ScheduledPayout.PENDING)
+        self.assertIsNone(payout.claimed_at)
+
+    @patch.object(PaymentService, 'process_payout', return_value=COMPLETED_PAYOUT)
+    def test_each_run_is_paid_once(self, mock_payout):
+        payout = self._payout()
+        ((payout_id, scheduled_for, _),) = ScheduledPayoutDispatcher().claim_batch(self.now)
+
+        self.assertEqual(ScheduledPayoutDispatcher.execute(payout_id, scheduled_for), ScheduledPayout.ACTIVE)
+        # A redelivered task for the same run does nothing
+        self.assertEqual(ScheduledPayoutDispatcher.execute(payout_id, scheduled_for), 'skipped')
+
+        mock_payout.assert_called_once()
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, ScheduledPayout.ACTIVE)
+        self.assertGreater(payout.next_execution, self.now)
+        self.assertIsNotNone(payout.last_executed_at)
+
+    def test_gateway_is_called_once_the_claim_is_marked_executing(self):
+        payout = self._payout()
+        ((payout_id, scheduled_for, _),) = ScheduledPayoutDispatcher().claim_batch(self.now)
+        seen = []
+
+        def process_payout(merchant, amount):
+            seen.append(ScheduledPayout.objects.get(pk=payout_id).status)
+            # A redelivered task arriving mid-payout leaves the run alone
+            seen.append(ScheduledPayoutDispatcher.execute(payout_id, scheduled_for))
+            return COMPLETED_PAYOUT
+
+        with patch.object(PaymentService, 'process_payout', side_effect=process_payout):
+            self.assertEqual(ScheduledPayoutDispatcher.execute(payout_id, scheduled_for), ScheduledPayout.ACTIVE)
+
+        self.assertEqual(seen, [ScheduledPayout.EXECUTING, 'skipped'])
+        payout.refresh_from_db()
+        self.assertIsNone(payout.claimed_at)
+
+    @override_settings(FLUTTERWAVE_SECRET_KEY='FLWSECK_TEST-123')
+    @patch('requests.post')
+    def test_payout_declined_by_the_gateway_is_a_failed_attempt(self, mock_post):
+        mock_post.return_value = MagicMock(
+            status_code=400,
+            json=lambda: {'message': 'Insufficient funds in account'},
+            text='{"message": "Insufficient funds in account"}'
+        )
+        payout_method = MagicMock(
+            method_type=PaymentMethod.BANK, details={'bank_code': 'GCB', 'account_number': '1234567890'}
+        )
+        payout = self._payout()
+
+        # process_payout reports a gateway decline as success with a failed transaction
+        with patch.object(Merchant, 'balance', Decimal('1000.00'), create=True), \
+                patch.object(Merchant, 'default_payout_method', payout_method, create=True):
+            ScheduledPayoutDispatcher(inline=True).dispatch(self.now)
+
+        mock_post.assert_called_once()
+        payout.refresh_from_db()
+        self.assertEqual((payout.status, payout.failed_attempts), (ScheduledPayout.ACTIVE, 1))
+        self.assertIsNone(payout.last_executed_at)
+        self.assertGreater(payout.next_execution, self.now)
+        self.assertFalse(Transaction.objects.filter(merchant=self.merchant).exists())
+
+    @patch.object(PaymentService, 'process_payout', return_value={'success': False, 'error': 'Insufficient merchant balance'})
+    def test_failed_runs_are_retried_then_marked_failed(self, mock_payout):
+        payout = self._payout()
+
+        for attempt in range(1, ScheduledPayout.MAX_ATTEMPTS):
+            started = timezone.now()
+            ScheduledPayoutDispatcher(inline=True).dispatch(self.now)
+            payout.refresh_from_db()
+            self.assertEqual((payout.status, payout.failed_attempts), (ScheduledPayout.ACTIVE, attempt))
+            backoff = ScheduledPayoutDispatcher.RETRY_BACKOFF * 2 ** (attempt - 1)
+            self.assertGreaterEqual(payout.next_execution, started + backoff)
+            self.assertIsNone(payout.last_executed_at)
+            # Not retried before the backoff is over
+            self.assertEqual(ScheduledPayoutDispatcher(inline=True).dispatch(self.now)['dispatched'], 0)
+            self.now = payout.next_execution
+
+        ScheduledPayoutDispatcher(inline=True).dispatch(self.now)
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, ScheduledPayout.FAILED)
+        self.assertEqual(mock_payout.call_count, ScheduledPayout.MAX_ATTEMPTS)
+
+        # Failed is terminal
+        self.assertEqual(ScheduledPayoutDispatcher(inline=True).dispatch(self.now + timedelta(days=30))['dispatched'], 0)
+        self.assertEqual(mock_payout.call_count, ScheduledPayout.MAX_ATTEMPTS)
+
+    def test_success_after_a_retry_resets_the_attempts(self):
+        payout = self._payout()
+        with patch.object(PaymentService, 'process_payout', return_value={'success': False, 'error': 'Gateway timeout'}):
+            ScheduledPayoutDispatcher(inline=True).dispatch(self.now)
+        payout.refresh_from_db()
+
+        with patch.object(PaymentService, 'process_payout', return_value=COMPLETED_PAYOUT):
+            ScheduledPayoutDispatcher(inline=True).dispatch(payout.next_execution)
+
+        payout.refresh_from_db()
+        self.assertEqual((payout.status, payout.failed_attempts), (ScheduledPayout.ACTIVE, 0))
+        self.assertIsNotNone(payout.last_executed_at)
+        self.assertEqual((payout.next_execution.hour, payout.next_execution.minute), (9, 0))
+
+    def test_failed_attempts_roll_back_what_they_wrote(self):
+        payout = self._payout()
+
+        def half_written(error):
+            def process_payout(merchant, amount):
+                Transaction.objects.create(
+                    merchant=merchant, amount=amount, currency='USD', status=Transaction.PENDING,
+                    metadata={'type': 'payout'}
+                )
+                if isinstance(error, Exception):
+                    raise error
+                return {'success': False, 'error': error}
+            return process_payout
+
+        for failure in (DatabaseError('deadlock detected'), ValueError('Unsupported payout method'), 'Declined'):
+            with patch.object(PaymentService, 'process_payout', side_effect=half_written(failure)):
+                ScheduledPayoutDispatcher(inline=True).dispatch(payout.next_execution)
+            payout.refresh_from_db()
+            self.assertNotEqual(payout.status, ScheduledPayout.PROCESSING)
+            self.assertIsNone(payout.claimed_at)
+
+        self.assertEqual(payout.status, ScheduledPayout.FAILED)
+        self.assertEqual(payout.failed_attempts, 3)
+        self.assertFalse(Transaction.objects.filter(merchant=self.merchant).exists())
+
+    @patch.object(PaymentService, 'process_payout', return_value=COMPLETED_PAYOUT)
+    def test_beat_task_runs_chunked_group(self, mock_payout):
+        for minutes in range(1, 4):
+            self._payout(minutes_ago=minutes)
+
+        app.conf.task_always_eager = True
+        try:
+            self.assertEqual(process_scheduled_payments(), 3)
+        finally:
+            app.conf.task_always_eager = False
+
+        self.assertEqual(mock_payout.call_count, 3)
+        self.assertEqual(ScheduledPayout.objects.filter(status=ScheduledPayout.ACTIVE).count(), 3)
@@ -137,9 +137,10 @@ class FraudDetectionViewSet(viewsets.ViewSet):
 
             results = []
             fraud_service = MLFraudDetectionService()
+            high_risk_transactions = list(high_risk_transactions)
+            analyses = fraud_service.score_batch(high_risk_transactions)
 
-            for transaction in high_risk_transactions:
-                analysis = fraud_service.analyze_transaction(transaction)
+            for transaction, analysis in zip(high_risk_transactions, analyses):
                 results.append({
                     'transaction_id': transaction.id,
                     'amount': float(transaction.amount),
@@ -176,8 +177,8 @@ class FraudDetectionViewSet(viewsets.ViewSet):
             behavioral_service = BehavioralAnalysisService()
 
             # Get recent transaction for analysis
-            recent_transaction = user.customer.customer_transactions.filter(
-                status='completed'
+            recent_transaction = Transaction.objects.filter(
+                customer__user=user, status='completed'
             ).order_by('-created_at').first()
 
             if not recent_transaction:
@@ -272,36 +272,36 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         """Get payment method usage analytics"""
-        from django.db.models import Count, Sum, Avg
-        from ..models.transaction import Transaction
-        from datetime import timedelta
-        from django.utils import timezone
-        
-        user_methods = self.get_queryset()
+        from ..services.payment_method_analytics_service import PaymentMethodAnalyticsService
+
+        user_methods = list(self.get_queryset())
         
         # Get date range from query params
         days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
+        
+        # One grouped query (or a cache hit) covers every method the user owns
+        usage_stats = PaymentMethodAnalyticsService.get_usage_stats(
+            request.user, days, method_ids=[method.id for method in user_methods]
+        )
         
         analytics_data = []
         
         for method in user_methods:
-            # Get transactions using this payment method
-            transactions = Transaction.objects.filter(
-                payment_method=method,
-                created_at__gte=start_date
-            )
+            usage = usage_stats.get(method.id, {})
+            total_transactions = usage.get('total_transactions', 0)
             
             method_analytics = {
                 'id': method.id,
                 'method_type': method.method_type,
                 'display_name': self._get_display_name(method),
                 'is_default': method.is_default,
-                'total_transactions': transactions.count(),
-                'total_amount': float(transactions.aggregate(Sum('amount'))['amount__sum'] or 0),
-                'avg_transaction': float(transactions.aggregate(Avg('amount'))['amount__avg'] or 0),
-                'success_rate': self._calculate_success_rate(transactions),
-                'last_used': transactions.order_by('-created_at').first().created_at if transactions.exists() else None,
+                'total_transactions': total_transactions,
+                'total_amount': usage.get('total_amount', 0.0),
+                'avg_transaction': usage.get('avg_transaction', 0.0),
+                'success_rate': self._calculate_success_rate(
+                    total_transactions, usage.get('completed_transactions', 0)
+                ),
+                'last_used': usage.get('last_used'),
                 'created_at': method.created_at
             }
             
@@ -336,14 +336,11 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
         else:
             return method.get_method_type_display()
     
-    def _calculate_success_rate(self, transactions):
-        """Calculate success rate for transactions"""
-        total = transactions.count()
+    def _calculate_success_rate(self, total, successful):
+        """Calculate success rate from total and completed transaction counts"""
         if total == 0:
             return 100.0
         
-        from ..models.transaction import Transaction
-        successful = transactions.filter(status=Transaction.COMPLETED).count()
         return round((successful / total) * 100, 2)
 
 class TransactionViewSet(viewsets.ModelViewSet):
@@ -933,7 +930,9 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             )
 
 class AdminTransactionViewSet(viewsets.ModelViewSet):
-    queryset = Transaction.objects.all().select_related('customer', 'merchant', 'payment_method')
+    # 'dispute' is a reverse one-to-one, so joining it keeps the admin list at a
+    # constant number of queries regardless of page size.
+    queryset = Transaction.objects.all().select_related('customer', 'merchant', 'payment_method', 'dispute')
     serializer_class = AdminTransactionSerializer
     permission_classes = [IsAdminUser]
     
@@ -21,6 +21,7 @@ from ..serializers.subscriptions import (
     SubscriptionUsageSerializer, SubscriptionFeatureSerializer,
     SubscriptionAnalyticsSerializer
 )
+from ..services.usage_metering_service import UsageMeter
 
 
 # Subscription Plans
@@ -152,17 +153,17 @@ class SubscriptionViewSet(ModelViewSet):
         """Get usage statistics for subscription"""
         subscription = self.get_object()
 
-        usage_records = SubscriptionUsage.objects.filter(
+        usage_records = UsageMeter.prefetch(list(SubscriptionUsage.objects.filter(
             subscription=subscription,
             period_start__lte=timezone.now(),
             period_end__gte=timezone.now()
-        ).select_related('feature')
+        ).select_related('feature')))
 
         usage_data = []
         for usage in usage_records:
             usage_data.append({
                 'feature': usage.feature.display_name,
-                'current_usage': usage.current_usage,
+                'current_usage': usage.live_usage,
                 'limit': usage.limit,
                 'percentage': usage.usage_percentage,
                 'is_over_limit': usage.is_over_limit,
@@ -535,7 +536,7 @@ def check_feature_access(request):
 
                         if usage:
                             usage_info = {
-                                'current': usage.current_usage,
+                                'current': usage.live_usage,
                                 'limit': usage.limit,
                                 'percentage': usage.usage_percentage,
                                 'is_over_limit': usage.is_over_limit,
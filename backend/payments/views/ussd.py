@@ -808,6 +808,13 @@ class USSDHandler:
             # Fail-safe: allow transaction if compliance check fails
             return True, "Compliance check completed"
 
+    def _continue_session(self, message):
+        """Send a menu screen; messages starting with END close the session"""
+        if message.startswith('END'):
+            return self._end_session(message)
+        self.response_type = 'CON'
+        return message
+
     def _end_session(self, message):
         """End USSD session"""
         self.response_type = 'END'
@@ -13,6 +13,7 @@ from django.db.models.signals import post_save
 from django.apps import apps
 from datetime import datetime
 from django.utils import timezone
+from core.metrics import observe_webhook
 
 logger = logging.getLogger('payments.webhooks')
 
@@ -332,13 +333,14 @@ class RemittanceWebhookService:
         }
         
         try:
-            response = requests.post(
-                settings.REMITTANCE_WEBHOOK_URL,
-                data=json.dumps(payload),
-                headers=headers,
-                timeout=5
-            )
-            response.raise_for_status()
+            with observe_webhook('remittance'):
+                response = requests.post(
+                    settings.REMITTANCE_WEBHOOK_URL,
+                    data=json.dumps(payload),
+                    headers=headers,
+                    timeout=5
+                )
+                response.raise_for_status()
         except Exception as e:
             logger.error(f"Remittance webhook failed: {str(e)}")
 
@@ -372,16 +374,17 @@ class RemittanceWebhookService:
         }
         
         try:
-            response = requests.post(
-                settings.VERIFICATION_WEBHOOK_URL,
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {settings.VERIFICATION_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                timeout=5
-            )
-            response.raise_for_status()
+            with observe_webhook('verification'):
+                response = requests.post(
+                    settings.VERIFICATION_WEBHOOK_URL,
+                    json=payload,
+                    headers={
+                        "Authorization": f"Bearer {settings.VERIFICATION_API_KEY}",
+                        "Content-Type": "application/json"
+                    },
+                    timeout=5
+                )
+                response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Verification request failed: {str(e)}")
@@ -4,22 +4,11 @@ Pytest Configuration and Fixtures for SikaRemit Tests
 import pytest
 import os
 import django
-from django.conf import settings
 
 # Configure Django settings for tests
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.test_settings')
 
 
-@pytest.fixture(scope='session')
-def django_db_setup():
-    """Setup test database"""
-    settings.DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
-        'ATOMIC_REQUESTS': False,
-    }
-
-
 @pytest.fixture
 def api_client():
     """Return a DRF API client"""
@@ -0,0 +1,99 @@
+"""
+Streaming Export Tests for SikaRemit
+Tests admin report CSV/Excel exports and the async export path
+"""
+import pytest
+import io
+import os
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.test_settings')
+django.setup()
+
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+from django.http import StreamingHttpResponse
+
+
+REPORT_URL = '/api/v1/admin/reports/generate/'
+
+
+@pytest.fixture
+def admin_client(api_client, create_admin):
+    api_client.force_authenticate(user=create_admin())
+    return api_client
+
+
+@pytest.fixture
+def transactions(db):
+    """Create more transactions than the old 1000-row export cap"""
+    from django.contrib.auth import get_user_model
+    from payments.models.transaction import Transaction
+
+    user = get_user_model().objects.create_user(email='export@example.com', password='TestPass123!')
+    customer = user.customer_profile
+    Transaction.objects.bulk_create([
+        Transaction(customer=customer, amount=Decimal('5.00'), currency='GHS', status='completed')
+        for _ in range(1200)
+    ])
+    return customer
+
+
+@pytest.mark.django_db
+class TestTransactionExports:
+    """Tests for transaction report exports"""
+
+    def test_csv_export_streams_every_row(self, admin_client, transactions):
+        response = admin_client.post(REPORT_URL, {'report_type': 'transactions', 'format': 'csv'}, format='json')
+
+        assert response.status_code == 200
+        assert isinstance(response, StreamingHttpResponse)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        header_index = lines.index('ID,Amount,Currency,Status,Customer,Created')
+        data_rows = lines[header_index + 1:]
+        assert len(data_rows) == 1200
+        assert 'Total Count,1200' in lines
+
+    def test_excel_export_contains_every_row(self, admin_client, transactions):
+        from openpyxl import load_workbook
+
+        response = admin_client.post(REPORT_URL, {'report_type': 'transactions', 'format': 'excel'}, format='json')
+
+        assert response.status_code == 200
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        data_sheet = workbook['Data']
+        # Header plus one row per transaction
+        assert data_sheet.max_row == 1201
+        assert 'Summary' in workbook.sheetnames
+
+    def test_large_export_is_generated_async(self, admin_client, transactions):
+        task = MagicMock(id='task-123')
+        with patch('accounts.tasks.generate_admin_report_export.delay', return_value=task) as mock_delay:
+            response = admin_client.post(
+                REPORT_URL,
+                {'report_type': 'transactions', 'format': 'csv', 'async': True},
+                format='json'
+            )
+
+        assert response.status_code == 202
+        assert response.data['task_id'] == 'task-123'
+        mock_delay.assert_called_once_with('transactions', 'csv', None, None)
+
+
+@pytest.mark.django_db
+class TestStreamingExportStorage:
+    """Tests for writing exports to file storage from a worker"""
+
+    def test_save_writes_csv_to_storage(self, transactions, tmp_path, settings):
+        from core.exports import StreamingExport
+        from payments.models.transaction import Transaction
+
+        settings.MEDIA_ROOT = str(tmp_path)
+        export = StreamingExport(Transaction.objects.order_by('id'), [('ID', 'id'), ('Amount', 'amount')])
+
+        stored_path, row_count = export.save('exports/test.csv', 'csv')
+
+        assert row_count == 1200
+        content = (tmp_path / stored_path).read_text().splitlines()
+        assert content[0] == 'ID,Amount'
+        assert len(content) == 1201
@@ -0,0 +1,60 @@
+"""
+Hot Path Benchmark Tests for SikaRemit
+Tests the benchmark suite's measurements and regression gate
+"""
+from django.test import TestCase
+
+from core.hot_path_benchmarks import HotPathBenchmarkSuite, measure, percentile
+from payments.models.transaction import Transaction
+
+
+def report(**operations):
+    return {'operations': operations}
+
+
+class HotPathBenchmarkSuiteTests(TestCase):
+    """Tests for HotPathBenchmarkSuite"""
+
+    def test_percentiles_use_nearest_rank(self):
+        samples = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(percentile(samples, 0.50), 50.0)
+        self.assertEqual(percentile(samples, 0.99), 99.0)
+        self.assertEqual(percentile([3.0], 0.99), 3.0)
+
+    def test_measure_counts_queries_per_operation(self):
+        result = measure(lambda i: list(Transaction.objects.all()[:1]), iterations=4, warmup=1)
+
+        self.assertEqual(result['iterations'], 4)
+        self.assertEqual(result['queries_per_op'], 1.0)
+        self.assertGreater(result['ops_per_sec'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_every_hot_path_runs_and_leaves_no_data_behind(self):
+        result = HotPathBenchmarkSuite(iterations=2, warmup=0).run()
+
+        self.assertEqual(list(result['operations']), HotPathBenchmarkSuite.OPERATIONS)
+        self.assertEqual(result['operations']['wallet_transfer']['iterations'], 2)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_regressions_past_threshold_are_reported(self):
+        baseline = report(
+            fee_calculation={'ops_per_sec': 1000.0, 'p50_ms': 1.0, 'p99_ms': 2.0, 'queries_per_op': 1.0},
+            currency_conversion={'ops_per_sec': 2000.0, 'p50_ms': 0.5, 'p99_ms': 1.0, 'queries_per_op': 1.0},
+        )
+        current = report(
+            fee_calculation={'ops_per_sec': 700.0, 'p50_ms': 1.1, 'p99_ms': 2.1, 'queries_per_op': 2.0},
+            currency_conversion={'ops_per_sec': 1900.0, 'p50_ms': 0.55, 'p99_ms': 1.1, 'queries_per_op': 1.0},
+            ussd_request={'ops_per_sec': 1.0, 'p50_ms': 9.0, 'p99_ms': 9.0, 'queries_per_op': 9.0},
+        )
+
+        regressions = HotPathBenchmarkSuite.compare(current, baseline, threshold=0.2)
+
+        self.assertEqual(
+            sorted((item['operation'], item['metric']) for item in regressions),
+            [('fee_calculation', 'ops_per_sec'), ('fee_calculation', 'queries_per_op')]
+        )
+
+    def test_unknown_operations_are_rejected(self):
+        with self.assertRaises(ValueError):
+            HotPathBenchmarkSuite(operations=['payment_creation'])
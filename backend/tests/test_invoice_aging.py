@@ -0,0 +1,190 @@
+"""
+Invoice Aging Tests for SikaRemit
+Tests the overdue status sweep, per-user aging summaries and batched overdue reminders
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.celery import app
+from payments.models.invoices import BusinessClient, Invoice, InvoiceAgingSummary, InvoiceReminder
+from payments.services.invoice_aging_service import InvoiceAgingSweeper
+from payments.tasks import invoice_aging_lock_key, sweep_invoice_aging
+
+User = get_user_model()
+
+
+class InvoiceAgingTestCase(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(email='receivables@example.com', password='TestPass123!', user_type=2)
+        self.client_account = self.create_client(self.user, 'acme@example.com')
+        mail.outbox = []
+
+    @staticmethod
+    def create_client(user, email):
+        return BusinessClient.objects.create(
+            user=user, company_name=email.split('@')[0].title(), contact_person='Ama Mensah', email=email,
+            address_line_1='2 Ring Rd', city='Accra', country='Ghana'
+        )
+
+    def create_invoice(self, days_overdue, amount='100.00', status='sent', user=None, client=None, **fields):
+        """An invoice stored as ``status`` whatever its due date, as the sweep finds stale rows"""
+        fields.setdefault('sent_at', timezone.now() - timedelta(days=days_overdue + 30))
+        invoice = Invoice.objects.create(
+            user=user or self.user, client=client or self.client_account, subtotal=Decimal(amount),
+            due_date=self.today + timedelta(days=1), **fields
+        )
+        Invoice.objects.filter(pk=invoice.pk).update(due_date=self.today - timedelta(days=days_overdue), status=status)
+        invoice.refresh_from_db()
+        return invoice
+
+    @staticmethod
+    def status(invoice):
+        return Invoice.objects.values_list('status', flat=True).get(pk=invoice.pk)
+
+
+class OverdueSweepTests(InvoiceAgingTestCase):
+    """Tests for InvoiceAgingSweeper.mark_overdue"""
+
+    def test_statuses_follow_the_due_date(self):
+        late = self.create_invoice(5)
+        viewed = self.create_invoice(1, status='viewed')
+        due_today = self.create_invoice(0)
+        partly_paid = self.create_invoice(10, status='partially_paid', amount_paid=Decimal('40.00'))
+        paid = self.create_invoice(10, status='paid', amount_paid=Decimal('100.00'))
+        cancelled = self.create_invoice(10, status='cancelled')
+        extended = self.create_invoice(-7, status='overdue')
+
+        with self.assertNumQueries(2):
+            self.assertEqual(InvoiceAgingSweeper().mark_overdue(), (2, 1))
+
+        self.assertEqual(
+            [self.status(invoice) for invoice in (late, viewed, due_today, partly_paid, paid, cancelled, extended)],
+            ['overdue', 'overdue', 'sent', 'partially_paid', 'paid', 'cancelled', 'sent']
+        )
+
+    def test_sweep_matches_saving_each_invoice(self):
+        invoices = [self.create_invoice(days) for days in (-3, 0, 1, 40)]
+
+        InvoiceAgingSweeper().mark_overdue()
+        swept = [self.status(invoice) for invoice in invoices]
+        for invoice in invoices:
+            invoice.save()
+
+        self.assertEqual(swept, [self.status(invoice) for invoice in invoices])
+
+
+class AgingSummaryTests(InvoiceAgingTestCase):
+    """Tests for InvoiceAgingSweeper.refresh_summaries"""
+
+    def test_outstanding_amounts_are_bucketed_by_days_overdue(self):
+        for days, amount in ((-5, '10.00'), (0, '20.00'), (1, '30.00'), (30, '40.00'), (31, '50.00'),
+                             (75, '60.00'), (90, '70.00'), (91, '80.00'), (400, '90.00')):
+            self.create_invoice(days, amount=amount)
+        self.create_invoice(15, amount='500.00', status='draft', sent_at=None)
+        self.create_invoice(15, amount='500.00', status='paid', amount_paid=Decimal('500.00'))
+        self.create_invoice(15, amount='25.00', status='partially_paid', amount_paid=Decimal('5.00'))
+        self.create_invoice(15, amount='7.00', currency='GHS')
+
+        self.assertEqual(InvoiceAgingSweeper().refresh_summaries(), 2)
+
+        summary = InvoiceAgingSummary.objects.get(user=self.user, currency='USD')
+        self.assertEqual(
+            [(getattr(summary, f'{bucket}_count'), getattr(summary, f'{bucket}_amount'))
+             for bucket in InvoiceAgingSummary.BUCKETS],
+            [(2, Decimal('30.00')), (3, Decimal('90.00')), (1, Decimal('50.00')),
+             (2, Decimal('130.00')), (2, Decimal('170.00'))]
+        )
+        self.assertEqual(summary.total_outstanding, Decimal('470.00'))
+        self.assertEqual(summary.overdue_amount, Decimal('440.00'))
+        self.assertEqual(InvoiceAgingSummary.objects.get(currency='GHS').days_0_30_amount, Decimal('7.00'))
+
+    def test_on_demand_refresh_only_touches_its_users(self):
+        other = User.objects.create_user(email='other-receivables@example.com', password='TestPass123!')
+        other_client = self.create_client(other, 'globex@example.com')
+        self.create_invoice(10)
+        self.create_invoice(10, user=other, client=other_client)
+        InvoiceAgingSweeper().refresh_summaries()
+
+        Invoice.objects.filter(user=self.user).update(status='paid')
+        Invoice.objects.filter(user=other).update(status='paid')
+        InvoiceAgingSweeper(user_ids=[self.user.id]).refresh_summaries()
+
+        self.assertFalse(InvoiceAgingSummary.objects.filter(user=self.user).exists())
+        self.assertTrue(InvoiceAgingSummary.objects.filter(user=other).exists())
+
+
+    def test_on_demand_refresh_runs_during_the_full_sweep(self):
+        self.create_invoice(10)
+        cache.add(invoice_aging_lock_key(), True, 60)
+        try:
+            self.assertIsNone(sweep_invoice_aging())
+            result = sweep_invoice_aging(user_ids=[self.user.id], send_reminders=False)
+
+            # Refreshes of the same users still do not overlap
+            cache.add(invoice_aging_lock_key([self.user.id]), True, 60)
+            self.assertIsNone(sweep_invoice_aging(user_ids=[self.user.id]))
+        finally:
+            cache.clear()
+
+        self.assertEqual(result['marked_overdue'], 1)
+        self.assertTrue(InvoiceAgingSummary.objects.filter(user=self.user).exists())
+
+@override_settings(INVOICE_REMINDER_BATCH_SIZE=2)
+class OverdueReminderTests(InvoiceAgingTestCase):
+    """Tests for the batched overdue reminders"""
+
+    def sweep_eagerly(self, **options):
+        app.conf.task_always_eager = True
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                return InvoiceAgingSweeper().sweep(**options)
+        finally:
+            app.conf.task_always_eager = False
+
+    def test_overdue_invoices_are_reminded_in_batches(self):
+        overdue = [self.create_invoice(days) for days in (3, 12, 40, 95, 200)]
+        self.create_invoice(-2)
+        self.create_invoice(8, status='draft', sent_at=None)
+
+        with patch('payments.services.invoice_aging_service.get_connection', wraps=mail.get_connection) as connect:
+            result = self.sweep_eagerly()
+
+        self.assertEqual(result['reminders'], 5)
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual({message.to[0] for message in mail.outbox}, {'acme@example.com'})
+        message = next(message for message in mail.outbox if overdue[1].invoice_number in message.subject)
+        self.assertIn('overdue by 12 days', message.body)
+        self.assertEqual(InvoiceReminder.objects.filter(is_sent=True, is_successful=True).count(), 5)
+
+        self.assertEqual(self.sweep_eagerly()['reminders'], 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_reminders_repeat_after_the_interval(self):
+        invoice = self.create_invoice(20)
+        self.sweep_eagerly()
+        InvoiceReminder.objects.update(created_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(self.sweep_eagerly()['reminders'], 1)
+        self.assertEqual(invoice.reminders.count(), 2)
+
+    def test_command_can_skip_reminders(self):
+        self.create_invoice(20)
+        out = StringIO()
+
+        call_command('sweep_invoice_aging', '--user', str(self.user.id), '--no-reminders', stdout=out)
+
+        self.assertIn('Marked 1 invoices overdue', out.getvalue())
+        self.assertFalse(InvoiceReminder.objects.exists())
+        self.assertEqual(InvoiceAgingSummary.objects.get(user=self.user).days_0_30_count, 1)
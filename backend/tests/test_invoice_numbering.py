@@ -0,0 +1,193 @@
+"""
+Invoice Numbering and Totals Tests for SikaRemit
+Tests per-user invoice number sequences, incremental invoice totals and bulk creation from templates
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from payments.models.invoices import BusinessClient, Invoice, InvoiceItem, InvoiceNumberSequence, InvoiceTemplate
+from payments.services.invoice_service import InvoiceService
+
+User = get_user_model()
+
+
+class InvoiceTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='billing@example.com', password='TestPass123!', user_type=2)
+        self.client_account = self.create_client(self.user, 'acme@example.com')
+        self.template = InvoiceTemplate.objects.create(
+            user=self.user, name='Standard', company_name='Billing Ltd', company_address='1 High St, Accra',
+            company_email='billing@example.com', default_notes='Thank you', default_terms='Net 14'
+        )
+
+    @staticmethod
+    def create_client(user, email):
+        return BusinessClient.objects.create(
+            user=user, company_name=email.split('@')[0].title(), email=email, address_line_1='2 Ring Rd',
+            city='Accra', country='Ghana', default_payment_terms=14, default_currency='GHS'
+        )
+
+    def create_invoice(self, **fields):
+        fields.setdefault('due_date', timezone.localdate() + timedelta(days=30))
+        return Invoice.objects.create(user=self.user, client=self.client_account, **fields)
+
+
+class InvoiceNumberingTests(InvoiceTestCase):
+    """Tests for InvoiceNumberSequence"""
+
+    def test_numbers_are_sequential_per_user(self):
+        other = User.objects.create_user(email='other-biller@example.com', password='TestPass123!')
+        other_client = self.create_client(other, 'globex@example.com')
+        prefix = f"INV-{timezone.localdate().strftime('%Y%m%d')}"
+
+        first = self.create_invoice()
+        second = self.create_invoice()
+        others = Invoice.objects.create(user=other, client=other_client, due_date=timezone.localdate())
+
+        self.assertEqual(first.invoice_number, f'{prefix}-0001')
+        self.assertEqual(second.invoice_number, f'{prefix}-0002')
+        self.assertEqual(others.invoice_number, f'{prefix}-0001')
+
+    def test_reserve_hands_out_disjoint_ranges(self):
+        day = date(2026, 5, 4)
+
+        self.assertEqual(InvoiceNumberSequence.reserve(self.user, count=3, day=day), 1)
+        self.assertEqual(InvoiceNumberSequence.reserve(self.user, count=2, day=day), 4)
+        self.assertEqual(InvoiceNumberSequence.reserve(self.user, day=day), 6)
+        self.assertEqual(InvoiceNumberSequence.reserve(self.user, day=day + timedelta(days=1)), 1)
+
+    def test_numbering_does_not_scan_invoices(self):
+        self.create_invoice()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.create_invoice()
+
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "payments_invoice"' in query['sql']])
+
+
+class InvoiceTotalsTests(InvoiceTestCase):
+    """Tests for the incrementally maintained invoice totals"""
+
+    def add_item(self, invoice, quantity, unit_price):
+        return InvoiceItem.objects.create(
+            invoice=invoice, description='Consulting', quantity=Decimal(quantity), unit_price=Decimal(unit_price)
+        )
+
+    def test_items_update_the_stored_totals(self):
+        invoice = self.create_invoice(tax_rate=Decimal('12.5'), discount_amount=Decimal('5.00'))
+        first = self.add_item(invoice, '2', '10.00')
+        self.add_item(Invoice.objects.get(pk=invoice.pk), '1', '30.00')
+
+        stored = Invoice.objects.get(pk=invoice.pk)
+        self.assertEqual((stored.subtotal, stored.tax_amount, stored.total_amount, stored.amount_due),
+                         (Decimal('50.00'), Decimal('6.25'), Decimal('51.25'), Decimal('51.25')))
+
+        item = InvoiceItem.objects.get(pk=first.pk)
+        item.quantity = Decimal('3')
+        item.save()
+        InvoiceItem.objects.get(description='Consulting', unit_price=Decimal('30.00')).delete()
+
+        stored.refresh_from_db()
+        self.assertEqual((stored.subtotal, stored.tax_amount, stored.total_amount),
+                         (Decimal('30.00'), Decimal('3.75'), Decimal('28.75')))
+
+    def test_loaded_invoice_stays_in_step(self):
+        invoice = self.create_invoice()
+        self.add_item(invoice, '4', '2.50')
+
+        self.assertEqual(invoice.subtotal, Decimal('10.00'))
+        invoice.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal('10.00'))
+
+    def test_saving_a_stale_invoice_keeps_item_changes(self):
+        invoice = self.create_invoice(tax_rate=Decimal('10'))
+        self.add_item(Invoice.objects.get(pk=invoice.pk), '2', '25.00')
+
+        invoice.record_payment(Decimal('20.00'), payment_method='bank_transfer')
+
+        stored = Invoice.objects.get(pk=invoice.pk)
+        self.assertEqual((stored.subtotal, stored.total_amount, stored.amount_paid, stored.amount_due),
+                         (Decimal('50.00'), Decimal('55.00'), Decimal('20.00'), Decimal('35.00')))
+        self.assertEqual(stored.status, 'partially_paid')
+
+    def test_bulk_item_deletes_update_the_totals(self):
+        invoice = self.create_invoice()
+        other = self.create_invoice()
+        for target, quantity in ((invoice, '1'), (invoice, '2'), (invoice, '5'), (other, '3')):
+            self.add_item(target, quantity, '10.00')
+
+        invoice.items.filter(quantity__lt=Decimal('5')).delete()
+        InvoiceItem.objects.filter(invoice=other).delete()
+
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).total_amount, Decimal('50.00'))
+        self.assertEqual(Invoice.objects.get(pk=other.pk).total_amount, Decimal('0.00'))
+        self.assertEqual(InvoiceItem.objects.count(), 1)
+
+    def test_mark_as_sent_only_writes_its_fields(self):
+        invoice = self.create_invoice()
+        self.add_item(Invoice.objects.get(pk=invoice.pk), '1', '99.00')
+
+        with CaptureQueriesContext(connection) as queries:
+            invoice.mark_as_sent()
+
+        self.assertEqual(len(queries), 1)
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.status, 'sent')
+        self.assertEqual(invoice.subtotal, Decimal('99.00'))
+
+
+class BulkInvoiceCreationTests(InvoiceTestCase):
+    """Tests for InvoiceService.create_from_template"""
+
+    def entries(self, count):
+        return [
+            {'client': self.client_account, 'tax_rate': '10', 'items': [
+                {'description': 'Hosting', 'quantity': 1, 'unit_price': '20.00'},
+                {'description': 'Support', 'quantity': '2', 'unit_price': '7.50'},
+            ]}
+            for _ in range(count)
+        ]
+
+    def test_invoices_are_created_from_the_template(self):
+        issue_date = date(2026, 6, 1)
+        self.create_invoice()
+
+        invoices = InvoiceService.create_from_template(self.template, self.entries(3), issue_date=issue_date)
+
+        self.assertEqual([invoice.invoice_number for invoice in invoices],
+                         ['INV-20260601-0001', 'INV-20260601-0002', 'INV-20260601-0003'])
+        stored = Invoice.objects.get(pk=invoices[0].pk)
+        self.assertEqual((stored.subtotal, stored.tax_amount, stored.total_amount),
+                         (Decimal('35.00'), Decimal('3.50'), Decimal('38.50')))
+        self.assertEqual(stored.due_date, date(2026, 6, 15))
+        self.assertEqual((stored.currency, stored.notes, stored.terms_and_conditions), ('GHS', 'Thank you', 'Net 14'))
+        self.assertEqual(stored.items.count(), 2)
+
+    def test_queries_do_not_grow_with_invoice_count(self):
+        # The first invoice of the day also creates the day's counter
+        InvoiceService.create_from_template(self.template, self.entries(1))
+
+        with CaptureQueriesContext(connection) as few:
+            InvoiceService.create_from_template(self.template, self.entries(2))
+        # Within one insert batch; SQLite caps a batch at 999 parameters
+        with CaptureQueriesContext(connection) as many:
+            InvoiceService.create_from_template(self.template, self.entries(25))
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(InvoiceItem.objects.count(), 56)
+
+    def test_clients_of_other_users_are_rejected(self):
+        other = User.objects.create_user(email='intruder@example.com', password='TestPass123!')
+        entries = [{'client': self.create_client(other, 'stolen@example.com'), 'items': []}]
+
+        with self.assertRaises(ValueError):
+            InvoiceService.create_from_template(self.template, entries)
+        self.assertFalse(Invoice.objects.exists())
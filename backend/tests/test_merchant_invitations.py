@@ -0,0 +1,177 @@
+"""
+Merchant Invitation Tests for SikaRemit
+Tests bulk invitation upload, its per-row report and batched invitation emails
+"""
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.celery import app
+from merchants.invitations import MerchantInvitationService
+from merchants.models import MerchantInvitation
+
+User = get_user_model()
+
+
+class MerchantInvitationTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='onboarding@example.com', password='TestPass123!', user_type=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        mail.outbox = []
+
+    def upload(self, rows):
+        return self.client.post('/api/v1/merchants/invitations/bulk_create/', {'invitations': rows}, format='json')
+
+
+class BulkInvitationTests(MerchantInvitationTestCase):
+    """Tests for MerchantInvitationService.create_bulk"""
+
+    def test_each_row_gets_a_result(self):
+        User.objects.create_user(email='taken@example.com', password='TestPass123!')
+        MerchantInvitation.objects.create(
+            email='invited@example.com', business_name='Invited', invited_by=self.admin,
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        MerchantInvitation.objects.create(
+            email='lapsed@example.com', business_name='Lapsed', invited_by=self.admin,
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+        with self.captureOnCommitCallbacks():
+            response = self.upload([
+                {'email': ' New@Example.com ', 'businessName': 'New Shop', 'businessType': 'retail'},
+                {'email': 'new@example.com', 'business_name': 'Copy'},
+                {'email': 'not-an-email', 'business_name': 'Broken'},
+                {'email': 'taken@example.com', 'business_name': 'Taken'},
+                {'email': 'invited@example.com', 'business_name': 'Invited again'},
+                {'email': 'lapsed@example.com', 'business_name': 'Lapsed again', 'business_type': 'casino'},
+                {'email': 'lapsed@example.com', 'business_name': 'Lapsed again'},
+                'garbage',
+            ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['summary'], {'total': 8, 'created': 2, 'failed': 6})
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'failed', 'failed', 'failed', 'failed', 'failed', 'created', 'failed'])
+        self.assertEqual(results[1]['errors'], {'email': ['Duplicate of row 0']})
+        self.assertIn('email', results[2]['errors'])
+        self.assertEqual(results[3]['errors'], {'email': ['A user with this email already exists']})
+        self.assertEqual(results[4]['errors'], {'email': ['A pending invitation for this email already exists']})
+        self.assertIn('business_type', results[5]['errors'])
+
+        invitation = MerchantInvitation.objects.get(pk=results[0]['id'])
+        self.assertEqual(invitation.email, 'new@example.com')
+        self.assertEqual(invitation.business_type, 'retail')
+        self.assertEqual(str(invitation.invitation_token), results[0]['invitation_token'])
+        self.assertEqual(invitation.invited_by, self.admin)
+        self.assertGreater(invitation.expires_at, timezone.now() + timedelta(days=13))
+
+    def test_taken_emails_match_whatever_their_stored_case(self):
+        User.objects.create_user(email='Kwame.Owner@Example.com', password='TestPass123!')
+        MerchantInvitation.objects.create(
+            email='Ama.Shop@EXAMPLE.com', business_name='Ama Shop', invited_by=self.admin,
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+
+        with self.captureOnCommitCallbacks():
+            report = MerchantInvitationService.create_bulk([
+                {'email': 'kwame.owner@example.com', 'business_name': 'Kwame Ventures'},
+                {'email': 'AMA.SHOP@example.com', 'business_name': 'Ama Shop'},
+            ], invited_by=self.admin)
+
+        self.assertEqual(report['summary']['created'], 0)
+        self.assertEqual([result['errors']['email'] for result in report['results']], [
+            ['A user with this email already exists'], ['A pending invitation for this email already exists']
+        ])
+
+    def test_validation_takes_one_query(self):
+        rows = [{'email': f'merchant{i}@example.com', 'business_name': f'Shop {i}'} for i in range(300)]
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks():
+            report = MerchantInvitationService.create_bulk(rows, invited_by=self.admin)
+
+        self.assertEqual(report['summary']['created'], 300)
+        selects = [query for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+    def test_oversized_and_empty_uploads_are_rejected(self):
+        self.assertEqual(self.upload([]).status_code, 400)
+        with override_settings(MERCHANT_INVITATION_BULK_MAX=2):
+            self.assertEqual(self.upload([{'email': f'm{i}@example.com'} for i in range(3)]).status_code, 400)
+
+    def test_ten_thousand_invitations(self):
+        rows = [{'email': f'partner{i}@example.com', 'business_name': f'Partner {i}'} for i in range(10000)]
+
+        started = time.perf_counter()
+        with self.captureOnCommitCallbacks():
+            response = self.upload(rows)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['summary']['created'], 10000)
+        self.assertEqual(MerchantInvitation.objects.count(), 10000)
+        # Well inside a 30 second request timeout, even on a slow CI runner
+        self.assertLess(elapsed, 15)
+
+
+@override_settings(MERCHANT_INVITATION_EMAIL_BATCH_SIZE=2)
+class InvitationEmailTests(MerchantInvitationTestCase):
+    """Tests for the batched invitation emails"""
+
+    def upload_eagerly(self, rows):
+        app.conf.task_always_eager = True
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.upload(rows)
+        finally:
+            app.conf.task_always_eager = False
+
+    def test_invitations_are_emailed_over_one_connection_per_batch(self):
+        rows = [{'email': f'shop{i}@example.com', 'business_name': f'Shop {i}'} for i in range(5)]
+
+        with patch('merchants.invitations.get_connection', wraps=mail.get_connection) as get_connection:
+            response = self.upload_eagerly(rows)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(row['email'] for row in rows))
+        first = MerchantInvitation.objects.get(email='shop0@example.com')
+        message = next(message for message in mail.outbox if message.to == [first.email])
+        self.assertIn(f'/auth/merchant/invite/{first.invitation_token}', message.body)
+        self.assertFalse(MerchantInvitation.objects.filter(email_sent_at__isnull=True).exists())
+
+    def test_resent_batch_skips_invitations_already_emailed(self):
+        rows = [{'email': f'stall{i}@example.com', 'business_name': f'Stall {i}'} for i in range(2)]
+        with self.captureOnCommitCallbacks():
+            self.upload(rows)
+        ids = list(MerchantInvitation.objects.values_list('id', flat=True))
+
+        send = mail.EmailMessage.send
+        calls = []
+
+        def fail_second(message, *args, **kwargs):
+            calls.append(message.to[0])
+            if len(calls) == 2:
+                raise OSError('Connection reset')
+            return send(message, *args, **kwargs)
+
+        with patch.object(mail.EmailMessage, 'send', autospec=True, side_effect=fail_second):
+            sent, error = MerchantInvitationService.send_emails(ids)
+        self.assertEqual(sent, 1)
+        self.assertIsInstance(error, OSError)
+
+        sent, error = MerchantInvitationService.send_emails(ids)
+        self.assertEqual((sent, error), (1, None))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 2)
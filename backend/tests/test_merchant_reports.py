@@ -0,0 +1,251 @@
+"""
+Merchant Report Engine Tests for SikaRemit
+Tests report generation to file storage, request coalescing and scheduled report dispatch
+"""
+import json
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.celery import app
+from core.exports import StreamingExport
+from merchants.models import Report, ReportTemplate, ScheduledReport
+from merchants.reports import MerchantReportEngine, ScheduledReportDispatcher
+from payments.models.transaction import Transaction
+
+User = get_user_model()
+
+
+class MerchantReportTestCase(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.merchant = User.objects.create_user(
+            email='reports@example.com', password='TestPass123!', user_type=2
+        ).merchant_profile
+        self.customer = User.objects.create_user(email='buyer@example.com', password='TestPass123!').customer_profile
+        self.template = ReportTemplate.objects.create(name='Transactions', report_type='transaction_detail')
+        mail.outbox = []
+
+    def create_transactions(self, count, status=Transaction.COMPLETED):
+        Transaction.objects.bulk_create([
+            Transaction(customer=self.customer, merchant=self.merchant, amount=Decimal('10.00'), currency='GHS',
+                        status=status)
+            for _ in range(count)
+        ])
+
+    def request(self, **overrides):
+        params = {'format_type': 'csv', 'name': 'Transactions report'}
+        params.update(overrides)
+        today = timezone.localdate()
+        return MerchantReportEngine.request(self.merchant, self.template, today, today, **params)
+
+
+class ReportGenerationTests(MerchantReportTestCase):
+    """Tests for MerchantReportEngine.generate"""
+
+    def test_report_is_written_to_storage_in_chunks(self):
+        self.create_transactions(250)
+        report, _ = self.request()
+
+        with patch('core.exports.EXPORT_CHUNK_SIZE', 100), \
+                patch.object(Report.objects, 'filter', wraps=Report.objects.filter) as report_filter:
+            stored_path = MerchantReportEngine.generate(report.id)
+
+        report.refresh_from_db()
+        self.assertEqual(stored_path, f'reports/merchants/{self.merchant.id}/{report.id}.csv')
+        self.assertEqual(report.status, 'completed')
+        self.assertEqual(report.progress, 100)
+        self.assertEqual(report.record_count, 250)
+        self.assertGreater(report.file_size, 0)
+        self.assertTrue(report.file_url.endswith(stored_path))
+        self.assertIsNotNone(report.processing_time)
+        # Claim, two chunk progress updates, completion
+        self.assertEqual(report_filter.call_count, 4)
+
+        with open(f'{self.media.name}/{stored_path}') as f:
+            lines = f.read().splitlines()
+        header_index = lines.index('ID,Date,Customer,Amount,Currency,Status,Payment Method,Description')
+        self.assertEqual(len(lines) - header_index - 1, 250)
+
+    def test_generation_is_claimed_once(self):
+        report, _ = self.request()
+
+        self.assertIsNotNone(MerchantReportEngine.generate(report.id))
+        self.assertIsNone(MerchantReportEngine.generate(report.id))
+
+    def test_cancelled_report_is_not_completed(self):
+        self.create_transactions(50)
+        report, _ = self.request()
+
+        write_csv = StreamingExport.write_csv
+
+        def cancel_then_write(export, fileobj):
+            Report.objects.filter(pk=report.pk).update(status='failed', error_message='Cancelled by user')
+            return write_csv(export, fileobj)
+
+        with patch('core.exports.EXPORT_CHUNK_SIZE', 10), \
+                patch.object(StreamingExport, 'write_csv', autospec=True, side_effect=cancel_then_write):
+            self.assertIsNone(MerchantReportEngine.generate(report.id))
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'failed')
+        self.assertEqual(report.error_message, 'Cancelled by user')
+
+    def test_json_and_pdf_formats(self):
+        self.create_transactions(30)
+        json_report, _ = self.request(format_type='json')
+        pdf_report, _ = self.request(format_type='pdf')
+
+        json_path = MerchantReportEngine.generate(json_report.id)
+        with patch('core.exports.PDF_MAX_ROWS', 20):
+            pdf_path = MerchantReportEngine.generate(pdf_report.id)
+
+        with open(f'{self.media.name}/{json_path}') as f:
+            document = json.load(f)
+        self.assertEqual(len(document['rows']), 30)
+        self.assertEqual(document['rows'][0]['Amount'], '10.00')
+        self.assertEqual(document['summary']['Transactions'], 30)
+
+        pdf_report.refresh_from_db()
+        self.assertTrue(pdf_path.endswith('.pdf'))
+        self.assertEqual(pdf_report.record_count, 20)
+        with open(f'{self.media.name}/{pdf_path}', 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+    def test_aggregate_report_types(self):
+        self.create_transactions(5)
+        self.create_transactions(3, status=Transaction.FAILED)
+        self.template.report_type = 'financial_overview'
+        self.template.save()
+        report, _ = self.request()
+
+        stored_path = MerchantReportEngine.generate(report.id)
+
+        with open(f'{self.media.name}/{stored_path}') as f:
+            lines = f.read().splitlines()
+        header_index = lines.index('Currency,Status,Transactions,Total,Average')
+        rows = [line.split(',') for line in lines[header_index + 1:]]
+        self.assertEqual([row[:3] for row in rows], [['GHS', 'completed', '5'], ['GHS', 'failed', '3']])
+        self.assertEqual(Decimal(rows[0][3]), Decimal('50'))
+
+    def test_memory_stays_bounded(self):
+        self.create_transactions(10000)
+        report, _ = self.request()
+
+        tracemalloc.start()
+        try:
+            with patch('core.exports.EXPORT_CHUNK_SIZE', 500):
+                MerchantReportEngine.generate(report.id)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        report.refresh_from_db()
+        self.assertEqual(report.record_count, 10000)
+        # Ten thousand materialised rows would need several times this
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+
+class ReportRequestTests(MerchantReportTestCase):
+    """Tests for request coalescing"""
+
+    def test_identical_requests_share_one_report(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            first, created = self.request()
+            second, created_again = self.request(filters={'template': '1', 'format': 'csv'})
+            other_format, _ = self.request(format_type='excel')
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, second.id)
+        self.assertNotEqual(first.id, other_format.id)
+        self.assertEqual(len(callbacks), 2)
+
+    def test_finished_reports_are_not_reused(self):
+        first, _ = self.request()
+        MerchantReportEngine.generate(first.id)
+
+        second, created = self.request()
+
+        self.assertTrue(created)
+        self.assertNotEqual(first.id, second.id)
+
+    def test_regenerate_joins_an_identical_active_report(self):
+        finished, _ = self.request()
+        MerchantReportEngine.generate(finished.id)
+        active, _ = self.request()
+
+        self.assertEqual(MerchantReportEngine.regenerate(finished).id, active.id)
+        finished.refresh_from_db()
+        self.assertEqual(finished.status, 'completed')
+
+
+class ScheduledReportDispatchTests(MerchantReportTestCase):
+    """Tests for ScheduledReportDispatcher"""
+
+    def create_schedule(self, next_run, **fields):
+        return ScheduledReport.objects.create(
+            merchant=self.merchant, template=self.template, name='Daily transactions', frequency='daily',
+            next_run=next_run, format='csv', email_recipients=['finance@example.com'], **fields
+        )
+
+    def test_due_schedules_are_dispatched_in_batches(self):
+        now = timezone.now()
+        due = [self.create_schedule(now - timedelta(minutes=minutes)) for minutes in (1, 2, 3)]
+        # Near midnight the schedules can fall on different days
+        expected_starts = [timezone.localdate(schedule.next_run) - timedelta(days=1) for schedule in due]
+        self.create_schedule(now + timedelta(hours=1))
+        self.create_schedule(now - timedelta(minutes=5), status='paused')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = ScheduledReportDispatcher(batch_size=2).dispatch(now)
+
+        self.assertEqual(result['dispatched'], 3)
+        self.assertEqual(result['batches'], 2)
+        self.assertEqual(len(callbacks), 3)
+        for schedule, start_date in zip(due, expected_starts):
+            schedule.refresh_from_db()
+            self.assertGreater(schedule.next_run, now)
+            self.assertEqual(schedule.reports.get().start_date, start_date)
+
+        self.assertEqual(ScheduledReportDispatcher().dispatch(now)['dispatched'], 0)
+
+    def test_scheduled_report_is_generated_and_emailed(self):
+        self.create_transactions(3)
+        Transaction.objects.update(created_at=timezone.now() - timedelta(days=1))
+        self.create_schedule(timezone.now() - timedelta(minutes=1))
+
+        app.conf.task_always_eager = True
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                ScheduledReportDispatcher().dispatch()
+        finally:
+            app.conf.task_always_eager = False
+
+        report = Report.objects.get(is_scheduled=True)
+        self.assertEqual(report.status, 'completed')
+        self.assertEqual(report.record_count, 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['finance@example.com'])
+        self.assertIn(report.file_url, mail.outbox[0].body)
+
+    def test_reporting_period(self):
+        schedule = ScheduledReport(frequency='monthly')
+        self.assertEqual(schedule.reporting_period(timezone.make_aware(timezone.datetime(2026, 3, 1, 9))),
+                         (date(2026, 2, 1), date(2026, 2, 28)))
+        schedule.frequency = 'quarterly'
+        self.assertEqual(schedule.reporting_period(timezone.make_aware(timezone.datetime(2026, 1, 1, 9))),
+                         (date(2025, 10, 1), date(2025, 12, 31)))
@@ -0,0 +1,187 @@
+"""
+Prometheus Metrics Tests for SikaRemit
+Tests payment pipeline instrumentation, queue depth gauges and counter-based alerts
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from core.alerts import check_alerts
+from core.celery import app
+from core.metrics import PAYMENT_GATEWAY_REQUESTS, sample_total
+from core.tasks import record_queue_depths
+from payments.gateways.base import PaymentGateway
+from payments.models import Currency, ExchangeRate
+from payments.services.currency_service import CurrencyService
+from payments.services.fee_calculator import DynamicFeeCalculator
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class FakeGateway(PaymentGateway):
+    metrics_name = 'fake'
+
+    def process_payment(self, amount, currency, payment_method, customer, merchant, metadata=None):
+        if amount < 0:
+            raise ValueError('Negative amount')
+        return {'success': amount < 1000, 'transaction_id': 'fake-1'}
+
+    def refund_payment(self, transaction_id, amount=None):
+        return {'success': True}
+
+    def get_webhook_secret(self):
+        return 'secret'
+
+    def parse_webhook(self, request):
+        return {}
+
+    def process_webhook(self, event):
+        return {}
+
+
+class PaymentPipelineMetricsTests(TestCase):
+    """Tests for the payment pipeline instrumentation"""
+
+    def test_gateway_calls_are_timed_and_counted_by_outcome(self):
+        gateway = FakeGateway()
+        before = {
+            outcome: sample('payment_gateway_requests_total', provider='fake', operation='payment', outcome=outcome)
+            for outcome in ('success', 'declined', 'error')
+        }
+        latency_before = sample('payment_gateway_request_seconds_count', provider='fake', operation='payment')
+
+        gateway.process_payment(10, 'GHS', None, None, None)
+        gateway.process_payment(5000, 'GHS', None, None, None)
+        with self.assertRaises(ValueError):
+            gateway.process_payment(-1, 'GHS', None, None, None)
+        gateway.refund_payment('fake-1')
+
+        for outcome in ('success', 'declined', 'error'):
+            self.assertEqual(
+                sample('payment_gateway_requests_total', provider='fake', operation='payment', outcome=outcome),
+                before[outcome] + 1
+            )
+        self.assertEqual(
+            sample('payment_gateway_request_seconds_count', provider='fake', operation='payment'), latency_before + 3
+        )
+        self.assertGreaterEqual(
+            sample('payment_gateway_requests_total', provider='fake', operation='refund', outcome='success'), 1
+        )
+
+    def test_provider_label_defaults_to_provider_name(self):
+        from payments.gateways.mobile_money import MTNMoMoGateway
+        from payments.gateways.stripe import StripeGateway
+
+        self.assertEqual(MTNMoMoGateway.metrics_name, 'mtn_momo')
+        self.assertEqual(StripeGateway.metrics_name, 'stripe')
+
+    def test_fx_lookups_are_labelled_by_source(self):
+        usd = Currency.objects.create(code='USD', name='US Dollar', symbol='$', is_base_currency=True)
+        ghs = Currency.objects.create(code='GHS', name='Ghana Cedi', symbol='₵')
+        ExchangeRate.objects.create(from_currency=usd, to_currency=ghs, rate=Decimal('15.25'), source='manual')
+        before = {source: sample('fx_rate_lookup_seconds_count', source=source) for source in ('database', 'inverse')}
+
+        self.assertEqual(CurrencyService.get_exchange_rate(usd, ghs, use_cache=False), Decimal('15.25'))
+        CurrencyService.get_exchange_rate(ghs, usd, use_cache=False)
+
+        for source in ('database', 'inverse'):
+            self.assertEqual(sample('fx_rate_lookup_seconds_count', source=source), before[source] + 1)
+
+    def test_fee_calculations_are_timed_by_fee_type(self):
+        before = sample('fee_calculation_seconds_count', fee_type='remittance')
+
+        DynamicFeeCalculator.calculate_fee('remittance', Decimal('100.00'), log_calculation=False)
+
+        self.assertEqual(sample('fee_calculation_seconds_count', fee_type='remittance'), before + 1)
+
+
+class QueueDepthTests(TestCase):
+    """Tests for the record_queue_depths task"""
+
+    def test_database_queues_are_recorded_without_a_broker(self):
+        with patch.object(app, 'connection_for_read', return_value=app.connection_for_read('memory://')):
+            with override_settings(METRICS_CELERY_QUEUES=[]):
+                depths = record_queue_depths()
+
+        self.assertEqual(depths, {'scheduled_notifications': 0, 'scheduled_payouts': 0})
+        self.assertEqual(sample('queue_depth', queue='scheduled_payouts'), 0.0)
+
+
+class CounterAlertTests(TestCase):
+    """Tests for check_alerts"""
+
+    def setUp(self):
+        cache.clear()
+        mail.outbox = []
+
+    def test_alerts_fire_on_counter_increase_since_last_check(self):
+        check_alerts()
+        cache.delete('alerts:last_sent')
+        mail.outbox = []
+
+        PAYMENT_GATEWAY_REQUESTS.labels(provider='fake', operation='payment', outcome='error').inc(6)
+        alerts = check_alerts()
+
+        self.assertEqual([severity for severity, _ in alerts], ['WARNING'])
+        self.assertEqual(len(mail.outbox), 1)
+
+        cache.delete('alerts:last_sent')
+        self.assertEqual(check_alerts(), [])
+
+    def test_increases_during_the_cooldown_are_reported_after_it(self):
+        check_alerts()
+        cache.delete('alerts:last_sent')
+        mail.outbox = []
+        PAYMENT_GATEWAY_REQUESTS.labels(provider='fake', operation='payment', outcome='error').inc(6)
+        self.assertEqual(len(check_alerts()), 1)
+
+        PAYMENT_GATEWAY_REQUESTS.labels(provider='fake', operation='payment', outcome='error').inc(4)
+        self.assertEqual(check_alerts(), [])
+        PAYMENT_GATEWAY_REQUESTS.labels(provider='fake', operation='payment', outcome='error').inc(3)
+        self.assertEqual(check_alerts(), [])
+
+        cache.delete('alerts:last_sent')
+        alerts = check_alerts()
+
+        self.assertEqual(alerts, [('WARNING', 'Gateway errors: 7 since last check')])
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_sample_total_sums_matching_labels(self):
+        PAYMENT_GATEWAY_REQUESTS.labels(provider='fake', operation='refund', outcome='error').inc()
+
+        self.assertEqual(
+            sample_total('payment_gateway_requests_total', provider='fake', outcome='error'),
+            sample('payment_gateway_requests_total', provider='fake', operation='payment', outcome='error')
+            + sample('payment_gateway_requests_total', provider='fake', operation='refund', outcome='error')
+        )
+
+    def test_multiprocess_mode_aggregates_worker_processes(self):
+        record = ("from core.metrics import PAYMENT_GATEWAY_REQUESTS as c; "
+                  "c.labels(provider='fake', operation='payment', outcome='success').inc(2)")
+        read = ("from core.metrics import sample_total; "
+                "print(sample_total('payment_gateway_requests_total', provider='fake'))")
+
+        with tempfile.TemporaryDirectory() as path:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': path}
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', record], env=env, check=True)
+            output = subprocess.run([sys.executable, '-c', read], env=env, check=True, capture_output=True, text=True)
+
+        self.assertEqual(float(output.stdout), 4.0)
+
+    def test_metrics_endpoint_exports_pipeline_metrics(self):
+        response = self.client.get('/metrics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'payment_gateway_request_seconds', response.content)
+        self.assertIn(b'queue_depth', response.content)
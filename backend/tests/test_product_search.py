@@ -0,0 +1,113 @@
+"""
+Product Search Tests for SikaRemit
+Tests the merchant catalogue search index, its ranking and result window
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from merchants.models import Product, Store
+from merchants.search import ProductSearchIndex
+
+User = get_user_model()
+
+
+class ProductSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='catalogue@example.com', password='TestPass123!', user_type=2)
+        self.store = Store.objects.create(merchant=self.user.merchant_profile, name='Main store')
+        other = User.objects.create_user(email='rival@example.com', password='TestPass123!', user_type=2)
+        self.other_store = Store.objects.create(merchant=other.merchant_profile, name='Rival store')
+
+    def add(self, name, description='', store=None, **fields):
+        fields.setdefault('sku', f'SKU-{Product.objects.count() + 1}')
+        return Product.objects.create(
+            store=store or self.store, name=name, description=description, price=Decimal('5.00'), **fields
+        )
+
+    def search(self, query, **kwargs):
+        queryset = Product.objects.filter(store__merchant__user=self.user)
+        return [product.name for product in ProductSearchIndex.search(queryset, query, **kwargs)]
+
+
+class ProductSearchIndexTests(ProductSearchTestCase):
+    """Tests for ProductSearchIndex"""
+
+    def test_prefix_matches_rank_name_above_description(self):
+        self.add('Cocoa butter', description='Pairs well with chocolate')
+        self.add('Dark chocolate bar')
+        self.add('Tea')
+
+        self.assertEqual(self.search('choc'), ['Dark chocolate bar', 'Cocoa butter'])
+        self.assertEqual(self.search('dark CHOC'), ['Dark chocolate bar'])
+        self.assertEqual(self.search('coffee'), [])
+
+    def test_exact_barcode_ranks_first(self):
+        self.add('Scanner lookalike 5901234123457')
+        self.add('Rice 5kg', barcode='5901234123457')
+
+        self.assertEqual(self.search('5901234123457'), ['Rice 5kg', 'Scanner lookalike 5901234123457'])
+
+    def test_index_follows_saves_bulk_inserts_and_deletes(self):
+        product = self.add('Plantain chips')
+        Product.objects.bulk_create([
+            Product(store=self.store, name=f'Groundnut paste {i}', price=Decimal('2.00'), sku=f'GP-{i}')
+            for i in range(3)
+        ])
+
+        product.name = 'Cassava chips'
+        product.save()
+        Product.objects.filter(sku='GP-0').delete()
+
+        self.assertEqual(self.search('plantain'), [])
+        self.assertEqual(self.search('cassava'), ['Cassava chips'])
+        self.assertEqual(sorted(self.search('groundnut')), ['Groundnut paste 1', 'Groundnut paste 2'])
+
+    def test_other_merchants_products_are_excluded(self):
+        self.add('Shea butter')
+        self.add('Shea butter deluxe', store=self.other_store)
+
+        self.assertEqual(self.search('shea'), ['Shea butter'])
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=3, PRODUCT_SEARCH_MAX_WINDOW=5)
+    def test_results_are_windowed(self):
+        for i in range(8):
+            self.add(f'Kente cloth {i}')
+
+        self.assertEqual(len(self.search('kente', limit=50)), 3)
+        # The last page is cut off at the window
+        self.assertEqual(ProductSearchIndex.window(limit=3, offset=4), (1, 4))
+        self.assertEqual(len(self.search('kente', limit=3, offset=3)), 2)
+        self.assertEqual(ProductSearchIndex.window(limit='x'), (3, 0))
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=3, PRODUCT_SEARCH_MAX_WINDOW=5)
+    def test_offsets_past_the_window_return_nothing(self):
+        for i in range(8):
+            self.add(f'Kente cloth {i}')
+
+        self.assertEqual(ProductSearchIndex.window(limit=50, offset=100), (0, 100))
+        self.assertEqual(self.search('kente', limit=3, offset=5), [])
+        self.assertEqual(self.search('kente', limit=3, offset=100), [])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.add('Palm oil')
+
+        self.assertEqual(self.search('"*-'), [])
+
+
+class ProductSearchEndpointTests(ProductSearchTestCase):
+    """Tests for ProductViewSet.search"""
+
+    def test_search_endpoint_returns_ranked_products(self):
+        self.add('Kenkey', description='Fermented corn dough')
+        self.add('Corn flour')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/v1/merchants/products/search/', {'q': 'corn', 'limit': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['name'] for product in response.data], ['Corn flour'])
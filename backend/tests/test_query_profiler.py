@@ -0,0 +1,105 @@
+"""
+Query Profiler Tests for SikaRemit
+Tests SQL fingerprinting, N+1 detection and the sampling middleware
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.performance_benchmarks import DatabaseQueryBenchmark
+from core.query_profiler import QueryProfileStore, fingerprint, normalize_sql, profile_queries
+from payments.models.transaction import Transaction
+
+User = get_user_model()
+
+
+class FingerprintTests(TestCase):
+    """Tests for SQL normalization"""
+
+    def test_literals_and_placeholders_are_normalized(self):
+        self.assertEqual(
+            normalize_sql("SELECT  \"t\".\"id\" FROM t1 WHERE name = 'O''Brien' AND amount > 25.50 AND id IN (%s, %s, %s)"),
+            'SELECT "t"."id" FROM t1 WHERE name = ? AND amount > ? AND id IN (...)'
+        )
+
+    def test_queries_differing_only_in_values_share_a_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM users_customer WHERE id = 1'),
+            fingerprint('SELECT * FROM users_customer WHERE id = 42')
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM users_customer WHERE id = 1'),
+            fingerprint('SELECT * FROM users_merchant WHERE id = 1')
+        )
+
+    def test_repeated_shapes_are_n_plus_one_suspects(self):
+        user = User.objects.create_user(email='profile@example.com', password='TestPass123!')
+
+        def lookups():
+            for _ in range(6):
+                list(User.objects.filter(pk=user.pk))
+            User.objects.count()
+
+        _, profile = profile_queries(lookups)
+        summary = profile.summary(n_plus_one_threshold=5)
+
+        self.assertEqual(summary['count'], 7)
+        self.assertEqual(len(summary['n_plus_one']), 1)
+        self.assertEqual(summary['fingerprints'][summary['n_plus_one'][0]]['count'], 6)
+
+    def test_find_slow_queries_works_without_debug(self):
+        slow = DatabaseQueryBenchmark.find_slow_queries(lambda: list(Transaction.objects.all()), threshold=0)
+
+        self.assertEqual(len(slow), 1)
+        self.assertIn('payments_transaction', slow[0]['sql'])
+
+
+class QueryProfilerMiddlewareTests(TestCase):
+    """Tests for QueryProfilerMiddleware"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='profiled@example.com', password='TestPass123!')
+        Transaction.objects.bulk_create([
+            Transaction(customer=self.user.customer_profile, amount=Decimal('10.00') + i, currency='GHS',
+                        status=Transaction.COMPLETED)
+            for i in range(10)
+        ])
+
+    def _list_transactions(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/payments/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_PROFILER_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_profiled_per_endpoint(self):
+        with self.assertLogs('core.query_profiler', level='WARNING') as logs:
+            self._list_transactions()
+
+        report = QueryProfileStore.top_offenders()
+        self.assertEqual(len(report), 1)
+        stats = report[0]
+        self.assertEqual(stats['endpoint'], 'GET /api/v1/payments/transactions/')
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 10)
+        self.assertEqual(stats['n_plus_one_requests'], 1)
+        self.assertGreater(stats['top_fingerprints'][0]['n_plus_one_requests'], 0)
+        self.assertTrue(any('Possible N+1' in line for line in logs.output))
+
+        output = StringIO()
+        call_command('query_profile_report', '--clear', stdout=output)
+        self.assertIn(stats['endpoint'], output.getvalue())
+        self.assertIn('N+1', output.getvalue())
+        self.assertEqual(QueryProfileStore.top_offenders(), [])
+
+    @override_settings(QUERY_PROFILER_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_profiled(self):
+        self._list_transactions()
+
+        self.assertEqual(QueryProfileStore.top_offenders(), [])
@@ -0,0 +1,81 @@
+"""
+Data Retention Tests for SikaRemit
+Tests chunked, resumable purging of rows past their retention period
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import PasswordResetToken
+from accounts.tasks import cleanup_expired_tokens
+from core.retention import RetentionPolicy, RetentionPurger, purge_expired
+from notifications.models import Notification
+from payments.models import USSDAnalytics
+
+User = get_user_model()
+
+
+class RetentionPurgerTests(TestCase):
+    """Tests for RetentionPurger"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='retention@example.com', password='TestPass123!')
+        self.now = timezone.now()
+
+    def _notifications(self, count, expires_in_days, category=Notification.EXPIRING):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title='Offer', message='Limited time', category=category,
+                         expires_at=self.now + timedelta(days=expires_in_days))
+            for _ in range(count)
+        ])
+
+    def test_expired_rows_are_deleted_in_chunks(self):
+        self._notifications(7, expires_in_days=-1)
+        self._notifications(2, expires_in_days=1)
+        self._notifications(2, expires_in_days=-1, category=Notification.ACTIONABLE)
+
+        result = purge_expired('expired_notifications', chunk_size=3, pause=0)
+
+        self.assertEqual((result['deleted'], result['chunks'], result['completed']), (7, 3, True))
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertGreater(result['rows_per_second'], 0)
+
+    def test_time_boxed_run_resumes_from_last_deleted_key(self):
+        self._notifications(5, expires_in_days=-1)
+        purger = RetentionPurger(
+            RetentionPolicy.from_settings('expired_notifications'), chunk_size=2, pause=0, max_seconds=0
+        )
+
+        pks = list(Notification.objects.order_by('pk').values_list('pk', flat=True))
+
+        first = purger.purge()
+        self.assertEqual((first['deleted'], first['completed']), (2, False))
+        self.assertEqual(cache.get(purger.progress_key), pks[1])
+
+        purger.max_seconds = None
+        second = purger.purge()
+        self.assertTrue(second['resumed'])
+        self.assertEqual((second['deleted'], second['completed']), (3, True))
+        self.assertIsNone(cache.get(purger.progress_key))
+
+    def test_date_field_policy_honours_days_override(self):
+        today = self.now.date()
+        for days_ago in (400, 100, 10):
+            USSDAnalytics.objects.create(date=today - timedelta(days=days_ago), network='MTN')
+
+        self.assertEqual(purge_expired('ussd_analytics')['deleted'], 1)
+        self.assertEqual(purge_expired('ussd_analytics', days=30)['deleted'], 1)
+        self.assertEqual(USSDAnalytics.objects.count(), 1)
+
+    def test_token_cleanup_task_uses_retention_policies(self):
+        PasswordResetToken.objects.create(user=self.user, token='expired', expires_at=self.now - timedelta(hours=1))
+        PasswordResetToken.objects.create(user=self.user, token='valid', expires_at=self.now + timedelta(hours=1))
+
+        result = cleanup_expired_tokens()
+
+        self.assertEqual(result['reset_tokens_cleaned'], 1)
+        self.assertEqual(list(PasswordResetToken.objects.values_list('token', flat=True)), ['valid'])
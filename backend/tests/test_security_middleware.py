@@ -0,0 +1,160 @@
+"""
+Security Middleware Tests for SikaRemit
+Tests per-request security state and request payload scanning
+"""
+import pytest
+import os
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.test_settings')
+django.setup()
+
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from core.middleware.security_middleware import SecurityContextMiddleware
+from core.performance_benchmarks import CacheCallCounter
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def middleware():
+    return SecurityContextMiddleware(lambda request: HttpResponse('ok'))
+
+
+def make_request(user_id=None, ip='10.0.0.1', agent='test-agent', path='/api/v1/payments/transactions/'):
+    request = RequestFactory().get(path, REMOTE_ADDR=ip, HTTP_USER_AGENT=agent)
+    if user_id:
+        request.user = SimpleNamespace(id=user_id, is_authenticated=True)
+    else:
+        request.user = SimpleNamespace(id=None, is_authenticated=False)
+    return request
+
+
+class TestSecurityContextMiddleware:
+    """Tests for SecurityContextMiddleware"""
+
+    def test_records_ip_and_device(self, middleware):
+        request = make_request(user_id=1)
+        middleware(request)
+
+        assert cache.get('last_ip:1') == '10.0.0.1'
+        assert request.device_fingerprint in cache.get('known_devices:1')
+        assert request.client_ip == '10.0.0.1'
+
+    def test_flags_ip_change(self, middleware):
+        middleware(make_request(user_id=1, ip='10.0.0.1'))
+
+        with patch('core.security.SuspiciousActivityDetector.record_ip_change') as mock_record:
+            middleware(make_request(user_id=1, ip='10.0.0.2'))
+
+        mock_record.assert_called_once_with(1, '10.0.0.1', '10.0.0.2')
+        assert cache.get('last_ip:1') == '10.0.0.2'
+
+    @override_settings(IS_PRODUCTION=True)
+    def test_rate_limits_after_threshold(self, middleware):
+        for _ in range(100):
+            response = middleware(make_request(user_id=1))
+            assert response.status_code == 200
+
+        assert response['X-RateLimit-Remaining'] == '0'
+        assert middleware(make_request(user_id=1)).status_code == 429
+
+    @override_settings(IS_PRODUCTION=True)
+    def test_exempt_paths_are_not_rate_limited(self, middleware):
+        response = middleware(make_request(user_id=1, path='/health/'))
+
+        assert 'X-RateLimit-Remaining' not in response
+
+    @override_settings(IS_PRODUCTION=True)
+    def test_one_read_and_batched_writes_per_request(self, middleware):
+        middleware(make_request(user_id=1))
+
+        with CacheCallCounter() as counter:
+            middleware(make_request(user_id=1))
+
+        assert counter.calls.get('get_many') == 1
+        assert counter.calls.get('get', 0) == 0
+        assert counter.calls.get('set', 0) == 0
+        # The counter is bumped in place, everything else goes out in one set_many
+        assert (counter.calls.get('add'), counter.calls.get('incr')) == (1, 1)
+        assert counter.calls.get('set_many') == 1
+
+    @override_settings(IS_PRODUCTION=True)
+    def test_concurrent_requests_do_not_share_a_count(self):
+        statuses = []
+
+        def view(request):
+            # A second request arrives while the first is still in its view
+            statuses.append(middleware(make_request(user_id=1)).status_code)
+            return HttpResponse('ok')
+
+        middleware = SecurityContextMiddleware(view)
+        cache.set('rate_limit:api_general:user:1', 99, 60)
+
+        assert middleware(make_request(user_id=1)).status_code == 200
+        assert statuses == [429]
+        assert cache.get('rate_limit:api_general:user:1') == 100
+
+
+class TestPayloadScanner:
+    """Tests for the SQL injection / XSS payload scanner"""
+
+    def test_detects_signatures_case_insensitively(self):
+        from core.security import xss_scanner
+
+        assert xss_scanner.search(b'{"bio": "<ScRiPt>alert(1)</script>"}') == '<script'
+        assert xss_scanner.search(b'url=JAVASCRIPT:alert(1)') == 'javascript:'
+        assert xss_scanner.search(bytearray(b'<img OnError=x>')) == 'onerror='
+
+    def test_clean_payload_passes(self):
+        from core.security import xss_scanner, sql_injection_scanner
+
+        assert not xss_scanner.matches(b'{"amount": "150.00", "note": "on time = yes"}')
+        assert not sql_injection_scanner.matches('page=2&order=created_at')
+
+    def test_scans_query_strings(self):
+        from core.security import sql_injection_scanner
+
+        assert sql_injection_scanner.search("id=1' or '1'='1") == "' OR '"
+        assert sql_injection_scanner.search('q=1 union select password') == 'UNION SELECT'
+
+
+class TestXSSProtectionMiddleware:
+    """Tests for XSSProtectionMiddleware body limits"""
+
+    @pytest.fixture
+    def xss_middleware(self):
+        from core.middleware.security_middleware import XSSProtectionMiddleware
+        return XSSProtectionMiddleware(lambda request: HttpResponse('ok'))
+
+    def test_blocks_script_in_json_body(self, xss_middleware):
+        request = RequestFactory().post('/api/v1/users/', data=b'{"name": "<script>"}',
+                                        content_type='application/json')
+
+        assert xss_middleware(request).status_code == 400
+
+    def test_skips_multipart_uploads(self, xss_middleware):
+        request = RequestFactory().post('/api/v1/kyc/documents/', data=b'<script>',
+                                        content_type='multipart/form-data; boundary=xyz')
+
+        assert xss_middleware(request).status_code == 200
+
+    @override_settings(PAYLOAD_SCAN_MAX_BYTES=16)
+    def test_only_scans_up_to_the_cap(self):
+        from core.middleware.security_middleware import XSSProtectionMiddleware
+
+        middleware = XSSProtectionMiddleware(lambda request: HttpResponse('ok'))
+        body = b'{"padding": "' + b'x' * 32 + b'", "name": "<script>"}'
+        request = RequestFactory().post('/api/v1/users/', data=body, content_type='application/json')
+
+        assert middleware(request).status_code == 200
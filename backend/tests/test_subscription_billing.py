@@ -0,0 +1,204 @@
+"""
+Subscription Billing Tests for SikaRemit
+Tests batched subscription renewals, their gateway charges and the per-gateway concurrency caps
+"""
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from payments.gateways.mock_gateway import MockPaymentGateway
+from payments.models.payment_method import PaymentMethod
+from payments.models.subscriptions import Subscription, SubscriptionDiscount, SubscriptionPayment, SubscriptionPlan
+from payments.services.subscription_billing_service import SubscriptionBillingRun
+
+User = get_user_model()
+
+
+class SubscriptionBillingTestCase(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.monthly = SubscriptionPlan.objects.create(name='Pro', price=Decimal('20.00'), billing_cycle='monthly')
+        self.yearly = SubscriptionPlan.objects.create(name='Pro Yearly', price=Decimal('200.00'), billing_cycle='yearly')
+        self.users = 0
+
+    def subscribe(self, plan=None, status='active', period_end=None, **fields):
+        self.users += 1
+        user = User.objects.create_user(email=f'subscriber{self.users}@example.com', password='TestPass123!')
+        method = PaymentMethod.objects.create(user=user, method_type='card', details={})
+        fields.setdefault('payment_method_id', str(method.pk))
+        return Subscription.objects.create(
+            user=user, plan=plan or self.monthly, status=status,
+            current_period_end=period_end or self.now - timedelta(minutes=5), **fields
+        )
+
+    def bill(self, **options):
+        options.setdefault('inline', True)
+        return SubscriptionBillingRun(**options).dispatch(until=self.now)
+
+
+class SubscriptionRenewalTests(SubscriptionBillingTestCase):
+    """Tests for SubscriptionBillingRun.claim_batch and dispatch"""
+
+    def test_due_subscriptions_are_renewed_and_charged(self):
+        discount = SubscriptionDiscount.objects.create(code='HALF', name='Half off', discount_value=Decimal('50'))
+        monthly = self.subscribe(metadata={'discount_applied': discount.id})
+        yearly = self.subscribe(plan=self.yearly)
+        period_end = monthly.current_period_end
+
+        result = self.bill()
+
+        self.assertEqual((result['billed'], result['batches']), (2, 1))
+        monthly.refresh_from_db()
+        self.assertEqual(monthly.current_period_start, period_end)
+        self.assertEqual(monthly.current_period_end, period_end + timedelta(days=30))
+        yearly.refresh_from_db()
+        self.assertEqual(yearly.current_period_end - yearly.current_period_start, timedelta(days=365))
+
+        payment = monthly.payments.get()
+        self.assertEqual((payment.status, payment.amount), ('completed', Decimal('10.00')))
+        self.assertEqual((payment.billing_period_start, payment.billing_period_end),
+                         (period_end, period_end + timedelta(days=30)))
+        self.assertTrue(payment.transaction_id.startswith('MOCK_TXN_'))
+        self.assertEqual(yearly.payments.get().amount, Decimal('200.00'))
+
+    def test_statuses_are_moved_on(self):
+        trial = self.subscribe(status='trial', trial_end=self.now - timedelta(minutes=5))
+        ending = self.subscribe(cancel_at_period_end=True)
+        later = self.subscribe(period_end=self.now + timedelta(days=3))
+        past_due = self.subscribe(status='past_due')
+
+        self.assertEqual(self.bill()['billed'], 1)
+
+        self.assertEqual(Subscription.objects.get(pk=trial.pk).status, 'active')
+        self.assertEqual(Subscription.objects.get(pk=ending.pk).status, 'canceled')
+        self.assertFalse(SubscriptionPayment.objects.filter(subscription__in=[ending, later, past_due]).exists())
+        later.refresh_from_db()
+        self.assertEqual(later.current_period_end, self.now + timedelta(days=3))
+
+    def test_each_period_is_billed_once(self):
+        for _ in range(5):
+            self.subscribe()
+
+        self.assertEqual(self.bill(batch_size=2), {'billed': 5, 'batches': 3, 'resent': 0})
+        self.assertEqual(self.bill()['billed'], 0)
+        self.assertEqual(SubscriptionPayment.objects.filter(status='completed').count(), 5)
+
+        with patch.object(MockPaymentGateway, 'process_payment') as process_payment:
+            results = SubscriptionBillingRun.charge(list(SubscriptionPayment.objects.values_list('id', flat=True)))
+        self.assertEqual(results, {'completed': 0, 'failed': 0})
+        process_payment.assert_not_called()
+
+    def test_queued_charges_are_chunked_into_tasks(self):
+        for _ in range(5):
+            self.subscribe()
+
+        with patch('payments.tasks.charge_subscription_payments.delay') as delay:
+            self.bill(inline=False, task_chunk_size=2)
+
+        self.assertEqual([len(call.args[0]) for call in delay.call_args_list], [2, 2, 1])
+        self.assertEqual(SubscriptionPayment.objects.filter(status='pending').count(), 5)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def billing_queries(count):
+            self.now = timezone.now()
+            for _ in range(count):
+                self.subscribe()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.bill()['billed'], count)
+            return len(queries)
+
+        self.assertEqual(billing_queries(2), billing_queries(20))
+
+
+class SubscriptionChargeTests(SubscriptionBillingTestCase):
+    """Tests for SubscriptionBillingRun.charge"""
+
+    def test_declined_charges_mark_the_subscription_past_due(self):
+        declined = self.subscribe()
+        missing_method = self.subscribe(payment_method_id='')
+
+        with patch.object(MockPaymentGateway, 'process_payment', return_value={'success': False, 'error': 'Declined'}):
+            self.bill()
+
+        payment = declined.payments.get()
+        self.assertEqual((payment.status, payment.failure_reason, payment.retry_count), ('failed', 'Declined', 1))
+        self.assertIsNotNone(payment.next_retry_date)
+        self.assertEqual(Subscription.objects.get(pk=declined.pk).status, 'past_due')
+        self.assertEqual(missing_method.payments.get().failure_reason, 'No usable payment method on file')
+
+    def test_gateways_are_given_the_customer_profile(self):
+        subscription = self.subscribe()
+        charged = []
+
+        def charge(customer, **kwargs):
+            # Gateways read the user through the customer, e.g. paystack's customer.user.email
+            charged.append(customer.user.email)
+            return {'success': True, 'transaction_id': 'MOCK_TXN_1'}
+
+        with patch.object(MockPaymentGateway, 'process_payment', side_effect=charge):
+            self.bill()
+
+        self.assertEqual(charged, [subscription.user.email])
+        self.assertEqual(subscription.payments.get().status, 'completed')
+
+    @override_settings(SUBSCRIPTION_BILLING_GATEWAY_CONCURRENCY={'mock': 2})
+    def test_gateway_concurrency_is_capped(self):
+        for _ in range(6):
+            self.subscribe()
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def slow_charge(**kwargs):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            return {'success': True, 'transaction_id': 'MOCK'}
+
+        with patch.object(MockPaymentGateway, 'process_payment', side_effect=slow_charge):
+            self.bill()
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(SubscriptionPayment.objects.filter(status='completed').count(), 6)
+
+    def test_charges_interrupted_after_the_gateway_are_retried_with_the_same_key(self):
+        subscription = self.subscribe()
+        charged = []
+
+        def charge(**kwargs):
+            charged.append(kwargs['metadata']['idempotency_key'])
+            return {'success': True, 'transaction_id': 'MOCK_TXN_1'}
+
+        with patch.object(MockPaymentGateway, 'process_payment', side_effect=charge):
+            # The worker dies after the gateway call, before storing its result
+            with patch.object(SubscriptionBillingRun, '_record', side_effect=RuntimeError('worker lost')):
+                with self.assertRaises(RuntimeError):
+                    self.bill()
+
+            # The claim was committed before the gateway was called, so it is not charged again yet
+            payment = subscription.payments.get()
+            self.assertEqual(payment.status, 'processing')
+            self.assertEqual(SubscriptionBillingRun.charge([payment.id]), {'completed': 0, 'failed': 0})
+            self.assertEqual(self.bill()['resent'], 0)
+
+            SubscriptionPayment.objects.filter(pk=payment.pk).update(
+                updated_at=timezone.now() - SubscriptionBillingRun.STALE_PAYMENT_AFTER - timedelta(minutes=1)
+            )
+            self.assertEqual(self.bill()['resent'], 1)
+
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.transaction_id), ('completed', 'MOCK_TXN_1'))
+        self.assertEqual(charged, [f'subscription-payment-{payment.id}'] * 2)
+        self.assertEqual(subscription.payments.count(), 1)
@@ -0,0 +1,186 @@
+"""
+Usage Metering Tests for SikaRemit
+Tests cache-backed subscription usage counters, their batched flushes and limit checks
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payments.models.subscriptions import Subscription, SubscriptionFeature, SubscriptionPlan, SubscriptionUsage
+from payments.services.usage_metering_service import UsageMeter
+from payments.tasks import flush_subscription_usage
+
+User = get_user_model()
+
+
+class UsageMeterFixtures:
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='metered@example.com', password='TestPass123!')
+        plan = SubscriptionPlan.objects.create(name='Metered', price='15.00')
+        self.subscription = Subscription.objects.create(
+            user=self.user, plan=plan, status='active', current_period_end=timezone.now() + timedelta(days=30)
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def usage(self, name='api_calls', limit=None, current_usage=0):
+        feature = SubscriptionFeature.objects.create(name=name, display_name=name.title(), feature_type='limit')
+        return SubscriptionUsage.objects.create(
+            subscription=self.subscription, feature=feature, limit=limit, current_usage=current_usage,
+            period_start=self.subscription.current_period_start, period_end=self.subscription.current_period_end
+        )
+
+    @staticmethod
+    def stored(usage):
+        return SubscriptionUsage.objects.get(pk=usage.pk).current_usage
+
+
+class UsageMeterTestCase(UsageMeterFixtures, TestCase):
+    pass
+
+
+class UsageCounterTests(UsageMeterTestCase):
+    """Tests for UsageMeter.increment and flush"""
+
+    def test_increments_are_written_by_the_flush(self):
+        usage = self.usage(current_usage=5)
+        usage.increment_usage()
+
+        with self.assertNumQueries(0):
+            usage.increment_usage(3)
+            self.assertEqual(UsageMeter.increment(SubscriptionUsage(pk=usage.pk), 2), 11)
+        self.assertEqual(usage.live_usage, 9)
+        self.assertEqual(self.stored(usage), 5)
+
+        self.assertEqual(flush_subscription_usage(), 1)
+        self.assertEqual(self.stored(usage), 11)
+        self.assertEqual(UsageMeter.current(usage), 11)
+        self.assertEqual(UsageMeter.flush(), 0)
+        self.assertEqual(self.stored(usage), 11)
+
+    def test_flush_updates_once_per_distinct_amount(self):
+        usages = [self.usage(name=f'feature_{i}') for i in range(6)]
+        for i, usage in enumerate(usages):
+            UsageMeter.increment(usage, 1 + i % 2)
+
+        # Two UPDATEs, inside a savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(UsageMeter.flush(), 6)
+        self.assertEqual([self.stored(usage) for usage in usages], [1, 2, 1, 2, 1, 2])
+
+    def test_no_increments_are_lost_under_concurrency(self):
+        usages = [self.usage(name='api_calls'), self.usage(name='invoices')]
+        UsageMeter.prefetch(usages)
+
+        def record(usage):
+            for _ in range(500):
+                UsageMeter.increment(usage)
+
+        threads = [threading.Thread(target=record, args=(usages[i % 2],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            UsageMeter.flush()
+        for thread in threads:
+            thread.join()
+        UsageMeter.flush()
+
+        self.assertEqual([self.stored(usage) for usage in usages], [2000, 2000])
+        self.assertEqual(UsageMeter.current_many(usages), {usages[0].pk: 2000, usages[1].pk: 2000})
+
+    def test_lost_slot_does_not_stall_the_flush(self):
+        usage = self.usage()
+        cache.add(UsageMeter.SEQUENCE_KEY, 0, None)
+        cache.incr(UsageMeter.SEQUENCE_KEY)  # A slot whose writer never got to write it
+        UsageMeter.increment(usage, 4)
+
+        self.assertEqual(UsageMeter.flush(), 0)
+        # Its writer may just be slow, so the slot is waited on for a while
+        self.assertEqual(UsageMeter.flush(), 0)
+        later = time.time() + UsageMeter.LOST_SLOT_AFTER
+        with patch('payments.services.usage_metering_service.time.time', return_value=later):
+            self.assertEqual(UsageMeter.flush(), 1)
+        self.assertEqual(self.stored(usage), 4)
+
+
+class UsageFlushInterleavingTests(UsageMeterFixtures, TransactionTestCase):
+    """Tests for totals seeded while a flush is moving usage to the database"""
+
+    def test_seed_during_a_flush_keeps_the_usage_in_flight(self):
+        usage = self.usage(current_usage=5)
+        UsageMeter.increment(usage, 3)
+        seeded = []
+
+        def seed():
+            seeded.append(UsageMeter.current(usage))
+            connection.close()
+
+        seeder = threading.Thread(target=seed)
+        decr = cache.decr
+
+        def decr_then_seed(key, delta=1, version=None):
+            result = decr(key, delta, version)
+            # The total expires once the usage has left pending but before the UPDATE
+            cache.delete(UsageMeter._key('total', usage.id))
+            seeder.start()
+            seeder.join(0.2)
+            return result
+
+        with patch.object(cache, 'decr', side_effect=decr_then_seed):
+            self.assertEqual(UsageMeter.flush(), 1)
+        seeder.join()
+
+        self.assertEqual(seeded, [8])
+        self.assertEqual(UsageMeter.current(usage), 8)
+        self.assertEqual(self.stored(usage), 8)
+
+class UsageLimitTests(UsageMeterTestCase):
+    """Tests for limit checks served from the usage counters"""
+
+    def test_limit_checks_read_the_counter(self):
+        usage = self.usage(limit=10, current_usage=8)
+        self.assertFalse(usage.is_over_limit)
+
+        with patch.object(SubscriptionUsage, '_trigger_over_limit_alert') as alert:
+            usage.increment_usage()
+            alert.assert_not_called()
+            usage.increment_usage()
+            alert.assert_called_once()
+
+        fresh = SubscriptionUsage.objects.get(pk=usage.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(fresh.is_over_limit)
+            self.assertEqual(fresh.usage_percentage, 100)
+
+    def test_reset_drops_pending_usage(self):
+        usage = self.usage(current_usage=3)
+        usage.increment_usage(4)
+
+        usage.reset_usage()
+        UsageMeter.flush()
+
+        self.assertEqual(self.stored(usage), 0)
+        self.assertEqual(SubscriptionUsage.objects.get(pk=usage.pk).live_usage, 0)
+
+    def test_usage_endpoint_reports_unflushed_usage(self):
+        usage = self.usage(limit=20, current_usage=2)
+        usage.increment_usage(3)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(f'/api/v1/payments/subscriptions/{self.subscription.pk}/usage/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['usage'][0]['current_usage'], 5)
+        self.assertEqual(response.data['usage'][0]['percentage'], 25)
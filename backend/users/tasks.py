@@ -4,6 +4,7 @@ from django.conf import settings
 from celery import shared_task
 from .models import User
 import requests
+from core.metrics import observe_webhook
 from django.utils import timezone
 from .models import KYCDocument
 
@@ -41,7 +42,7 @@ def send_merchant_approval_email(user_id, approved_by_id):
     )
 
 @shared_task(bind=True, max_retries=3)
-def send_kyc_webhook(document_id, event_type):
+def send_kyc_webhook(self, document_id, event_type):
     document = KYCDocument.objects.get(pk=document_id)
     webhook_url = settings.KYC_WEBHOOK_URL
     
@@ -54,13 +55,14 @@ def send_kyc_webhook(document_id, event_type):
     }
     
     try:
-        response = requests.post(
-            webhook_url,
-            json=payload,
-            headers={'Authorization': f'Bearer {settings.KYC_WEBHOOK_SECRET}'},
-            timeout=10
-        )
-        response.raise_for_status()
+        with observe_webhook('kyc'):
+            response = requests.post(
+                webhook_url,
+                json=payload,
+                headers={'Authorization': f'Bearer {settings.KYC_WEBHOOK_SECRET}'},
+                timeout=10
+            )
+            response.raise_for_status()
         return True
     except Exception as e:
         self.retry(exc=e, countdown=60)